@@ -1,19 +1,25 @@
 import json
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth.models import User, Group
-from django.db.models import Sum, Q
+from django.db.models import Sum, Count, Q, OuterRef, Subquery, Value, DecimalField, IntegerField, CharField
+from django.db.models.functions import Coalesce
 from django.db.models.functions import TruncDay
 from django.utils import timezone
 from datetime import timedelta
-from django.shortcuts import redirect
+from django.shortcuts import redirect, get_object_or_404
 from django.contrib import messages
 from django.utils.html import format_html
 from django.core.serializers.json import DjangoJSONEncoder
-from django.urls import path
+from django.urls import path, reverse
+from django.http import HttpResponse
 from django.utils.safestring import mark_safe # لإظهار الأزرار
+from django.template.loader import render_to_string
 
 # استيراد كافة الجداول
-from .models import Service, Job, Booking, Advance, Notification, StationSettings, WorkerProfile, Attendance
+from .models import Service, Job, Booking, Advance, Notification, StationSettings, WorkerProfile, Attendance, Task, SlowQuery, RequestProfile, JobEvent, ProjectionRow, OutboundMessage, BookingSlot, WorkerServiceStats
+from .routers import reporting_reads
+from . import dashboard, performance, taskqueue, tasks
 
 # =========================================================
 # ⚙️ إعدادات العناوين
@@ -22,6 +28,13 @@ admin.site.unregister(Group)
 admin.site.site_header = "نظام TurboWash المتكامل 🚿"
 admin.site.index_title = "لوحة القيادة"
 
+def _station_mode(request):
+    """ ⚡ نظام العمل الحالي: استعلام واحد لكل طلب مهما تكرر السؤال """
+    if not hasattr(request, '_station_mode'):
+        settings_obj, _ = StationSettings.objects.get_or_create(id=1)
+        request._station_mode = settings_obj.current_mode
+    return request._station_mode
+
 # =========================================================
 # 1. إعدادات النظام
 # =========================================================
@@ -36,8 +49,8 @@ class StationSettingsAdmin(admin.ModelAdmin):
 # =========================================================
 @admin.register(Service)
 class ServiceAdmin(admin.ModelAdmin):
-    list_display = ('name', 'price', 'worker_commission', 'icon')
-    list_editable = ('price', 'worker_commission', 'icon')
+    list_display = ('name', 'price', 'worker_commission', 'duration_minutes', 'icon')
+    list_editable = ('price', 'worker_commission', 'duration_minutes', 'icon')
     ordering = ('name',)
 
 # =========================================================
@@ -50,7 +63,7 @@ class JobAdmin(admin.ModelAdmin):
     # ---------------------------------------------------------
     fieldsets = (
         ('👤 بيانات الزبون', {'fields': (('client_name', 'phone'), ('car_plate', 'car_type'))}),
-        ('🧼 تفاصيل الخدمة', {'fields': ('service', 'worker', 'status', 'source')}),
+        ('🧼 تفاصيل الخدمة', {'fields': ('service', 'worker', 'status', 'source', 'slot_at')}),
         ('💰 الحسابات والوقت', {'fields': (('final_price', 'final_commission'), 'created_at')}),
         ('🎙️ تفاصيل الطلب الخاص', {'fields': ('voice_audio', 'custom_desc')}),
     )
@@ -60,23 +73,23 @@ class JobAdmin(admin.ModelAdmin):
     
     # السماح بتعديل الحالة والعامل مباشرة في الجدول (وهذا هو سبب طلب زر الحفظ)
     list_editable = ('status', 'worker',) 
+
+    # ⚡ الخدمة والعامل في نفس استعلام الجدول (بدل استعلام لكل صف)
+    list_select_related = ('service', 'worker')
     
     list_filter = ('status', 'worker', 'service', 'created_at') 
     search_fields = ('car_plate', 'client_name', 'worker__username')
     ordering = ('-created_at',)
-    readonly_fields = ('final_price', 'final_commission', 'created_at') 
+    # 📅 الموعد يُحجز من نموذج الموقع فقط (تغييره هنا لن ينقل الفترات المحجوزة)
+    readonly_fields = ('final_price', 'final_commission', 'created_at', 'slot_at') 
 
     # ---------------------------------------------------------
     # 🔥 (إضافة مهمة جداً) فلترة الجدول لفصل النظامين بصرياً 🔥
     # ---------------------------------------------------------
     def get_queryset(self, request):
         qs = super().get_queryset(request)
-        try:
-            # نجلب النظام الحالي
-            settings = StationSettings.objects.first()
-            current_mode = settings.current_mode if settings else 'commission'
-        except:
-            current_mode = 'commission'
+        # نجلب النظام الحالي (مرة واحدة لكل طلب)
+        current_mode = _station_mode(request)
 
         # إذا كنا في الرواتب، اعرض فقط عمليات الرواتب
         if current_mode == 'salary':
@@ -104,7 +117,14 @@ class JobAdmin(admin.ModelAdmin):
         # if db_field.name == "service":
         #     kwargs["required"] = False 
 
-        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+        formfield = super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+        # ⚡ قائمة العمال في الجدول القابل للتعديل: تُقرأ مرة واحدة وتُشارك بين كل الصفوف
+        if db_field.name == "worker" and formfield is not None:
+            if not hasattr(request, '_worker_choices'):
+                request._worker_choices = list(formfield.choices)
+            formfield.choices = request._worker_choices
+        return formfield
 
     # ---------------------------------------------------------
     # ⚙️ إضافة مسارات URL مخصصة للأزرار
@@ -124,7 +144,9 @@ class JobAdmin(admin.ModelAdmin):
         """عرض أزرار الحفظ والحذف لكل عملية."""
         save_link = self.save_job_link(obj)
         delete_link = self.delete_job_link(obj)
-        return format_html('{} {}', save_link, delete_link)
+        if obj.status in ('completed', 'canceled'):
+            return format_html('{} {}', save_link, delete_link)
+        return format_html('{} {} {}', self.finish_job_link(obj), save_link, delete_link)
         
     actions_column.short_description = format_html('الإجراءات')
     actions_column.allow_tags = True
@@ -137,6 +159,13 @@ class JobAdmin(admin.ModelAdmin):
         link = f"/{url}/bookings/job/{obj.pk}/action/?type=save" 
         return mark_safe(f'<a href="{link}" class="button" style="background-color: #4CAF50; color: white; padding: 5px 10px; margin-right: 5px; border-radius: 3px;" title="حفظ التغييرات في هذا الصف">💾 حفظ</a>')
 
+    def finish_job_link(self, obj):
+        """زر إنهاء الغسيل (يُحدّث السطر والأرقام مكانها دون إعادة تحميل الصفحة)"""
+        return format_html(
+            '<a href="{}" class="button" data-partial="finish" style="background-color: #ff9500; color: white; padding: 5px 10px; margin-right: 5px; border-radius: 3px;" title="إنهاء الغسيل">🏁 إنهاء</a>',
+            reverse('finish_wash', args=[obj.pk]),
+        )
+
     def delete_job_link(self, obj):
         """زر الحذف الفردي"""
         url = self.admin_site.name
@@ -187,22 +216,38 @@ class JobAdmin(admin.ModelAdmin):
                 # 🛑 التحقق من الإلزامية: الخدمة والعامل
                 if not srv_id or not worker_id:
                     error_msg = "⚠️ يجب اختيار كل من **الخدمة** و **العامل** لتسجيل عملية الكاشير!"
+                    if dashboard.wants_json(request):
+                        return dashboard.partial_response(error_msg, level='error', status=400)
                     self.message_user(request, error_msg, level=messages.ERROR)
                     return redirect(request.get_full_path())
 
                 selected_service = Service.objects.get(id=srv_id)
                 
                 commission_value = 0
-                settings_obj, _ = StationSettings.objects.get_or_create(id=1)
-                if settings_obj.current_mode != 'salary':
+                if _station_mode(request) != 'salary':
                     commission_value = selected_service.worker_commission
 
+                # 📴 نفس الإدخال أُرسل مرتين -> لا ننشئ عملية ثانية
+                idem_key = request.POST.get('idempotency_key') or None
+
+                def duplicate():
+                    if dashboard.wants_json(request):
+                        return dashboard.partial_response("ℹ️ العملية مسجلة مسبقاً", level='info', duplicate=True)
+                    self.message_user(request, "ℹ️ العملية مسجلة مسبقاً", level=messages.INFO)
+                    return redirect(request.get_full_path())
+
+                if idem_key and Job.objects.filter(idempotency_key=idem_key).exists():
+                    return duplicate()
+
                 # ✅ المعالجة الأمنية للقيم الفارغة المسموح بها في DB
                 input_phone = request.POST.get('phone') or "-"
                 input_name = request.POST.get('client_name') or "زبون مباشر"
                 input_car_type = request.POST.get('car_type') or "غير محدد"
 
-                new_job = Job(
+                # 🔒 نفس مسار الكاشير: كاتب واحد، والحدث والرسائل والإحصاءات في معاملة واحدة
+                from .views import _create_job_once
+                new_job = _create_job_once(
+                    idempotency_key=idem_key,
                     source='manual', 
                     car_plate=request.POST.get('plate') or "بدون لوحة",
                     
@@ -216,13 +261,20 @@ class JobAdmin(admin.ModelAdmin):
                     service=selected_service,
                     # لا نحتاج لتعيين final_price/commission هنا، دالة save في models.py ستحسبها عند الحفظ الأول
                 )
-                
-                # عند الحفظ، سيتم حساب final_price و final_commission (إذا كانت الحالة completed)
-                new_job.save() 
+                if new_job is None:
+                    return duplicate()
+                if dashboard.wants_json(request):
+                    # ⚡ بدل إعادة رسم الصفحة كاملة: السطر الجديد + أرقام اليوم
+                    return dashboard.partial_response(
+                        "✅ تم تسجيل العملية بنجاح", mode=new_job.system_mode, job=dashboard.job_row(new_job),
+                        row_html=render_to_string('admin/bookings/job/latest_job_row.html', {'job': new_job}),
+                    )
                 self.message_user(request, "✅ تم تسجيل العملية بنجاح", level=messages.SUCCESS)
                 return redirect(request.get_full_path())
             except Exception as e:
                 # عرض رسالة خطأ أكثر وضوحاً
+                if dashboard.wants_json(request):
+                    return dashboard.partial_response(f"❌ حدث خطأ غير متوقع: {e}", level='error', status=400)
                 self.message_user(request, f"❌ حدث خطأ غير متوقع: {e}", level=messages.ERROR)
                 return redirect(request.get_full_path())
 
@@ -234,8 +286,7 @@ class JobAdmin(admin.ModelAdmin):
         extra_context['workers'] = User.objects.filter(is_staff=True)
 
         # 2. تحديد الوضع الحالي
-        settings_obj, _ = StationSettings.objects.get_or_create(id=1)
-        current_mode = settings_obj.current_mode
+        current_mode = _station_mode(request)
         
         today = timezone.now().date()
         now = timezone.now()
@@ -249,34 +300,29 @@ class JobAdmin(admin.ModelAdmin):
             self.change_list_template = "admin/bookings/job/salary_dashboard.html"
             
             workers_list = []
-            total_salaries_today = 0
-            
+
+            # ⚡ قراءة الرواتب والحضور دفعة واحدة بدل استعلامين لكل عامل
+            salaries = dict(WorkerProfile.objects.filter(user__is_staff=True).values_list('user_id', 'daily_salary'))
+            present_ids = set(Attendance.objects.filter(date=today, is_present=True).values_list('worker_id', flat=True))
+            default_salary = WorkerProfile._meta.get_field('daily_salary').default
+
+            # ⚙️ إنشاء الملفات الناقصة في الخلفية، ونعرض الراتب الافتراضي مؤقتاً
+            if any(w.id not in salaries for w in extra_context['workers']):
+                tasks.ensure_worker_profiles.delay(unique=True)
+
             for w in extra_context['workers']:
-                profile, _ = WorkerProfile.objects.get_or_create(user=w)
-                daily_wage = profile.daily_salary
-                att = Attendance.objects.filter(worker=w, date=today).first()
-                is_present = att.is_present if att else False
-                
-                if is_present: total_salaries_today += daily_wage
+                daily_wage = salaries.get(w.id, default_salary)
+                is_present = w.id in present_ids
                 workers_list.append({'worker': w, 'salary': daily_wage, 'is_present': is_present})
 
-            # ✅ فلترة الحسابات حسب النظام + استثناء الملغاة (canceled)
-            total_revenue = Job.objects.filter(
-                created_at__range=(today_start, today_end),
-                system_mode='salary'  # ⬅️ الفلترة المضافة
-            ).exclude(status='canceled').aggregate(Sum('final_price'))['final_price__sum'] or 0
-
+            # ✅ أرقام اليوم (نفس الدالة التي تحدّث اللوحة بعد كل زر - bookings/dashboard.py)
             extra_context.update({
                 'workers_list': workers_list,
-                'salary_stats': {
-                    'total_revenue': total_revenue,
-                    'total_salaries': total_salaries_today,
-                    'net_profit': total_revenue - total_salaries_today
-                },
+                'salary_stats': dashboard.today_counters('salary', present_salaries=[w['salary'] for w in workers_list if w['is_present']]),
                 'latest_jobs': Job.objects.filter(
                     created_at__range=(today_start, today_end), 
                     system_mode='salary'
-                ).exclude(status='canceled').order_by('-created_at')[:10]
+                ).exclude(status='canceled').select_related('service').order_by('-created_at')[:10]
             })
 
         # =========================================================
@@ -285,43 +331,40 @@ class JobAdmin(admin.ModelAdmin):
         else:
             self.change_list_template = "admin/bookings/job/change_list_jazzmin.html"
             
-            # ✅ فلترة الحسابات حسب النظام + استثناء الملغاة
-            today_jobs = Job.objects.filter(
-                created_at__range=(today_start, today_end), 
-                system_mode='commission'  # ⬅️ الفلترة المضافة
-            )
-            active_jobs = today_jobs.exclude(status='canceled')
-            
-            total_revenue = active_jobs.aggregate(Sum('final_price'))['final_price__sum'] or 0
-            total_commission = active_jobs.aggregate(Sum('final_commission'))['final_commission__sum'] or 0
-            net_profit = total_revenue - total_commission
-            pending_jobs = today_jobs.filter(status='processing').count()
-
-            # ✅ استثناء الملغاة من الشهر
-            month_jobs = Job.objects.filter(
-                created_at__month=now.month, 
-                created_at__year=now.year,
-                system_mode='commission'
-            ).exclude(status='canceled')
-            profit_month = (month_jobs.aggregate(Sum('final_price'))['final_price__sum'] or 0) - (month_jobs.aggregate(Sum('final_commission'))['final_commission__sum'] or 0)
-
-            # ✅ استثناء الملغاة من السنة
-            year_jobs = Job.objects.filter(
-                created_at__year=now.year,
-                system_mode='commission'
-            ).exclude(status='canceled')
-            profit_year = (year_jobs.aggregate(Sum('final_price'))['final_price__sum'] or 0) - (year_jobs.aggregate(Sum('final_commission'))['final_commission__sum'] or 0)
-
-            last_7_days = now - timedelta(days=6)
-            
-            # ✅ استثناء الملغاة من المبيان
-            chart_data = Job.objects.filter(
-                created_at__gte=last_7_days,
-                system_mode='commission'
-            ).exclude(status='canceled').annotate(day=TruncDay('created_at')).values('day').annotate(rev=Sum('final_price'), comm=Sum('final_commission')).order_by('day')
+            # ✅ أرقام اليوم: فلترة حسب النظام + استثناء الملغاة (bookings/dashboard.py)
+            today_stats = dashboard.today_counters('commission')
+
+            # 📸 الإحصائيات الطويلة (الشهر/السنة/المبيان) تُقرأ من نسخة التقارير
+            # أرقام اليوم بالأعلى تبقى على القاعدة الرئيسية ليرى الكاشير عمليته فوراً
+            with reporting_reads():
+                # ✅ استثناء الملغاة من الشهر
+                month_jobs = Job.objects.filter(
+                    created_at__month=now.month, 
+                    created_at__year=now.year,
+                    system_mode='commission'
+                ).exclude(status='canceled')
+                month = month_jobs.aggregate(rev=Sum('final_price'), comm=Sum('final_commission'))
+                profit_month = (month['rev'] or 0) - (month['comm'] or 0)
+
+                # ✅ استثناء الملغاة من السنة
+                year_jobs = Job.objects.filter(
+                    created_at__year=now.year,
+                    system_mode='commission'
+                ).exclude(status='canceled')
+                year = year_jobs.aggregate(rev=Sum('final_price'), comm=Sum('final_commission'))
+                profit_year = (year['rev'] or 0) - (year['comm'] or 0)
+
+                last_7_days = now - timedelta(days=6)
+                
+                # ✅ استثناء الملغاة من المبيان
+                chart_data = Job.objects.filter(
+                    created_at__gte=last_7_days,
+                    system_mode='commission'
+                ).exclude(status='canceled').annotate(day=TruncDay('created_at')).values('day').annotate(rev=Sum('final_price'), comm=Sum('final_commission')).order_by('day')
+
+                data_dict = {item['day'].date(): item for item in chart_data}
 
             dates, profits, revenues = [], [], []
-            data_dict = {item['day'].date(): item for item in chart_data}
             for i in range(7):
                 d = (last_7_days + timedelta(days=i)).date()
                 dates.append(d.strftime('%Y-%m-%d'))
@@ -331,12 +374,9 @@ class JobAdmin(admin.ModelAdmin):
 
             extra_context.update({
                 'stats': {
-                    'total_revenue': total_revenue, 
-                    'total_commission': total_commission, 
-                    'profit': net_profit,
+                    **today_stats,
                     'profit_month': profit_month, 
                     'profit_year': profit_year, 
-                    'pending_jobs': pending_jobs,
                     'chart_dates': json.dumps(dates, cls=DjangoJSONEncoder),
                     'chart_profits': json.dumps(profits, cls=DjangoJSONEncoder),
                     'chart_revenues': json.dumps(revenues, cls=DjangoJSONEncoder),
@@ -361,6 +401,219 @@ class AttendanceAdmin(admin.ModelAdmin):
     list_display = ('worker', 'date', 'is_present', 'day_salary_snapshot')
     list_filter = ('date', 'worker')
 
+# =========================================================
+# ⚙️ المهام الخلفية (الطابور)
+# =========================================================
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'attempts', 'run_after', 'locked_by', 'created_at', 'short_error')
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'last_error')
+    readonly_fields = [f.name for f in Task._meta.fields]
+    actions = ['retry_tasks']
+
+    def has_add_permission(self, request): return False
+
+    def changelist_view(self, request, extra_context=None):
+        # ⚠️ بدون run_workers تتراكم المهام (ومعها إشعارات حجوزات الموقع) بصمت
+        waited = taskqueue.oldest_due_seconds()
+        if waited > getattr(settings, 'TASKS_STALL_WARNING_SECONDS', 120):
+            self.message_user(
+                request, f"⚠️ أقدم مهمة جاهزة تنتظر منذ {int(waited // 60)} دقيقة: هل أمر run_workers يعمل؟",
+                level=messages.WARNING,
+            )
+        return super().changelist_view(request, extra_context=extra_context)
+
+    def short_error(self, obj):
+        return (obj.last_error.strip().splitlines() or ['-'])[-1][:80]
+    short_error.short_description = "آخر خطأ"
+
+    def retry_tasks(self, request, queryset):
+        count = queryset.exclude(status='running').update(status='queued', attempts=0, run_after=timezone.now(), last_error='')
+        self.message_user(request, f"🔁 تمت إعادة {count} مهمة إلى الطابور", level=messages.SUCCESS)
+    retry_tasks.short_description = "🔁 إعادة المحاولة"
+
+# =========================================================
+# 📨 رسائل الزبائن (Outbox)
+# =========================================================
+@admin.register(OutboundMessage)
+class OutboundMessageAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'phone', 'status', 'attempts', 'next_attempt_at', 'sent_at', 'job_id')
+    list_filter = ('status', 'kind')
+    search_fields = ('phone', 'body', 'dedupe_key')
+    readonly_fields = [f.name for f in OutboundMessage._meta.fields]
+    actions = ['retry_messages']
+
+    def has_add_permission(self, request): return False
+
+    def retry_messages(self, request, queryset):
+        count = queryset.filter(status='failed').update(status='queued', attempts=0, next_attempt_at=timezone.now(), last_error='')
+        if count:
+            tasks.dispatch_outbox.delay(unique=True)
+        self.message_user(request, f"🔁 تمت إعادة {count} رسالة إلى الصندوق", level=messages.SUCCESS)
+    retry_messages.short_description = "🔁 إعادة إرسال الفاشلة"
+
+# =========================================================
+# 📅 مواعيد الحجز (السعة من الحضور، المحجوز من نموذج الموقع)
+# =========================================================
+@admin.register(BookingSlot)
+class BookingSlotAdmin(admin.ModelAdmin):
+    list_display = ('date', 'start', 'capacity', 'reserved', 'available')
+    list_filter = ('date',)
+    list_editable = ('capacity',)
+    readonly_fields = ('date', 'start', 'reserved')
+    date_hierarchy = 'date'
+
+    def has_add_permission(self, request): return False
+
+# =========================================================
+# ⏱️ أداء العمال (يُحدث تلقائياً عند كل اكتمال - قراءة فقط)
+# =========================================================
+@admin.register(WorkerServiceStats)
+class WorkerServiceStatsAdmin(admin.ModelAdmin):
+    list_display = ('worker', 'service', 'count', 'median_display', 'p90_display', 'mean_display', 'updated_at')
+    list_filter = ('service', 'worker')
+    list_select_related = ('worker', 'service')
+    readonly_fields = ('worker', 'service', 'count', 'mean', 'min_seconds', 'max_seconds', 'updated_at')
+
+    def _minutes(self, obj, q):
+        return f"{performance.Summary.of(obj).quantile(q) / 60:.1f} د" if obj.count else '-'
+
+    @admin.display(description="الوسيط")
+    def median_display(self, obj): return self._minutes(obj, 0.5)
+
+    @admin.display(description="90%")
+    def p90_display(self, obj): return self._minutes(obj, 0.9)
+
+    @admin.display(description="المتوسط", ordering='mean')
+    def mean_display(self, obj): return f"{obj.mean / 60:.1f} د"
+
+    def has_add_permission(self, request): return False
+
+# =========================================================
+# 🐢 الاستعلامات البطيئة (قراءة فقط)
+# =========================================================
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = ('short_sql', 'calls', 'avg_ms', 'max_ms_display', 'last_view', 'last_seen')
+    list_filter = ('last_view',)
+    search_fields = ('sql', 'last_view', 'fingerprint')
+    fields = ('fingerprint', 'sql', 'sample_sql', 'calls', 'total_ms', 'max_ms', 'last_view',
+              'plan_display', 'stack_display', 'first_seen', 'last_seen')
+    readonly_fields = fields
+    actions = ['delete_selected']
+
+    def has_add_permission(self, request): return False
+    def has_change_permission(self, request, obj=None): return False
+
+    def short_sql(self, obj): return obj.sql[:90] + ('…' if len(obj.sql) > 90 else '')
+    short_sql.short_description = "الاستعلام"
+
+    def avg_ms(self, obj): return f"{obj.total_ms / obj.calls:.1f}" if obj.calls else '-'
+    avg_ms.short_description = "المتوسط (ms)"
+
+    def max_ms_display(self, obj): return f"{obj.max_ms:.1f}"
+    max_ms_display.short_description = "الأسوأ (ms)"
+    max_ms_display.admin_order_field = 'max_ms'
+
+    def plan_display(self, obj): return format_html('<pre style="direction: ltr; text-align: left;">{}</pre>', obj.plan or '-')
+    plan_display.short_description = "خطة التنفيذ"
+
+    def stack_display(self, obj): return format_html('<pre style="direction: ltr; text-align: left;">{}</pre>', obj.last_stack or '-')
+    stack_display.short_description = "مكان الاستدعاء"
+
+# =========================================================
+# 🔬 قياسات الأداء (?profile=1) - مدير النظام فقط
+# =========================================================
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ('path', 'view', 'status_code', 'duration_display', 'query_count', 'samples', 'user', 'created_at')
+    list_filter = ('view',)
+    search_fields = ('path', 'view')
+    fields = ('path', 'view', 'method', 'status_code', 'duration_ms', 'query_count', 'samples', 'user',
+              'created_at', 'downloads', 'top_functions_display')
+    readonly_fields = fields
+    actions = ['delete_selected']
+
+    def has_module_permission(self, request): return request.user.is_superuser
+    def has_view_permission(self, request, obj=None): return request.user.is_superuser
+    def has_delete_permission(self, request, obj=None): return request.user.is_superuser
+    def has_add_permission(self, request): return False
+    def has_change_permission(self, request, obj=None): return False
+
+    def get_queryset(self, request):
+        # الملفات الخام كبيرة: لا نقرأها في القائمة
+        return super().get_queryset(request).defer('pstats_data', 'collapsed_stacks').select_related('user')
+
+    def get_urls(self):
+        custom_urls = [
+            path('<int:pk>/download/<str:kind>/', self.admin_site.admin_view(self.download), name='bookings_requestprofile_download'),
+        ]
+        return custom_urls + super().get_urls()
+
+    def download(self, request, pk, kind):
+        if not request.user.is_superuser:
+            return HttpResponse(status=403)
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        if kind == 'prof':
+            response = HttpResponse(bytes(profile.pstats_data), content_type='application/octet-stream')
+            filename = f"profile-{pk}.prof"
+        elif kind == 'collapsed':
+            response = HttpResponse(profile.collapsed_stacks, content_type='text/plain; charset=utf-8')
+            filename = f"profile-{pk}.collapsed.txt"
+        else:
+            return HttpResponse(status=404)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    def duration_display(self, obj): return f"{obj.duration_ms:.0f} ms"
+    duration_display.short_description = "المدة"
+    duration_display.admin_order_field = 'duration_ms'
+
+    def downloads(self, obj):
+        url = lambda kind: reverse('admin:bookings_requestprofile_download', args=[obj.pk, kind])
+        return format_html(
+            '<a class="btn btn-sm btn-outline-primary" href="{}">⬇️ .prof (snakeviz / pstats)</a> '
+            '<a class="btn btn-sm btn-outline-danger" href="{}">🔥 collapsed stacks (flamegraph / speedscope)</a>',
+            url('prof'), url('collapsed'),
+        )
+    downloads.short_description = "تحميل"
+
+    def top_functions_display(self, obj):
+        return format_html('<pre style="direction: ltr; text-align: left; font-size: 12px;">{}</pre>', obj.top_functions or '-')
+    top_functions_display.short_description = "أهم الدوال (حسب الزمن التراكمي)"
+
+# =========================================================
+# 📜 سجل أحداث العمليات + الإسقاطات (قراءة فقط)
+# =========================================================
+@admin.register(JobEvent)
+class JobEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'job_id', 'kind', 'at', 'change_display')
+    list_filter = ('kind',)
+    search_fields = ('job__id',)
+    fields = ('job_id', 'kind', 'at', 'before', 'after')
+    readonly_fields = fields
+
+    def has_add_permission(self, request): return False
+    def has_change_permission(self, request, obj=None): return False
+    def has_delete_permission(self, request, obj=None): return False
+
+    def change_display(self, obj):
+        before, after = obj.before or {}, obj.after or {}
+        changed = [f"{k}: {before.get(k)} → {after.get(k)}" for k in sorted(set(before) | set(after)) if before.get(k) != after.get(k)]
+        return ' | '.join(changed) or '-'
+    change_display.short_description = "التغيير"
+
+@admin.register(ProjectionRow)
+class ProjectionRowAdmin(admin.ModelAdmin):
+    list_display = ('projection', 'key', 'data', 'updated_at')
+    list_filter = ('projection',)
+    search_fields = ('key',)
+    readonly_fields = ('projection', 'key', 'data', 'updated_at')
+
+    def has_add_permission(self, request): return False
+    def has_change_permission(self, request, obj=None): return False
+
 # =========================================================
 # 5. تقرير الرواتب الذكي (Payroll)
 # =========================================================
@@ -376,61 +629,61 @@ class PayrollAdmin(admin.ModelAdmin):
     get_full_name_custom.short_description = "العامل"
 
     def get_salary_mode(self, obj):
-        setting = StationSettings.objects.first()
-        mode = setting.current_mode if setting else 'commission'
-        return "راتب يومي" if mode == 'salary' else "نسبة"
+        return "راتب يومي" if obj.pay_mode == 'salary' else "نسبة"
     get_salary_mode.short_description = "نظام الحساب"
 
     def month_earnings(self, obj):
-        setting = StationSettings.objects.first()
-        mode = setting.current_mode if setting else 'commission'
-        start_month = timezone.now().replace(day=1)
-
-        if mode == 'salary':
-            total = Attendance.objects.filter(worker=obj, date__gte=start_month, is_present=True).aggregate(Sum('day_salary_snapshot'))['day_salary_snapshot__sum'] or 0
-            days = Attendance.objects.filter(worker=obj, date__gte=start_month, is_present=True).count()
-            return format_html('<span style="color:blue;">{} د.ج ({} أيام)</span>', total, days)
-        else:
-            # ✅ استثناء الملغاة وفلترة نظام العمولة
-            total = Job.objects.filter(
-                worker=obj, 
-                created_at__gte=start_month, 
-                status='completed',
-                system_mode='commission'
-            ).exclude(status='canceled').aggregate(Sum('final_commission'))['final_commission__sum'] or 0
-            return format_html('<span style="color:blue;">{} د.ج (نسبة)</span>', total)
+        if obj.pay_mode == 'salary':
+            return format_html('<span style="color:blue;">{} د.ج ({} أيام)</span>', obj.earned, obj.present_days)
+        return format_html('<span style="color:blue;">{} د.ج (نسبة)</span>', obj.earned)
     month_earnings.short_description = "الاستحقاق"
 
     def month_advances(self, obj):
-        start_month = timezone.now().replace(day=1)
-        total = Advance.objects.filter(worker=obj, date__gte=start_month).aggregate(Sum('amount'))['amount__sum'] or 0
-        return format_html('<span style="color:red;">- {} د.ج</span>', total)
+        return format_html('<span style="color:red;">- {} د.ج</span>', obj.taken)
     month_advances.short_description = "المسحوبات"
 
     def net_salary(self, obj):
-        start_month = timezone.now().replace(day=1)
-        setting = StationSettings.objects.first()
-        mode = setting.current_mode if setting else 'commission'
-
-        if mode == 'salary':
-            earned = Attendance.objects.filter(worker=obj, date__gte=start_month, is_present=True).aggregate(Sum('day_salary_snapshot'))['day_salary_snapshot__sum'] or 0
-        else:
-            # ✅ استثناء الملغاة وفلترة نظام العمولة في الصافي
-            earned = Job.objects.filter(
-                worker=obj, 
-                created_at__gte=start_month, 
-                status='completed',
-                system_mode='commission'
-            ).exclude(status='canceled').aggregate(Sum('final_commission'))['final_commission__sum'] or 0
-        
-        taken = Advance.objects.filter(worker=obj, date__gte=start_month).aggregate(Sum('amount'))['amount__sum'] or 0
-        net = earned - taken
+        net = obj.earned - obj.taken
         color = "green" if net >= 0 else "red"
         return format_html('<b style="color:{}; background:#e8f5e9; padding:5px;">= {} د.ج</b>', color, net)
     net_salary.short_description = "✅ الصافي"
 
     def get_queryset(self, request):
-        return super().get_queryset(request).filter(is_staff=True)
+        # ⚡ كل أرقام الشهر تُحسب في استعلام الجدول نفسه (استعلامات فرعية) بدل 4-5 استعلامات لكل عامل
+        mode = _station_mode(request)
+        start_month = timezone.now().replace(day=1)
+        money = DecimalField(max_digits=12, decimal_places=2)
+
+        def per_worker(qs, expression):
+            return Coalesce(Subquery(
+                qs.filter(worker=OuterRef('pk')).order_by().values('worker').annotate(v=expression).values('v')
+            ), Value(0), output_field=expression.output_field)
+
+        present = Attendance.objects.filter(date__gte=start_month, is_present=True)
+        if mode == 'salary':
+            earned = per_worker(present, Sum('day_salary_snapshot', output_field=money))
+        else:
+            # ✅ استثناء الملغاة وفلترة نظام العمولة
+            earned = per_worker(
+                Job.objects.filter(created_at__gte=start_month, status='completed', system_mode='commission').exclude(status='canceled'),
+                Sum('final_commission', output_field=money),
+            )
+
+        return super().get_queryset(request).filter(is_staff=True).annotate(
+            pay_mode=Value(mode, output_field=CharField()),
+            earned=earned,
+            present_days=per_worker(present, Count('id', output_field=IntegerField())),
+            taken=per_worker(Advance.objects.filter(date__gte=start_month), Sum('amount', output_field=money)),
+        )
+
+    def changelist_view(self, request, extra_context=None):
+        # 📸 تقرير قراءة فقط: كل الاستعلامات (حتى أعمدة الجدول) من نسخة التقارير
+        # لذلك نرسم الصفحة داخل السياق بدل الرسم المتأخر المعتاد
+        with reporting_reads():
+            response = super().changelist_view(request, extra_context=extra_context)
+            if hasattr(response, 'render'):
+                response.render()
+        return response
 
 # =========================================================
 # 6. إدارة العمال
@@ -451,6 +704,7 @@ class WorkerAdmin(admin.ModelAdmin):
     inlines = (WorkerProfileInline,)
     fields = ('username', 'first_name', 'password', 'is_active')
     list_display = ('username', 'first_name', 'get_salary', 'is_active')
+    list_select_related = ('profile',)
     
     def get_salary(self, obj):
         if hasattr(obj, 'profile'): return f"{obj.profile.daily_salary} DA"
@@ -5,4 +5,6 @@ class BookingsConfig(AppConfig):
     name = 'bookings'
 
     def ready(self):
-        import bookings.signals # 👈 إضافة هذا السطر لتفعيل المراقب
\ No newline at end of file
+        import bookings.signals # 👈 إضافة هذا السطر لتفعيل المراقب
+        import bookings.tasks   # ⚙️ تسجيل المهام الخلفية
+        import bookings.ratelimit  # 🚦 فحص مخزن الدلاء عند الإقلاع
\ No newline at end of file
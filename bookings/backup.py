@@ -0,0 +1,395 @@
+"""
+💾 نسخ احتياطية لقاعدة SQLite الحية: كاملة + تزايدية، مضغوطة وموقعة بـ SHA-256.
+
+- النسخة الكاملة: Online Backup API على دفعات صغيرة من الصفحات (replica.online_backup)
+  إلى ملف مرحلي بجانب القاعدة ثم ضغطه (gzip): الكاشير لا يتوقف، ولا نسخة نصف مكتوبة.
+- التزايدية: الصفحات التي تغيرت فقط منذ النسخة السابقة. نحفظ بصمة قصيرة لكل صفحة
+  (blake2b) بعد كل نسخة، فنكتب على وسيط النسخ بضعة KB بدل القاعدة كلها.
+  البصمات تُحسب من ملف القاعدة نفسه داخل معاملة قراءة (لا نسخة مرحلية كاملة)؛ الكتابة
+  تنتظر مدة المرور فقط. مع WAL الصفحات الحديثة في ملف -wal، فنرجع للملف المرحلي.
+  كل تزايدية مبنية على السابقة لها؛ بعد BACKUP_MAX_INCREMENTALS نبدأ سلسلة كاملة جديدة.
+- السجل (manifest.json): لكل نسخة بصمة الأرشيف وبصمة القاعدة بعد تطبيقها، فالتحقق
+  يعيد البناء في ملف مؤقت ويقارن البايتات ثم يشغل PRAGMA integrity_check.
+- التدوير: نحتفظ بآخر BACKUP_KEEP_FULL سلاسل كاملة (النسخة الكاملة وتزايدياتها).
+
+الاستعادة لا تلمس القاعدة الحية: تكتب ملفاً جديداً، والاستبدال يدوي بعد إيقاف الخادم.
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import struct
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+
+from . import replica, stations
+
+try:
+    import fcntl
+except ImportError:  # ويندوز: بدون قفل بين العمليات
+    fcntl = None
+
+MANIFEST = 'manifest.json'
+DELTA_MAGIC = b'AEDELTA1'
+_DELTA_HEADER = struct.Struct('>III')  # حجم الصفحة، عدد صفحات القاعدة، عدد الصفحات المتغيرة
+_PAGE_NO = struct.Struct('>I')
+_DIGEST_SIZE = 8
+
+
+class BackupError(Exception):
+    """ نسخة ناقصة أو تالفة، أو نسخ آخر قيد التشغيل """
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def backup_dir():
+    base = str(_setting('BACKUP_DIR', os.path.join(settings.BASE_DIR, 'backups')))
+    # 🏪 كل محطة إضافية في مجلد فرعي باسمها (سلسلة نسخ وبيان خاص بها)
+    return base if stations.db_alias() == DEFAULT_DB_ALIAS else os.path.join(base, stations.current())
+
+
+def _path(name):
+    return os.path.join(backup_dir(), name)
+
+
+# =========================================================
+# 📒 السجل
+# =========================================================
+def load_manifest():
+    try:
+        with open(_path(MANIFEST), encoding='utf-8') as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return {'snapshots': []}
+
+
+def _save_manifest(manifest):
+    tmp = _path(f"{MANIFEST}.tmp")
+    with open(tmp, 'w', encoding='utf-8') as fh:
+        json.dump(manifest, fh, indent=2, ensure_ascii=False)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, _path(MANIFEST))
+
+
+def _by_name(manifest):
+    return {s['name']: s for s in manifest['snapshots']}
+
+
+def chain(manifest, name):
+    """ النسخ اللازمة لاستعادة name بالترتيب: الكاملة ثم التزايديات """
+    snapshots = _by_name(manifest)
+    if name not in snapshots:
+        raise BackupError(f"لا توجد نسخة باسم {name}.")
+    links = []
+    while name:
+        snapshot = snapshots.get(name)
+        if snapshot is None:
+            raise BackupError(f"السلسلة ناقصة: {name} غير موجودة.")
+        links.append(snapshot)
+        name = snapshot['base']
+    return links[::-1]
+
+
+@contextmanager
+def _exclusive():
+    os.makedirs(backup_dir(), exist_ok=True)
+    fd = os.open(_path('.lock'), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise BackupError("نسخ احتياطي آخر قيد التشغيل.")
+        yield
+    finally:
+        os.close(fd)  # يحرر القفل
+
+
+# =========================================================
+# 📄 الصفحات
+# =========================================================
+def page_size_of(path):
+    """ من ترويسة ملف SQLite (البايتان 16-17، والقيمة 1 تعني 65536) """
+    with open(path, 'rb') as fh:
+        header = fh.read(100)
+    if len(header) < 100 or not header.startswith(b'SQLite format 3\x00'):
+        raise BackupError(f"{path} ليس ملف SQLite.")
+    size = int.from_bytes(header[16:18], 'big')
+    return 65536 if size == 1 else size
+
+
+def _pages(path, page_size):
+    with open(path, 'rb') as fh:
+        while True:
+            page = fh.read(page_size)
+            if not page:
+                return
+            yield page
+
+
+def _digests_path(name):
+    return _path(f".pages-{name}")
+
+
+def _read_digests(name):
+    try:
+        with open(_digests_path(name), 'rb') as fh:
+            data = fh.read()
+    except FileNotFoundError:
+        return None
+    return [data[i:i + _DIGEST_SIZE] for i in range(0, len(data), _DIGEST_SIZE)]
+
+
+def _write_digests(name, digests):
+    with open(_digests_path(name), 'wb') as fh:
+        fh.write(b''.join(digests))
+    for entry in os.listdir(backup_dir()):
+        if entry.startswith('.pages-') and entry != f".pages-{name}":
+            os.remove(_path(entry))
+
+
+def _sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# =========================================================
+# 📸 إنشاء نسخة
+# =========================================================
+def _stage(source_path, pages, pause):
+    """ نسخة متسقة من القاعدة الحية بجانبها (قراءة على دفعات، بدون حجز الكاتب) """
+    staging = f"{source_path}.backup-staging"
+    if os.path.exists(staging):
+        os.remove(staging)
+    replica.online_backup(
+        staging, pages=pages, pause=pause, source_path=source_path,
+        max_restarts=_setting('BACKUP_MAX_RESTARTS', 3),
+    )
+    return staging
+
+
+def _journal_mode(path):
+    db = sqlite3.connect(path)
+    try:
+        return db.execute('PRAGMA journal_mode').fetchone()[0].lower()
+    finally:
+        db.close()
+
+
+@contextmanager
+def _read_transaction(path):
+    """ قفل قراءة على القاعدة الحية: لا يُكتب في ملفها حتى نخرج (journal العادي) """
+    db = sqlite3.connect(path, isolation_level=None, timeout=5)
+    try:
+        db.execute('BEGIN')
+        db.execute('SELECT count(*) FROM sqlite_master').fetchone()
+        yield
+    finally:
+        db.close()
+
+
+def _scan(path, page_size, base_digests, spool):
+    """ مرور واحد: بصمة كل صفحة + بصمة القاعدة كلها + الصفحات المتغيرة (تُكتب في spool) """
+    digests, changed, db_digest = [], [], hashlib.sha256()
+    for number, page in enumerate(_pages(path, page_size), start=1):
+        db_digest.update(page)
+        digest = hashlib.blake2b(page, digest_size=_DIGEST_SIZE).digest()
+        digests.append(digest)
+        if base_digests is not None and (number > len(base_digests) or base_digests[number - 1] != digest):
+            changed.append(number)
+            spool.write(page)
+    return digests, changed, db_digest.hexdigest()
+
+
+def _write_archive(name, writer):
+    """ يكتب الأرشيف المضغوط بشكل ذري ويرجع (الحجم، SHA-256) """
+    tmp = _path(f"{name}.tmp")
+    with gzip.open(tmp, 'wb', compresslevel=6) as out:
+        writer(out)
+    with open(tmp, 'rb') as fh:
+        os.fsync(fh.fileno())
+    os.replace(tmp, _path(name))
+    return os.path.getsize(_path(name)), _sha256_file(_path(name))
+
+
+def create(full=False, source_path=None, pages=None, pause=None, now=None):
+    """
+    نسخة جديدة. تزايدية إن أمكن (نفس حجم الصفحة، سلسلة غير طويلة، بصمات السابقة
+    موجودة)، وإلا كاملة. يرجع وصف النسخة، أو None إن لم يتغير شيء منذ السابقة.
+    """
+    source_path = str(source_path or connections[stations.db_alias()].settings_dict['NAME'])
+    pages = pages or _setting('BACKUP_PAGES', 256)
+    pause = _setting('BACKUP_PAUSE', 0.005) if pause is None else pause
+
+    with _exclusive():
+        manifest = load_manifest()
+        previous = manifest['snapshots'][-1] if manifest['snapshots'] else None
+        started = time.perf_counter()
+        page_size = page_size_of(source_path)
+        base_digests = _read_digests(previous['name']) if previous else None
+        if (
+            full or base_digests is None or previous['page_size'] != page_size
+            or len(chain(manifest, previous['name'])) > _setting('BACKUP_MAX_INCREMENTALS', 24)
+        ):
+            kind, base_digests = 'full', None
+        else:
+            kind = 'incremental'
+
+        staging = None
+        # الصفحات المتغيرة فقط (في الذاكرة، وعلى القرص إن كبرت)
+        spool = tempfile.SpooledTemporaryFile(max_size=8 << 20)
+        try:
+            if kind == 'incremental' and _journal_mode(source_path) != 'wal':
+                with _read_transaction(source_path):
+                    digests, changed, db_digest = _scan(source_path, page_size, base_digests, spool)
+            else:
+                staging = _stage(source_path, pages, pause)
+                digests, changed, db_digest = _scan(staging, page_size, base_digests, spool)
+
+            if kind == 'incremental' and not changed and len(digests) == len(base_digests):
+                return None
+
+            stamp = timezone.localtime(now).strftime('%Y%m%dT%H%M%S')
+            name = f"{kind}-{stamp}"
+            if name in _by_name(manifest):
+                name = f"{name}-{len(manifest['snapshots'])}"
+
+            if kind == 'full':
+                archive = f"{name}.sqlite3.gz"
+
+                def writer(out):
+                    with open(staging, 'rb') as src:
+                        shutil.copyfileobj(src, out, 1 << 20)
+            else:
+                archive = f"{name}.delta.gz"
+
+                def writer(out):
+                    out.write(DELTA_MAGIC + _DELTA_HEADER.pack(page_size, len(digests), len(changed)))
+                    spool.seek(0)
+                    for number in changed:
+                        out.write(_PAGE_NO.pack(number) + spool.read(page_size))
+
+            size, sha256 = _write_archive(archive, writer)
+            snapshot = {
+                'name': name,
+                'kind': kind,
+                'base': previous['name'] if kind == 'incremental' else None,
+                'file': archive,
+                'created_at': timezone.localtime(now).isoformat(),
+                'page_size': page_size,
+                'pages': len(digests),
+                'changed_pages': len(changed) if kind == 'incremental' else len(digests),
+                'bytes': size,
+                'sha256': sha256,
+                'db_sha256': db_digest,
+                'seconds': round(time.perf_counter() - started, 3),
+            }
+            manifest['snapshots'].append(snapshot)
+            if kind == 'full':
+                rotate(manifest)
+            _save_manifest(manifest)
+            _write_digests(name, digests)
+            return snapshot
+        finally:
+            spool.close()
+            if staging:
+                os.remove(staging)
+
+
+def rotate(manifest, keep=None):
+    """ يحذف السلاسل الأقدم من آخر keep نسخ كاملة (الكاملة + تزايدياتها) """
+    keep = keep or _setting('BACKUP_KEEP_FULL', 7)
+    fulls = [s['name'] for s in manifest['snapshots'] if s['kind'] == 'full']
+    kept_roots = set(fulls[-keep:])
+    roots, kept = {}, []
+    for snapshot in manifest['snapshots']:
+        roots[snapshot['name']] = snapshot['name'] if snapshot['kind'] == 'full' else roots.get(snapshot['base'])
+        if roots[snapshot['name']] in kept_roots:
+            kept.append(snapshot)
+        else:
+            try:
+                os.remove(_path(snapshot['file']))
+            except FileNotFoundError:
+                pass
+    removed = len(manifest['snapshots']) - len(kept)
+    manifest['snapshots'] = kept
+    return removed
+
+
+# =========================================================
+# ♻️ الاستعادة والتحقق
+# =========================================================
+def _apply_delta(path, dest):
+    with gzip.open(path, 'rb') as delta, open(dest, 'r+b') as db:
+        if delta.read(len(DELTA_MAGIC)) != DELTA_MAGIC:
+            raise BackupError(f"{os.path.basename(path)} ليس ملف تزايدي.")
+        page_size, page_count, changed = _DELTA_HEADER.unpack(delta.read(_DELTA_HEADER.size))
+        for _ in range(changed):
+            (number,) = _PAGE_NO.unpack(delta.read(_PAGE_NO.size))
+            page = delta.read(page_size)
+            if len(page) != page_size:
+                raise BackupError(f"{os.path.basename(path)} مقطوع.")
+            db.seek((number - 1) * page_size)
+            db.write(page)
+        db.truncate(page_count * page_size)
+
+
+def restore(name, dest):
+    """ يعيد بناء النسخة name في dest (ملف جديد) بعد التحقق من كل أرشيف في سلسلتها """
+    manifest = load_manifest()
+    links = chain(manifest, name)
+    if os.path.exists(dest):
+        raise BackupError(f"{dest} موجود: الاستعادة لا تكتب فوق ملف قائم.")
+    tmp = f"{dest}.restoring"
+    try:
+        for snapshot in links:
+            archive = _path(snapshot['file'])
+            if not os.path.exists(archive):
+                raise BackupError(f"الأرشيف {snapshot['file']} مفقود.")
+            if _sha256_file(archive) != snapshot['sha256']:
+                raise BackupError(f"الأرشيف {snapshot['file']} تالف (SHA-256 مختلف).")
+            if snapshot['kind'] == 'full':
+                with gzip.open(archive, 'rb') as src, open(tmp, 'wb') as out:
+                    shutil.copyfileobj(src, out, 1 << 20)
+            else:
+                _apply_delta(archive, tmp)
+        if _sha256_file(tmp) != links[-1]['db_sha256']:
+            raise BackupError(f"القاعدة المستعادة من {name} لا تطابق البصمة المسجلة.")
+        os.replace(tmp, dest)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return links
+
+
+def verify(name=None):
+    """ استعادة تجريبية في ملف مؤقت + integrity_check. يرجع ملخصاً أو BackupError """
+    manifest = load_manifest()
+    if not manifest['snapshots']:
+        raise BackupError("لا توجد نسخ بعد.")
+    name = name or manifest['snapshots'][-1]['name']
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        dest = os.path.join(tmp_dir, 'verify.sqlite3')
+        links = restore(name, dest)
+        db = sqlite3.connect(dest)
+        try:
+            result = db.execute('PRAGMA integrity_check').fetchone()[0]
+            tables = db.execute("SELECT count(*) FROM sqlite_master WHERE type = 'table'").fetchone()[0]
+        finally:
+            db.close()
+    if result != 'ok':
+        raise BackupError(f"integrity_check فشل لـ {name}: {result}")
+    return {'name': name, 'chain': len(links), 'tables': tables}
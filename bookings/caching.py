@@ -0,0 +1,173 @@
+"""
+🗃️ كاش بطبقتين للأرقام المحسوبة والأجزاء المرسومة.
+
+- L1: ذاكرة العملية (LRU بحد أقصى CACHE_L1_MAX_ENTRIES ومهلة CACHE_L1_TTL).
+- L2: الكاش المشترك CACHES['shared'] (ملفات محلياً، Redis إن وُضع REDIS_URL).
+
+كل قيمة تعتمد على مساحات (namespaces) = أسماء الجداول التي تُحسب منها، ولكل مساحة
+إصدار محفوظ في L2. الإصدار جزء من المفتاح: حفظ خدمة/عملية/حضور... (signals.py) يغير
+إصدار مساحته بعد التثبيت، فتتجاهل كل العمليات (عمال gunicorn) القيم القديمة خلال
+CACHE_VERSION_TTL ثانية على الأكثر دون أي مسح يدوي.
+
+داخل معاملة غيرت مساحة ما، القراءات من تلك المساحة تُحسب مباشرة ولا تُحفظ: الرد
+الجزئي بعد "إنهاء الغسيل" مثلاً يرى الأرقام الجديدة قبل التثبيت.
+
+الإصدارات والقيم خاصة بكل محطة (stations.scoped): حفظ عملية في محطة لا يُسقط كاش غيرها.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections, transaction
+from django.utils import translation
+
+from . import metrics, stations
+
+_MISSING = object()
+
+_l1 = OrderedDict()  # key -> (expires_at, value)
+_l1_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _shared():
+    return caches[_setting('CACHE_SHARED_ALIAS', 'shared')]
+
+
+# =========================================================
+# 🧠 L1 (ذاكرة العملية)
+# =========================================================
+def _l1_get(key):
+    with _l1_lock:
+        entry = _l1.get(key)
+        if entry is None:
+            return _MISSING
+        if entry[0] < time.monotonic():
+            del _l1[key]
+            return _MISSING
+        _l1.move_to_end(key)
+        return entry[1]
+
+
+def _l1_set(key, value, ttl):
+    with _l1_lock:
+        _l1[key] = (time.monotonic() + ttl, value)
+        _l1.move_to_end(key)
+        while len(_l1) > _setting('CACHE_L1_MAX_ENTRIES', 1000):
+            _l1.popitem(last=False)
+
+
+def clear_local():
+    """ L1 + ما ينتظر التثبيت في هذا الاتصال (للاختبارات) """
+    with _l1_lock:
+        _l1.clear()
+    for connection in connections.all(initialized_only=True):
+        connection.__dict__.pop('_bookings_cache_pending', None)
+
+
+# =========================================================
+# 🔢 الإصدارات
+# =========================================================
+def _new_version():
+    # قيمة جديدة في كل مرة (لا incr): تغييران متزامنان لا ينتهيان بنفس الإصدار
+    return format(time.time_ns(), 'x')
+
+
+def version(namespace):
+    key = stations.scoped(f"ns:{namespace}")
+    current = _l1_get(key)
+    if current is _MISSING:
+        current = _shared().get(key)
+        if current is None:
+            _shared().add(key, _new_version(), timeout=None)
+            current = _shared().get(key)
+        _l1_set(key, current, _setting('CACHE_VERSION_TTL', 1))
+    return current
+
+
+def bump(*namespaces):
+    """ إصدار جديد للمساحات: كل ما حُفظ قبله يصبح غير مرئي في كل العمليات """
+    fresh = _new_version()
+    keys = [stations.scoped(f"ns:{ns}") for ns in namespaces]
+    _shared().set_many(dict.fromkeys(keys, fresh), timeout=None)
+    for key in keys:
+        _l1_set(key, fresh, _setting('CACHE_VERSION_TTL', 1))
+    _pending().difference_update(namespaces)
+
+
+def _pending():
+    connection = transaction.get_connection(stations.db_alias())
+    pending = connection.__dict__.setdefault('_bookings_cache_pending', set())
+    if not connection.in_atomic_block:
+        pending.clear()  # معاملة أُلغيت: لا شيء ينتظر التثبيت
+    return pending
+
+
+def invalidate(*namespaces):
+    """ يُستدعى من الإشارات: الإصدار الجديد يُنشر بعد التثبيت فقط """
+    if transaction.get_connection(stations.db_alias()).in_atomic_block:
+        _pending().update(namespaces)
+        stations.on_commit(lambda: bump(*namespaces))
+    else:
+        bump(*namespaces)
+
+
+# =========================================================
+# 📦 القراءة والحساب
+# =========================================================
+def get_or_compute(name, namespaces, key_parts, compute, timeout=None):
+    """ L1 ثم L2 ثم الحساب (ويُحفظ في الطبقتين) """
+    if _pending().intersection(namespaces):
+        metrics.inc('bookings_cache_requests_total', value=name, result='bypass')
+        return compute()
+
+    timeout = timeout or _setting('CACHE_DEFAULT_TIMEOUT', 300)
+    digest = hashlib.md5(repr(key_parts).encode(), usedforsecurity=False).hexdigest()
+    key = stations.scoped(f"c:{name}:{'.'.join(version(ns) for ns in namespaces)}:{digest}")
+
+    value = _l1_get(key)
+    if value is not _MISSING:
+        metrics.inc('bookings_cache_requests_total', value=name, result='l1_hit')
+        return value
+    l1_ttl = min(timeout, _setting('CACHE_L1_TTL', 30))
+    value = _shared().get(key, _MISSING)
+    if value is not _MISSING:
+        metrics.inc('bookings_cache_requests_total', value=name, result='l2_hit')
+        _l1_set(key, value, l1_ttl)
+        return value
+
+    metrics.inc('bookings_cache_requests_total', value=name, result='miss')
+    value = compute()
+    _shared().set(key, value, timeout)
+    _l1_set(key, value, l1_ttl)
+    return value
+
+
+def cached(*namespaces, timeout=None, vary=None, name=None):
+    """
+    يحفظ نتيجة الدالة حسب وسائطها. namespaces: الجداول التي تعتمد عليها،
+    vary: دالة تضيف للمفتاح ما لا يظهر في الوسائط (اليوم، اللغة...).
+    """
+    def decorate(func):
+        label = name or func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            parts = (args, sorted(kwargs.items()), vary() if vary else None)
+            return get_or_compute(label, namespaces, parts, lambda: func(*args, **kwargs), timeout)
+
+        wrapper.uncached = func
+        return wrapper
+    return decorate
+
+
+def cached_fragment(*namespaces, timeout=None, name=None):
+    """ لجزء HTML مرسوم: نسخة لكل لغة """
+    return cached(*namespaces, timeout=timeout, vary=translation.get_language, name=name)
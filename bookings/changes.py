@@ -0,0 +1,100 @@
+"""
+🔄 تغذية التغييرات (Change Feed) للمزامنة التدريجية.
+
+المستهلك الخارجي (جدول المحاسبة، تقرير المقر، النسخ الاحتياطي) يحفظ مؤشراً ويطلب فقط
+ما تغير بعده، بدل قراءة جدول العمليات كاملاً في كل مرة:
+
+    GET /api/changes/?feed=jobs&since=<cursor>&limit=500
+    python manage.py export_changes jobs --state sync.json
+
+المؤشر = (updated_at, id) لآخر سطر مُرسل، مرمز base64 (لا يهم المستهلك محتواه).
+الحذف يظهر في التغذية 'tombstones'. المعرفات لا يُعاد استعمالها، فترتيب قراءة
+التغذيتين لا يهم.
+
+التغييرات الأحدث من CHANGES_SETTLE_SECONDS لا تُرسل بعد: معاملة بدأت قبلنا قد
+تُثبت لاحقاً بوقت أقدم، ولو تقدم المؤشر فوقها لضاعت.
+"""
+import base64
+import binascii
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Advance, Attendance, Job, Tombstone, WorkerProfile
+
+# التغذية -> (الجدول، حقل الوقت)
+FEEDS = {
+    'jobs': (Job, 'updated_at'),
+    'advances': (Advance, 'updated_at'),
+    'attendance': (Attendance, 'updated_at'),
+    'worker_profiles': (WorkerProfile, 'updated_at'),
+    'tombstones': (Tombstone, 'deleted_at'),
+}
+
+# اسم الجدول في شواهد الحذف
+TRACKED_MODELS = {Job: 'jobs', Advance: 'advances', Attendance: 'attendance', WorkerProfile: 'worker_profiles'}
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 5000
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(timestamp, pk):
+    raw = f"{timestamp.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """ يرجع (timestamp, id) أو None للبداية """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        stamp, pk = raw.rsplit('|', 1)
+        timestamp = parse_datetime(stamp)
+        if timestamp is None:
+            raise ValueError(stamp)
+        return timestamp, int(pk)
+    except (ValueError, binascii.Error, UnicodeDecodeError) as exc:
+        raise InvalidCursor(f"مؤشر غير صالح: {cursor}") from exc
+
+
+def fetch(feed, cursor=None, limit=DEFAULT_LIMIT):
+    """
+    الأسطر التي تغيرت بعد المؤشر بترتيب (الوقت، المعرف).
+    يرجع (rows, next_cursor, has_more). next_cursor = المؤشر نفسه إن لم يتغير شيء.
+    """
+    model, field = FEEDS[feed]
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    settle = getattr(settings, 'CHANGES_SETTLE_SECONDS', 2)
+
+    qs = model.objects.filter(**{f"{field}__lte": timezone.now() - timedelta(seconds=settle)})
+    position = decode_cursor(cursor)
+    if position:
+        stamp, pk = position
+        qs = qs.filter(Q(**{f"{field}__gt": stamp}) | Q(**{field: stamp, 'id__gt': pk}))
+
+    rows = list(qs.order_by(field, 'id').values()[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1][field], rows[-1]['id']) if rows else cursor
+    return rows, next_cursor, has_more
+
+
+def record_tombstone(instance):
+    """ يُستدعى من post_delete للجداول المتابعة """
+    return Tombstone.objects.create(model=TRACKED_MODELS[instance._meta.concrete_model], object_id=instance.pk)
+
+
+def authorized(request):
+    """ مفتاح Bearer (CHANGES_TOKEN) للمستهلكين الخارجيين، أو مستخدم إداري """
+    token = getattr(settings, 'CHANGES_TOKEN', None)
+    if token and request.headers.get('Authorization') == f"Bearer {token}":
+        return True
+    return request.user.is_authenticated and request.user.is_staff
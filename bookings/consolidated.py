@@ -0,0 +1,74 @@
+"""
+📊 التقرير الموحد لكل المحطات (الإيرادات، العمولات، الرواتب، السلف).
+
+كل محطة تُحسب في قاعدتها بثلاثة استعلامات تجميع فقط، والمحطات تُسأل بالتوازي
+(stations.fan_out)، ثم تُجمع الأرقام هنا. المحطة الرئيسية تقرأ من نسخة التقارير إن
+كانت حديثة. محطة معطلة أو بطيئة (أكثر من STATION_REPORT_TIMEOUT) تظهر في failed
+ولا توقف التقرير.
+"""
+from datetime import datetime, time as dt_time, timedelta
+from decimal import Decimal
+
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from . import stations
+from .models import Advance, Attendance, Job
+from .routers import reporting_reads
+
+FIELDS = ('jobs', 'completed', 'revenue', 'commission', 'salaries', 'advances', 'profit')
+
+
+def _bounds(start, end):
+    # أيام محلية كاملة: من منتصف ليل start إلى منتصف ليل اليوم بعد end
+    return (
+        timezone.make_aware(datetime.combine(start, dt_time.min)),
+        timezone.make_aware(datetime.combine(end + timedelta(days=1), dt_time.min)),
+    )
+
+
+def station_totals(start, end):
+    """ أرقام المحطة الحالية بين يومين (شاملين) """
+    since, until = _bounds(start, end)
+    with reporting_reads():
+        jobs = (
+            Job.objects.filter(created_at__gte=since, created_at__lt=until).exclude(status='canceled')
+            .aggregate(
+                jobs=Count('id'), completed=Count('id', filter=Q(status='completed')),
+                revenue=Sum('final_price'), commission=Sum('final_commission'),
+            )
+        )
+        salaries = Attendance.objects.filter(date__range=(start, end), is_present=True).aggregate(s=Sum('day_salary_snapshot'))['s']
+        advances = Advance.objects.filter(date__gte=since, date__lt=until).aggregate(s=Sum('amount'))['s']
+
+    row = {
+        'jobs': jobs['jobs'],
+        'completed': jobs['completed'],
+        'revenue': jobs['revenue'] or Decimal('0'),
+        'commission': jobs['commission'] or Decimal('0'),
+        'salaries': salaries or Decimal('0'),
+        'advances': advances or Decimal('0'),
+    }
+    row['profit'] = row['revenue'] - row['commission'] - row['salaries']
+    return row
+
+
+def report(start=None, end=None, only=None, timeout=None):
+    """
+    {'start', 'end', 'stations': [{'station', 'seconds', ...الأرقام}], 'totals', 'failed': [(المحطة، السبب)]}
+    only: قائمة محطات (الافتراضي كلها).
+    """
+    end = end or timezone.localdate()
+    start = start or end
+    results = stations.fan_out(lambda: station_totals(start, end), only, timeout)
+
+    totals = dict.fromkeys(FIELDS, 0)
+    rows, failed = [], []
+    for result in results:
+        if not result.ok:
+            failed.append((result.station, result.error))
+            continue
+        rows.append({'station': result.station, 'seconds': round(result.seconds, 3), **result.value})
+        for name in FIELDS:
+            totals[name] += result.value[name]
+    return {'start': start, 'end': end, 'stations': rows, 'totals': totals, 'failed': failed}
@@ -0,0 +1,100 @@
+"""
+📊 أرقام اليوم في لوحة التحكم + الردود الجزئية (JSON) لأزرار اللوحة.
+
+الأزرار (إنهاء الغسيل، الحضور، الراتب، التبديل، الكاشير) كانت تعيد توجيه المتصفح
+إلى سجل العمليات فيُعاد حساب الصفحة كاملة. الآن إذا طلبت الصفحة JSON نرجع فقط
+السطر الذي تغير + أرقام اليوم (استعلامان صغيران)، والجافاسكريبت يحدث اللوحة مكانها.
+"""
+from django.db.models import Sum
+from django.http import JsonResponse
+from django.utils import timezone
+
+from . import caching, writes
+from .models import Attendance, Job, StationSettings, WorkerProfile
+
+
+@caching.cached('stationsettings')
+def current_mode():
+    settings_obj = StationSettings.objects.filter(id=1).first()
+    return settings_obj.current_mode if settings_obj else 'commission'
+
+
+def today_range():
+    now = timezone.now()
+    return (
+        now.replace(hour=0, minute=0, second=0, microsecond=0),
+        now.replace(hour=23, minute=59, second=59, microsecond=999999),
+    )
+
+
+# 🗃️ تتغير فقط مع العمليات/الحضور/الرواتب/الوضع (إصدار المساحة يتغير بعد كل حفظ)
+@caching.cached('job', 'attendance', 'workerprofile', 'stationsettings', timeout=600, vary=timezone.localdate)
+def today_counters(mode=None, present_salaries=None):
+    """ نفس أرقام رأس اللوحة في كل نظام (بدون الشهر/السنة/المبيان)
+    present_salaries: رواتب الحاضرين إن كانت اللوحة قرأتها مسبقاً (توفير استعلام) """
+    mode = mode or current_mode()
+    today_jobs = Job.objects.filter(created_at__range=today_range(), system_mode=mode)
+    active = today_jobs.exclude(status='canceled')
+
+    if mode == 'salary':
+        total_revenue = active.aggregate(s=Sum('final_price'))['s'] or 0
+        # الراتب الحالي لكل عامل حاضر اليوم (الافتراضي إن لم يكن له ملف)
+        if present_salaries is None:
+            default_salary = WorkerProfile._meta.get_field('daily_salary').default
+            present_salaries = [
+                s if s is not None else default_salary
+                for s in Attendance.objects.filter(
+                    date=timezone.now().date(), is_present=True, worker__is_staff=True,
+                ).values_list('worker__profile__daily_salary', flat=True)
+            ]
+        total_salaries = sum(present_salaries)
+        return {
+            'mode': mode,
+            'total_revenue': total_revenue,
+            'total_salaries': total_salaries,
+            'net_profit': total_revenue - total_salaries,
+            'present_workers': len(present_salaries),
+        }
+
+    totals = active.aggregate(rev=Sum('final_price'), comm=Sum('final_commission'))
+    total_revenue, total_commission = totals['rev'] or 0, totals['comm'] or 0
+    return {
+        'mode': mode,
+        'total_revenue': total_revenue,
+        'total_commission': total_commission,
+        'profit': total_revenue - total_commission,
+        'pending_jobs': today_jobs.filter(status='processing').count(),
+    }
+
+
+def job_row(job):
+    """ ما تحتاجه اللوحة لتحديث سطر عملية واحد """
+    return {
+        'id': job.id,
+        'car_plate': job.car_plate,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'service': job.service.name if job.service_id else None,
+        'final_price': job.final_price,
+        'final_commission': job.final_commission,
+        'created_at': timezone.localtime(job.created_at).strftime('%H:%M'),
+    }
+
+
+def wants_json(request):
+    """ الأزرار المحدثة بالجافاسكريبت ترسل Accept: application/json """
+    return (
+        'application/json' in request.headers.get('Accept', '')
+        or request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+    )
+
+
+def partial_response(message, level='success', status=200, mode=None, **data):
+    """
+    رد موحد: رسالة + أرقام اليوم + ما تغير فقط.
+    يُبنى بعد انتهاء الكتابة: أرقام اليوم تجميعات، ولا تُحسب والكاتب الوحيد محجوز.
+    """
+    assert not writes.in_write(), "partial_response داخل @serialized_write"
+    payload = {'ok': level != 'error', 'message': message, 'level': level, 'counters': today_counters(mode)}
+    payload.update(data)
+    return JsonResponse(payload, status=status)
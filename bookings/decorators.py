@@ -0,0 +1,25 @@
+"""
+🔐 نفس staff_member_required الخاص بالأدمن، لكن دون استيراد django.contrib.admin.
+
+استيراد django.contrib.admin يحمّل ModelAdmin والنماذج والقوالب كلها؛ الواجهة العامة
+الخفيفة (core/settings_public.py) لا تحمّل الأدمن أصلاً، فالدوال المشتركة تستعمل هذا.
+"""
+from django.conf import settings
+from django.contrib.auth import REDIRECT_FIELD_NAME
+from django.contrib.auth.decorators import user_passes_test
+from django.utils.functional import lazy
+
+
+def _staff_login_url():
+    return getattr(settings, 'STAFF_LOGIN_URL', 'admin:login')
+
+
+def staff_member_required(view_func=None, redirect_field_name=REDIRECT_FIELD_NAME, login_url=None):
+    """ مستخدم نشط من الطاقم، وإلا تحويل لصفحة دخول الأدمن (STAFF_LOGIN_URL) """
+    decorator = user_passes_test(
+        lambda u: u.is_active and u.is_staff,
+        # يُقرأ عند كل طلب (وليس عند الاستيراد)
+        login_url=login_url or lazy(_staff_login_url, str)(),
+        redirect_field_name=redirect_field_name,
+    )
+    return decorator(view_func) if view_func else decorator
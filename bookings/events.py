@@ -0,0 +1,113 @@
+"""
+📜 سجل أحداث العمليات (إضافة فقط).
+
+Job.save يكتب فوق الحالة والعمولة، فكل رقم مشتق كان يُعاد حسابه من الصفوف الحالية.
+الآن كل تغيير (إنشاء، تعيين عامل، بدء، إكمال، إلغاء، تغيير سعر، حذف) يُسجل كسطر
+JobEvent في نفس معاملة الحفظ، مع لقطة "قبل" و"بعد" للحقول المؤثرة في الأرقام.
+الإسقاطات (projections.py) تقرأ السجل بمؤشر وتحدث العروض المشتقة تدريجياً.
+"""
+from decimal import Decimal
+
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import Job, JobEvent
+
+# الحالة الجديدة -> نوع الحدث
+STATUS_EVENTS = {
+    'pending': 'reopened',
+    'processing': 'started',
+    'completed': 'completed',
+    'canceled': 'canceled',
+}
+
+# الحقول التي تتغير مع حدث الحالة أو حدث السعر
+MONEY_FIELDS = ('service_id', 'final_price', 'final_commission')
+
+
+def _money(value):
+    return str(Decimal(value or 0).quantize(Decimal('0.01')))
+
+
+def current_values(job):
+    return {f: getattr(job, f) for f in Job.TRACKED_FIELDS}
+
+
+def state(job, values):
+    """ لقطة JSON لما يهم الإسقاطات (values: قيم TRACKED_FIELDS، والباقي من العملية نفسها) """
+    phone = (job.phone or '').strip()
+    return {
+        'status': values['status'],
+        'worker': values['worker_id'],
+        'service': values['service_id'],
+        'price': _money(values['final_price']),
+        'commission': _money(values['final_commission']),
+        'mode': job.system_mode,
+        'day': timezone.localdate(job.created_at).isoformat(),
+        'phone': phone if phone not in ('', '-') else None,
+    }
+
+
+def _changes(before, after):
+    """ ترتيب الأحداث لحفظ واحد: العامل أولاً ثم الحالة (مع المال) أو تغيير السعر وحده """
+    changes = []
+    if before['worker_id'] != after['worker_id']:
+        changes.append(('assigned', ('worker_id',)))
+    if before['status'] != after['status']:
+        changes.append((STATUS_EVENTS.get(after['status'], 'started'), ('status',) + MONEY_FIELDS))
+    elif any(before[f] != after[f] for f in MONEY_FIELDS):
+        changes.append(('repriced', MONEY_FIELDS))
+    return changes
+
+
+def record_save(job, created):
+    """ يُستدعى من post_save: يضيف حدثاً (أو أكثر) لما تغير منذ آخر قراءة/حفظ """
+    now_values = current_values(job)
+    at = timezone.now()
+
+    if created:
+        events = [JobEvent(job_id=job.pk, kind='created', before=None, after=state(job, now_values), at=at)]
+    else:
+        loaded = getattr(job, '_loaded_values', None)
+        if loaded is None:
+            # نسخة لم تُقرأ من القاعدة: لا نعرف ما تغير
+            return []
+        events, values = [], dict(loaded)
+        for kind, fields in _changes(loaded, now_values):
+            before = state(job, values)
+            values.update({f: now_values[f] for f in fields})
+            events.append(JobEvent(job_id=job.pk, kind=kind, before=before, after=state(job, values), at=at))
+
+    job._loaded_values = now_values
+    if events:
+        JobEvent.objects.bulk_create(events)
+    return events
+
+
+def record_delete(job):
+    """ يُستدعى من post_delete: الإسقاطات تطرح أثر العملية المحذوفة """
+    values = getattr(job, '_loaded_values', None) or current_values(job)
+    return JobEvent.objects.create(job_id=job.pk, kind='deleted', before=state(job, values), after=None)
+
+
+def backfill(job_model=Job, event_model=JobEvent, batch_size=500):
+    """
+    حدث 'created' لكل عملية ليس لها أحداث (العمليات القديمة قبل السجل).
+    الإسقاطات تفترض أن أول حدث لكل عملية هو إنشاؤها. يرجع عدد الأحداث المضافة.
+    """
+    # المعرفات أولاً: SQLite لا يعزل القراءة الجارية عن الكتابة في نفس الاتصال
+    missing = list(
+        job_model.objects
+        .filter(~Exists(event_model.objects.filter(job_id=OuterRef('pk'))))
+        .order_by('id').values_list('id', flat=True)
+    )
+    for start in range(0, len(missing), batch_size):
+        jobs = job_model.objects.filter(id__in=missing[start:start + batch_size]).order_by('id')
+        event_model.objects.bulk_create([
+            event_model(
+                job_id=job.pk, kind='created', before=None, at=job.created_at,
+                after=state(job, {f: getattr(job, f) for f in Job.TRACKED_FIELDS}),
+            )
+            for job in jobs
+        ])
+    return len(missing)
@@ -0,0 +1,255 @@
+"""
+🔥 خريطة الضغط: عدد العمليات والإيراد لكل (يوم أسبوع × ساعة).
+
+- التحديث التدريجي: كل عملية جديدة تضيف +1 في الخانة المناسبة (بدون مسح الجدول)،
+  عبر الكاتب الوحيد (قراءة + تعديل + كتابة المصفوفة في معاملة واحدة، فلا تضيع زيادة).
+- إعادة البناء الكاملة: قراءة created_at و final_price في مرور واحد ثم التجميع بـ NumPy،
+  خارج الكاتب الوحيد حتى رقم عملية ثابت (watermark). عند الاستبدال (داخل الكاتب) تُعاد
+  إضافة العمليات الأحدث منه، ويُحفظ الرقم في through_job_id: التحديث التدريجي لعملية
+  محسوبة فيه يتجاهلها، فلا تضيع زيادة ولا تُحسب مرتين.
+- النافذة: آخر WINDOW_DAYS يوماً. التحديث التدريجي يتجاهل العمليات الأقدم منها، والعمليات
+  التي خرجت منها تسقط عند إعادة البناء التالية (rebuild_heatmap --schedule 86400).
+- القراءة: من ذاكرة العملية (cache) مع مهلة قصيرة، لذلك الرد يكون فورياً.
+"""
+import threading
+import time
+from datetime import timedelta, timezone as dt_timezone, datetime
+
+from django.db.models import Max
+from django.utils import timezone
+
+from . import stations
+from .models import Job, OccupancyMatrix
+from .writes import serialized_write
+
+DAYS = 7
+HOURS = 24
+CELLS = DAYS * HOURS
+
+# نافذة إعادة البناء (سنة كاملة)
+WINDOW_DAYS = 365
+
+# مدة صلاحية النسخة المحفوظة في ذاكرة العملية (بالثواني)
+CACHE_TTL = 30
+
+# أسماء الأيام بترتيب Python (الإثنين = 0)
+DAY_LABELS = ['الإثنين', 'الثلاثاء', 'الأربعاء', 'الخميس', 'الجمعة', 'السبت', 'الأحد']
+
+_cache = {}  # (المحطة، scope) -> (expires_at, payload)
+_cache_lock = threading.Lock()
+
+
+def scope_for(service_id=None, worker_id=None):
+    """ يحول الفلتر إلى اسم النطاق المخزن في الجدول (ValueError إن لم يكن رقماً) """
+    if service_id:
+        return f'service:{int(service_id)}'
+    if worker_id:
+        return f'worker:{int(worker_id)}'
+    return 'all'
+
+
+def _cell(dt):
+    local = timezone.localtime(dt)
+    return local.weekday() * HOURS + local.hour
+
+
+# NumPy (~100ms) يُستورد داخل الدوال عند أول استعمال وليس عند إقلاع العامل
+def _decode(row):
+    import numpy as np
+
+    counts = np.frombuffer(bytes(row.counts), dtype='<i4').astype(np.int64)
+    revenue = np.frombuffer(bytes(row.revenue), dtype='<f8').copy()
+    return counts, revenue
+
+
+def _encode(counts, revenue):
+    import numpy as np
+
+    return (
+        np.asarray(counts, dtype='<i4').tobytes(),
+        np.asarray(revenue, dtype='<f8').tobytes(),
+    )
+
+
+def _payload(scope, counts, revenue):
+    import numpy as np
+
+    counts = counts.reshape(DAYS, HOURS)
+    revenue = revenue.reshape(DAYS, HOURS)
+    return {
+        'scope': scope,
+        'days': DAY_LABELS,
+        'counts': counts.tolist(),
+        'revenue': np.round(revenue, 2).tolist(),
+        'max_count': int(counts.max()) if counts.size else 0,
+    }
+
+
+# =========================================================
+# ⚡ التحديث التدريجي (عند إنشاء عملية)
+# =========================================================
+def record_job(job):
+    """ يضيف العملية الجديدة إلى مصفوفات: الكل + الخدمة + العامل """
+    if job.created_at < timezone.now() - timedelta(days=WINDOW_DAYS):
+        return  # خارج نافذة إعادة البناء (استيراد قديم مثلاً)
+    scopes = ['all']
+    if job.service_id:
+        scopes.append(scope_for(service_id=job.service_id))
+    if job.worker_id:
+        scopes.append(scope_for(worker_id=job.worker_id))
+
+    _add(job.pk, scopes, _cell(job.created_at), float(job.final_price or 0))
+
+    # نسخة العملية الحالية تصبح قديمة
+    with _cache_lock:
+        for scope in scopes:
+            _cache.pop(stations.scoped(scope), None)
+
+
+@serialized_write
+def _add(job_id, scopes, cell, price):
+    """ قراءة + تعديل + كتابة الخانة في معاملة الكاتب الوحيد """
+    import numpy as np
+
+    existing = {row.scope: row for row in OccupancyMatrix.objects.filter(scope__in=scopes)}
+    watermark = existing['all'].through_job_id if 'all' in existing else 0
+    if job_id <= watermark:
+        return  # إعادة البناء حسبتها بالفعل
+    to_create, to_update = [], []
+    for scope in scopes:
+        row = existing.get(scope)
+        if row:
+            counts, revenue = _decode(row)
+        else:
+            row = OccupancyMatrix(scope=scope, through_job_id=watermark)
+            counts, revenue = np.zeros(CELLS, dtype=np.int64), np.zeros(CELLS)
+        counts[cell] += 1
+        revenue[cell] += price
+        row.counts, row.revenue = _encode(counts, revenue)
+        (to_update if row.pk else to_create).append(row)
+
+    if to_create:
+        OccupancyMatrix.objects.bulk_create(to_create)
+    for row in to_update:
+        row.save(update_fields=['counts', 'revenue', 'updated_at'])
+
+
+# =========================================================
+# 🧮 إعادة البناء الكاملة (NumPy)
+# =========================================================
+def _local_cells(timestamps):
+    """ يحول الطوابع الزمنية (UTC) إلى رقم الخانة حسب التوقيت المحلي مع احترام التوقيت الصيفي """
+    import numpy as np
+
+    tz = timezone.get_current_timezone()
+    # فرق التوقيت يُحسب مرة واحدة لكل ساعة مختلفة فقط (بدل كل سطر)
+    hour_keys, inverse = np.unique(timestamps // 3600, return_inverse=True)
+    offsets = np.fromiter(
+        (datetime.fromtimestamp(int(h) * 3600, dt_timezone.utc).astimezone(tz).utcoffset().total_seconds() for h in hour_keys),
+        dtype=np.int64, count=len(hour_keys),
+    )
+    local = timestamps + offsets[inverse]
+    # 1970-01-01 كان يوم خميس (3)
+    weekday = (local // 86400 + 3) % 7
+    hour = (local % 86400) // 3600
+    return weekday * HOURS + hour
+
+
+def _group(keys, cells, prices):
+    """ تجميع حسب مفتاح (خدمة/عامل): يرجع {id: (counts, revenue)} """
+    import numpy as np
+
+    mask = keys >= 0
+    if not mask.any():
+        return {}
+    ids, dense = np.unique(keys[mask], return_inverse=True)
+    flat = dense * CELLS + cells[mask]
+    size = len(ids) * CELLS
+    counts = np.bincount(flat, minlength=size).reshape(len(ids), CELLS)
+    revenue = np.bincount(flat, weights=prices[mask], minlength=size).reshape(len(ids), CELLS)
+    return {int(k): (counts[i], revenue[i]) for i, k in enumerate(ids)}
+
+
+def _matrices(rows):
+    """ (created_at, final_price, service_id, worker_id) -> {النطاق: (counts, revenue)} """
+    import numpy as np
+
+    n = len(rows)
+
+    timestamps = np.fromiter((int(r[0].timestamp()) for r in rows), dtype=np.int64, count=n)
+    prices = np.fromiter((float(r[1] or 0) for r in rows), dtype=np.float64, count=n)
+    services = np.fromiter((r[2] or -1 for r in rows), dtype=np.int64, count=n)
+    workers = np.fromiter((r[3] or -1 for r in rows), dtype=np.int64, count=n)
+    cells = _local_cells(timestamps) if n else np.zeros(0, dtype=np.int64)
+
+    matrices = {
+        'all': (np.bincount(cells, minlength=CELLS), np.bincount(cells, weights=prices, minlength=CELLS)),
+    }
+    for sid, data in _group(services, cells, prices).items():
+        matrices[scope_for(service_id=sid)] = data
+    for wid, data in _group(workers, cells, prices).items():
+        matrices[scope_for(worker_id=wid)] = data
+    return matrices
+
+
+_FIELDS = ('created_at', 'final_price', 'service_id', 'worker_id')
+
+
+def rebuild(window_days=WINDOW_DAYS):
+    """ يعيد حساب جميع المصفوفات من سجل العمليات. يرجع عدد العمليات المقروءة. """
+    since = timezone.now() - timedelta(days=window_days)
+    # القراءة الطويلة خارج الكاتب الوحيد، حتى رقم ثابت
+    watermark = Job.objects.aggregate(m=Max('id'))['m'] or 0
+    rows = list(
+        Job.objects.filter(created_at__gte=since, id__lte=watermark)
+        .values_list(*_FIELDS).iterator(chunk_size=5000)
+    )
+    n = _replace_all(_matrices(rows), since, watermark) + len(rows)
+
+    with _cache_lock:
+        _cache.clear()
+    return n
+
+
+@serialized_write
+def _replace_all(matrices, since, watermark):
+    """ يضيف العمليات الأحدث من watermark (أُنشئت أثناء القراءة) ثم يستبدل المصفوفات """
+    newer = list(Job.objects.filter(created_at__gte=since, id__gt=watermark).values_list('id', *_FIELDS))
+    if newer:
+        watermark = max(r[0] for r in newer)
+        for scope, (counts, revenue) in _matrices([r[1:] for r in newer]).items():
+            base = matrices.get(scope)
+            matrices[scope] = (counts + base[0], revenue + base[1]) if base else (counts, revenue)
+
+    objs = []
+    for scope, (counts, revenue) in matrices.items():
+        c, r = _encode(counts, revenue)
+        objs.append(OccupancyMatrix(scope=scope, counts=c, revenue=r, through_job_id=watermark))
+    OccupancyMatrix.objects.all().delete()
+    OccupancyMatrix.objects.bulk_create(objs, batch_size=500)
+    return len(newer)
+
+
+# =========================================================
+# 📤 القراءة (من الذاكرة أولاً)
+# =========================================================
+def get_matrix(scope='all'):
+    """ يرجع المصفوفة جاهزة للـ JSON. الضربة الأولى فقط تقرأ من قاعدة البيانات. """
+    now = time.monotonic()
+    key = stations.scoped(scope)
+    hit = _cache.get(key)
+    if hit and hit[0] > now:
+        return hit[1]
+
+    import numpy as np
+
+    row = OccupancyMatrix.objects.filter(scope=scope).first()
+    if row:
+        counts, revenue = _decode(row)
+    else:
+        counts, revenue = np.zeros(CELLS, dtype=np.int64), np.zeros(CELLS)
+
+    payload = _payload(scope, counts, revenue)
+    with _cache_lock:
+        _cache[key] = (now + CACHE_TTL, payload)
+    return payload
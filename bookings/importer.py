@@ -0,0 +1,239 @@
+"""
+📥 استيراد سجل العمليات القديم (دفاتر / جداول Excel) من ملف CSV.
+
+Job.save() لكل سطر = قراءة إعدادات المحطة + كل الإشارات (أحداث، إشعارات، خريطة...)
+لكل عملية: سنوات من السجل تأخذ ساعات. هنا:
+
+- الملف يُقرأ سطراً سطراً (لا يُحمّل كاملاً في الذاكرة).
+- الخدمات والعمال يُقرؤون مرة واحدة في قواميس (بالرقم أو الاسم بأي لغة / اسم المستخدم).
+- final_price و final_commission و system_mode تُحسب بنفس قواعد Job.save() دون حفظ.
+- الإدخال بـ bulk_create على دفعات، وكل chunk_size سطر في معاملة واحدة عبر الكاتب
+  الوحيد (الكاشير يستمر في العمل بين المعاملات). الإشارات لا تعمل.
+- كل سطر له مفتاح ثابت (idempotency_key = بصمة محتواه): إعادة استيراد نفس الملف
+  لا تكرر أي عملية.
+- بعد الاستيراد: أحداث الإنشاء + الإسقاطات + خريطة الضغط + الكاش (finalize).
+
+الأعمدة: created_at (مطلوب)، service (مطلوب: رقم أو اسم)، worker (اسم المستخدم أو
+الاسم)، car_plate، client_name، phone، car_type، status (الافتراضي completed)،
+source، system_mode، price و commission (للأسعار القديمة المختلفة عن الحالية).
+"""
+import csv
+import hashlib
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, time as dt_time
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.auth.models import User
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import caching, events, heatmap, projections
+from .models import SOURCE_CHOICES, STATUS_CHOICES, Job, Service, StationSettings
+from .writes import serialized_write
+
+STATUSES = {key for key, _ in STATUS_CHOICES}
+SOURCES = {key for key, _ in SOURCE_CHOICES}
+MODES = {key for key, _ in StationSettings.MODE_CHOICES}
+
+KEY_PREFIX = 'import:'
+TEXT_FIELDS = ('client_name', 'phone', 'car_plate', 'car_type')
+
+
+class RowError(ValueError):
+    """ سطر مرفوض (السبب في الرسالة) """
+
+
+@dataclass
+class ImportReport:
+    read: int = 0
+    inserted: int = 0
+    duplicates: int = 0
+    rejected: list = field(default_factory=list)   # [(رقم السطر، السبب)]
+    seconds: float = 0.0
+    finalize_seconds: float = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.read / self.seconds if self.seconds else 0.0
+
+
+def _norm(value):
+    return ' '.join(str(value or '').split()).casefold()
+
+
+# =========================================================
+# 🗂️ القواميس (قراءة واحدة لكل جدول)
+# =========================================================
+def service_map():
+    """ {مفتاح: (id, السعر، العمولة)} بالرقم وبالاسم في كل لغة """
+    name_fields = [f.attname for f in Service._meta.concrete_fields if f.name == 'name' or f.name.startswith('name_')]
+    lookup = {}
+    for row in Service.objects.values('id', 'price', 'worker_commission', *name_fields):
+        entry = (row['id'], row['price'], row['worker_commission'])
+        lookup[str(row['id'])] = entry
+        for name in name_fields:
+            if row[name]:
+                lookup.setdefault(_norm(row[name]), entry)
+    return lookup
+
+
+def worker_map():
+    """ {مفتاح: id} بالرقم واسم المستخدم والاسم الكامل والاسم الأول (إن لم يتكرر) """
+    lookup, first_names = {}, {}
+    for pk, username, first, last in User.objects.values_list('id', 'username', 'first_name', 'last_name'):
+        lookup[str(pk)] = pk
+        lookup[_norm(username)] = pk
+        if first or last:
+            lookup.setdefault(_norm(f"{first} {last}"), pk)
+        if first:
+            first_names.setdefault(_norm(first), set()).add(pk)
+    for name, ids in first_names.items():
+        if len(ids) == 1:
+            lookup.setdefault(name, next(iter(ids)))
+    return lookup
+
+
+# =========================================================
+# 🧾 تحويل سطر إلى Job (بنفس حسابات Job.save)
+# =========================================================
+def _timestamp(value):
+    value = (value or '').strip()
+    try:
+        day = parse_date(value.replace('/', '-'))
+        # تاريخ بدون وقت (الدفاتر): منتصف النهار بدل منتصف الليل
+        parsed = datetime.combine(day, dt_time(12, 0)) if day else parse_datetime(value.replace('/', '-'))
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise RowError(f"تاريخ غير صالح: {value!r}")
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+def _money(value, default):
+    if value in (None, ''):
+        return default
+    try:
+        amount = Decimal(str(value).replace(',', '.').strip())
+    except InvalidOperation:
+        raise RowError(f"مبلغ غير صالح: {value!r}")
+    if amount < 0:
+        raise RowError(f"مبلغ سالب: {value!r}")
+    return amount
+
+
+def build_job(row, services, workers, default_mode):
+    """ Job غير محفوظ من سطر CSV، أو RowError """
+    service = services.get(_norm(row.get('service')))
+    if service is None:
+        raise RowError(f"خدمة غير معروفة: {row.get('service')!r}")
+    service_id, price, commission = service
+
+    worker_id = None
+    if (row.get('worker') or '').strip():
+        worker_id = workers.get(_norm(row['worker']))
+        if worker_id is None:
+            raise RowError(f"عامل غير معروف: {row['worker']!r}")
+
+    status = (row.get('status') or 'completed').strip().lower()
+    if status not in STATUSES:
+        raise RowError(f"حالة غير معروفة: {status!r}")
+    source = (row.get('source') or 'manual').strip().lower()
+    if source not in SOURCES:
+        raise RowError(f"مصدر غير معروف: {source!r}")
+    mode = (row.get('system_mode') or default_mode).strip().lower()
+    if mode not in MODES:
+        raise RowError(f"نظام غير معروف: {mode!r}")
+
+    job = Job(
+        service_id=service_id,
+        worker_id=worker_id,
+        status=status,
+        source=source,
+        system_mode=mode,
+        created_at=_timestamp(row.get('created_at')),
+        final_price=_money(row.get('price'), price),
+        # نفس قاعدة Job.save: العمولة فقط للمكتملة في نظام العمولة
+        final_commission=_money(row.get('commission'), commission) if status == 'completed' and mode == 'commission' else 0,
+    )
+    for name in TEXT_FIELDS:
+        value = (row.get(name) or '').strip()
+        if value:
+            setattr(job, name, value[:Job._meta.get_field(name).max_length])
+    return job
+
+
+def row_key(row, occurrence):
+    """ مفتاح ثابت من محتوى السطر؛ occurrence يميز الأسطر المتطابقة في نفس الملف """
+    content = '\x1f'.join(f"{k}={(v or '').strip()}" for k, v in sorted(row.items()) if k)
+    return KEY_PREFIX + hashlib.sha1(f"{content}\x1e{occurrence}".encode()).hexdigest()
+
+
+# =========================================================
+# 📦 الإدخال
+# =========================================================
+@serialized_write
+def _insert(jobs, batch_size):
+    """ معاملة واحدة: يتخطى ما استُورد من قبل. يرجع عدد المُدخل """
+    keys = [j.idempotency_key for j in jobs]
+    existing = set()
+    for start in range(0, len(keys), 500):  # حد متغيرات SQLite في الاستعلام الواحد
+        existing.update(Job.objects.filter(idempotency_key__in=keys[start:start + 500]).values_list('idempotency_key', flat=True))
+    fresh = [j for j in jobs if j.idempotency_key not in existing]
+    Job.objects.bulk_create(fresh, batch_size=batch_size)
+    return len(fresh)
+
+
+def run(lines, batch_size=500, chunk_size=5000, default_mode=None, dry_run=False, delimiter=',', progress=None):
+    """ يستورد من أي iterable أسطر (ملف مفتوح). يرجع ImportReport """
+    report = ImportReport()
+    started = time.perf_counter()
+    services, workers = service_map(), worker_map()
+    if default_mode is None:
+        default_mode = StationSettings.objects.values_list('current_mode', flat=True).first() or 'commission'
+
+    reader = csv.DictReader(lines, delimiter=delimiter)
+    missing = {'created_at', 'service'} - set(reader.fieldnames or ())
+    if missing:
+        raise RowError(f"أعمدة مطلوبة غير موجودة: {', '.join(sorted(missing))}")
+
+    seen, pending = {}, []
+
+    def flush():
+        if pending and not dry_run:
+            inserted = _insert(pending, batch_size)
+            report.inserted += inserted
+            report.duplicates += len(pending) - inserted
+        pending.clear()
+        if progress:
+            progress(report)
+
+    for row in reader:
+        report.read += 1
+        try:
+            job = build_job(row, services, workers, default_mode)
+        except RowError as exc:
+            report.rejected.append((reader.line_num, str(exc)))
+            continue
+        fingerprint = row_key(row, 0)
+        seen[fingerprint] = seen.get(fingerprint, -1) + 1
+        job.idempotency_key = row_key(row, seen[fingerprint]) if seen[fingerprint] else fingerprint
+        pending.append(job)
+        if len(pending) >= chunk_size:
+            flush()
+    flush()
+    report.seconds = time.perf_counter() - started
+
+    if report.inserted:
+        finalize_started = time.perf_counter()
+        finalize()
+        report.finalize_seconds = time.perf_counter() - finalize_started
+    return report
+
+
+def finalize():
+    """ ما كانت الإشارات ستحدثه: سجل الأحداث، الإسقاطات، خريطة الضغط، الكاش """
+    events.backfill()
+    projections.catch_up()
+    heatmap.rebuild()
+    caching.invalidate('job')
@@ -0,0 +1,346 @@
+"""
+🏋️ اختبار الضغط داخل العملية: محاكاة محطة مزدحمة دون خادم ولا شبكة.
+
+كل مستخدم افتراضي = خيط مع django.test.Client خاص به (نفس WSGI handler ونفس
+الـ middleware كما في الإنتاج). الأدوار:
+- tablet: لوحة تسأل عن الإشعارات باستمرار.
+- cashier: يسجل عمليات من الكاشير ثم ينهي بعضها.
+- visitor: زبون يفتح الموقع ويحجز (مع أو بدون رسالة صوتية).
+- admin: مدير يفتح تقرير الرواتب وسجل العمليات.
+
+التشغيل الافتراضي على نسخة مؤقتة من القاعدة (online backup) ومجلد media مؤقت،
+فلا يلمس بيانات المحطة الحقيقية. مع in_place (قاعدة اختبار غير SQLite مثلاً) يُحذف
+في النهاية كل ما أنشأه الاختبار: عملياته (ومعها إشعاراتها) ومستخدمه وخدمته.
+"""
+import math
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+from django.db.models import Max, Q
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from . import replica, routers, slots, stations, taskqueue
+from .models import Job, Notification, Service, Task
+
+LOADTEST_USER = 'loadtest-admin'
+# علامات ما ينشئه الاختبار (للحذف بعد التشغيل على القاعدة الحقيقية)
+LOADTEST_KEY_PREFIX = 'loadtest-'
+LOADTEST_CLIENT = "زبون تجريبي"
+
+# رسالة صوتية وهمية (~24KB) لمحاكاة الرفع
+_VOICE_BYTES = os.urandom(24 * 1024)
+
+
+# =========================================================
+# 📊 تجميع النتائج
+# =========================================================
+class Results:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)   # endpoint -> [seconds]
+        self.errors = defaultdict(int)       # (endpoint, kind) -> count
+
+    def record(self, endpoint, elapsed, error=None):
+        with self._lock:
+            self.latencies[endpoint].append(elapsed)
+            if error:
+                self.errors[(endpoint, error)] += 1
+
+    @staticmethod
+    def percentile(values, pct):
+        """ nearest-rank """
+        ordered = sorted(values)
+        return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+    def summary(self, elapsed):
+        rows = []
+        for endpoint, values in sorted(self.latencies.items()):
+            errors = sum(n for (ep, _), n in self.errors.items() if ep == endpoint)
+            rows.append({
+                'endpoint': endpoint,
+                'requests': len(values),
+                'rps': len(values) / elapsed if elapsed else 0,
+                'p50': self.percentile(values, 50) * 1000,
+                'p95': self.percentile(values, 95) * 1000,
+                'p99': self.percentile(values, 99) * 1000,
+                'errors': errors,
+            })
+        return rows
+
+
+def _classify(exc=None, status=None):
+    if exc is not None:
+        text = str(exc).lower()
+        if 'locked' in text or 'busy' in text:
+            return 'sqlite_locked'
+        return type(exc).__name__
+    if status and status >= 500:
+        return f"http_{status}"
+    if status == 429:
+        return 'http_429'
+    if status and status >= 400:
+        return f"http_{status}"
+    return None
+
+
+# =========================================================
+# 👥 المستخدمون الافتراضيون
+# =========================================================
+class VirtualUser(threading.Thread):
+    role = None
+
+    def __init__(self, index, results, stop, context, think):
+        super().__init__(daemon=True, name=f"{self.role}-{index}")
+        self.results = results
+        self.stop_event = stop
+        self.context = context
+        self.think = think
+        self.client = Client(raise_request_exception=True)
+
+    def call(self, endpoint, method, url, data=None, expect=(200, 302), **extra):
+        started = time.perf_counter()
+        try:
+            response = getattr(self.client, method)(url, data, **extra)
+        except Exception as exc:
+            self.results.record(endpoint, time.perf_counter() - started, _classify(exc=exc))
+            return None
+        status = response.status_code
+        self.results.record(endpoint, time.perf_counter() - started, None if status in expect else _classify(status=status))
+        return response
+
+    def pause(self):
+        self.stop_event.wait(self.think * random.uniform(0.5, 1.5))
+
+    def run(self):
+        try:
+            if self.role != 'visitor':
+                self.client.force_login(self.context['admin'])
+            while not self.stop_event.is_set():
+                self.step()
+                self.pause()
+        finally:
+            close_old_connections()
+
+    def step(self):
+        raise NotImplementedError
+
+
+class Tablet(VirtualUser):
+    role = 'tablet'
+
+    def step(self):
+        self.call('get_notifications', 'get', reverse('get_notifications'), expect=(200,))
+
+
+class Cashier(VirtualUser):
+    role = 'cashier'
+
+    def step(self):
+        key = f"{LOADTEST_KEY_PREFIX}{uuid.uuid4().hex}"
+        self.call('pos_dashboard', 'post', reverse('pos_dashboard'), {
+            'service': random.choice(self.context['services']),
+            'worker': random.choice(self.context['workers']),
+            'plate': f"{random.randint(10000, 99999)}-{random.randint(100, 999)}",
+            'car_type': "سيارة سياحية",
+            'idempotency_key': key,
+        })
+        # نصف العمليات تنتهي مباشرة (زر إنهاء الغسيل)
+        if random.random() < 0.5:
+            job_id = Job.objects.filter(idempotency_key=key).values_list('id', flat=True).first()
+            if job_id:
+                self.call('finish_wash', 'get', reverse('finish_wash', args=[job_id]))
+
+
+class Visitor(VirtualUser):
+    role = 'visitor'
+
+    def step(self):
+        self.call('home_get', 'get', reverse('home'), expect=(200,))
+        # مثل المتصفح: مواعيد يوم ثم حجز فترة متاحة
+        day = random.choice(slots.bookable_days())
+        response = self.call('slots_data', 'get', reverse('slots_data'), {'date': day.isoformat()}, expect=(200,))
+        free = [s['time'] for s in response.json()['slots'] if s['available']] if response and response.status_code == 200 else []
+        if not free:
+            return
+        data = {
+            'name': LOADTEST_CLIENT,
+            'phone': f"05{random.randint(10000000, 99999999)}",
+            'plate': f"{random.randint(10000, 99999)}-{random.randint(100, 999)}",
+            'service': random.choice(self.context['services']),
+            'slot': f"{day.isoformat()}T{random.choice(free)}",
+        }
+        endpoint = 'home_post'
+        if random.random() < self.context['voice_ratio']:
+            data['voice_note'] = SimpleUploadedFile('voice_note.mp3', _VOICE_BYTES, content_type='audio/mp3')
+            endpoint = 'home_post_voice'
+        # 409 = زبون آخر أخذ آخر مكان في الفترة: نتيجة عادية تحت الضغط
+        self.call(endpoint, 'post', reverse('home'), data, expect=(200, 409))
+
+
+class Admin(VirtualUser):
+    role = 'admin'
+
+    def step(self):
+        self.call('payroll_changelist', 'get', reverse('admin:bookings_payroll_changelist'), expect=(200,))
+        self.pause()
+        self.call('job_changelist', 'get', reverse('admin:bookings_job_changelist'), expect=(200,))
+
+
+ROLES = {'tablets': Tablet, 'cashiers': Cashier, 'visitors': Visitor, 'admins': Admin}
+
+
+# =========================================================
+# 🗄️ القاعدة المؤقتة
+# =========================================================
+def db_size(path):
+    """ حجم القاعدة مع ملف WAL """
+    return sum(os.path.getsize(p) for p in (str(path), f"{path}-wal") if os.path.exists(p))
+
+
+@contextmanager
+def sandbox(in_place=False):
+    """
+    ينسخ القاعدة الحية إلى مجلد مؤقت ويوجه إليه كل الاتصالات طوال الاختبار.
+    يشمل قاعدة المحطة الحالية (BOOKINGS_STATION): طلبات الاختبار تذهب إليها لا إلى default.
+    """
+    station_alias = stations.db_alias()
+    if in_place:
+        with override_settings(ALLOWED_HOSTS=['*']):
+            yield str(settings.DATABASES[station_alias]['NAME'])
+        return
+
+    workdir = tempfile.mkdtemp(prefix='turbowash-loadtest-')
+    databases = settings.DATABASES
+    # قاعدة في الذاكرة (الاختبارات) ليست بيانات حية ولا ملف ينسخ: تبقى كما هي
+    aliases = [a for a in dict.fromkeys([DEFAULT_DB_ALIAS, station_alias]) if not connections[a].is_in_memory_db()]
+    paths = {alias: os.path.join(workdir, f'{alias}.sqlite3') for alias in aliases}
+    for alias, path in paths.items():
+        replica.online_backup(path, alias=alias)
+    if DEFAULT_DB_ALIAS in paths and routers.REPORTING_ALIAS in databases:
+        # التقارير نسخة من default
+        paths[routers.REPORTING_ALIAS] = os.path.join(workdir, f'{routers.REPORTING_ALIAS}.sqlite3')
+        replica.online_backup(paths[routers.REPORTING_ALIAS])
+
+    original = {alias: databases[alias]['NAME'] for alias in databases}
+    connections.close_all()
+    for alias, path in paths.items():
+        databases[alias]['NAME'] = path
+    db_path = str(databases[station_alias]['NAME'])
+    overrides = {'ALLOWED_HOSTS': ['*'], 'MEDIA_ROOT': os.path.join(workdir, 'media')}
+    if DEFAULT_DB_ALIAS in paths:
+        overrides['DB_WRITE_LOCK_FILE'] = f"{paths[DEFAULT_DB_ALIAS]}.write-lock"
+    routers._last_check['at'] = 0.0
+    try:
+        with override_settings(**overrides):
+            yield db_path
+    finally:
+        connections.close_all()
+        for alias, name in original.items():
+            databases[alias]['NAME'] = name
+        routers._last_check['at'] = 0.0
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _prepare_context(voice_ratio):
+    """ مستخدم إداري للاختبار + خدمات وعمال (تُنشأ في النسخة المؤقتة إن لم توجد) """
+    admin, created = User.objects.get_or_create(
+        username=LOADTEST_USER, defaults={'is_staff': True, 'is_superuser': True},
+    )
+    if created:
+        admin.set_unusable_password()
+        admin.save()
+    created_service = None
+    services = list(Service.objects.values_list('id', flat=True))
+    if not services:
+        created_service = Service.objects.create(name="غسيل عادي", price=500, worker_commission=150)
+        services = [created_service.id]
+    workers = list(User.objects.filter(is_staff=True).values_list('id', flat=True))
+    return {
+        'admin': admin, 'services': services, 'workers': workers, 'voice_ratio': voice_ratio,
+        'created_admin': created, 'created_service': created_service,
+        'last_job_id': Job.objects.aggregate(m=Max('id'))['m'] or 0,
+    }
+
+
+def _cleanup(context):
+    """ in_place: يحذف عمليات الاختبار (بإشاراتها: الإشعارات، السجل، الملفات) ومستخدمه وخدمته """
+    jobs = Job.objects.filter(id__gt=context['last_job_id']).filter(
+        Q(idempotency_key__startswith=LOADTEST_KEY_PREFIX) | Q(source='website', client_name=LOADTEST_CLIENT)
+    )
+    removed = jobs.delete()[1].get(Job._meta.label, 0)
+    if context['created_admin']:
+        context['admin'].delete()
+    if context['created_service'] is not None:
+        context['created_service'].delete()
+    return removed
+
+
+def run(duration=30, tablets=4, cashiers=2, visitors=3, admins=1, think=0.5, voice_ratio=0.3,
+        task_workers=1, in_place=False, log=print):
+    """ يشغل السيناريو ويرجع ملخص النتائج """
+    results = Results()
+    stop = threading.Event()
+    counts = {'tablets': tablets, 'cashiers': cashiers, 'visitors': visitors, 'admins': admins}
+
+    with sandbox(in_place) as db_path:
+        context = _prepare_context(voice_ratio)
+        try:
+            size_before = db_size(db_path)
+            jobs_before = Job.objects.count()
+            notifications_before = Notification.objects.count()
+
+            def task_loop(index):
+                # عمال المهام الخلفية يعملون أثناء الضغط كما في الإنتاج
+                while not stop.is_set():
+                    task_obj = taskqueue.claim(f"loadtest:{index}")
+                    if task_obj is None:
+                        stop.wait(0.2)
+                        continue
+                    taskqueue.execute(task_obj)
+                close_old_connections()
+
+            threads = [threading.Thread(target=task_loop, args=(i,), daemon=True) for i in range(task_workers)]
+            for role, count in counts.items():
+                threads += [ROLES[role](i, results, stop, context, think) for i in range(count)]
+
+            log(f"🏋️ {sum(counts.values())} مستخدم افتراضي + {task_workers} عامل مهام لمدة {duration} ثانية ({db_path})")
+            started = time.perf_counter()
+            for t in threads:
+                t.start()
+            try:
+                stop.wait(duration)
+            finally:
+                stop.set()
+                for t in threads:
+                    t.join()
+            elapsed = time.perf_counter() - started
+
+            summary = {
+                'elapsed': elapsed,
+                'endpoints': results.summary(elapsed),
+                'errors': dict(results.errors),
+                'total_requests': sum(len(v) for v in results.latencies.values()),
+                'db_growth_bytes': db_size(db_path) - size_before,
+                'jobs_created': Job.objects.count() - jobs_before,
+                'notifications_created': Notification.objects.count() - notifications_before,
+                # طابور لم يُفرغ = عمال المهام أقل من اللازم لهذا الضغط
+                'tasks_pending': Task.objects.filter(status__in=('queued', 'running')).count(),
+            }
+        finally:
+            if in_place:
+                # القاعدة الحقيقية: لا يبقى مستخدم الاختبار ولا عملياته الوهمية
+                log(f"🧹 حُذفت {_cleanup(context)} عملية اختبار من القاعدة")
+            close_old_connections()
+    return summary
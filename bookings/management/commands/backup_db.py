@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings import backup
+
+
+class Command(BaseCommand):
+    help = "💾 نسخة احتياطية للقاعدة الحية (كاملة/تزايدية) دون إيقاف الكاشير، مع التحقق والاستعادة"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="نسخة كاملة حتى لو أمكنت التزايدية")
+        parser.add_argument('--pages', type=int, help="عدد الصفحات في كل خطوة نسخ")
+        parser.add_argument('--pause', type=float, help="الاستراحة بين الخطوات (ثوانٍ)")
+        parser.add_argument('--list', action='store_true', help="عرض النسخ الموجودة")
+        parser.add_argument('--verify', nargs='?', const='', metavar='NAME', help="استعادة تجريبية والتحقق (الافتراضي: آخر نسخة)")
+        parser.add_argument('--restore', metavar='NAME', help="إعادة بناء النسخة NAME في --output")
+        parser.add_argument('--output', help="مسار ملف الاستعادة (يجب ألا يكون موجوداً)")
+
+    def handle(self, *args, **options):
+        try:
+            if options['list']:
+                return self._list()
+            if options['verify'] is not None:
+                result = backup.verify(options['verify'] or None)
+                self.stdout.write(self.style.SUCCESS(
+                    f"✅ {result['name']} سليمة ({result['chain']} ملف في السلسلة، {result['tables']} جدول)"
+                ))
+                return
+            if options['restore']:
+                if not options['output']:
+                    raise CommandError("⚠️ حدد --output لملف الاستعادة.")
+                backup.restore(options['restore'], options['output'])
+                self.stdout.write(self.style.SUCCESS(
+                    f"✅ استُعيدت {options['restore']} في {options['output']}. أوقف الخادم قبل استبدال القاعدة بها."
+                ))
+                return
+
+            snapshot = backup.create(full=options['full'], pages=options['pages'], pause=options['pause'])
+        except backup.BackupError as exc:
+            raise CommandError(f"❌ {exc}")
+
+        if snapshot is None:
+            self.stdout.write("ℹ️ لا تغيير منذ آخر نسخة، لم تُكتب نسخة جديدة.")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {snapshot['name']}: {snapshot['changed_pages']}/{snapshot['pages']} صفحة، "
+            f"{snapshot['bytes'] / 1024:.1f} KB في {snapshot['seconds']:.2f} ثانية"
+        ))
+
+    def _list(self):
+        snapshots = backup.load_manifest()['snapshots']
+        if not snapshots:
+            self.stdout.write("لا توجد نسخ بعد.")
+            return
+        self.stdout.write(f"{'name':<36}{'pages':>9}{'changed':>9}{'KB':>10}  base")
+        for s in snapshots:
+            self.stdout.write(f"{s['name']:<36}{s['pages']:>9}{s['changed_pages']:>9}{s['bytes'] / 1024:>10.1f}  {s['base'] or '-'}")
@@ -0,0 +1,50 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings import startup
+
+
+class Command(BaseCommand):
+    help = "🚀 قياس إقلاع العامل (زمن، ذاكرة، وحدات) للإعدادات الكاملة مقابل الخفيفة"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--settings-module', action='append', dest='modules',
+                            help="ملف إعدادات للقياس (يتكرر)؛ الافتراضي core.settings و core.settings_public")
+        parser.add_argument('--repeat', type=int, default=5, help="عدد التشغيلات لكل إعدادات (نأخذ الوسيط)")
+        parser.add_argument('--top', type=int, default=10, help="عدد أثقل الحزم المعروضة")
+        parser.add_argument('--json', action='store_true', help="إخراج النتائج بصيغة JSON")
+
+    def handle(self, *args, **options):
+        try:
+            summary = startup.run(
+                modules=options['modules'] or startup.DEFAULT_MODULES,
+                repeat=max(1, options['repeat']),
+                top=options['top'],
+            )
+        except RuntimeError as exc:
+            raise CommandError(f"❌ فشل الإقلاع: {exc}")
+
+        if options['json']:
+            self.stdout.write(json.dumps(summary, indent=2, ensure_ascii=False))
+            return
+
+        self.stdout.write(f"\n{'settings':<24}{'start ms':>10}{'import ms':>11}{'RSS MB':>9}{'modules':>9}  heavy apps")
+        for row in summary:
+            self.stdout.write(
+                f"{row['settings']:<24}{row['seconds'] * 1000:>10.0f}{row['import_ms']:>11.0f}"
+                f"{row['maxrss_mb']:>9.1f}{row['modules']:>9.0f}  {', '.join(row['loaded']) or '-'}"
+            )
+        for row in summary:
+            self.stdout.write(f"\n📦 {row['settings']}: أثقل الحزم (زمن الاستيراد الذاتي)")
+            for item in row['heaviest']:
+                self.stdout.write(f"   {item['package']:<28}{item['ms']:>8.1f} ms")
+
+        if len(summary) > 1:
+            base, slim = summary[0], summary[-1]
+            self.stdout.write(self.style.SUCCESS(
+                f"\n✅ {slim['settings']} مقابل {base['settings']}: "
+                f"الإقلاع {(slim['seconds'] - base['seconds']) * 1000:+.0f} ms، "
+                f"الذاكرة {slim['maxrss_mb'] - base['maxrss_mb']:+.1f} MB، "
+                f"الوحدات {slim['modules'] - base['modules']:+.0f}"
+            ))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from bookings import metrics, retention, tasks
+
+
+class Command(BaseCommand):
+    help = "🧹 حذف الإشعارات المقروءة القديمة والمنتهية واليتيمة (على دفعات)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help="عدد الأسطر في كل دفعة حذف")
+        parser.add_argument('--max-batches', type=int, default=None, help="أقصى عدد دفعات في هذا التشغيل")
+        parser.add_argument('--schedule', type=int, metavar='SECONDS', default=None,
+                            help="بدل التنفيذ الآن: جدولة مهمة خلفية تتكرر كل SECONDS ثانية (run_workers)")
+
+    def handle(self, *args, **options):
+        if options['schedule']:
+            tasks.compact_notifications.delay(unique=True, every=options['schedule'])
+            self.stdout.write(self.style.SUCCESS(f"⏰ تمت الجدولة: كل {options['schedule']} ثانية"))
+            return
+
+        started = time.perf_counter()
+        removed = retention.compact(batch_size=options['batch_size'], max_batches=options['max_batches'])
+        for reason, count in removed.items():
+            self.stdout.write(f"  • {reason}: {count}")
+        metrics.maybe_flush(force=True)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"✅ حُذف {sum(removed.values())} إشعار في {elapsed:.2f} ثانية"))
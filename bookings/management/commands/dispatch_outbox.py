@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+from bookings import outbox
+
+
+class Command(BaseCommand):
+    help = "📨 إرسال رسائل الزبائن من الصندوق الصادر (Outbox) على دفعات"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help="عدد الرسائل في كل نداء للبوابة")
+        parser.add_argument('--max-batches', type=int, default=None, help="أقصى عدد دفعات في هذا التشغيل")
+        parser.add_argument('--gateway', default=None, help="مسار صنف البوابة (بدل OUTBOX_GATEWAY)")
+        parser.add_argument('--loop', action='store_true', help="البقاء في الخدمة وفحص الصندوق باستمرار")
+        parser.add_argument('--poll', type=float, default=5.0, help="فترة الانتظار عند فراغ الصندوق (ثوانٍ)")
+
+    def handle(self, *args, **options):
+        gateway = import_string(options['gateway'])() if options['gateway'] else outbox.get_gateway()
+        self.stdout.write(f"📡 البوابة: {type(gateway).__name__}")
+        try:
+            while True:
+                stats = outbox.dispatch(options['batch_size'], options['max_batches'], gateway=gateway)
+                if any(stats.values()):
+                    self.stdout.write(f"  • أُرسلت {stats['sent']} | إعادة لاحقاً {stats['retry']} | فشلت {stats['failed']}")
+                if not options['loop']:
+                    break
+                time.sleep(options['poll'])
+        except KeyboardInterrupt:
+            self.stdout.write("⏹️ إيقاف")
+        self.stdout.write(self.style.SUCCESS("✅ انتهى"))
@@ -0,0 +1,63 @@
+import json
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from bookings import changes
+
+
+class Command(BaseCommand):
+    help = "🔄 تصدير الأسطر التي تغيرت بعد مؤشر (JSON Lines) للمزامنة التدريجية"
+
+    def add_arguments(self, parser):
+        parser.add_argument('feeds', nargs='*', help=f"التغذيات (الافتراضي: الكل - {', '.join(changes.FEEDS)})")
+        parser.add_argument('--since', help="المؤشر الذي نبدأ بعده (لتغذية واحدة فقط)")
+        parser.add_argument('--state', help="ملف JSON يحفظ مؤشر كل تغذية بين التشغيلات")
+        parser.add_argument('--output', help="ملف الإخراج (الافتراضي: stdout)")
+        parser.add_argument('--page-size', type=int, default=changes.DEFAULT_LIMIT, help="عدد الأسطر في كل قراءة")
+
+    def handle(self, *args, **options):
+        feeds = options['feeds'] or list(changes.FEEDS)
+        unknown = [f for f in feeds if f not in changes.FEEDS]
+        if unknown:
+            raise CommandError(f"تغذية غير معروفة: {', '.join(unknown)}")
+        if options['since'] and len(feeds) != 1:
+            raise CommandError("--since يحتاج تغذية واحدة (أو استعمل --state)")
+
+        state = {}
+        if options['state'] and os.path.exists(options['state']):
+            with open(options['state']) as f:
+                state = json.load(f)
+        if options['since']:
+            state[feeds[0]] = options['since']
+
+        out = open(options['output'], 'a', encoding='utf-8') if options['output'] else sys.stdout
+        totals = {}
+        try:
+            for feed in feeds:
+                cursor, totals[feed] = state.get(feed), 0
+                while True:
+                    try:
+                        rows, cursor, has_more = changes.fetch(feed, cursor, options['page_size'])
+                    except changes.InvalidCursor as exc:
+                        raise CommandError(str(exc))
+                    for row in rows:
+                        out.write(json.dumps({'feed': feed, **row}, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n')
+                    totals[feed] += len(rows)
+                    if not has_more:
+                        break
+                state[feed] = cursor
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+        # المؤشر يُحفظ فقط بعد كتابة كل الأسطر
+        if options['state']:
+            with open(f"{options['state']}.tmp", 'w') as f:
+                json.dump(state, f, indent=2)
+            os.replace(f"{options['state']}.tmp", options['state'])
+
+        for feed, count in totals.items():
+            self.stderr.write(f"  • {feed}: {count} سطر (المؤشر: {state.get(feed) or '-'})")
@@ -0,0 +1,58 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings import importer
+
+
+class Command(BaseCommand):
+    help = "📥 استيراد سجل العمليات القديم من CSV بسرعة (بدون Job.save ولا الإشارات)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="ملف CSV (UTF-8، السطر الأول أسماء الأعمدة)")
+        parser.add_argument('--delimiter', default=',', help="فاصل الأعمدة (Excel بالفرنسية يستعمل ;)")
+        parser.add_argument('--mode', choices=sorted(importer.MODES), help="system_mode للأسطر التي لا تحدده (الافتراضي: الوضع الحالي)")
+        parser.add_argument('--batch-size', type=int, default=500, help="أسطر في كل INSERT")
+        parser.add_argument('--chunk-size', type=int, default=5000, help="أسطر في كل معاملة")
+        parser.add_argument('--dry-run', action='store_true', help="التحقق فقط دون إدخال")
+        parser.add_argument('--rejects', help="حفظ الأسطر المرفوضة وأسبابها في ملف CSV")
+
+    def handle(self, *args, **options):
+        def progress(report):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"  … {report.read} سطر ({report.inserted} جديد، {len(report.rejected)} مرفوض)")
+
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as fh:
+                report = importer.run(
+                    fh,
+                    batch_size=options['batch_size'],
+                    chunk_size=options['chunk_size'],
+                    default_mode=options['mode'],
+                    dry_run=options['dry_run'],
+                    delimiter=options['delimiter'],
+                    progress=progress,
+                )
+        except FileNotFoundError:
+            raise CommandError(f"❌ الملف غير موجود: {options['path']}")
+        except importer.RowError as exc:
+            raise CommandError(f"❌ {exc}")
+
+        if options['rejects'] and report.rejected:
+            with open(options['rejects'], 'w', encoding='utf-8-sig', newline='') as fh:
+                writer = csv.writer(fh)
+                writer.writerow(['line', 'reason'])
+                writer.writerows(report.rejected)
+
+        for line, reason in report.rejected[:10]:
+            self.stdout.write(self.style.WARNING(f"⚠️ السطر {line}: {reason}"))
+        if len(report.rejected) > 10:
+            self.stdout.write(self.style.WARNING(f"⚠️ … و{len(report.rejected) - 10} سطراً مرفوضاً آخر"))
+
+        verb = "تحقق من" if options['dry_run'] else "قرأ"
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {verb} {report.read} سطر في {report.seconds:.2f} ثانية ({report.rows_per_second:.0f} سطر/ثانية): "
+            f"{report.inserted} جديد، {report.duplicates} مستورد من قبل، {len(report.rejected)} مرفوض"
+        ))
+        if report.finalize_seconds:
+            self.stdout.write(f"📊 الأحداث والإسقاطات وخريطة الضغط: {report.finalize_seconds:.2f} ثانية")
@@ -0,0 +1,74 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from bookings import loadtest
+
+
+class Command(BaseCommand):
+    help = "🏋️ اختبار ضغط داخل العملية: لوحات + كاشير + زبائن + مدير على نسخة مؤقتة من القاعدة"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=int, default=30, help="مدة الاختبار (ثوانٍ)")
+        parser.add_argument('--tablets', type=int, default=4, help="لوحات تسأل عن الإشعارات")
+        parser.add_argument('--cashiers', type=int, default=2, help="كاشير يسجل وينهي العمليات")
+        parser.add_argument('--visitors', type=int, default=3, help="زبائن يحجزون من الموقع")
+        parser.add_argument('--admins', type=int, default=1, help="مدراء يفتحون تقرير الرواتب")
+        parser.add_argument('--think', type=float, default=0.5, help="متوسط الانتظار بين طلبات كل مستخدم (ثوانٍ)")
+        parser.add_argument('--voice-ratio', type=float, default=0.3, help="نسبة الحجوزات مع رسالة صوتية")
+        parser.add_argument('--task-workers', type=int, default=1, help="عمال المهام الخلفية أثناء الاختبار")
+        parser.add_argument('--in-place', action='store_true', help="⚠️ التشغيل على القاعدة الحقيقية بدل نسخة مؤقتة (يُحذف ما أنشأه في النهاية)")
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive', help="بدون سؤال التأكيد مع --in-place")
+        parser.add_argument('--json', action='store_true', help="إخراج النتائج بصيغة JSON")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite' and not options['in_place']:
+            raise CommandError("⚠️ النسخة المؤقتة تدعم SQLite فقط، استعمل --in-place على قاعدة اختبار.")
+        if options['in_place'] and options['interactive']:
+            answer = input(
+                f"⚠️ --in-place يكتب عمليات وهمية في {connection.settings_dict['NAME']} (وتُحذف في النهاية).\n"
+                "اكتب yes للمتابعة: "
+            )
+            if answer.strip().lower() != 'yes':
+                raise CommandError("أُلغي الاختبار.")
+
+        summary = loadtest.run(
+            duration=options['duration'],
+            tablets=options['tablets'],
+            cashiers=options['cashiers'],
+            visitors=options['visitors'],
+            admins=options['admins'],
+            think=options['think'],
+            voice_ratio=options['voice_ratio'],
+            task_workers=options['task_workers'],
+            in_place=options['in_place'],
+            log=self.stdout.write,
+        )
+
+        if options['json']:
+            summary['errors'] = [{'endpoint': ep, 'kind': kind, 'count': n} for (ep, kind), n in summary['errors'].items()]
+            self.stdout.write(json.dumps(summary, indent=2, ensure_ascii=False))
+            return
+
+        self.stdout.write(f"\n{'endpoint':<22}{'req':>7}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+        for row in summary['endpoints']:
+            self.stdout.write(
+                f"{row['endpoint']:<22}{row['requests']:>7}{row['rps']:>8.1f}"
+                f"{row['p50']:>9.1f}{row['p95']:>9.1f}{row['p99']:>9.1f}{row['errors']:>8}"
+            )
+
+        self.stdout.write(
+            f"\n📈 {summary['total_requests']} طلب في {summary['elapsed']:.1f} ثانية "
+            f"({summary['total_requests'] / summary['elapsed']:.1f} طلب/ثانية)"
+        )
+        self.stdout.write(
+            f"🗄️ نمو القاعدة: {summary['db_growth_bytes'] / 1024:.0f} KB | "
+            f"عمليات جديدة: {summary['jobs_created']} | إشعارات جديدة: {summary['notifications_created']} | "
+            f"مهام في الطابور: {summary['tasks_pending']}"
+        )
+        if summary['errors']:
+            for (endpoint, kind), count in sorted(summary['errors'].items()):
+                self.stdout.write(self.style.ERROR(f"❌ {endpoint}: {kind} × {count}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("✅ بدون أخطاء"))
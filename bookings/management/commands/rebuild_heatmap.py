@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from bookings import heatmap, tasks
+
+
+class Command(BaseCommand):
+    help = "🔥 إعادة بناء خريطة الضغط (ساعة × يوم) من سجل العمليات"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=heatmap.WINDOW_DAYS, help="عدد الأيام المشمولة (الافتراضي: سنة)")
+        parser.add_argument('--schedule', type=int, metavar='SECONDS', default=None,
+                            help="بدل التنفيذ الآن: جدولة مهمة خلفية تتكرر كل SECONDS ثانية (run_workers)")
+
+    def handle(self, *args, **options):
+        if options['schedule']:
+            tasks.rebuild_heatmap.delay(unique=True, days=options['days'], every=options['schedule'])
+            self.stdout.write(self.style.SUCCESS(f"⏰ تمت الجدولة: كل {options['schedule']} ثانية"))
+            return
+
+        started = time.perf_counter()
+        total = heatmap.rebuild(window_days=options['days'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"✅ تمت إعادة البناء: {total} عملية في {elapsed:.2f} ثانية"))
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings import events, projections
+
+
+class Command(BaseCommand):
+    help = "📊 إعادة بناء الإسقاطات (العروض المشتقة) من سجل أحداث العمليات"
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help=f"الإسقاطات المطلوبة (الافتراضي: الكل - {', '.join(projections.REGISTRY)})")
+        parser.add_argument('--batch-size', type=int, default=projections.BATCH_SIZE, help="عدد الأحداث في كل معاملة")
+
+    def handle(self, *args, **options):
+        unknown = [n for n in options['names'] if n not in projections.REGISTRY]
+        if unknown:
+            raise CommandError(f"إسقاط غير معروف: {', '.join(unknown)}")
+
+        started = time.perf_counter()
+        # العمليات التي سبقت السجل (أو أُدخلت دون Job.save) تحصل على حدث إنشاء أولاً
+        added = events.backfill()
+        if added:
+            self.stdout.write(f"📜 أُضيف حدث إنشاء لـ {added} عملية بدون أحداث")
+
+        processed = projections.rebuild(options['names'] or None, batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        for name, count in processed.items():
+            self.stdout.write(f"  • {name}: {count} حدث")
+        self.stdout.write(self.style.SUCCESS(f"✅ تمت إعادة البناء في {elapsed:.2f} ثانية"))
@@ -0,0 +1,29 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings import replica
+from bookings.routers import REPORTING_ALIAS
+
+
+class Command(BaseCommand):
+    help = "📸 تحديث نسخة التقارير (reporting) من القاعدة الرئيسية دون إيقاف الكاشير"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=256, help="عدد الصفحات في كل خطوة نسخ")
+        parser.add_argument('--pause', type=float, default=0.005, help="الاستراحة بين الخطوات (ثوانٍ)")
+        parser.add_argument('--loop', action='store_true', help="تشغيل مستمر مع تحديث دوري")
+        parser.add_argument('--interval', type=int, default=300, help="الفاصل بين التحديثات في وضع --loop (ثوانٍ)")
+
+    def handle(self, *args, **options):
+        db = settings.DATABASES.get(REPORTING_ALIAS)
+        if not db or 'sqlite3' not in db['ENGINE']:
+            raise CommandError("⚠️ نسخة التقارير غير معرفة كملف SQLite في DATABASES.")
+
+        while True:
+            elapsed = replica.refresh_reporting_snapshot(pages=options['pages'], pause=options['pause'])
+            self.stdout.write(self.style.SUCCESS(f"✅ تم تحديث نسخة التقارير في {elapsed:.2f} ثانية"))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
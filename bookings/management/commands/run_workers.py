@@ -0,0 +1,62 @@
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from bookings import metrics, taskqueue
+
+
+class Command(BaseCommand):
+    help = "⚙️ تشغيل عمال المهام الخلفية (Task Queue)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=2, help="عدد العمال المتوازيين")
+        parser.add_argument('--poll', type=float, default=1.0, help="فترة الانتظار عند فراغ الطابور (ثوانٍ)")
+        parser.add_argument('--burst', action='store_true', help="تنفيذ المهام الجاهزة ثم الخروج")
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        base_id = f"{socket.gethostname()}:{os.getpid()}"
+        processed = [0] * options['threads']
+        interval = getattr(settings, 'TASKS_PURGE_INTERVAL', 3600)
+        next_purge = [0.0]
+
+        def loop(index):
+            worker_id = f"{base_id}:{index}"
+            while not stop.is_set():
+                close_old_connections()
+                # 🧹 العامل الأول فقط يحذف المهام المنتهية القديمة (عند البدء ثم كل interval)
+                if index == 0 and time.monotonic() >= next_purge[0]:
+                    next_purge[0] = time.monotonic() + interval
+                    taskqueue.purge_finished()
+                task_obj = taskqueue.claim(worker_id)
+                if task_obj is None:
+                    if options['burst']:
+                        break
+                    stop.wait(options['poll'])
+                    continue
+                taskqueue.execute(task_obj)
+                processed[index] += 1
+                # 📈 عدادات المهام (إشعارات، رسائل...) تظهر في /metrics دون انتظار طلب ويب
+                metrics.maybe_flush()
+            close_old_connections()
+
+        self.stdout.write(f"🚀 تشغيل {options['threads']} عامل ({base_id})")
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            futures = [pool.submit(loop, i) for i in range(options['threads'])]
+            try:
+                for f in futures:
+                    f.result()
+            except KeyboardInterrupt:
+                stop.set()
+                self.stdout.write("⏹️ إيقاف العمال بعد إنهاء المهام الحالية...")
+
+        metrics.maybe_flush(force=True)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"✅ تم تنفيذ {sum(processed)} مهمة في {elapsed:.1f} ثانية"))
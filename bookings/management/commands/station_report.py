@@ -0,0 +1,49 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from bookings import consolidated, stations
+
+
+class Command(BaseCommand):
+    help = "📊 تقرير موحد لكل المحطات (تُسأل بالتوازي، والمحطة المتأخرة لا تؤخر الباقي)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help="أول يوم YYYY-MM-DD (الافتراضي: بداية الشهر)")
+        parser.add_argument('--to', dest='end', help="آخر يوم YYYY-MM-DD (الافتراضي: اليوم)")
+        parser.add_argument('--station', action='append', help="محطة محددة (يمكن تكرارها)، الافتراضي كل المحطات")
+        parser.add_argument('--timeout', type=float, help="مهلة كل محطة (ثوانٍ)")
+        parser.add_argument('--json', action='store_true', help="إخراج النتائج بصيغة JSON")
+
+    def _day(self, value, default):
+        if not value:
+            return default
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"⚠️ تاريخ غير صالح: {value}")
+        return day
+
+    def handle(self, *args, **options):
+        end = self._day(options['end'], timezone.localdate())
+        start = self._day(options['start'], end.replace(day=1))
+        if start > end:
+            start, end = end, start
+        try:
+            result = consolidated.report(start, end, options['station'], options['timeout'])
+        except stations.UnknownStation as exc:
+            raise CommandError(f"⚠️ محطة غير معرفة في STATIONS: {exc}")
+
+        if options['json']:
+            self.stdout.write(json.dumps(result, indent=2, ensure_ascii=False, cls=DjangoJSONEncoder))
+            return
+
+        self.stdout.write(f"📊 من {start} إلى {end}")
+        header = ('station',) + consolidated.FIELDS
+        self.stdout.write('  '.join(f"{h:>12}" for h in header))
+        for row in result['stations'] + [{'station': 'TOTAL', **result['totals']}]:
+            self.stdout.write('  '.join(f"{str(row[h]):>12}" for h in header))
+        for slug, error in result['failed']:
+            self.stdout.write(self.style.WARNING(f"⚠️ {slug}: {error}"))
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from bookings import media, tasks
+
+
+class Command(BaseCommand):
+    help = "🧹 حذف الرسائل الصوتية التي لا تشير إليها أي عملية (على دفعات)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--after', default='', help="متابعة الكنس بعد هذا المسار")
+        parser.add_argument('--batch-size', type=int, default=500, help="عدد الملفات في كل استعلام تحقق")
+        parser.add_argument('--max-files', type=int, default=None, help="أقصى عدد ملفات يُفحص في هذا التشغيل")
+        parser.add_argument('--grace', type=int, default=media.SWEEP_GRACE_SECONDS, help="لا نحذف ملفاً أحدث من هذا (ثوانٍ)")
+        parser.add_argument('--schedule', type=int, metavar='SECONDS', default=None,
+                            help="بدل التنفيذ الآن: جدولة كنس خلفي يتكرر كل SECONDS ثانية (run_workers)")
+
+    def handle(self, *args, **options):
+        if options['schedule']:
+            tasks.sweep_voice_notes.delay(unique=True, every=options['schedule'])
+            self.stdout.write(self.style.SUCCESS(f"⏰ تمت الجدولة: كل {options['schedule']} ثانية"))
+            return
+
+        started = time.perf_counter()
+        last, stats = media.sweep(
+            after=options['after'], batch_size=options['batch_size'],
+            max_files=options['max_files'], grace=options['grace'],
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ فُحص {stats['scanned']} ملف، حُذف {stats['removed']} ({stats['bytes'] / 1024:.0f} KB) في {elapsed:.2f} ثانية"
+        ))
+        if last is not None:
+            self.stdout.write(f"⏭️ للمتابعة: --after {last}")
@@ -0,0 +1,232 @@
+"""
+🎙️ تخزين الرسائل الصوتية حسب بصمة المحتوى + كنس الملفات اليتيمة.
+
+- الاسم = sha256 للمحتوى (voice_notes/ab/abcdef....mp3): نفس التسجيل المرسل مرتين
+  (إعادة الإرسال من متصفح الزبون مثلاً) يُحفظ مرة واحدة، وعدة عمليات تشير لنفس الملف.
+- الكتابة إلى ملف .part ثم os.replace: لا يرى أحد ملفاً نصف مكتوب، وطلبان بنفس
+  المحتوى في نفس اللحظة ينتهيان بنفس الملف.
+- الحذف: عند حذف عملية نحذف ملفها إن لم تعد تشير إليه عملية أخرى، والكنّاس
+  (sweep) يمر على مجلد الرسائل على دفعات ويحذف ما لا تشير إليه أي عملية.
+- المجلد مشترك بين كل المحطات (stations.py): نفس التسجيل في محطتين = ملف واحد،
+  فالمرجع يُبحث عنه في قواعد كل المحطات قبل أي حذف.
+- الحذف بشاهد (tombstone): نقل الملف إلى اسم .trash ثم إعادة الفحص (العمر
+  والمرجع)؛ حفظ تزامن مع الحذف يجد الملف جديداً فيُعاد، أو لا يجده فيكتبه من جديد.
+"""
+import hashlib
+import os
+import time
+import uuid
+import wave
+
+from django.core.files.storage import FileSystemStorage
+
+from . import metrics, stations
+
+VOICE_DIR = 'voice_notes'
+
+# ملف عمره أقل من هذا لا يُكنس (عملية قيد الحفظ لم تُثبت بعد)
+SWEEP_GRACE_SECONDS = 3600
+
+# عدد الملفات في كل مهمة كنس خلفية (المهمة التالية تكمل من آخر مسار)
+SWEEP_FILES_PER_TASK = 5000
+
+# أقصى مدة نقبلها من المتصفح (ثوانٍ)
+MAX_DURATION = 15 * 60
+
+# ملفات مؤقتة (كتابة لم تكتمل / حذف لم يكتمل): لا تشير إليها أي عملية
+_TEMPORARY = ('.part', '.trash')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """ الاسم مشتق من المحتوى: إن وُجد الملف فهو نفس المحتوى ولا داعي لكتابته """
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        if self.exists(name):
+            # نجدد وقت التعديل: الكنّاس لا يحذف ملفاً أُعيد استعماله للتو
+            try:
+                os.utime(self.path(name))
+                return name
+            except FileNotFoundError:
+                pass  # الكنّاس نقله بين exists و utime: نكتبه من جديد
+        partial = super()._save(f"{name}.{uuid.uuid4().hex}.part", content)
+        os.replace(self.path(partial), self.path(name))
+        return name
+
+
+_voice_storage = ContentAddressedStorage()
+
+
+def voice_storage():
+    return _voice_storage
+
+
+def content_hash(file):
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def voice_upload_to(instance, filename):
+    ext = os.path.splitext(filename)[1].lower()[:8] or '.bin'
+    digest = content_hash(instance.voice_audio)
+    return f"{VOICE_DIR}/{digest[:2]}/{digest}{ext}"
+
+
+# =========================================================
+# ⏱️ المدة
+# =========================================================
+# معدلات البت لـ MPEG-1 Layer III (kbps) حسب رأس الإطار
+_MP3_BITRATES = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320)
+
+
+def _probe(file, size):
+    """ تقدير من الملف نفسه: WAV بدقة، MP3 من أول إطار (CBR). غير ذلك None """
+    file.seek(0)
+    head = file.read(4096)
+    file.seek(0)
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+        try:
+            with wave.open(file) as w:
+                return w.getnframes() / float(w.getframerate())
+        except (wave.Error, EOFError, ZeroDivisionError):
+            return None
+        finally:
+            file.seek(0)
+    # وسم ID3 في البداية: حجمه مرمز بـ 7 بتات لكل بايت
+    start = 0
+    if head[:3] == b'ID3' and len(head) >= 10:
+        start = 10 + ((head[6] & 0x7f) << 21 | (head[7] & 0x7f) << 14 | (head[8] & 0x7f) << 7 | (head[9] & 0x7f))
+    file.seek(start)
+    frame = file.read(4)
+    file.seek(0)
+    if len(frame) == 4 and frame[0] == 0xFF and (frame[1] & 0xFE) == 0xFA:
+        index = frame[2] >> 4
+        if 0 < index < len(_MP3_BITRATES):
+            return (size - start) * 8 / (_MP3_BITRATES[index] * 1000)
+    return None
+
+
+def describe(file, client_duration=None):
+    """ (الحجم بالبايت، المدة بالثواني أو None) لملف مرفوع """
+    size = file.size
+    duration = None
+    try:
+        duration = float(client_duration)
+    except (TypeError, ValueError):
+        pass
+    if duration is None or not 0 < duration <= MAX_DURATION:
+        duration = _probe(file, size)
+    return size, round(duration, 2) if duration else None
+
+
+# =========================================================
+# 🧹 الكنس
+# =========================================================
+def _referenced(names):
+    """ المسارات التي تشير إليها عملية في أي محطة (استعلام واحد لكل قاعدة) """
+    from .models import Job
+    found = set()
+    if not names:
+        return found
+    for alias in dict.fromkeys(stations.db_alias(slug) for slug in stations.slugs()):
+        found.update(Job.objects.using(alias).filter(voice_audio__in=names).values_list('voice_audio', flat=True))
+    return found
+
+
+def _is_fresh(name, grace):
+    try:
+        return os.path.getmtime(_voice_storage.path(name)) > time.time() - grace
+    except FileNotFoundError:
+        return True  # غير موجود أصلاً: لا شيء نحذفه
+
+
+def _remove(names, reason, grace):
+    """
+    ينقل الملفات إلى شواهد ثم يعيد الفحص (استعلام مراجع واحد للدفعة)، ويحذف ما بقي
+    قديماً وبلا مرجع. يرجع {المسار: الحجم المحذوف}.
+    النقل ذري: حفظ لاحق لا يجد الملف فيكتبه، وحفظ سابق جدد وقته فيظهر في فحص الشاهد.
+    """
+    moved = {}
+    for name in names:
+        path = _voice_storage.path(name)
+        tombstone = f"{path}.{uuid.uuid4().hex}.trash"
+        try:
+            os.rename(path, tombstone)
+        except FileNotFoundError:
+            continue
+        moved[name] = (path, tombstone, os.stat(tombstone))
+
+    keep = _referenced([n for n in moved if not n.endswith(_TEMPORARY)])
+    removed = {}
+    for name, (path, tombstone, stat) in moved.items():
+        if name in keep or stat.st_mtime > time.time() - grace:
+            # أُعيد استعماله أثناء الفحص: نرجعه (إن كُتب من جديد فهو نفس المحتوى)
+            os.replace(tombstone, path)
+            continue
+        os.remove(tombstone)
+        removed[name] = stat.st_size
+        metrics.inc('bookings_voice_files_removed_total', reason=reason)
+        metrics.inc('bookings_voice_bytes_removed_total', stat.st_size, reason=reason)
+    return removed
+
+
+def release(name, grace=60):
+    """ بعد حذف عملية: نحذف ملفها إن لم تعد تشير إليه عملية أخرى. يرجع True إن حُذف """
+    if not name or _is_fresh(name, grace) or _referenced([name]):
+        return False
+    return bool(_remove([name], 'released', grace))
+
+
+def _walk(after='', rel=VOICE_DIR):
+    """
+    كل الملفات تحت مجلد الرسائل بترتيب ثابت (مقارنة أجزاء المسار)، بعد المسار after.
+    المجلدات التي تقع كلها قبل after لا تُفتح أصلاً.
+    """
+    position = tuple(after.split('/')) if after else ()
+    try:
+        entries = sorted(os.scandir(_voice_storage.path(rel)), key=lambda e: e.name)
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        name = f"{rel}/{entry.name}"
+        parts = tuple(name.split('/'))
+        if entry.is_dir(follow_symlinks=False):
+            if parts >= position[:len(parts)]:
+                yield from _walk(after, name)
+        elif parts > position:
+            yield name
+
+
+def sweep(after='', batch_size=500, max_files=None, grace=SWEEP_GRACE_SECONDS):
+    """
+    يحذف الملفات التي لا تشير إليها أي عملية (استعلام واحد لكل دفعة).
+    يرجع (آخر مسار فُحص أو None إن انتهت الشجرة، {'scanned', 'removed', 'bytes'}).
+    """
+    stats = {'scanned': 0, 'removed': 0, 'bytes': 0}
+    batch, last = [], None
+
+    def flush():
+        keep = _referenced([n for n in batch if not n.endswith(_TEMPORARY)])
+        candidates = [n for n in batch if n not in keep and not _is_fresh(n, grace)]
+        removed = _remove(candidates, 'orphan', grace)
+        stats['removed'] += len(removed)
+        stats['bytes'] += sum(removed.values())
+        batch.clear()
+
+    for name in _walk(after):
+        # التحقق قبل الإضافة: لا نتجاوز الحد في منتصف دفعة
+        if max_files is not None and stats['scanned'] >= max_files:
+            flush()
+            return last, stats
+        batch.append(name)
+        stats['scanned'] += 1
+        last = name
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    return None, stats
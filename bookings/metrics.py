@@ -0,0 +1,233 @@
+"""
+📈 عدادات المراقبة بصيغة Prometheus (نص).
+
+العدادات تعيش في ذاكرة العملية (تحديثها = قفل + جمع رقم). مع عدة عمال (gunicorn)
+ضع METRICS_DIR في الإعدادات: كل عملية تكتب نسختها هناك كل ثانية على الأكثر،
+والـ /metrics يجمع كل النسخ عند القراءة.
+الطلبات (MetricsMiddleware) وأوامر الخلفية (run_workers بعد كل مهمة وعند الخروج) تكتب
+نسختها؛ نسخ العمليات المنتهية تُحذف عند القراءة (عداداتها تبدأ من الصفر كإعادة تشغيل).
+"""
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+# حدود مدرج زمن الاستجابة (ثوانٍ)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    'bookings_requests_total': ('counter', "Requests served, by URL name, method and status."),
+    'bookings_request_duration_seconds': ('histogram', "Request latency by URL name."),
+    'bookings_db_queries_total': ('counter', "Database queries executed, by URL name."),
+    'bookings_db_query_seconds_total': ('counter', "Time spent in database queries, by URL name."),
+    'bookings_jobs_total': ('counter', "Job lifecycle events (created/completed/canceled) by source."),
+    'bookings_sqlite_writes_total': ('counter', "Writes executed through the single-writer coordinator."),
+    'bookings_sqlite_lock_waits_total': ('counter', "Writes that waited more than 1ms for the writer lock."),
+    'bookings_sqlite_lock_wait_seconds_total': ('counter', "Total time spent waiting for the writer lock."),
+    'bookings_sqlite_lock_retries_total': ('counter', "Writes retried after 'database is locked'."),
+    'bookings_sqlite_lock_failures_total': ('counter', "Writes that failed after exhausting retries."),
+    'bookings_sqlite_max_lock_wait_seconds': ('gauge', "Longest wait for the writer lock since start."),
+    'bookings_unread_notifications': ('gauge', "Unread notifications backlog."),
+    'bookings_task_queue_depth': ('gauge', "Background tasks by status."),
+    'bookings_task_oldest_due_seconds': ('gauge', "Age of the oldest task ready to run (grows when no run_workers is running)."),
+    'bookings_notifications_removed_total': ('counter', "Notifications removed by retention, by reason."),
+    'bookings_voice_files_removed_total': ('counter', "Voice-note files deleted, by reason (released/orphan)."),
+    'bookings_voice_bytes_removed_total': ('counter', "Bytes freed by deleting voice-note files, by reason."),
+    'bookings_outbox_messages_total': ('counter', "Customer messages dispatched, by result (sent/retry/failed)."),
+    'bookings_outbox_depth': ('gauge', "Customer messages waiting in the outbox, by status."),
+    'bookings_cache_requests_total': ('counter', "Two-tier cache lookups, by cached value name and result (l1_hit/l2_hit/miss/bypass)."),
+    'bookings_rate_limited_total': ('counter', "Requests rejected with 429, by URL name and reason (rate/concurrency/connections)."),
+    'bookings_queue_board_builds_total': ('counter', "Queue board snapshots rebuilt from the database."),
+    'bookings_projection_lag_events': ('gauge', "Job events not yet applied, by projection."),
+}
+
+_lock = threading.Lock()
+_counters = defaultdict(float)   # (name, labels) -> value
+_histograms = {}                 # (name, labels) -> [buckets..., sum, count]
+_last_flush = [0.0]
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name, amount=1, **labels):
+    """ زيادة عداد """
+    with _lock:
+        _counters[_key(name, labels)] += amount
+
+
+def observe(name, value, buckets=LATENCY_BUCKETS, **labels):
+    """ تسجيل قيمة في مدرج (histogram) """
+    key = _key(name, labels)
+    with _lock:
+        data = _histograms.get(key)
+        if data is None:
+            data = _histograms[key] = [0] * len(buckets) + [0.0, 0]
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                data[i] += 1
+        data[-2] += value
+        data[-1] += 1
+
+
+# =========================================================
+# 🔄 الجمع بين عدة عمليات (اختياري)
+# =========================================================
+def _local_snapshot():
+    from .writes import stats_snapshot
+
+    with _lock:
+        counters = [[n, list(l), v] for (n, l), v in _counters.items()]
+        histograms = [[n, list(l), list(d)] for (n, l), d in _histograms.items()]
+
+    w = stats_snapshot()
+    counters += [
+        ['bookings_sqlite_writes_total', [], w['writes']],
+        ['bookings_sqlite_lock_waits_total', [], w['lock_waits']],
+        ['bookings_sqlite_lock_wait_seconds_total', [], w['lock_wait_seconds']],
+        ['bookings_sqlite_lock_retries_total', [], w['retries']],
+        ['bookings_sqlite_lock_failures_total', [], w['failures']],
+    ]
+    gauges = [['bookings_sqlite_max_lock_wait_seconds', [], w['max_lock_wait_seconds']]]
+    return {'counters': counters, 'histograms': histograms, 'max_gauges': gauges}
+
+
+def maybe_flush(force=False):
+    """ يكتب نسخة هذه العملية في METRICS_DIR (مرة في الثانية على الأكثر، أو الآن مع force) """
+    directory = getattr(settings, 'METRICS_DIR', None)
+    now = time.monotonic()
+    if not directory or (not force and now - _last_flush[0] < 1.0):
+        return
+    _last_flush[0] = now
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{os.getpid()}.json")
+    with open(f"{path}.tmp", 'w') as f:
+        json.dump(_local_snapshot(), f)
+    os.replace(f"{path}.tmp", path)
+
+
+def _alive(pid):
+    """ هل العملية ما زالت تعمل؟ (ويندوز: os.kill يُنهي العملية، فنفترض نعم) """
+    if os.name == 'nt':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # تعمل تحت مستخدم آخر
+        return True
+    return True
+
+
+def _merged_snapshots():
+    directory = getattr(settings, 'METRICS_DIR', None)
+    snapshots = {os.getpid(): _local_snapshot()}
+    if directory and os.path.isdir(directory):
+        for filename in os.listdir(directory):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                pid = int(filename.split('.')[0])
+            except ValueError:  # ملف غريب في المجلد المشترك
+                continue
+            if pid == os.getpid():
+                continue
+            if not _alive(pid):
+                # عملية منتهية: لا نجمع نسختها القديمة للأبد
+                try:
+                    os.remove(os.path.join(directory, filename))
+                except OSError:
+                    pass
+                continue
+            try:
+                with open(os.path.join(directory, filename)) as f:
+                    snapshots[pid] = json.load(f)
+            except (OSError, ValueError):
+                continue
+
+    counters, histograms, gauges = defaultdict(float), {}, {}
+    for snap in snapshots.values():
+        for name, labels, value in snap['counters']:
+            counters[(name, tuple(map(tuple, labels)))] += value
+        for name, labels, data in snap['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            if key in histograms:
+                histograms[key] = [a + b for a, b in zip(histograms[key], data)]
+            else:
+                histograms[key] = list(data)
+        for name, labels, value in snap['max_gauges']:
+            key = (name, tuple(map(tuple, labels)))
+            gauges[key] = max(gauges.get(key, 0), value)
+    return counters, histograms, gauges
+
+
+# =========================================================
+# 📤 الإخراج بصيغة Prometheus
+# =========================================================
+def _fmt_labels(labels):
+    if not labels:
+        return ''
+    body = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in labels)
+    return '{' + body + '}'
+
+
+def _collect_gauges():
+    """ قيم تُحسب لحظة القراءة فقط (استعلامات صغيرة) """
+    from django.db.models import Count
+    from .models import Notification, OutboundMessage, Task
+    from .projections import lag
+    from .taskqueue import oldest_due_seconds
+
+    gauges = {('bookings_unread_notifications', ()): Notification.objects.filter(is_read=False).count()}
+    for status in ('queued', 'running', 'failed'):
+        gauges[('bookings_task_queue_depth', (('status', status),))] = 0
+    for row in Task.objects.exclude(status='done').values('status').annotate(n=Count('id')):
+        gauges[('bookings_task_queue_depth', (('status', row['status']),))] = row['n']
+    gauges[('bookings_task_oldest_due_seconds', ())] = oldest_due_seconds()
+    for status in ('queued', 'sending', 'failed'):
+        gauges[('bookings_outbox_depth', (('status', status),))] = 0
+    for row in OutboundMessage.objects.exclude(status='sent').values('status').annotate(n=Count('id')):
+        gauges[('bookings_outbox_depth', (('status', row['status']),))] = row['n']
+    for name, behind in lag().items():
+        gauges[('bookings_projection_lag_events', (('projection', name),))] = behind
+    return gauges
+
+
+def render():
+    counters, histograms, gauges = _merged_snapshots()
+    gauges.update(_collect_gauges())
+
+    series = defaultdict(list)
+    for (name, labels), value in sorted(counters.items()):
+        series[name].append(f"{name}{_fmt_labels(labels)} {value:g}")
+    for (name, labels), value in sorted(gauges.items()):
+        series[name].append(f"{name}{_fmt_labels(labels)} {value:g}")
+    # المدرج: الحدود بالترتيب التصاعدي كما يتطلب Prometheus
+    for (name, labels), data in sorted(histograms.items()):
+        for bound, count in zip(LATENCY_BUCKETS, data):
+            series[name].append(f"{name}_bucket{_fmt_labels(labels + (('le', f'{bound:g}'),))} {count}")
+        series[name].append(f"{name}_bucket{_fmt_labels(labels + (('le', '+Inf'),))} {data[-1]}")
+        series[name].append(f"{name}_sum{_fmt_labels(labels)} {data[-2]:g}")
+        series[name].append(f"{name}_count{_fmt_labels(labels)} {data[-1]}")
+
+    lines = []
+    for name in sorted(series):
+        kind, help_text = HELP.get(name, ('untyped', name))
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(series[name])
+    return '\n'.join(lines) + '\n'
+
+
+def authorized(request):
+    """ /metrics: مفتاح Bearer (METRICS_TOKEN) أو عنوان في METRICS_ALLOWED_IPS أو مستخدم إداري، والباقي مرفوض """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token and request.headers.get('Authorization') == f"Bearer {token}":
+        return True
+    if request.META.get('REMOTE_ADDR') in getattr(settings, 'METRICS_ALLOWED_IPS', ()):
+        return True
+    return request.user.is_authenticated and request.user.is_staff
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0002_job_system_mode'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OccupancyMatrix',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=40, unique=True, verbose_name='النطاق')),
+                ('counts', models.BinaryField(verbose_name='عدد العمليات')),
+                ('revenue', models.BinaryField(verbose_name='الإيراد')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='آخر تحديث')),
+            ],
+            options={
+                'verbose_name': 'خريطة الضغط',
+                'verbose_name_plural': '🔥 خرائط الضغط (ساعة × يوم)',
+            },
+        ),
+    ]
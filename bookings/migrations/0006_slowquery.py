@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0005_job_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=16, unique=True, verbose_name='البصمة')),
+                ('sql', models.TextField(verbose_name='الاستعلام (بدون قيم)')),
+                ('sample_sql', models.TextField(blank=True, default='', verbose_name='آخر مثال')),
+                ('calls', models.PositiveIntegerField(default=0, verbose_name='عدد المرات')),
+                ('total_ms', models.FloatField(default=0, verbose_name='المجموع (ms)')),
+                ('max_ms', models.FloatField(default=0, verbose_name='الأسوأ (ms)')),
+                ('last_view', models.CharField(blank=True, default='', max_length=150, verbose_name='آخر صفحة')),
+                ('last_stack', models.TextField(blank=True, default='', verbose_name='مكان الاستدعاء')),
+                ('plan', models.TextField(blank=True, default='', verbose_name='خطة التنفيذ')),
+                ('first_seen', models.DateTimeField(auto_now_add=True, verbose_name='أول ظهور')),
+                ('last_seen', models.DateTimeField(auto_now=True, db_index=True, verbose_name='آخر ظهور')),
+            ],
+            options={
+                'verbose_name': 'استعلام بطيء',
+                'verbose_name_plural': '🐢 الاستعلامات البطيئة',
+                'ordering': ['-total_ms'],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0006_slowquery'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=500, verbose_name='الرابط')),
+                ('view', models.CharField(blank=True, default='', max_length=150, verbose_name='الصفحة')),
+                ('method', models.CharField(max_length=10, verbose_name='الطريقة')),
+                ('status_code', models.PositiveSmallIntegerField(default=200, verbose_name='الحالة')),
+                ('duration_ms', models.FloatField(default=0, verbose_name='المدة (ms)')),
+                ('query_count', models.PositiveIntegerField(default=0, verbose_name='عدد الاستعلامات')),
+                ('samples', models.PositiveIntegerField(default=0, verbose_name='عدد العينات')),
+                ('top_functions', models.TextField(blank=True, default='', verbose_name='أهم الدوال')),
+                ('collapsed_stacks', models.TextField(blank=True, default='', verbose_name='المكدسات المضغوطة')),
+                ('pstats_data', models.BinaryField(blank=True, default=b'', verbose_name='ملف pstats')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='التاريخ')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='المستخدم')),
+            ],
+            options={
+                'verbose_name': 'قياس أداء',
+                'verbose_name_plural': '🔬 قياسات الأداء (Profiles)',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:30
+
+from decimal import Decimal
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+
+def _money(value):
+    return str(Decimal(value or 0).quantize(Decimal('0.01')))
+
+
+def backfill_created_events(apps, schema_editor):
+    # العمليات الموجودة تحصل على حدث إنشاء بحالتها الحالية، فتبدأ الإسقاطات من سجل كامل.
+    # نسخة مجمدة من events.backfill/state: الهجرة لا تتبع تغييرات الكود الحي.
+    Job = apps.get_model('bookings', 'Job')
+    JobEvent = apps.get_model('bookings', 'JobEvent')
+    alias = schema_editor.connection.alias
+    missing = list(
+        Job.objects.using(alias)
+        .filter(~Exists(JobEvent.objects.using(alias).filter(job_id=OuterRef('pk'))))
+        .order_by('id').values_list('id', flat=True)
+    )
+    for start in range(0, len(missing), 500):
+        jobs = Job.objects.using(alias).filter(id__in=missing[start:start + 500]).order_by('id')
+        events = []
+        for job in jobs:
+            phone = (job.phone or '').strip()
+            events.append(JobEvent(job_id=job.pk, kind='created', before=None, at=job.created_at, after={
+                'status': job.status,
+                'worker': job.worker_id,
+                'service': job.service_id,
+                'price': _money(job.final_price),
+                'commission': _money(job.final_commission),
+                'mode': job.system_mode,
+                'day': django.utils.timezone.localdate(job.created_at).isoformat(),
+                'phone': phone if phone not in ('', '-') else None,
+            }))
+        JobEvent.objects.using(alias).bulk_create(events)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0007_requestprofile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectionCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=40, unique=True, verbose_name='الإسقاط')),
+                ('position', models.BigIntegerField(default=0, verbose_name='آخر حدث معالج')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='آخر تحديث')),
+            ],
+            options={
+                'verbose_name': 'مؤشر إسقاط',
+                'verbose_name_plural': '📍 مؤشرات الإسقاطات',
+            },
+        ),
+        migrations.CreateModel(
+            name='JobEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('created', '🆕 إنشاء'), ('assigned', '👨\u200d🔧 تعيين عامل'), ('started', '🧼 بدء العمل'), ('completed', '✅ إكمال'), ('canceled', '❌ إلغاء'), ('reopened', '↩️ إعادة فتح'), ('repriced', '💲 تغيير السعر/الخدمة'), ('deleted', '🗑️ حذف')], max_length=12, verbose_name='الحدث')),
+                ('before', models.JSONField(blank=True, null=True, verbose_name='قبل')),
+                ('after', models.JSONField(blank=True, null=True, verbose_name='بعد')),
+                ('at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='الوقت')),
+                ('job', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='events', to='bookings.job', verbose_name='العملية')),
+            ],
+            options={
+                'verbose_name': 'حدث عملية',
+                'verbose_name_plural': '📜 سجل أحداث العمليات',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProjectionRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('projection', models.CharField(max_length=40, verbose_name='الإسقاط')),
+                ('key', models.CharField(max_length=100, verbose_name='المفتاح')),
+                ('data', models.JSONField(default=dict, verbose_name='القيم')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='آخر تحديث')),
+            ],
+            options={
+                'verbose_name': 'سطر إسقاط',
+                'verbose_name_plural': '📊 العروض المشتقة (الإسقاطات)',
+                'unique_together': {('projection', 'key')},
+            },
+        ),
+        migrations.RunPython(backfill_created_events, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:31
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0008_jobevent_projections'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=40, verbose_name='الجدول')),
+                ('object_id', models.BigIntegerField(verbose_name='المعرف')),
+                ('deleted_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='وقت الحذف')),
+            ],
+            options={
+                'verbose_name': 'سطر محذوف',
+                'verbose_name_plural': '🪦 الأسطر المحذوفة (للمزامنة)',
+            },
+        ),
+        migrations.AddField(
+            model_name='advance',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='آخر تعديل'),
+        ),
+        migrations.AddField(
+            model_name='attendance',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='آخر تعديل'),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='آخر تعديل'),
+        ),
+        migrations.AddField(
+            model_name='workerprofile',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='آخر تعديل'),
+        ),
+    ]
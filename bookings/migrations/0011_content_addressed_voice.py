@@ -0,0 +1,42 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:36
+
+import bookings.media
+import os
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def record_existing_sizes(apps, schema_editor):
+    # الملفات القديمة تبقى في مساراتها (voice_notes/%Y/%m/)؛ نسجل حجمها فقط
+    Job = apps.get_model('bookings', 'Job')
+    for job in Job.objects.exclude(voice_audio='').exclude(voice_audio__isnull=True).filter(voice_size__isnull=True).only('id', 'voice_audio'):
+        path = os.path.join(settings.MEDIA_ROOT, job.voice_audio.name)
+        if os.path.exists(path):
+            Job.objects.filter(id=job.id).update(voice_size=os.path.getsize(path))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0010_notification_retention_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='voice_duration',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='مدة التسجيل (ثانية)'),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='voice_size',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='حجم التسجيل (بايت)'),
+        ),
+        migrations.AlterField(
+            model_name='job',
+            name='voice_audio',
+            field=models.FileField(blank=True, null=True, storage=bookings.media.voice_storage, upload_to=bookings.media.voice_upload_to, verbose_name='تسجيل صوتي 🎙️'),
+        ),
+        migrations.RunPython(record_existing_sizes, migrations.RunPython.noop),
+    ]
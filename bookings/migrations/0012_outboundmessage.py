@@ -0,0 +1,40 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:38
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0011_content_addressed_voice'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboundMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=30, verbose_name='النوع')),
+                ('phone', models.CharField(max_length=20, verbose_name='الهاتف')),
+                ('body', models.TextField(verbose_name='النص')),
+                ('dedupe_key', models.CharField(max_length=100, unique=True, verbose_name='مفتاح عدم التكرار')),
+                ('status', models.CharField(choices=[('queued', '⏳ في الانتظار'), ('sending', '📤 قيد الإرسال'), ('sent', '✅ أُرسلت'), ('failed', '❌ فشلت')], default='queued', max_length=10, verbose_name='الحالة')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='المحاولات')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='المحاولة التالية')),
+                ('locked_until', models.DateTimeField(blank=True, null=True, verbose_name='محجوزة حتى')),
+                ('gateway_id', models.CharField(blank=True, default='', max_length=100, verbose_name='معرف البوابة')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='آخر خطأ')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='وقت الإنشاء')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='وقت الإرسال')),
+                ('job', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='bookings.job', verbose_name='العملية')),
+            ],
+            options={
+                'verbose_name': 'رسالة للزبون',
+                'verbose_name_plural': '📨 رسائل الزبائن (Outbox)',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='bookings_ou_status_072caa_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0012_outboundmessage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='slot_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='موعد الحجز'),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='slot_count',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='الفترات المحجوزة'),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='duration_minutes',
+            field=models.PositiveSmallIntegerField(default=30, verbose_name='مدة الخدمة (دقيقة)'),
+        ),
+        migrations.CreateModel(
+            name='BookingSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='اليوم')),
+                ('start', models.TimeField(verbose_name='البداية')),
+                ('capacity', models.PositiveSmallIntegerField(default=0, verbose_name='السعة')),
+                ('reserved', models.PositiveSmallIntegerField(default=0, verbose_name='المحجوز')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='آخر تعديل')),
+            ],
+            options={
+                'verbose_name': 'فترة حجز',
+                'verbose_name_plural': '📅 مواعيد الحجز (السعة)',
+                'ordering': ['date', 'start'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'start'), name='unique_booking_slot')],
+            },
+        ),
+    ]
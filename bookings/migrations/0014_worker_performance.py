@@ -0,0 +1,46 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0013_booking_slots'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='وقت الانتهاء'),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='started_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='بداية العمل'),
+        ),
+        migrations.CreateModel(
+            name='WorkerServiceStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='عدد الغسلات')),
+                ('mean', models.FloatField(default=0, verbose_name='متوسط المدة (ثانية)')),
+                ('m2', models.FloatField(default=0, editable=False)),
+                ('min_seconds', models.FloatField(blank=True, null=True, verbose_name='أقصر مدة (ثانية)')),
+                ('max_seconds', models.FloatField(blank=True, null=True, verbose_name='أطول مدة (ثانية)')),
+                ('sketch', models.JSONField(default=dict, editable=False)),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='آخر تحديث')),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='worker_stats', to='bookings.service', verbose_name='الخدمة')),
+                ('worker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='service_stats', to=settings.AUTH_USER_MODEL, verbose_name='العامل')),
+            ],
+            options={
+                'verbose_name': 'أداء عامل',
+                'verbose_name_plural': '⏱️ أداء العمال (مدة الغسيل)',
+                'constraints': [models.UniqueConstraint(fields=('worker', 'service'), name='unique_worker_service_stats')],
+            },
+        ),
+    ]
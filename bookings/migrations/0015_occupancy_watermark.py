@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0014_worker_performance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='occupancymatrix',
+            name='through_job_id',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='محسوبة حتى العملية'),
+        ),
+    ]
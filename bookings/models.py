@@ -2,6 +2,8 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
 
+from . import media
+
 # ----------------------------------------------------
 # 📌 خيارات الموديلز (Choices)
 # ----------------------------------------------------
@@ -26,6 +28,34 @@ NOTIF_TYPE_CHOICES = [
     ('voice', '🎙️ رسالة صوتية'),
 ]
 
+# حالات المهام الخلفية
+TASK_STATUS_CHOICES = [
+    ('queued', '⏳ في الانتظار'),
+    ('running', '⚙️ قيد التنفيذ'),
+    ('done', '✅ تمت'),
+    ('failed', '❌ فشلت'),
+]
+
+# حالات رسائل الزبائن (Outbox)
+OUTBOX_STATUS_CHOICES = [
+    ('queued', '⏳ في الانتظار'),
+    ('sending', '📤 قيد الإرسال'),
+    ('sent', '✅ أُرسلت'),
+    ('failed', '❌ فشلت'),
+]
+
+# أنواع أحداث العمليات (سجل الأحداث)
+JOB_EVENT_CHOICES = [
+    ('created', '🆕 إنشاء'),
+    ('assigned', '👨‍🔧 تعيين عامل'),
+    ('started', '🧼 بدء العمل'),
+    ('completed', '✅ إكمال'),
+    ('canceled', '❌ إلغاء'),
+    ('reopened', '↩️ إعادة فتح'),
+    ('repriced', '💲 تغيير السعر/الخدمة'),
+    ('deleted', '🗑️ حذف'),
+]
+
 # ----------------------------------------------------
 # 1. قائمة الخدمات والأسعار (Service)
 # ----------------------------------------------------
@@ -34,6 +64,8 @@ class Service(models.Model):
     price = models.DecimalField(max_digits=8, decimal_places=2, verbose_name="سعر الزبون")
     worker_commission = models.DecimalField(max_digits=8, decimal_places=2, verbose_name="أجر العامل")
     icon = models.CharField(max_length=50, default='🚗', verbose_name="أيقونة الخدمة")
+    # 📅 كم يشغل العامل (يحدد عدد الفترات التي يحجزها موعد الموقع - slots.py)
+    duration_minutes = models.PositiveSmallIntegerField(default=30, verbose_name="مدة الخدمة (دقيقة)")
 
     def __str__(self):
         return f"{self.name} ({self.price} د.ج)"
@@ -65,7 +97,10 @@ class Job(models.Model):
     )
     
     # الطلبات الخاصة
-    voice_audio = models.FileField(upload_to='voice_notes/%Y/%m/', blank=True, null=True, verbose_name="تسجيل صوتي 🎙️")
+    # 🎙️ الاسم = بصمة المحتوى (media.py): التسجيل المكرر يُحفظ مرة واحدة
+    voice_audio = models.FileField(upload_to=media.voice_upload_to, storage=media.voice_storage, blank=True, null=True, verbose_name="تسجيل صوتي 🎙️")
+    voice_size = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="حجم التسجيل (بايت)")
+    voice_duration = models.FloatField(null=True, blank=True, editable=False, verbose_name="مدة التسجيل (ثانية)")
     custom_desc = models.TextField(blank=True, null=True, verbose_name="وصف المشكلة/الطلب")
     
     # العامل: مطلوب
@@ -87,6 +122,20 @@ class Job(models.Model):
     # 🆕 حقل جديد: لتحديد النظام الذي سُجلت فيه العملية (راتب أم عمولة) لفصلهما تماماً
     system_mode = models.CharField(max_length=20, default='commission', editable=False, verbose_name="نظام العملية")
 
+    # 📴 مفتاح يولده جهاز الكاشير لكل إدخال: إعادة الإرسال لا تنشئ عملية ثانية
+    idempotency_key = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False, verbose_name="مفتاح عدم التكرار")
+
+    # 🔄 آخر تعديل (للمزامنة التدريجية - changes.py)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="آخر تعديل")
+
+    # 📅 موعد حجز الموقع وعدد الفترات المحجوزة له (تُحرر عند الإلغاء أو الحذف - slots.py)
+    slot_at = models.DateTimeField(null=True, blank=True, verbose_name="موعد الحجز")
+    slot_count = models.PositiveSmallIntegerField(default=0, editable=False, verbose_name="الفترات المحجوزة")
+
+    # ⏱️ بداية العمل (أول انتقال إلى "جاري العمل") وأول اكتمال: مدة الغسيل (performance.py)
+    started_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name="بداية العمل")
+    completed_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name="وقت الانتهاء")
+
     # دوال مساعدة لضمان عدم وجود أخطاء
     def get_final_price(self):
         """يحسب السعر النهائي، يرجع 0 في حالة عدم وجود خدمة."""
@@ -104,6 +153,17 @@ class Job(models.Model):
         # إذا كان النظام 'salary' أو غير ذلك، العمولة صفر
         return 0
 
+    # الحقول التي يتتبعها سجل الأحداث (events.py) لمعرفة ما تغير عند الحفظ
+    TRACKED_FIELDS = ('status', 'worker_id', 'service_id', 'final_price', 'final_commission')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # 📌 نحفظ الحالة كما قُرئت من القاعدة لمعرفة الانتقالات عند الحفظ (مكتملة/ملغاة)
+        instance._loaded_status = instance.__dict__.get('status')
+        instance._loaded_values = {f: instance.__dict__.get(f) for f in cls.TRACKED_FIELDS}
+        return instance
+
     def save(self, *args, **kwargs):
         is_new_record = not self.pk
         
@@ -117,6 +177,18 @@ class Job(models.Model):
             except:
                 self.system_mode = 'commission'
 
+        # ⏱️ انتقالات الحالة: نحفظ أول بداية وأول اكتمال فقط (التصحيح لاحقاً لا يغير المدة)
+        self._just_completed = False
+        if self.status == 'processing' and self.started_at is None:
+            self.started_at = self.created_at if is_new_record else timezone.now()
+        elif self.status == 'completed' and self.completed_at is None:
+            self.completed_at = timezone.now()
+            self._just_completed = True
+
+        # 🎙️ حجم ومدة التسجيل الجديد (قبل أن يُكتب على القرص)
+        if self.voice_audio and not self.voice_audio._committed:
+            self.voice_size, self.voice_duration = media.describe(self.voice_audio, self.voice_duration)
+
         # 2. منطق حساب العمولة (يحدث عند كل تعديل)
         
         # إذا كانت الحالة "ملغاة" (canceled) أو غير مكتملة -> تصفير العمولة
@@ -155,6 +227,7 @@ class Advance(models.Model):
     amount = models.DecimalField(max_digits=8, decimal_places=2, verbose_name="قيمة المصروف (د.ج)")
     date = models.DateTimeField(default=timezone.now, verbose_name="التاريخ")
     note = models.CharField(max_length=200, blank=True, null=True, verbose_name="ملاحظة / سبب")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="آخر تعديل")
 
     def __str__(self):
         return f"{self.worker} - {self.amount}"
@@ -180,6 +253,8 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ['-created_at'] # الأحدث يظهر أولاً
+        # ⚡ عدّاد غير المقروءة وآخر 5 منها + التنظيف حسب العمر: من الفهرس مباشرة
+        indexes = [models.Index(fields=['is_read', 'created_at'])]
         verbose_name = "إشعار"
         verbose_name_plural = "5. سجل التنبيهات 🔔"
 
@@ -210,6 +285,7 @@ class StationSettings(models.Model):
 class WorkerProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile', verbose_name="العامل")
     daily_salary = models.DecimalField(max_digits=8, decimal_places=2, default=1000.00, verbose_name="الراتب اليومي (د.ج)")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="آخر تعديل")
 
     def __str__(self):
         return f"{self.user.username} ({self.daily_salary} د.ج)"
@@ -226,6 +302,7 @@ class Attendance(models.Model):
     
     # نحفظ قيمة الراتب في ذلك اليوم (snapshot)
     day_salary_snapshot = models.DecimalField(max_digits=8, decimal_places=2, default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="آخر تعديل")
 
     def save(self, *args, **kwargs):
         # 1. جلب الراتب الحالي وتخزينه كـ Snapshot
@@ -246,4 +323,303 @@ class Attendance(models.Model):
     class Meta:
         unique_together = ('worker', 'date') # يمنع تسجيل حضور مرتين في نفس اليوم
         verbose_name = "سجل حضور"
-        verbose_name_plural = "📅 سجل الحضور والغياب"
\ No newline at end of file
+        verbose_name_plural = "📅 سجل الحضور والغياب"
+
+# =========================================================
+# 👇👇👇 خريطة الضغط (ساعة × يوم) - Heatmap 👇👇👇
+# =========================================================
+
+# 9. مصفوفة الإشغال المحسوبة مسبقاً (OccupancyMatrix)
+class OccupancyMatrix(models.Model):
+    """
+    مصفوفة 7×24 (يوم الأسبوع × الساعة) محفوظة كبايتات مضغوطة.
+    النطاق: 'all' أو 'service:<id>' أو 'worker:<id>'.
+    """
+    scope = models.CharField(max_length=40, unique=True, verbose_name="النطاق")
+    counts = models.BinaryField(verbose_name="عدد العمليات")    # int32 × 168
+    revenue = models.BinaryField(verbose_name="الإيراد")        # float64 × 168
+    # آخر عملية دخلت في إعادة البناء: العمليات حتى هذا الرقم محسوبة، فلا يضيفها التحديث التدريجي مرة ثانية
+    through_job_id = models.PositiveBigIntegerField(default=0, verbose_name="محسوبة حتى العملية")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="آخر تحديث")
+
+    def __str__(self):
+        return f"🔥 {self.scope}"
+
+    class Meta:
+        verbose_name = "خريطة الضغط"
+        verbose_name_plural = "🔥 خرائط الضغط (ساعة × يوم)"
+
+
+# =========================================================
+# 👇👇👇 المهام الخلفية (Task Queue) 👇👇👇
+# =========================================================
+
+# 10. طابور المهام (Task)
+class Task(models.Model):
+    """
+    مهمة خلفية محفوظة في قاعدة البيانات.
+    العامل (run_workers) يحجز المهمة لمدة محددة (locked_until)؛ إذا توقف العامل
+    تنتهي المدة وتعود المهمة متاحة لعامل آخر.
+    """
+    name = models.CharField(max_length=100, db_index=True, verbose_name="اسم المهمة")
+    payload = models.JSONField(default=dict, blank=True, verbose_name="البيانات")
+    status = models.CharField(max_length=10, choices=TASK_STATUS_CHOICES, default='queued', verbose_name="الحالة")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="المحاولات")
+    max_attempts = models.PositiveIntegerField(default=5, verbose_name="أقصى عدد محاولات")
+    run_after = models.DateTimeField(default=timezone.now, verbose_name="التنفيذ بعد")
+    locked_until = models.DateTimeField(null=True, blank=True, verbose_name="محجوزة حتى")
+    locked_by = models.CharField(max_length=100, blank=True, default='', verbose_name="العامل المنفذ")
+    last_error = models.TextField(blank=True, default='', verbose_name="آخر خطأ")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="وقت الإنشاء")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="وقت الانتهاء")
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['status', 'run_after'])]
+        verbose_name = "مهمة خلفية"
+        verbose_name_plural = "⚙️ المهام الخلفية"
+
+
+# =========================================================
+# 👇👇👇 سجل الاستعلامات البطيئة (Slow Query Log) 👇👇👇
+# =========================================================
+
+# 11. استعلام بطيء مجمع حسب البصمة (SlowQuery)
+class SlowQuery(models.Model):
+    """
+    كل صف = شكل استعلام واحد (بعد حذف القيم)، مع عدد مرات البطء وأسوأ زمن
+    وآخر خطة تنفيذ (EXPLAIN QUERY PLAN) ومكان الاستدعاء في الكود.
+    """
+    fingerprint = models.CharField(max_length=16, unique=True, verbose_name="البصمة")
+    sql = models.TextField(verbose_name="الاستعلام (بدون قيم)")
+    sample_sql = models.TextField(blank=True, default='', verbose_name="آخر مثال")
+    calls = models.PositiveIntegerField(default=0, verbose_name="عدد المرات")
+    total_ms = models.FloatField(default=0, verbose_name="المجموع (ms)")
+    max_ms = models.FloatField(default=0, verbose_name="الأسوأ (ms)")
+    last_view = models.CharField(max_length=150, blank=True, default='', verbose_name="آخر صفحة")
+    last_stack = models.TextField(blank=True, default='', verbose_name="مكان الاستدعاء")
+    plan = models.TextField(blank=True, default='', verbose_name="خطة التنفيذ")
+    first_seen = models.DateTimeField(auto_now_add=True, verbose_name="أول ظهور")
+    last_seen = models.DateTimeField(auto_now=True, db_index=True, verbose_name="آخر ظهور")
+
+    def __str__(self):
+        return f"{self.fingerprint} ({self.calls}×)"
+
+    class Meta:
+        ordering = ['-total_ms']
+        verbose_name = "استعلام بطيء"
+        verbose_name_plural = "🐢 الاستعلامات البطيئة"
+
+
+# =========================================================
+# 👇👇👇 البروفايلر عند الطلب (?profile=1) 👇👇👇
+# =========================================================
+
+# 12. قياس أداء طلب واحد (RequestProfile)
+class RequestProfile(models.Model):
+    """
+    نتيجة ?profile=1 لطلب واحد: أهم الدوال (cProfile) + مكدسات مضغوطة
+    (collapsed stacks) جاهزة لـ flamegraph.pl / speedscope + الملف الخام (.prof).
+    """
+    path = models.CharField(max_length=500, verbose_name="الرابط")
+    view = models.CharField(max_length=150, blank=True, default='', verbose_name="الصفحة")
+    method = models.CharField(max_length=10, verbose_name="الطريقة")
+    status_code = models.PositiveSmallIntegerField(default=200, verbose_name="الحالة")
+    duration_ms = models.FloatField(default=0, verbose_name="المدة (ms)")
+    query_count = models.PositiveIntegerField(default=0, verbose_name="عدد الاستعلامات")
+    samples = models.PositiveIntegerField(default=0, verbose_name="عدد العينات")
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="المستخدم")
+    top_functions = models.TextField(blank=True, default='', verbose_name="أهم الدوال")
+    collapsed_stacks = models.TextField(blank=True, default='', verbose_name="المكدسات المضغوطة")
+    pstats_data = models.BinaryField(blank=True, default=b'', verbose_name="ملف pstats")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="التاريخ")
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f}ms)"
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "قياس أداء"
+        verbose_name_plural = "🔬 قياسات الأداء (Profiles)"
+
+
+# =========================================================
+# 👇👇👇 سجل أحداث العمليات + الإسقاطات (Event Log) 👇👇👇
+# =========================================================
+
+# 13. حدث على عملية (JobEvent) - إضافة فقط
+class JobEvent(models.Model):
+    """
+    كل تغيير على عملية = سطر جديد، لا يُعدل ولا يُحذف.
+    before/after: لقطة الحقول المؤثرة في الأرقام قبل الحدث وبعده، فالإسقاطات
+    تطرح أثر before وتضيف أثر after دون الرجوع إلى جدول العمليات.
+    """
+    # بدون قيد: الحدث يبقى بعد حذف العملية
+    job = models.ForeignKey(Job, on_delete=models.DO_NOTHING, db_constraint=False, related_name='events', verbose_name="العملية")
+    kind = models.CharField(max_length=12, choices=JOB_EVENT_CHOICES, verbose_name="الحدث")
+    before = models.JSONField(null=True, blank=True, verbose_name="قبل")
+    after = models.JSONField(null=True, blank=True, verbose_name="بعد")
+    at = models.DateTimeField(default=timezone.now, verbose_name="الوقت")
+
+    def save(self, *args, **kwargs):
+        if self.pk:
+            raise ValueError("سجل الأحداث للإضافة فقط")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("سجل الأحداث للإضافة فقط")
+
+    def __str__(self):
+        return f"#{self.job_id} {self.kind}"
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = "حدث عملية"
+        verbose_name_plural = "📜 سجل أحداث العمليات"
+
+
+# 14. موضع كل إسقاط في سجل الأحداث (ProjectionCursor)
+class ProjectionCursor(models.Model):
+    name = models.CharField(max_length=40, unique=True, verbose_name="الإسقاط")
+    position = models.BigIntegerField(default=0, verbose_name="آخر حدث معالج")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="آخر تحديث")
+
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
+
+    class Meta:
+        verbose_name = "مؤشر إسقاط"
+        verbose_name_plural = "📍 مؤشرات الإسقاطات"
+
+
+# 15. سطر في عرض مشتق (ProjectionRow)
+class ProjectionRow(models.Model):
+    """ مثال: projection='daily', key='2025-01-31:commission', data={'revenue': ..., 'jobs': ...} """
+    projection = models.CharField(max_length=40, verbose_name="الإسقاط")
+    key = models.CharField(max_length=100, verbose_name="المفتاح")
+    data = models.JSONField(default=dict, verbose_name="القيم")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="آخر تحديث")
+
+    def __str__(self):
+        return f"{self.projection}:{self.key}"
+
+    class Meta:
+        unique_together = ('projection', 'key')
+        verbose_name = "سطر إسقاط"
+        verbose_name_plural = "📊 العروض المشتقة (الإسقاطات)"
+
+
+# =========================================================
+# 👇👇👇 تغذية التغييرات للمزامنة الخارجية (Change Feed) 👇👇👇
+# =========================================================
+
+# 16. شاهد حذف (Tombstone)
+class Tombstone(models.Model):
+    """ سطر حُذف من جدول متابَع: المزامنة التدريجية تحذفه من نسختها أيضاً """
+    model = models.CharField(max_length=40, verbose_name="الجدول")
+    object_id = models.BigIntegerField(verbose_name="المعرف")
+    deleted_at = models.DateTimeField(default=timezone.now, db_index=True, verbose_name="وقت الحذف")
+
+    def __str__(self):
+        return f"🪦 {self.model}#{self.object_id}"
+
+    class Meta:
+        verbose_name = "سطر محذوف"
+        verbose_name_plural = "🪦 الأسطر المحذوفة (للمزامنة)"
+
+
+# =========================================================
+# 👇👇👇 رسائل الزبائن (Outbox) 👇👇👇
+# =========================================================
+
+# 17. رسالة للزبون تنتظر الإرسال (OutboundMessage)
+class OutboundMessage(models.Model):
+    """
+    تُكتب في نفس معاملة تغيير العملية (إكمال/تأكيد)، ويرسلها dispatch_outbox لاحقاً
+    على دفعات عبر البوابة (SMS/WhatsApp). طلب الكاشير لا ينتظر أي شبكة.
+    """
+    job = models.ForeignKey(Job, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="العملية")
+    kind = models.CharField(max_length=30, verbose_name="النوع")
+    phone = models.CharField(max_length=20, verbose_name="الهاتف")
+    body = models.TextField(verbose_name="النص")
+    # منع التكرار: نفس الحدث لنفس العملية = رسالة واحدة مهما تكرر الحفظ
+    dedupe_key = models.CharField(max_length=100, unique=True, verbose_name="مفتاح عدم التكرار")
+    status = models.CharField(max_length=10, choices=OUTBOX_STATUS_CHOICES, default='queued', verbose_name="الحالة")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="المحاولات")
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name="المحاولة التالية")
+    locked_until = models.DateTimeField(null=True, blank=True, verbose_name="محجوزة حتى")
+    gateway_id = models.CharField(max_length=100, blank=True, default='', verbose_name="معرف البوابة")
+    last_error = models.TextField(blank=True, default='', verbose_name="آخر خطأ")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="وقت الإنشاء")
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name="وقت الإرسال")
+
+    def __str__(self):
+        return f"{self.kind} → {self.phone} ({self.status})"
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+        verbose_name = "رسالة للزبون"
+        verbose_name_plural = "📨 رسائل الزبائن (Outbox)"
+
+
+# =========================================================
+# 👇👇👇 مواعيد الحجز (Booking Slots) 👇👇👇
+# =========================================================
+
+# 18. فترة حجز بسعة محدودة (BookingSlot)
+class BookingSlot(models.Model):
+    """
+    فترة واحدة (BOOKING_SLOT_MINUTES) في يوم. السعة = العمال الحاضرون (سيارة لكل عامل)،
+    و reserved عداد يُزاد بتحديث ذري واحد عند الحجز، فالتوفر لليوم = قراءة واحدة بالفهرس.
+    """
+    date = models.DateField(verbose_name="اليوم")
+    start = models.TimeField(verbose_name="البداية")
+    capacity = models.PositiveSmallIntegerField(default=0, verbose_name="السعة")
+    reserved = models.PositiveSmallIntegerField(default=0, verbose_name="المحجوز")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="آخر تعديل")
+
+    @property
+    def available(self):
+        return max(0, self.capacity - self.reserved)
+
+    def __str__(self):
+        return f"📅 {self.date} {self.start:%H:%M} ({self.reserved}/{self.capacity})"
+
+    class Meta:
+        ordering = ['date', 'start']
+        constraints = [models.UniqueConstraint(fields=['date', 'start'], name='unique_booking_slot')]
+        verbose_name = "فترة حجز"
+        verbose_name_plural = "📅 مواعيد الحجز (السعة)"
+
+# =========================================================
+# 👇👇👇 أداء العمال (مدة الغسيل) 👇👇👇
+# =========================================================
+
+# 19. إحصاءات مدة الغسيل لكل (عامل، خدمة) تُحدث عند كل اكتمال (WorkerServiceStats)
+class WorkerServiceStats(models.Model):
+    """
+    إحصاء جارٍ (Welford): العدد والمتوسط ومجموع مربعات الانحراف (m2) بالثواني،
+    و sketch = مدرج لوغاريتمي مضغوط {خانة: عدد} للنسب المئوية (الوسيط، 90%).
+    تُدمج الأسطر بلا فقدان (لوحة الترتيب، توقعات الانتظار) دون قراءة جدول العمليات.
+    """
+    worker = models.ForeignKey(User, on_delete=models.CASCADE, related_name='service_stats', verbose_name="العامل")
+    service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name='worker_stats', verbose_name="الخدمة")
+    count = models.PositiveIntegerField(default=0, verbose_name="عدد الغسلات")
+    mean = models.FloatField(default=0, verbose_name="متوسط المدة (ثانية)")
+    m2 = models.FloatField(default=0, editable=False)
+    min_seconds = models.FloatField(null=True, blank=True, verbose_name="أقصر مدة (ثانية)")
+    max_seconds = models.FloatField(null=True, blank=True, verbose_name="أطول مدة (ثانية)")
+    sketch = models.JSONField(default=dict, editable=False)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="آخر تحديث")
+
+    def __str__(self):
+        return f"⏱️ {self.worker} - {self.service} ({self.count})"
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['worker', 'service'], name='unique_worker_service_stats')]
+        verbose_name = "أداء عامل"
+        verbose_name_plural = "⏱️ أداء العمال (مدة الغسيل)"
@@ -0,0 +1,232 @@
+"""
+📨 رسائل الزبائن عبر صندوق صادر (Transactional Outbox).
+
+إكمال العملية (أو تأكيد حجز الموقع) يكتب سطر OutboundMessage في نفس معاملة الحفظ:
+إما أن تُحفظ العملية والرسالة معاً أو لا شيء. الإرسال الفعلي (SMS/WhatsApp) يتم
+لاحقاً في dispatch() خارج مسار الطلب، فضغطة الكاشير لا تنتظر أي شبكة:
+
+- الدفعات: البوابة تستقبل حتى max_batch رسالة في كل نداء.
+- حد الإرسال: OUTBOX_RATE_PER_MINUTE رسالة في الدقيقة على الأكثر.
+- إعادة المحاولة: تضاعف الانتظار (نفس منحنى المهام الخلفية) حتى OUTBOX_MAX_ATTEMPTS.
+- منع التكرار: dedupe_key فريد لكل (نوع، عملية)، ومعرف الرسالة يُمرر للبوابة
+  كمفتاح عدم تكرار إن أُعيد إرسال دفعة انتهت مدة حجزها.
+
+البوابة قابلة للتبديل (OUTBOX_GATEWAY). المرفق هنا بديلان محليان فقط:
+ConsoleGateway (السجل) و FileGateway (ملف JSON Lines) للتطوير والاختبارات.
+"""
+import json
+import logging
+import re
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Min, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import metrics
+from .models import OutboundMessage
+from .taskqueue import backoff
+from .writes import serialized_write
+
+logger = logging.getLogger(__name__)
+
+# مدة حجز الدفعة أثناء الإرسال (ثوانٍ)؛ بعدها تعود متاحة لمرسل آخر
+LEASE_SECONDS = 120
+
+TEMPLATES = {
+    'job_completed': "✅ {plate}: سيارتك جاهزة! شكراً لاختيارك TurboWash 🚿",
+    'booking_confirmed': "📅 {name}، تم تأكيد حجزك ({plate}). نحن بانتظارك في TurboWash 🚿",
+}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def normalize_phone(raw):
+    """ أرقام فقط (مع + في البداية)؛ None إن لم يكن رقماً صالحاً """
+    phone = re.sub(r'[^\d+]', '', raw or '')
+    return phone if len(re.sub(r'\D', '', phone)) >= 8 else None
+
+
+# =========================================================
+# ✍️ الكتابة (داخل معاملة حفظ العملية)
+# =========================================================
+def _kind_for(job, event):
+    if event.kind == 'completed':
+        return 'job_completed'
+    # حجز الموقع: انتقاله من الانتظار إلى العمل = تأكيده
+    if event.kind == 'started' and job.source == 'website' and (event.before or {}).get('status') == 'pending':
+        return 'booking_confirmed'
+    return None
+
+
+def enqueue_for_events(job, job_events):
+    """ رسالة لكل حدث يهم الزبون (يُستدعى من post_save بعد سجل الأحداث). يرجع عدد الرسائل """
+    phone = normalize_phone(job.phone)
+    if not phone:
+        return 0
+    messages = []
+    for event in job_events:
+        kind = _kind_for(job, event)
+        if kind:
+            messages.append(OutboundMessage(
+                job_id=job.pk, kind=kind, phone=phone,
+                body=TEMPLATES[kind].format(plate=job.car_plate, name=job.client_name),
+                dedupe_key=f"{kind}:{job.pk}",
+            ))
+    if messages:
+        # إعادة الإكمال بعد إعادة الفتح لا ترسل رسالة ثانية
+        OutboundMessage.objects.bulk_create(messages, ignore_conflicts=True)
+    return len(messages)
+
+
+# =========================================================
+# 📡 البوابات
+# =========================================================
+@dataclass
+class SendResult:
+    ok: bool
+    gateway_id: str = ''
+    error: str = ''
+    retryable: bool = True
+
+
+class Gateway:
+    """ واجهة البوابة: send_batch(messages) -> [SendResult] بنفس الترتيب """
+    max_batch = 50
+
+    def send_batch(self, messages):
+        raise NotImplementedError
+
+
+class ConsoleGateway(Gateway):
+    """ بديل محلي: يكتب الرسائل في السجل فقط """
+
+    def send_batch(self, messages):
+        for message in messages:
+            logger.info("📨 [console] %s → %s: %s", message.kind, message.phone, message.body)
+        return [SendResult(ok=True, gateway_id=f"console-{m.pk}") for m in messages]
+
+
+class FileGateway(Gateway):
+    """ بديل محلي: سطر JSON لكل رسالة في OUTBOX_FILE (للاختبارات والتجربة) """
+
+    def __init__(self, path=None):
+        self.path = str(path or _setting('OUTBOX_FILE', 'outbox.jsonl'))
+
+    def send_batch(self, messages):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for m in messages:
+                f.write(json.dumps({'id': m.pk, 'kind': m.kind, 'phone': m.phone, 'body': m.body}, ensure_ascii=False) + '\n')
+        return [SendResult(ok=True, gateway_id=f"file-{m.pk}") for m in messages]
+
+
+def get_gateway():
+    return import_string(_setting('OUTBOX_GATEWAY', 'bookings.outbox.ConsoleGateway'))()
+
+
+# =========================================================
+# 📤 الإرسال (خارج مسار الطلب)
+# =========================================================
+def _available(now):
+    return Q(status='queued', next_attempt_at__lte=now) | Q(status='sending', locked_until__lt=now)
+
+
+@serialized_write
+def _claim(limit):
+    """ يحجز أقدم الرسائل الجاهزة (أو التي انتهت مدة حجزها) ويرجعها """
+    now = timezone.now()
+    ids = list(
+        OutboundMessage.objects.filter(_available(now))
+        .order_by('next_attempt_at', 'id').values_list('id', flat=True)[:limit]
+    )
+    if not ids:
+        return []
+    lease = now + timedelta(seconds=LEASE_SECONDS)
+    OutboundMessage.objects.filter(_available(now), id__in=ids).update(status='sending', locked_until=lease)
+    return list(OutboundMessage.objects.filter(id__in=ids, status='sending', locked_until=lease).order_by('id'))
+
+
+@serialized_write
+def _record(messages, results, stats):
+    """ يسجل النتائج للرسائل التي ما زال حجزها لنا فقط (locked_until من _claim هو رمز الحجز) """
+    now = timezone.now()
+    max_attempts = _setting('OUTBOX_MAX_ATTEMPTS', 6)
+    owned = set(
+        OutboundMessage.objects.select_for_update()
+        .filter(id__in=[m.pk for m in messages], status='sending', locked_until=messages[0].locked_until)
+        .values_list('id', flat=True)
+    )
+    if len(owned) < len(messages):
+        # الإرسال تأخر حتى انتهى الحجز وأخذها مرسل آخر: نتيجته هي التي تُسجل
+        logger.warning("Outbox lease lost for %s message(s), results dropped", len(messages) - len(owned))
+    recorded = []
+    for message, result in zip(messages, results):
+        if message.pk not in owned:
+            continue
+        recorded.append(message)
+        message.attempts += 1
+        message.locked_until = None
+        if result.ok:
+            message.status, message.sent_at = 'sent', now
+            message.gateway_id, message.last_error = result.gateway_id, ''
+            outcome = 'sent'
+        elif result.retryable and message.attempts < max_attempts:
+            message.status, message.last_error = 'queued', result.error
+            message.next_attempt_at = now + timedelta(seconds=backoff(message.attempts))
+            outcome = 'retry'
+        else:
+            message.status, message.last_error = 'failed', result.error
+            outcome = 'failed'
+        stats[outcome] += 1
+        metrics.inc('bookings_outbox_messages_total', result=outcome)
+    OutboundMessage.objects.bulk_update(
+        recorded, ['status', 'attempts', 'locked_until', 'sent_at', 'gateway_id', 'last_error', 'next_attempt_at'],
+    )
+
+
+def pace_seconds(count):
+    """ أقل مدة تأخذها دفعة من count رسالة حسب OUTBOX_RATE_PER_MINUTE """
+    rate = _setting('OUTBOX_RATE_PER_MINUTE', 60)
+    return count * 60.0 / rate if rate else 0.0
+
+
+def dispatch(batch_size=None, max_batches=None, gateway=None, pace=True):
+    """
+    يرسل الرسائل الجاهزة على دفعات مع احترام حد الإرسال. يرجع {'sent', 'retry', 'failed'}
+    pace=False: لا انتظار بين الدفعات، والمنادي يؤجل الدفعة التالية بنفسه (pace_seconds).
+    """
+    gateway = gateway or get_gateway()
+    batch_size = min(batch_size or _setting('OUTBOX_BATCH_SIZE', 50), gateway.max_batch)
+    stats = {'sent': 0, 'retry': 0, 'failed': 0}
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        started = time.monotonic()
+        messages = _claim(batch_size)
+        if not messages:
+            break
+        try:
+            results = gateway.send_batch(messages)
+        except Exception as exc:
+            logger.warning("Outbox gateway %s failed: %s", type(gateway).__name__, exc)
+            results = [SendResult(ok=False, error=f"{type(exc).__name__}: {exc}") for _ in messages]
+        _record(messages, results, stats)
+        batches += 1
+        # ⏱️ دفعة من n رسالة تأخذ n / rate دقيقة على الأقل
+        if pace:
+            wait = pace_seconds(len(messages)) - (time.monotonic() - started)
+            if wait > 0:
+                time.sleep(wait)
+    return stats
+
+
+def next_retry_in():
+    """ ثوانٍ حتى أقرب رسالة مؤجلة (إعادة محاولة)، أو None """
+    due = OutboundMessage.objects.filter(status='queued').aggregate(m=Min('next_attempt_at'))['m']
+    if due is None:
+        return None
+    return max(0, (due - timezone.now()).total_seconds())
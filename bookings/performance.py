@@ -0,0 +1,218 @@
+"""
+⏱️ أداء العمال: مدة الغسيل لكل (عامل، خدمة) تُحدث عند الاكتمال فقط.
+
+- Job.save() يختم started_at (أول "جاري العمل") و completed_at (أول اكتمال).
+- عند الاكتمال (إشارة في نفس المعاملة): سطر WorkerServiceStats واحد يُحدث بخوارزمية
+  Welford (العدد، المتوسط، m2 للتباين) + مدرج لوغاريتمي مضغوط للنسب المئوية
+  (خانة كل 5%: خطأ نسبي ~2.5% مهما كثرت الغسلات، وبضع عشرات من الخانات فقط).
+- Summary تدمج الأسطر بلا فقدان (معادلة Chan للتباين + جمع المدرجات)، فلوحة الترتيب
+  وتوقع الانتظار تقرأ هذا الجدول الصغير فقط (محفوظ في الكاش) ولا تمر على العمليات.
+- المدد الشاذة (زر إنهاء مضغوط بالخطأ، أو نُسي حتى المساء) لا تدخل الإحصاء.
+"""
+import math
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import caching
+from .models import WorkerServiceStats
+
+GAMMA = 1.05
+_LOG_GAMMA = math.log(GAMMA)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# =========================================================
+# 📐 الإحصاء الجاري (Welford + مدرج لوغاريتمي)
+# =========================================================
+def _bucket(seconds):
+    return math.ceil(math.log(max(seconds, 1.0)) / _LOG_GAMMA)
+
+
+def _bucket_value(bucket):
+    # منتصف الخانة (γ^(i-1), γ^i]: الخطأ النسبي ≤ (γ-1)/(γ+1)
+    return 2 * GAMMA ** bucket / (GAMMA + 1)
+
+
+@dataclass
+class Summary:
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+    min_seconds: float = None
+    max_seconds: float = None
+    sketch: dict = field(default_factory=dict)
+
+    @classmethod
+    def of(cls, row):
+        return cls(row.count, row.mean, row.m2, row.min_seconds, row.max_seconds, dict(row.sketch))
+
+    def add(self, seconds):
+        self.count += 1
+        delta = seconds - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (seconds - self.mean)
+        self.min_seconds = seconds if self.min_seconds is None else min(self.min_seconds, seconds)
+        self.max_seconds = seconds if self.max_seconds is None else max(self.max_seconds, seconds)
+        key = str(_bucket(seconds))
+        self.sketch[key] = self.sketch.get(key, 0) + 1
+        return self
+
+    def merge(self, other):
+        if not other.count:
+            return self
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.mean += delta * other.count / total
+        self.count = total
+        self.min_seconds = other.min_seconds if self.min_seconds is None else min(self.min_seconds, other.min_seconds)
+        self.max_seconds = other.max_seconds if self.max_seconds is None else max(self.max_seconds, other.max_seconds)
+        for key, n in other.sketch.items():
+            self.sketch[key] = self.sketch.get(key, 0) + n
+        return self
+
+    @property
+    def stddev(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.sketch, key=int):
+            seen += self.sketch[key]
+            if seen > rank:
+                return min(max(_bucket_value(int(key)), self.min_seconds), self.max_seconds)
+        return self.max_seconds
+
+
+# =========================================================
+# ✍️ التحديث عند الاكتمال (signals.py)
+# =========================================================
+def duration_of(job):
+    """ مدة الغسيل بالثواني، أو None إن كانت ناقصة أو شاذة """
+    if not (job.started_at and job.completed_at and job.worker_id and job.service_id):
+        return None
+    seconds = (job.completed_at - job.started_at).total_seconds()
+    if not _setting('WASH_DURATION_MIN_SECONDS', 60) <= seconds <= _setting('WASH_DURATION_MAX_SECONDS', 4 * 3600):
+        return None
+    return seconds
+
+
+def record(job):
+    """ يضيف مدة العملية المكتملة إلى سطر (العامل، الخدمة). يرجع المدة أو None
+    يُستدعى من post_save داخل معاملة حفظ العملية (الكاتب الوحيد محجوز أصلاً) """
+    seconds = duration_of(job)
+    if seconds is None:
+        return None
+    row, _ = WorkerServiceStats.objects.get_or_create(worker_id=job.worker_id, service_id=job.service_id)
+    summary = Summary.of(row).add(seconds)
+    for name in ('count', 'mean', 'm2', 'min_seconds', 'max_seconds', 'sketch'):
+        setattr(row, name, getattr(summary, name))
+    row.save()
+    return seconds
+
+
+# =========================================================
+# 📖 القراءة (جدول صغير، محفوظ في الكاش)
+# =========================================================
+@caching.cached('workerservicestats', name='performance_table')
+def table():
+    """ {(worker_id, service_id): Summary} + أسماء العمال """
+    rows = WorkerServiceStats.objects.select_related('worker')
+    return {
+        'stats': {(r.worker_id, r.service_id): Summary.of(r) for r in rows},
+        'names': {r.worker_id: r.worker.get_full_name() or r.worker.username for r in rows},
+    }
+
+
+def _by_service(stats):
+    merged = {}
+    for (_, service_id), summary in stats.items():
+        merged.setdefault(service_id, Summary()).merge(summary)
+    return merged
+
+
+def expected_seconds(worker_id, service_id, data=None, default_minutes=None):
+    """ الوسيط المتوقع: العامل في هذه الخدمة، ثم كل العمال فيها، ثم مدة الخدمة المعلنة """
+    data = data or table()
+    min_count = _setting('PERFORMANCE_MIN_SAMPLES', 5)
+    own = data['stats'].get((worker_id, service_id))
+    if own and own.count >= min_count:
+        return own.quantile(0.5)
+    service = _by_service(data['stats']).get(service_id)
+    if service and service.count >= min_count:
+        return service.quantile(0.5)
+    return (default_minutes or 30) * 60
+
+
+def leaderboard(min_washes=None):
+    """
+    ترتيب العمال: مؤشر السرعة = متوسط (وسيط الخدمة لكل العمال ÷ وسيط العامل فيها)
+    موزوناً بعدد غسلاته في كل خدمة؛ 1.0 = المعدل، وأكبر = أسرع.
+    """
+    min_washes = _setting('PERFORMANCE_MIN_SAMPLES', 5) if min_washes is None else min_washes
+    data = table()
+    services = {pk: s.quantile(0.5) for pk, s in _by_service(data['stats']).items()}
+    workers = {}
+    for (worker_id, service_id), summary in data['stats'].items():
+        entry = workers.setdefault(worker_id, {'summary': Summary(), 'weighted': 0.0})
+        entry['summary'].merge(summary)
+        entry['weighted'] += summary.count * services[service_id] / summary.quantile(0.5)
+
+    board = []
+    for worker_id, entry in workers.items():
+        summary = entry['summary']
+        if summary.count < min_washes:
+            continue
+        board.append({
+            'worker_id': worker_id,
+            'worker': data['names'][worker_id],
+            'washes': summary.count,
+            'speed_index': round(entry['weighted'] / summary.count, 2),
+            'median_minutes': round(summary.quantile(0.5) / 60, 1),
+            'p90_minutes': round(summary.quantile(0.9) / 60, 1),
+            'mean_minutes': round(summary.mean / 60, 1),
+            'stddev_minutes': round(summary.stddev / 60, 1),
+        })
+    board.sort(key=lambda row: (-row['speed_index'], -row['washes']))
+    for rank, row in enumerate(board, start=1):
+        row['rank'] = rank
+    return board
+
+
+def estimate_finish(jobs, now=None, lanes=None):
+    """
+    وقت الانتهاء المتوقع لكل عملية في الطابور (نفس ترتيب jobs).
+    jobs: [{'status', 'worker_id', 'service_id', 'started_at', 'duration_minutes'}]
+    كل عامل يعمل حالياً = خط؛ العمليات المنتظرة تذهب لعاملها إن كان محدداً وإلا لأول خط يتفرغ.
+    """
+    now = now or timezone.now()
+    data = table()
+    free, finish = {}, [None] * len(jobs)
+
+    def expected(job):
+        return timedelta(seconds=expected_seconds(job['worker_id'], job['service_id'], data, job.get('duration_minutes')))
+
+    for i, job in enumerate(jobs):
+        if job['status'] == 'processing':
+            finish[i] = max(now, (job['started_at'] or now) + expected(job))
+            lane = job['worker_id'] or f"job-{i}"
+            free[lane] = max(free.get(lane, now), finish[i])
+    for i in range(max(0, (lanes or 1) - len(free))):
+        free[f"idle-{i}"] = now
+
+    for i, job in enumerate(jobs):
+        if finish[i] is None:
+            lane = job['worker_id'] or min(free, key=free.get)
+            free[lane] = free.get(lane, now) + expected(job)
+            finish[i] = free[lane]
+    return finish
+
@@ -0,0 +1,132 @@
+"""
+🔬 البروفايلر عند الطلب: أضف ?profile=1 لأي رابط (مدير النظام فقط).
+
+يعمل مقياسان معاً أثناء الطلب:
+1. cProfile: كل استدعاء دالة مع الزمن التراكمي (أهم الدوال + ملف .prof).
+2. عيّنات المكدس كل PROFILE_SAMPLE_INTERVAL ثانية من خيط الطلب، تُحفظ بصيغة
+   collapsed stacks ("a;b;c 12") التي يقرأها flamegraph.pl و speedscope مباشرة.
+
+التخزين محدود: آخر PROFILE_MAX_STORED قياس فقط، والمكدسات مقصوصة بـ PROFILE_MAX_BYTES.
+"""
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+from .models import RequestProfile
+from .writes import serialized_write
+
+
+def requested(request):
+    """ ?profile=1 من مدير النظام فقط (superuser) """
+    if request.GET.get('profile') != '1':
+        return False
+    user = getattr(request, 'user', None)
+    return bool(user and user.is_authenticated and user.is_superuser)
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler(threading.Thread):
+    """ خيط جانبي يأخذ صورة مكدس خيط الطلب على فترات ثابتة """
+    def __init__(self, target_ident, interval):
+        super().__init__(daemon=True)
+        self.target_ident = target_ident
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.target_ident)
+            names = []
+            while frame is not None:
+                names.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+                self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def collapsed(self, max_bytes):
+        """ الأكثر تكراراً أولاً حتى نبقى تحت الحد """
+        out, size = [], 0
+        for stack, count in self.stacks.most_common():
+            line = f"{stack} {count}"
+            size += len(line.encode()) + 1
+            if size > max_bytes:
+                break
+            out.append(line)
+        return '\n'.join(out)
+
+
+class Capture:
+    """ يشغل cProfile + العينات بين start() و stop() """
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.sampler = StackSampler(threading.get_ident(), getattr(settings, 'PROFILE_SAMPLE_INTERVAL', 0.002))
+        self.started = self.duration_ms = 0
+
+    def start(self):
+        # ValueError إن كان بروفايلر آخر يعمل في نفس العملية
+        self.profiler.enable()
+        self.sampler.start()
+        self.started = time.perf_counter()
+
+    def stop(self):
+        self.duration_ms = (time.perf_counter() - self.started) * 1000
+        self.profiler.disable()
+        self.sampler.stop()
+
+    def top_functions(self, limit=40):
+        out = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=out)
+        stats.strip_dirs().sort_stats('cumulative').print_stats(limit)
+        return out.getvalue()
+
+    def pstats_bytes(self):
+        """ نفس صيغة Profile.dump_stats (تُفتح بـ snakeviz أو pstats) """
+        self.profiler.create_stats()
+        return marshal.dumps(self.profiler.stats)
+
+
+def save(capture, request, response, view, query_count):
+    """ التحليل خارج قفل الكتابة، ثم الحفظ """
+    max_bytes = getattr(settings, 'PROFILE_MAX_BYTES', 512 * 1024)
+    data = capture.pstats_bytes()
+    return _store(
+        path=request.get_full_path()[:500],
+        view=view[:150],
+        method=request.method,
+        status_code=response.status_code,
+        duration_ms=capture.duration_ms,
+        query_count=query_count,
+        samples=capture.sampler.samples,
+        user=request.user,
+        top_functions=capture.top_functions(),
+        collapsed_stacks=capture.sampler.collapsed(max_bytes),
+        pstats_data=data if len(data) <= max_bytes else b'',
+    )
+
+
+@serialized_write
+def _store(**fields):
+    profile = RequestProfile.objects.create(**fields)
+    # نحتفظ بآخر PROFILE_MAX_STORED فقط
+    keep = getattr(settings, 'PROFILE_MAX_STORED', 50)
+    stale = RequestProfile.objects.order_by('-id').values_list('id', flat=True)[keep:]
+    RequestProfile.objects.filter(id__in=list(stale)).delete()
+    return profile
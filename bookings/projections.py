@@ -0,0 +1,197 @@
+"""
+📊 الإسقاطات: عروض مشتقة تُحدث تدريجياً من سجل الأحداث (events.py).
+
+كل إسقاط له مؤشر (ProjectionCursor) = آخر حدث عالجه. التحديث يقرأ الأحداث بعد
+المؤشر على دفعات، ولكل حدث: يطرح أثر لقطة "قبل" ويضيف أثر لقطة "بعد".
+الدفعة والمؤشر يُكتبان في نفس المعاملة، فلا يُحسب حدث مرتين ولا يضيع.
+
+- التحديث التدريجي: مهمة update_projections بعد كل حدث (tasks.py).
+- إعادة البناء:      python manage.py rebuild_projections
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import JobEvent, ProjectionCursor, ProjectionRow
+from .writes import serialized_write
+
+BATCH_SIZE = 500
+
+
+def _dec(value):
+    return Decimal(value or 0)
+
+
+class Projection:
+    """ إسقاط = أثر لقطة عملية واحدة على سطر أو أكثر: {key: {field: amount}} """
+    name = None
+    money_fields = ()   # تُحفظ كنص عشري بدل float
+
+    def contributions(self, state):
+        raise NotImplementedError
+
+    def apply(self, event, rows):
+        for sign, snapshot in ((-1, event.before), (1, event.after)):
+            if snapshot is None:
+                continue
+            for key, values in self.contributions(snapshot).items():
+                row = rows[key]
+                for field, amount in values.items():
+                    row[field] = row.get(field, 0) + sign * amount
+
+    def load(self, data):
+        return {k: _dec(v) if k in self.money_fields else v for k, v in data.items()}
+
+    def dump(self, row):
+        return {k: str(v) if k in self.money_fields else v for k, v in row.items()}
+
+
+class DailyCounters(Projection):
+    """ أرقام كل يوم لكل نظام (نفس رأس لوحة العمولة): الإيراد والعمولة بدون الملغاة """
+    name = 'daily'
+    money_fields = ('revenue', 'commission')
+
+    def contributions(self, s):
+        active = s['status'] != 'canceled'
+        return {f"{s['day']}:{s['mode']}": {
+            'jobs': 1,
+            'pending': int(s['status'] == 'processing'),
+            'completed': int(s['status'] == 'completed'),
+            'canceled': int(not active),
+            'revenue': _dec(s['price']) if active else Decimal(0),
+            'commission': _dec(s['commission']) if active else Decimal(0),
+        }}
+
+
+class WorkerTallies(Projection):
+    """ حصيلة كل عامل: عملياته والمكتمل منها وما جلبه من إيراد وعمولة """
+    name = 'workers'
+    money_fields = ('revenue', 'commission')
+
+    def contributions(self, s):
+        if not s['worker']:
+            return {}
+        done = s['status'] == 'completed'
+        return {str(s['worker']): {
+            'jobs': 1,
+            'completed': int(done),
+            'canceled': int(s['status'] == 'canceled'),
+            'revenue': _dec(s['price']) if done else Decimal(0),
+            'commission': _dec(s['commission']) if done else Decimal(0),
+        }}
+
+
+class CustomerCounters(Projection):
+    """ عدد زيارات كل زبون (حسب الهاتف) وما دفعه """
+    name = 'customers'
+    money_fields = ('spent',)
+
+    def contributions(self, s):
+        if not s['phone']:
+            return {}
+        done = s['status'] == 'completed'
+        return {s['phone']: {
+            'visits': int(s['status'] != 'canceled'),
+            'completed': int(done),
+            'spent': _dec(s['price']) if done else Decimal(0),
+        }}
+
+
+REGISTRY = {p.name: p for p in (DailyCounters(), WorkerTallies(), CustomerCounters())}
+
+
+# =========================================================
+# ⚡ التحديث التدريجي
+# =========================================================
+@serialized_write
+def _step(projection, batch_size):
+    """ دفعة واحدة: أحداث بعد المؤشر -> تحديث الأسطر -> تقديم المؤشر (معاملة واحدة) """
+    cursor, _ = ProjectionCursor.objects.get_or_create(name=projection.name)
+    events = list(JobEvent.objects.filter(id__gt=cursor.position).order_by('id')[:batch_size])
+    if not events:
+        return 0
+
+    rows = defaultdict(dict)
+    for event in events:
+        projection.apply(event, rows)
+
+    existing = {
+        row.key: row
+        for row in ProjectionRow.objects.filter(projection=projection.name, key__in=list(rows))
+    }
+    now = timezone.now()
+    to_create, to_update, to_delete = [], [], []
+    for key, delta in rows.items():
+        row = existing.get(key)
+        data = projection.load(row.data) if row else {}
+        for field, amount in delta.items():
+            data[field] = data.get(field, 0) + amount
+        if not any(data.values()):
+            # لم يبق أثر (حُذفت كل عملياته)
+            if row:
+                to_delete.append(row.pk)
+            continue
+        if row:
+            row.data, row.updated_at = projection.dump(data), now
+            to_update.append(row)
+        else:
+            to_create.append(ProjectionRow(projection=projection.name, key=key, data=projection.dump(data)))
+
+    ProjectionRow.objects.bulk_create(to_create)
+    ProjectionRow.objects.bulk_update(to_update, ['data', 'updated_at'])
+    ProjectionRow.objects.filter(pk__in=to_delete).delete()
+
+    cursor.position = events[-1].id
+    cursor.save(update_fields=['position', 'updated_at'])
+    return len(events)
+
+
+def catch_up(names=None, batch_size=BATCH_SIZE):
+    """ يمرر كل الأحداث الجديدة على الإسقاطات. يرجع {اسم: عدد الأحداث المعالجة} """
+    processed = {}
+    for name in names or REGISTRY:
+        projection = REGISTRY[name]
+        processed[name] = 0
+        while True:
+            n = _step(projection, batch_size)
+            processed[name] += n
+            if n < batch_size:
+                break
+    return processed
+
+
+# =========================================================
+# 🧮 إعادة البناء من الصفر
+# =========================================================
+@serialized_write
+def _reset(name):
+    ProjectionRow.objects.filter(projection=name).delete()
+    ProjectionCursor.objects.update_or_create(name=name, defaults={'position': 0})
+
+
+def rebuild(names=None, batch_size=BATCH_SIZE):
+    """ يمسح العروض ويعيد تمرير السجل كاملاً. يرجع {اسم: عدد الأحداث} """
+    names = list(names or REGISTRY)
+    for name in names:
+        REGISTRY[name]  # اسم غير معروف -> KeyError قبل المسح
+    for name in names:
+        _reset(name)
+    return catch_up(names, batch_size)
+
+
+# =========================================================
+# 📤 القراءة
+# =========================================================
+def read(name, key):
+    """ سطر واحد من عرض مشتق (المبالغ كـ Decimal)، أو {} """
+    row = ProjectionRow.objects.filter(projection=name, key=key).first()
+    return REGISTRY[name].load(row.data) if row else {}
+
+
+def lag():
+    """ عدد الأحداث التي لم يعالجها كل إسقاط بعد """
+    last = JobEvent.objects.aggregate(m=Max('id'))['m'] or 0
+    positions = dict(ProjectionCursor.objects.values_list('name', 'position'))
+    return {name: last - positions.get(name, 0) for name in REGISTRY}
@@ -0,0 +1,138 @@
+"""
+🐢 سجل الاستعلامات البطيئة.
+
+أثناء الطلب نقيس زمن كل استعلام فقط (تكلفة شبه معدومة). الاستعلام الذي يتجاوز
+SLOW_QUERY_MS نحفظ نصه ومكان استدعائه في القائمة، وبعد انتهاء الطلب نضيف مهمة خلفية
+واحدة (tasks.record_slow_queries) تحسب خطة التنفيذ وتجمعه في جدول SlowQuery حسب
+البصمة (نفس الاستعلام بقيم مختلفة = صف واحد).
+
+القيم نفسها (أرقام الهواتف، الأسماء...) لا تُحفظ ولا تُمرر للمهمة: المثال هو الاستعلام
+بعلامات %s كما نفذه Django، والخطة تُحسب بقيم NULL (الخطة لا تتعلق بالقيم غالباً).
+"""
+import hashlib
+import random
+import re
+import time
+import traceback
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import F
+
+from .models import SlowQuery
+from .writes import serialized_write
+
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDERS = re.compile(r"%s|\?")
+_IN_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_SPACES = re.compile(r"\s+")
+
+# لا نعيد حساب خطة نفس البصمة أكثر من مرة كل 10 دقائق (داخل العملية)
+_PLAN_TTL = 600
+_last_plan = {}
+
+
+def threshold_ms():
+    return getattr(settings, 'SLOW_QUERY_MS', 100)
+
+
+def sampled():
+    """ هل نراقب هذا الطلب؟ (SLOW_QUERY_SAMPLE_RATE بين 0 و 1) """
+    return random.random() < getattr(settings, 'SLOW_QUERY_SAMPLE_RATE', 1.0)
+
+
+def normalize(sql):
+    """ يحذف القيم: الأرقام والنصوص والقوائم تصبح ? """
+    sql = _STRINGS.sub('?', sql)
+    sql = _NUMBERS.sub('?', sql)
+    sql = _PLACEHOLDERS.sub('?', sql)
+    sql = _IN_LISTS.sub('(...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+def fingerprint(normalized_sql):
+    return hashlib.sha1(normalized_sql.encode()).hexdigest()[:16]
+
+
+def stack_excerpt(limit=6):
+    """ آخر استدعاءات من كود المشروع نفسه (بدون Django والمكتبات) """
+    base = str(settings.BASE_DIR)
+    frames = [
+        f for f in traceback.extract_stack()
+        if f.filename.startswith(base) and 'site-packages' not in f.filename
+        and not f.filename.endswith(('querylog.py', 'middleware.py'))
+    ]
+    return '\n'.join(f"{f.filename[len(base) + 1:]}:{f.lineno} in {f.name}" for f in frames[-limit:])
+
+
+class QueryCapture:
+    """ execute_wrapper يلتقط الاستعلامات التي تتجاوز الحد """
+    def __init__(self, alias='default'):
+        self.alias = alias
+        self.limit = threshold_ms()
+        self.entries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if elapsed_ms >= self.limit:
+                self.entries.append({
+                    'sql': sql, 'params': None if many else len(params or ()),
+                    'ms': elapsed_ms, 'stack': stack_excerpt(),
+                })
+
+
+def _explain(alias, sql, param_count):
+    """ خطة التنفيذ للاستعلامات القرائية فقط (بقيم NULL بدل القيم الحقيقية) """
+    if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return ''
+    connection = connections[alias]
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, [None] * param_count)
+            return '\n'.join(' | '.join(str(col) for col in row) for row in cursor.fetchall())
+    except Exception as exc:
+        return f"(EXPLAIN failed: {exc})"
+
+
+@serialized_write
+def _store(fp, normalized, entry, view, plan):
+    updated = SlowQuery.objects.filter(fingerprint=fp).update(
+        calls=F('calls') + 1,
+        total_ms=F('total_ms') + entry['ms'],
+        sample_sql=entry['sql'][:5000],
+        last_view=view[:150],
+        last_stack=entry['stack'],
+        **({'plan': plan} if plan else {}),
+    )
+    SlowQuery.objects.filter(fingerprint=fp, max_ms__lt=entry['ms']).update(max_ms=entry['ms'])
+    if updated:
+        return
+
+    SlowQuery.objects.create(
+        fingerprint=fp, sql=normalized, sample_sql=entry['sql'][:5000],
+        calls=1, total_ms=entry['ms'], max_ms=entry['ms'], last_view=view[:150],
+        last_stack=entry['stack'], plan=plan,
+    )
+    # الجدول محدود: نحذف الأقدم ظهوراً عند تجاوز الحد
+    cap = getattr(settings, 'SLOW_QUERY_MAX_FINGERPRINTS', 500)
+    stale = SlowQuery.objects.order_by('-last_seen').values_list('id', flat=True)[cap:]
+    SlowQuery.objects.filter(id__in=list(stale)).delete()
+
+
+def record(entries, view, alias='default'):
+    """ في المهمة الخلفية: يحسب الخطط ويحفظ الاستعلامات البطيئة لطلب انتهى """
+    now = time.monotonic()
+    for entry in entries:
+        normalized = normalize(entry['sql'])
+        fp = fingerprint(normalized)
+        plan = ''
+        if now - _last_plan.get(fp, 0) > _PLAN_TTL and entry['params'] is not None:
+            plan = _explain(alias, entry['sql'], entry['params'])
+            _last_plan[fp] = now
+        _store(fp, normalized, entry, view, plan)
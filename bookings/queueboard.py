@@ -0,0 +1,248 @@
+"""
+📺 شاشة الانتظار العامة: لوحات اليوم (في الانتظار / جاري العمل / جاهزة).
+
+كل الشاشات تقرأ نسخة واحدة في ذاكرة العملية بدل أن تسأل القاعدة كل منها:
+- النسخة تُبنى باستعلام واحد، ولا يُعاد بناؤها إلا عند تغير عملية (إشارة بعد التثبيت)
+  أو بعد QUEUE_BOARD_MAX_AGE ثانية (تغيير من عملية أخرى، أو بداية يوم جديد).
+- البث (SSE) يتم في core/asgi.py: كل شاشة متصلة تنتظر التنبيه فقط، فالشاشة
+  الإضافية لا تكلف أي استعلام.
+- اللوحات مخفية جزئياً (آخر 3 خانات فقط) واسم العامل الأول فقط.
+- وقت الانتهاء المتوقع لكل سيارة من إحصاءات مدة الغسيل (performance.py، من الكاش).
+- لكل محطة (stations.py) نسختها وقفلها وشاشاتها؛ البث يعرف المحطة من اسم النطاق.
+- البث تحت ASGI لا يمر على RateLimitMiddleware: حد الاتصالات المفتوحة لكل عنوان
+  (QUEUE_STREAM_MAX_PER_CLIENT) يُطبق هنا، والزائد يأخذ 429.
+"""
+import asyncio
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import metrics, performance, stations
+from .dashboard import today_range
+from .models import STATUS_CHOICES, Job
+
+# مسار البث خارج بادئة اللغة (يلتقطه core/asgi.py قبل Django)
+STREAM_PATH = '/queue/stream/'
+
+BOARD_STATUSES = ('pending', 'processing', 'completed')
+STATUS_LABELS = dict(STATUS_CHOICES)
+
+_boards = {}  # المحطة -> {'lock', 'state', 'waiters'}
+_boards_lock = threading.Lock()
+_streams = {}  # العنوان -> عدد البثوث المفتوحة (تحت _boards_lock)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def mask_plate(plate, visible=3):
+    """ 12345-116-16 -> •••••-••6-16 : الفواصل تبقى، والخانات الأخيرة فقط ظاهرة """
+    plate = (plate or '').strip()
+    keep = sum(ch.isalnum() for ch in plate) - visible
+    out = []
+    for ch in plate:
+        if ch.isalnum():
+            out.append('•' if keep > 0 else ch)
+            keep -= 1
+        else:
+            out.append(ch)
+    return ''.join(out)
+
+
+# =========================================================
+# 🧱 بناء النسخة (استعلام واحد)
+# =========================================================
+def build():
+    rows = list(
+        Job.objects.filter(created_at__range=today_range(), status__in=BOARD_STATUSES)
+        .order_by('created_at', 'id')
+        .values(
+            'car_plate', 'status', 'updated_at', 'started_at', 'worker_id', 'service_id',
+            'service__name', 'service__icon', 'service__duration_minutes', 'worker__first_name',
+        )
+    )
+    waiting, queued, done = [], [], []
+    for row in rows:
+        entry = {
+            'plate': mask_plate(row['car_plate']),
+            'status': row['status'],
+            'status_display': STATUS_LABELS[row['status']],
+            'service': row['service__name'] or '',
+            'icon': row['service__icon'] or '🚗',
+            'worker': row['worker__first_name'] or '',
+            'position': None,
+            'eta': None,
+        }
+        if row['status'] == 'completed':
+            done.append((row['updated_at'], entry))
+        else:
+            entry['position'] = len(waiting) + 1
+            waiting.append(entry)
+            queued.append({**row, 'duration_minutes': row['service__duration_minutes']})
+    # ⏱️ خطوط العمل = العمال الذين ظهروا في لوحة اليوم (بدون استعلام إضافي)
+    lanes = len({row['worker_id'] for row in rows if row['worker_id']})
+    for entry, finish in zip(waiting, performance.estimate_finish(queued, lanes=lanes)):
+        entry['eta'] = timezone.localtime(finish).strftime('%H:%M')
+    # الجاهزة: آخر ما اكتمل أولاً
+    done.sort(key=lambda pair: pair[0], reverse=True)
+    return {
+        'jobs': waiting + [entry for _, entry in done[:_setting('QUEUE_BOARD_COMPLETED', 8)]],
+        'waiting': len(waiting),
+    }
+
+
+def _board():
+    """ نسخة المحطة الحالية؛ waiters = (loop, asyncio.Event) لكل شاشة متصلة """
+    slug = stations.current()
+    with _boards_lock:
+        if slug not in _boards:
+            _boards[slug] = {
+                'lock': threading.Lock(),
+                'state': {'version': 0, 'built_at': 0.0, 'dirty': True, 'payload': None, 'data': ''},
+                'waiters': set(),
+            }
+        return _boards[slug]
+
+
+def _is_fresh(state):
+    return not state['dirty'] and time.monotonic() - state['built_at'] < _setting('QUEUE_BOARD_MAX_AGE', 10)
+
+
+def snapshot():
+    """ (الإصدار، JSON) للنسخة الحالية؛ يُعاد البناء فقط إن تغير شيء أو انتهت صلاحيتها """
+    board = _board()
+    state = board['state']
+    with board['lock']:
+        if not _is_fresh(state):
+            # نمسح العلامة قبل القراءة: تغيير يصل أثناء البناء يعيد البناء مرة أخرى
+            state['dirty'] = False
+            payload = build()
+            metrics.inc('bookings_queue_board_builds_total')
+            if payload != state['payload']:
+                state['version'] += 1
+                state['payload'] = payload
+                state['data'] = json.dumps(
+                    {'version': state['version'], 'generated_at': timezone.localtime().strftime('%H:%M'), **payload},
+                    ensure_ascii=False,
+                )
+            state['built_at'] = time.monotonic()
+        return state['version'], state['data']
+
+
+def invalidate():
+    """ بعد تثبيت أي تغيير في العمليات (signals.py): نعلم النسخة ونوقظ الشاشات """
+    board = _board()
+    with board['lock']:
+        board['state']['dirty'] = True
+        waiters = list(board['waiters'])
+    for loop, event in waiters:
+        try:
+            loop.call_soon_threadsafe(event.set)
+        except RuntimeError:
+            pass  # الحلقة أُغلقت (الخادم يتوقف)
+
+
+# =========================================================
+# 📡 البث (SSE) - يُستدعى من core/asgi.py
+# =========================================================
+def event(version, data):
+    return f"id: {version}\nevent: board\ndata: {data}\n\n".encode()
+
+
+def _client_address(scope, headers):
+    """ عنوان الشاشة (X-Forwarded-For فقط خلف وكيل موثوق، كما في ratelimit.client_key) """
+    address = (scope.get('client') or ('',))[0] or ''
+    if _setting('RATE_LIMIT_TRUST_FORWARDED', False):
+        forwarded = headers.get(b'x-forwarded-for', b'').decode('latin-1').split(',')[0].strip()
+        address = forwarded or address
+    return address
+
+
+def _open_stream(address):
+    """ يحجز مكاناً لبث جديد من هذا العنوان، أو False إن بلغ الحد """
+    limit = _setting('QUEUE_STREAM_MAX_PER_CLIENT', 4)
+    with _boards_lock:
+        if limit is not None and _streams.get(address, 0) >= limit:
+            return False
+        _streams[address] = _streams.get(address, 0) + 1
+        return True
+
+
+def _close_stream(address):
+    with _boards_lock:
+        _streams[address] -= 1
+        if not _streams[address]:
+            del _streams[address]
+
+
+async def stream(scope, receive, send):
+    """ تطبيق ASGI صغير: يرسل النسخة عند كل تغيير، وسطر تعليق كل QUEUE_BOARD_MAX_AGE ثانية """
+    headers = dict(scope.get('headers') or ())
+    address = _client_address(scope, headers)
+    if not _open_stream(address):
+        metrics.inc('bookings_rate_limited_total', view='queue_stream', reason='connections')
+        retry = str(int(_setting('QUEUE_BOARD_MAX_AGE', 10))).encode()
+        await send({'type': 'http.response.start', 'status': 429, 'headers': [(b'retry-after', retry), (b'content-type', b'text/plain')]})
+        await send({'type': 'http.response.body', 'body': b'too many open streams'})
+        return
+    try:
+        host = headers.get(b'host', b'').decode('latin-1')
+        with stations.use(stations.for_host(host) or stations.current()):
+            await _stream(receive, send)
+    finally:
+        _close_stream(address)
+
+
+async def _stream(receive, send):
+    from asgiref.sync import sync_to_async
+
+    await send({
+        'type': 'http.response.start', 'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+    wake = asyncio.Event()
+    waiter = (asyncio.get_running_loop(), wake)
+    board = _board()
+    with board['lock']:
+        board['waiters'].add(waiter)
+    disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+    last = None
+    try:
+        while not disconnected.done():
+            wake.clear()
+            # النسخة صالحة: قراءة من الذاكرة دون المرور على خيط قاعدة البيانات
+            state = board['state']
+            if _is_fresh(state):
+                version, data = state['version'], state['data']
+            else:
+                version, data = await sync_to_async(snapshot)()
+            await send({'type': 'http.response.body', 'body': event(version, data) if version != last else b': ping\n\n', 'more_body': True})
+            last = version
+            woken = asyncio.ensure_future(wake.wait())
+            await asyncio.wait([woken, disconnected], timeout=_setting('QUEUE_BOARD_MAX_AGE', 10), return_when=asyncio.FIRST_COMPLETED)
+            woken.cancel()
+    except OSError:
+        pass  # الشاشة انقطعت أثناء الإرسال
+    finally:
+        with board['lock']:
+            board['waiters'].discard(waiter)
+        disconnected.cancel()
+
+
+async def _wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+def screens():
+    """ عدد الشاشات المتصلة بهذه العملية (كل المحطات) """
+    with _boards_lock:
+        return sum(len(board['waiters']) for board in _boards.values())
@@ -0,0 +1,137 @@
+"""
+🚦 التحكم في القبول وتحديد المعدل (Rate Limiting).
+
+روبوت يرسل الحجوزات أو جهاز عالق يسأل عن الإشعارات بلا توقف كان يشغل الكاتب الوحيد
+وعمال الخادم. الآن قبل الوصول إلى الدالة:
+
+1. حد التزامن: أكثر من RATE_LIMIT_MAX_INFLIGHT طلب قيد التنفيذ في العملية = 429 فوري
+   (لا طابور ينتظر خلف قاعدة مشغولة).
+2. دلو الرموز (Token Bucket) لكل (رابط، زائر): الزائر = المستخدم أو الجلسة أو العنوان.
+   الميزانية لكل رابط في RATE_LIMITS؛ الدلو يتسع لـ rate طلب ويمتلئ بمعدل rate/per.
+
+حالة الدلاء في الكاش RATE_LIMIT_CACHE (وليس قاعدة البيانات): ملفات مشتركة بين عمال الجهاز،
+أو Redis عند REDIS_URL. كاش في ذاكرة العملية مرفوض عند الإقلاع: كل عامل سيعطي الزائر ميزانية كاملة.
+كل رفض يُعد في /metrics (bookings_rate_limited_total).
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+
+from . import metrics
+
+_lock = threading.Lock()
+_inflight = [0]
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _store():
+    return caches[_setting('RATE_LIMIT_CACHE', 'ratelimit')]
+
+
+# كاش لا يراه إلا عامل واحد: N عمال = N ضعف الميزانية (أو لا حد إطلاقاً مع Dummy)
+_PROCESS_LOCAL = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@checks.register()
+def check_shared_store(app_configs=None, **kwargs):
+    """ يرفض الإقلاع إن كانت الدلاء في ذاكرة العملية """
+    alias = _setting('RATE_LIMIT_CACHE', 'ratelimit')
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if backend in _PROCESS_LOCAL:
+        return [checks.Error(
+            f"RATE_LIMIT_CACHE ({alias!r}) يستخدم {backend}: كل عامل له دلاء منفصلة.",
+            hint="استخدم FileBasedCache (عمال جهاز واحد) أو Redis عبر REDIS_URL.",
+            id='bookings.E001',
+        )]
+    return []
+
+
+# =========================================================
+# 🚧 حد التزامن (داخل العملية)
+# =========================================================
+@contextmanager
+def admit():
+    """ يرجع True إن قُبل الطلب؛ المكان يُحرر عند الخروج """
+    limit = _setting('RATE_LIMIT_MAX_INFLIGHT', None)
+    with _lock:
+        admitted = limit is None or _inflight[0] < limit
+        if admitted:
+            _inflight[0] += 1
+    try:
+        yield admitted
+    finally:
+        if admitted:
+            with _lock:
+                _inflight[0] -= 1
+
+
+def inflight():
+    return _inflight[0]
+
+
+# =========================================================
+# 🪣 دلو الرموز
+# =========================================================
+def budget_for(view, method):
+    """ ميزانية الرابط لهذه الطريقة (rate, per) أو None """
+    rule = _setting('RATE_LIMITS', {}).get(view)
+    if not rule or method not in rule.get('methods', (method,)):
+        return None
+    return rule['rate'], rule['per']
+
+
+def client_key(request):
+    """
+    المستخدم المسجل، وإلا العنوان (X-Forwarded-For فقط خلف وكيل موثوق).
+    لا نعتمد على كوكي الجلسة للزائر: أي قيمة مزورة كانت تعطي دلواً جديداً.
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f"user:{user.pk}"
+    address = request.META.get('REMOTE_ADDR', '')
+    if _setting('RATE_LIMIT_TRUST_FORWARDED', False):
+        address = request.META.get('HTTP_X_FORWARDED_FOR', address).split(',')[0].strip() or address
+    return f"ip:{address}"
+
+
+def take(key, rate, per, now=None):
+    """ يسحب رمزاً من الدلو. يرجع 0 إن قُبل، أو الثواني حتى يتوفر رمز """
+    now = time.time() if now is None else now
+    refill = rate / per
+    store = _store()
+    cache_key = f"rl:{key}"
+    # القفل يجعل الدلو دقيقاً داخل العملية؛ بين العمليات قد يمر طلب زائد نادراً (لا ضرر)
+    with _lock:
+        tokens, stamp = store.get(cache_key) or (rate, now)
+        tokens = min(rate, tokens + max(0.0, now - stamp) * refill)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / refill
+        # الدلو الممتلئ = لا سطر: ينتهي بعد مدة امتلائه
+        store.set(cache_key, (tokens, now), timeout=math.ceil(per) + 1)
+    return wait
+
+
+def check(request, view):
+    """ None إن قُبل، أو ثواني Retry-After إن تجاوز الزائر ميزانية الرابط """
+    budget = budget_for(view, request.method)
+    if budget is None:
+        return None
+    wait = take(f"{view}:{client_key(request)}", *budget)
+    if not wait:
+        return None
+    metrics.inc('bookings_rate_limited_total', view=view, reason='rate')
+    return max(1, math.ceil(wait))
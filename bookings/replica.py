@@ -0,0 +1,77 @@
+"""
+📸 نسخة التقارير المحلية (snapshot) عبر Online Backup API الخاص بـ SQLite.
+
+النسخ يتم على دفعات صغيرة من الصفحات مع استراحة قصيرة بينها،
+حتى لا يتوقف الكاشير عن الكتابة أثناء النسخ.
+"""
+import os
+import sqlite3
+import time
+
+from django.db import connections
+
+from .routers import REPORTING_ALIAS
+
+
+class _Restarted(Exception):
+    """ كتابات القاعدة الحية أعادت النسخ من البداية أكثر من المسموح """
+
+
+def online_backup(dest_path, alias='default', pages=256, pause=0.005, progress=None, source_path=None, max_restarts=3):
+    """
+    ينسخ قاعدة SQLite الحية إلى dest_path دون إيقاف الكتابة.
+    pages: عدد الصفحات في كل خطوة، pause: الاستراحة بين الخطوات (ثوانٍ).
+    source_path: ملف آخر بدل قاعدة alias.
+    كل كتابة من اتصال آخر بين خطوتين تعيد النسخ من البداية؛ بعد max_restarts إعادة
+    ننسخ الباقي بخطوة واحدة (قفل قراءة قصير) حتى لا يدور النسخ بلا نهاية تحت الضغط.
+    """
+    source_path = source_path or connections[alias].settings_dict['NAME']
+    state = {'remaining': None, 'restarts': 0}
+
+    def _step(status, remaining, total):
+        if progress:
+            progress(remaining, total)
+        # بدون كتابات ينقص الباقي مع كل خطوة؛ إن لم ينقص فقد بدأ النسخ من جديد
+        if state['remaining'] is not None and remaining >= state['remaining']:
+            state['restarts'] += 1
+            if max_restarts is not None and state['restarts'] > max_restarts:
+                raise _Restarted()
+        state['remaining'] = remaining
+        if remaining and pause:
+            time.sleep(pause)
+
+    src = sqlite3.connect(str(source_path))
+    dst = sqlite3.connect(str(dest_path))
+    try:
+        try:
+            with dst:
+                src.backup(dst, pages=pages, progress=_step)
+        except _Restarted:
+            with dst:
+                src.backup(dst, pages=-1)
+    finally:
+        dst.close()
+        src.close()
+    return dest_path
+
+
+def refresh_reporting_snapshot(pages=256, pause=0.005):
+    """
+    يحدّث نسخة التقارير: نسخ بطيء من القاعدة الحية إلى ملف مؤقت، ثم نسخه داخل ملف
+    النسخة نفسه بخطوة واحدة. لا نستبدل الملف تحت القراء: SQLite يقفل النسخة لحظة
+    الكتابة ويبقي ملفاتها (-wal/-shm) متسقة، والاتصالات المفتوحة ترى البيانات الجديدة.
+    """
+    target = str(connections[REPORTING_ALIAS].settings_dict['NAME'])
+    tmp_path = f"{target}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    started = time.perf_counter()
+    online_backup(tmp_path, pages=pages, pause=pause)
+    try:
+        online_backup(target, pages=-1, pause=0, source_path=tmp_path)
+    finally:
+        os.remove(tmp_path)
+    # عمر النسخة (REPORTING_MAX_LAG) يُقرأ من وقت تعديل الملف، ومع WAL قد لا يتغير إلا عند checkpoint
+    os.utime(target)
+    return time.perf_counter() - started
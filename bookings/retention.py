@@ -0,0 +1,60 @@
+"""
+🧹 تنظيف جدول الإشعارات حتى لا يكبر بلا حد.
+
+- المقروءة أقدم من NOTIFICATION_READ_RETENTION_DAYS تُحذف.
+- غير المقروءة لا تُحذف إلا إن ضُبط NOTIFICATION_UNREAD_TTL_DAYS (اختياري، None افتراضياً).
+- اليتيمة: العملية حُذفت (on_delete=SET_NULL ترك job فارغاً).
+
+الحذف على دفعات قصيرة، كل دفعة كتابة مستقلة عبر الكاتب الوحيد، فلا تنتظر
+الطلبات الأخرى خلف عملية حذف طويلة. عدد المحذوف لكل سبب يُعد في
+bookings_notifications_removed_total؛ الأمر والمهمة عمليتان منفصلتان عن الويب، فيظهر
+العدد في /metrics فقط مع METRICS_DIR (تكتبان نسختهما عند الانتهاء).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from . import metrics
+from .models import Notification
+from .writes import serialized_write
+
+
+def policies(now=None):
+    """ السبب -> فلتر الإشعارات المطلوب حذفها """
+    now = now or timezone.now()
+    read_days = getattr(settings, 'NOTIFICATION_READ_RETENTION_DAYS', 30)
+    unread_days = getattr(settings, 'NOTIFICATION_UNREAD_TTL_DAYS', None)
+    rules = {
+        'orphan': Q(job__isnull=True),
+        'read_expired': Q(is_read=True, created_at__lt=now - timedelta(days=read_days)),
+    }
+    if unread_days is not None:
+        rules['unread_expired'] = Q(is_read=False, created_at__lt=now - timedelta(days=unread_days))
+    return rules
+
+
+@serialized_write
+def _delete_batch(condition, batch_size):
+    ids = list(Notification.objects.filter(condition).order_by('id').values_list('id', flat=True)[:batch_size])
+    if ids:
+        Notification.objects.filter(id__in=ids).delete()
+    return len(ids)
+
+
+def compact(batch_size=None, max_batches=None, now=None):
+    """ ينفذ سياسات الحذف. max_batches يحد العمل في التشغيل الواحد (None = حتى النهاية). يرجع {السبب: عدد} """
+    batch_size = batch_size or getattr(settings, 'NOTIFICATION_COMPACT_BATCH', 500)
+    removed, batches = {}, 0
+    for reason, condition in policies(now).items():
+        removed[reason] = 0
+        while max_batches is None or batches < max_batches:
+            n = _delete_batch(condition, batch_size)
+            batches += 1
+            removed[reason] += n
+            if n < batch_size:
+                break
+        if removed[reason]:
+            metrics.inc('bookings_notifications_removed_total', removed[reason], reason=reason)
+    return removed
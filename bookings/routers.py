@@ -0,0 +1,107 @@
+"""
+🔀 توجيه قواعد البيانات.
+
+- StationRouter: كل الجداول ← قاعدة المحطة الحالية (stations.py). في المحطة
+  الرئيسية لا يتدخل، فيكمل التوجيه كما كان.
+- ReportingRouter: تقارير القراءة فقط ← نسخة التقارير (reporting) للمحطة الرئيسية.
+  الكتابة وكل ما عداها يبقى على القاعدة الرئيسية (default).
+  التوجيه لا يتم إلا داخل `with reporting_reads():` وبشرط أن تكون النسخة موجودة وحديثة،
+  وإلا نرجع تلقائياً للقاعدة الرئيسية.
+"""
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from . import stations
+
+REPORTING_ALIAS = 'reporting'
+
+_reporting = ContextVar('bookings_reporting_reads', default=False)
+
+# نتيجة فحص النسخة تُحفظ لبضع ثوانٍ حتى لا نفحص الملف مع كل استعلام
+_CHECK_TTL = 5
+_last_check = {'at': 0.0, 'ok': False}
+
+
+@contextmanager
+def reporting_reads():
+    """ كل القراءات داخل هذا السياق تذهب إلى نسخة التقارير إن كانت متاحة """
+    token = _reporting.set(True)
+    try:
+        yield
+    finally:
+        _reporting.reset(token)
+
+
+def reporting_available():
+    """ هل نسخة التقارير معرفة وحديثة بما يكفي؟ """
+    now = time.monotonic()
+    if now - _last_check['at'] < _CHECK_TTL:
+        return _last_check['ok']
+
+    ok = False
+    if REPORTING_ALIAS in settings.DATABASES:
+        db = connections[REPORTING_ALIAS].settings_dict
+        if 'sqlite3' in db['ENGINE']:
+            # النسخة المحلية: ملف snapshot يجب ألا يكون أقدم من الحد المسموح
+            try:
+                age = time.time() - os.path.getmtime(db['NAME'])
+                ok = age <= getattr(settings, 'REPORTING_MAX_LAG', 900)
+            except (OSError, TypeError):
+                ok = False
+        else:
+            # PostgreSQL standby: المزامنة مسؤولية الخادم
+            ok = True
+
+    _last_check.update(at=now, ok=ok)
+    return ok
+
+
+class StationRouter:
+    """ 🏪 يجب أن يكون الأول في DATABASE_ROUTERS """
+    def _station_db(self):
+        alias = stations.db_alias()
+        return None if alias == DEFAULT_DB_ALIAS else alias
+
+    def db_for_read(self, model, **hints):
+        return self._station_db()
+
+    def db_for_write(self, model, **hints):
+        return self._station_db()
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # لا علاقات بين محطتين (مستخدم محطة لا يُربط بعملية محطة أخرى)
+        db1, db2 = obj1._state.db, obj2._state.db
+        own = {stations.db_alias(slug) for slug in stations.slugs()} - {DEFAULT_DB_ALIAS}
+        if db1 and db2 and db1 != db2 and own.intersection((db1, db2)):
+            return False
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # قاعدة كل محطة نسخة كاملة من الجداول: migrate --database station_<slug>
+        return None
+
+
+class ReportingRouter:
+    def db_for_read(self, model, **hints):
+        if _reporting.get() and reporting_available():
+            return REPORTING_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        # ⚠️ نُرجع default صراحة: الكائنات المقروءة من النسخة يجب أن تُحفظ في الرئيسية
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # النسخة هي نفس البيانات، فالعلاقات بينها مسموحة
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # النسخة تُنسخ كما هي من الرئيسية، لا نطبق عليها migrations
+        if db == REPORTING_ALIAS:
+            return False
+        return None
@@ -1,12 +1,99 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from .models import Job, Notification
+from .models import Advance, Attendance, Job, Service, StationSettings, WorkerProfile, WorkerServiceStats
+from . import caching, changes, events, outbox, performance, queueboard, slots, stations, tasks, metrics
+
+
+# 🗃️ الجداول التي تُحسب منها القيم المحفوظة في الكاش (caching.py)
+CACHED_MODELS = (Service, Job, StationSettings, WorkerProfile, Attendance, Advance, WorkerServiceStats)
+
+def _schedule_projections():
+    # 📊 الإسقاطات تلحق بالسجل في الخلفية (مهمة واحدة تنتظر مهما كثرت الأحداث)
+    stations.on_commit(lambda: tasks.update_projections.delay(unique=True))
+
+@receiver(post_save, sender=Job)
+def record_job_event(sender, instance, created, **kwargs):
+    # 📜 سجل الأحداث: في نفس معاملة الحفظ
+    job_events = events.record_save(instance, created)
+    if job_events:
+        _schedule_projections()
+        # 📨 رسالة الزبون في نفس المعاملة، والإرسال في الخلفية بعد التثبيت
+        if outbox.enqueue_for_events(instance, job_events):
+            stations.on_commit(lambda: tasks.dispatch_outbox.delay(unique=True))
+        # 📅 إلغاء حجز الموقع يعيد فتراته (مرة واحدة: إعادة الفتح لا تحجز من جديد)
+        if instance.slot_count and any(e.kind == 'canceled' for e in job_events):
+            slots.release(instance)
+            Job.objects.filter(pk=instance.pk).update(slot_count=0)
+            instance.slot_count = 0
+
+@receiver(post_delete, sender=Job)
+def record_job_deleted(sender, instance, **kwargs):
+    events.record_delete(instance)
+    _schedule_projections()
+    slots.release(instance)
+
+@receiver(post_save, sender=Attendance)
+@receiver(post_delete, sender=Attendance)
+def refresh_slot_capacity(sender, instance, **kwargs):
+    # 📅 سعة مواعيد الحجز تتبع الحضور (في الخلفية بعد التثبيت)
+    day = Attendance._meta.get_field('date').to_python(instance.date).isoformat()
+    stations.on_commit(lambda: tasks.refresh_slot_capacity.delay(unique=True, day=day))
+
+@receiver(post_save, sender=Job)
+@receiver(post_delete, sender=Job)
+def refresh_queue_board(sender, instance, **kwargs):
+    # 📺 شاشات الانتظار تُعيد بناء نسختها مرة واحدة بعد التثبيت
+    stations.on_commit(queueboard.invalidate)
+
+@receiver(post_delete, sender=Job)
+def release_voice_note(sender, instance, **kwargs):
+    # 🎙️ الملف يُحذف إن لم تعد تشير إليه عملية أخرى (بعد تثبيت الحذف)
+    name = instance.voice_audio.name
+    if name:
+        stations.on_commit(lambda: tasks.release_voice_note.delay(path=name))
 
 @receiver(post_save, sender=Job)
 def create_notification(sender, instance, created, **kwargs):
     # إذا تم إنشاء حجز جديد والمصدر هو الموقع الإلكتروني
+    # ⚙️ الإشعار يُنشأ في مهمة خلفية (خارج طلب الزبون)
     if created and instance.source == 'website':
-        Notification.objects.create(
-            job=instance,
-            message=f"🔔 حجز جديد: {instance.client_name} ({instance.service.name})"
-        )
\ No newline at end of file
+        tasks.notify_new_booking.delay(job_id=instance.pk)
+
+@receiver(post_save, sender=Job)
+def count_job_events(sender, instance, created, **kwargs):
+    # 📈 عدادات المراقبة: إنشاء / إكمال / إلغاء حسب المصدر
+    previous = getattr(instance, '_loaded_status', None)
+    if created:
+        metrics.inc('bookings_jobs_total', event='created', source=instance.source)
+    if instance.status != previous and instance.status in ('completed', 'canceled'):
+        metrics.inc('bookings_jobs_total', event=instance.status, source=instance.source)
+    instance._loaded_status = instance.status
+
+@receiver(post_save, sender=Job)
+def record_wash_duration(sender, instance, **kwargs):
+    # ⏱️ أول اكتمال فقط: سطر إحصاء واحد (العامل، الخدمة) في نفس المعاملة
+    if getattr(instance, '_just_completed', False):
+        instance._just_completed = False
+        performance.record(instance)
+
+@receiver(post_save, sender=Job)
+def update_heatmap(sender, instance, created, **kwargs):
+    # 🔥 تحديث خريطة الضغط تدريجياً (خانة واحدة فقط بدل إعادة الحساب)
+    if created:
+        tasks.record_job_in_heatmap.delay(job_id=instance.pk)
+
+@receiver(post_delete, sender=Job)
+@receiver(post_delete, sender=Advance)
+@receiver(post_delete, sender=Attendance)
+@receiver(post_delete, sender=WorkerProfile)
+def record_tombstone(sender, instance, **kwargs):
+    # 🪦 المزامنة التدريجية تحذف السطر من نسختها أيضاً
+    changes.record_tombstone(instance)
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_cached_values(sender, **kwargs):
+    # 🗃️ إصدار جديد للمساحة بعد التثبيت: كل العمليات تترك القيم القديمة (بما فيها الـ proxy مثل Booking)
+    model = sender._meta.concrete_model
+    if model in CACHED_MODELS:
+        caching.invalidate(model._meta.model_name)
@@ -0,0 +1,196 @@
+"""
+📅 مواعيد حجز الموقع بسعة محدودة.
+
+- اليوم مقسم إلى فترات (BOOKING_SLOT_MINUTES) بين BOOKING_OPEN و BOOKING_CLOSE.
+- سعة الفترة = العمال الحاضرون ذلك اليوم (سيارة لكل عامل). الأيام القادمة التي
+  لم يُسجل حضورها بعد تأخذ آخر يوم مسجل.
+- الخدمة تحجز ceil(مدتها / طول الفترة) فترات متتالية.
+- الحجز = UPDATE ذري واحد (reserved + 1 حيث reserved < capacity) داخل معاملة إنشاء
+  العملية: إن لم تُحجز كل الفترات يُلغى كل شيء، فلا حجز زائد حتى مع طلبين متزامنين.
+- التوفر لليوم = قراءة واحدة بالفهرس (date, start)، محفوظة في الكاش المشترك لثوانٍ.
+"""
+import math
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, F
+from django.utils import timezone
+
+from . import stations
+from .models import Attendance, BookingSlot, Service
+from .writes import serialized_write
+
+
+class SlotUnavailable(Exception):
+    """ الموعد خارج المواعيد المتاحة أو امتلأ """
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def slot_minutes():
+    return _setting('BOOKING_SLOT_MINUTES', 30)
+
+
+def _clock(value):
+    hour, minute = map(int, value.split(':'))
+    return hour * 60 + minute
+
+
+def day_starts(day):
+    """ بدايات فترات اليوم (time) بالترتيب """
+    step = slot_minutes()
+    midnight = datetime.combine(day, datetime.min.time())
+    return [
+        (midnight + timedelta(minutes=m)).time()
+        for m in range(_clock(_setting('BOOKING_OPEN', '08:00')), _clock(_setting('BOOKING_CLOSE', '18:00')), step)
+    ]
+
+
+def units_for(duration_minutes):
+    """ عدد الفترات التي تشغلها خدمة بهذه المدة """
+    return max(1, math.ceil((duration_minutes or slot_minutes()) / slot_minutes()))
+
+
+def bookable_days(today=None):
+    today = today or timezone.localdate()
+    return [today + timedelta(days=i) for i in range(_setting('BOOKING_DAYS_AHEAD', 7) + 1)]
+
+
+def _cache():
+    # المشترك بين العمليات: الحجز في عامل يظهر فوراً في الآخرين
+    return caches[_setting('CACHE_SHARED_ALIAS', 'shared')]
+
+
+def _cache_key(day):
+    return stations.scoped(f"booking-slots:{day.isoformat()}")
+
+
+def _forget(*days):
+    # بعد التثبيت: قارئ بين الحذف والتثبيت كان سيحفظ الأرقام القديمة
+    keys = [_cache_key(d) for d in days]
+    stations.on_commit(lambda: _cache().delete_many(keys))
+
+
+# =========================================================
+# 👷 السعة
+# =========================================================
+def capacity_for(day):
+    """ العمال الحاضرون في ذلك اليوم، أو في آخر يوم مسجل قبله """
+    latest = (
+        Attendance.objects.filter(date__lte=day, is_present=True)
+        .values('date').annotate(present=Count('id')).order_by('-date').first()
+    )
+    return latest['present'] if latest else _setting('BOOKING_DEFAULT_CAPACITY', 2)
+
+
+@serialized_write
+def ensure_day(day):
+    """ ينشئ فترات اليوم إن لم تكن موجودة (مرة واحدة لكل يوم) """
+    if BookingSlot.objects.filter(date=day).exists():
+        return 0
+    capacity = capacity_for(day)
+    created = BookingSlot.objects.bulk_create(
+        [BookingSlot(date=day, start=start, capacity=capacity) for start in day_starts(day)],
+        ignore_conflicts=True,
+    )
+    return len(created)
+
+
+@serialized_write
+def refresh_capacity(day):
+    """ بعد تعديل الحضور: سعة ذلك اليوم، والأيام بعده التي تأخذ سعتها منه """
+    capacity = capacity_for(day)
+    days = BookingSlot.objects.filter(date=day)
+    if not Attendance.objects.filter(date__gt=day, is_present=True).exists():
+        days = BookingSlot.objects.filter(date__gte=day)
+    affected = sorted(set(days.values_list('date', flat=True)))
+    days.update(capacity=capacity)
+    _forget(*affected)
+    return len(affected)
+
+
+# =========================================================
+# 🔍 التوفر (قراءة واحدة لكل يوم)
+# =========================================================
+def day_rows(day):
+    """ [(HH:MM، السعة، المحجوز)] لفترات اليوم من الكاش أو من قراءة واحدة """
+    key = _cache_key(day)
+    rows = _cache().get(key)
+    if rows is None:
+        query = BookingSlot.objects.filter(date=day).order_by('start').values_list('start', 'capacity', 'reserved')
+        rows = list(query)
+        if not rows and ensure_day(day):
+            rows = list(query.all())
+        rows = [(start.strftime('%H:%M'), capacity, reserved) for start, capacity, reserved in rows]
+        _cache().set(key, rows, _setting('BOOKING_SLOTS_CACHE_SECONDS', 15))
+    return rows
+
+
+def availability(day, duration_minutes=None, now=None):
+    """ لكل فترة: عدد السيارات التي ما زال يمكن حجزها لخدمة بهذه المدة """
+    rows = day_rows(day)
+    units = units_for(duration_minutes)
+    now = timezone.localtime(now)
+    past = now.strftime('%H:%M') if day == now.date() else ''
+    result = []
+    for i, (start, _, _) in enumerate(rows):
+        window = rows[i:i + units]
+        free = min(capacity - reserved for _, capacity, reserved in window) if len(window) == units else 0
+        result.append({'time': start, 'available': 0 if start <= past else max(0, free)})
+    return result
+
+
+# =========================================================
+# ✍️ الحجز والتحرير (داخل معاملة العملية)
+# =========================================================
+def parse(value, now=None):
+    """ 'YYYY-MM-DDTHH:MM' -> datetime بتوقيت المحطة، أو SlotUnavailable """
+    try:
+        naive = datetime.strptime((value or '').strip(), '%Y-%m-%dT%H:%M')
+    except ValueError:
+        raise SlotUnavailable("اختر موعداً من القائمة.")
+    slot_at = timezone.make_aware(naive)
+    if naive.date() not in bookable_days() or naive.time() not in day_starts(naive.date()):
+        raise SlotUnavailable("هذا الموعد خارج أوقات الحجز.")
+    if slot_at <= (now or timezone.now()):
+        raise SlotUnavailable("هذا الموعد قد مضى.")
+    return slot_at
+
+
+def _starts(slot_at, count):
+    local = timezone.localtime(slot_at)
+    return local.date(), [(local + timedelta(minutes=slot_minutes() * i)).time() for i in range(count)]
+
+
+def reserve(slot_at, service_id):
+    """ يحجز فترات الخدمة بتحديث واحد ويرجع عددها؛ SlotUnavailable إن امتلأت إحداها """
+    duration = Service.objects.filter(pk=service_id).values_list('duration_minutes', flat=True).first()
+    day, starts = _starts(slot_at, units_for(duration))
+
+    def take():
+        return (
+            BookingSlot.objects.filter(date=day, start__in=starts, reserved__lt=F('capacity'))
+            .update(reserved=F('reserved') + 1)
+        )
+
+    taken = take()
+    if taken == 0 and ensure_day(day):
+        taken = take()
+    if taken != len(starts):
+        # المعاملة كلها تُلغى (serialized_write): لا تبقى فترة محجوزة جزئياً
+        raise SlotUnavailable("هذا الموعد امتلأ، اختر موعداً آخر.")
+    _forget(day)
+    return len(starts)
+
+
+def release(job):
+    """ عند إلغاء أو حذف حجز: نعيد فتراته """
+    if not job.slot_at or not job.slot_count:
+        return 0
+    day, starts = _starts(job.slot_at, job.slot_count)
+    freed = BookingSlot.objects.filter(date=day, start__in=starts, reserved__gt=0).update(reserved=F('reserved') - 1)
+    _forget(day)
+    return freed
@@ -0,0 +1,93 @@
+"""
+🚀 قياس إقلاع العامل: الزمن والذاكرة والوحدات المستوردة لكل ملف إعدادات.
+
+كل تشغيل = عملية Python جديدة تحت `python -X importtime` تنشئ تطبيق WSGI وتحمّل
+الروابط (كما يفعل gunicorn قبل أول طلب)، ثم تطبع أرقامها. نقارن الإعدادات الكاملة
+(core.settings) بالخفيفة (core.settings_public) ونعرض أثقل الحزم حسب زمن الاستيراد.
+"""
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+
+DEFAULT_MODULES = ('core.settings', 'core.settings_public')
+
+# ما يُفترض ألا يُحمّل في العامل الخفيف: تطبيق الأدمن وتسجيلاته وواجهته.
+# حزمة django.contrib.admin نفسها تُستورد في الاثنين (modeltranslation.manager يستورد
+# django.contrib.admin.utils)، فلا نراقبها.
+WATCHED = ('jazzmin', 'bookings.admin', 'django.contrib.admin.apps', 'django.contrib.auth.admin', 'modeltranslation.admin')
+
+_CHILD = """
+import json, os, resource, sys, time
+started = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    'seconds': elapsed,
+    'maxrss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'modules': len(sys.modules),
+    'loaded': [w for w in json.loads(os.environ['BENCH_WATCHED']) if w in sys.modules],
+}))
+"""
+
+# import time: self [us] | cumulative | imported package
+_IMPORTTIME = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def parse_importtime(stderr):
+    """ زمن الاستيراد الذاتي (ميكروثانية) مجمعاً حسب الحزمة العليا """
+    totals = defaultdict(int)
+    for line in stderr.splitlines():
+        match = _IMPORTTIME.match(line)
+        if match:
+            totals[match.group(4).split('.')[0]] += int(match.group(1))
+    return dict(totals)
+
+
+def measure(module):
+    """ تشغيل واحد: أرقام العملية الجديدة + زمن الاستيراد لكل حزمة """
+    env = {
+        **os.environ,
+        'DJANGO_SETTINGS_MODULE': module,
+        'BENCH_WATCHED': json.dumps(WATCHED),
+    }
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _CHILD],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode:
+        raise RuntimeError(f"{module}: {proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else proc.returncode}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result['packages'] = parse_importtime(proc.stderr)
+    return result
+
+
+def run(modules=DEFAULT_MODULES, repeat=5, top=10):
+    """ الوسيط لكل ملف إعدادات عبر repeat تشغيلات """
+    summary = []
+    for module in modules:
+        runs = [measure(module) for _ in range(repeat)]
+        packages = defaultdict(list)
+        for r in runs:
+            for name, us in r['packages'].items():
+                packages[name].append(us)
+        heaviest = sorted(((name, statistics.median(v) / 1000) for name, v in packages.items()), key=lambda p: -p[1])
+        summary.append({
+            'settings': module,
+            'runs': repeat,
+            'seconds': statistics.median(r['seconds'] for r in runs),
+            'maxrss_mb': statistics.median(r['maxrss_kb'] for r in runs) / 1024,
+            'modules': statistics.median(r['modules'] for r in runs),
+            'import_ms': sum(ms for _, ms in heaviest),
+            'loaded': runs[-1]['loaded'],
+            'heaviest': [{'package': name, 'ms': round(ms, 1)} for name, ms in heaviest[:top]],
+        })
+    return summary
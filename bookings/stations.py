@@ -0,0 +1,132 @@
+"""
+🏪 عدة محطات من نشر واحد: قاعدة SQLite خاصة لكل محطة.
+
+- STATIONS في settings.py: {المحطة: {'database': اسم القاعدة في DATABASES، 'hosts': [...]}}.
+  المحطة الرئيسية (main) = القاعدة default، فالنشر بمحطة واحدة لا يتغير شيء فيه.
+- الطلب يأخذ محطته من اسم النطاق (StationMiddleware)، والأوامر والعمال الخلفيون من
+  BOOKINGS_STATION (مثلاً: BOOKINGS_STATION=north python manage.py run_workers).
+- StationRouter (routers.py) يوجه كل الجداول إلى قاعدة المحطة الحالية: الإعدادات،
+  الخدمات وأسعارها، الطاقم، العمليات، الحضور والسلف... لا يوجد عمود "محطة" في أي جدول.
+- لكل قاعدة كاتبها الوحيد (writes.py) وإصدارات كاشها وشاشة انتظارها: زحام محطة لا
+  يبطئ الأخرى.
+- fan_out: نفس الدالة على عدة محطات بالتوازي (خيط لكل محطة) مع مهلة؛ المحطة
+  المتأخرة تُعلَّم ولا تؤخر نتائج الباقي (consolidated.py).
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+MAIN = 'main'
+
+_station = ContextVar('bookings_station', default=None)
+
+
+class UnknownStation(LookupError):
+    """ محطة غير معرفة في STATIONS """
+
+
+def configured():
+    return getattr(settings, 'STATIONS', None) or {MAIN: {'database': DEFAULT_DB_ALIAS, 'hosts': []}}
+
+
+def slugs():
+    return list(configured())
+
+
+def current():
+    """ المحطة الحالية: من السياق (الطلب / use) وإلا من BOOKINGS_STATION """
+    return _station.get() or getattr(settings, 'DEFAULT_STATION', MAIN)
+
+
+def db_alias(slug=None):
+    """ اسم قاعدة المحطة في DATABASES """
+    slug = slug or current()
+    try:
+        return configured()[slug].get('database', DEFAULT_DB_ALIAS)
+    except KeyError:
+        raise UnknownStation(slug)
+
+
+@contextmanager
+def use(slug):
+    """ كل القراءات والكتابات داخل السياق تذهب إلى قاعدة هذه المحطة """
+    db_alias(slug)
+    token = _station.set(slug)
+    try:
+        yield slug
+    finally:
+        _station.reset(token)
+
+
+def for_host(host):
+    """ المحطة التي يخدمها اسم النطاق (بدون المنفذ)، أو None """
+    host = (host or '').rsplit(':', 1)[0].strip().lower()
+    for slug, conf in configured().items():
+        if host in (h.lower() for h in conf.get('hosts', ())):
+            return slug
+    return None
+
+
+def scoped(key):
+    """ مفتاح كاش مشترك خاص بالمحطة الحالية (مفاتيح الرئيسية تبقى كما هي) """
+    slug = current()
+    return key if db_alias(slug) == DEFAULT_DB_ALIAS else f"{slug}:{key}"
+
+
+def on_commit(func):
+    """ transaction.on_commit على قاعدة المحطة الحالية """
+    transaction.on_commit(func, using=db_alias())
+
+
+# =========================================================
+# 🌐 التوزيع على المحطات
+# =========================================================
+@dataclass
+class StationResult:
+    station: str
+    value: Any = None
+    error: str = ''
+    seconds: float = 0.0
+
+    @property
+    def ok(self):
+        return not self.error
+
+
+def _run_in(slug, func):
+    started = time.perf_counter()
+    try:
+        with use(slug):
+            return StationResult(slug, value=func(), seconds=time.perf_counter() - started)
+    except Exception as exc:
+        return StationResult(slug, error=f"{type(exc).__name__}: {exc}", seconds=time.perf_counter() - started)
+    finally:
+        # اتصالات هذا الخيط لا يعيد استخدامها أحد
+        connections.close_all()
+
+
+def fan_out(func, stations=None, timeout=None):
+    """
+    ينفذ func() داخل كل محطة في خيط خاص ويرجع [StationResult] بترتيب المحطات.
+    محطة لم تنته خلال timeout ثانية تُرجع error='timeout' (خيطها يكمل وحده في الخلفية).
+    """
+    stations = list(stations or slugs())
+    for slug in stations:
+        db_alias(slug)
+    timeout = getattr(settings, 'STATION_REPORT_TIMEOUT', 30) if timeout is None else timeout
+    pool = ThreadPoolExecutor(max_workers=max(1, len(stations)), thread_name_prefix='station')
+    try:
+        futures = [pool.submit(_run_in, slug, func) for slug in stations]
+        wait(futures, timeout=timeout)
+        return [
+            f.result() if f.done() else StationResult(slug, error='timeout', seconds=timeout)
+            for slug, f in zip(stations, futures)
+        ]
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
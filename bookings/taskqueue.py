@@ -0,0 +1,184 @@
+"""
+⚙️ طابور مهام بسيط مبني على جدول Task.
+
+- التسجيل:   @task() فوق أي دالة تقبل وسائط بسيطة (JSON).
+- الإضافة:   enqueue('اسم_المهمة', **payload) أو my_task.delay(**payload)
+- التنفيذ:   python manage.py run_workers
+
+الحجز يتم بتحديث شرطي (UPDATE ... WHERE status='queued') فلا يأخذ عاملان نفس المهمة.
+النتيجة تُسجل فقط إن بقي الحجز كما هو (locked_by + locked_until): عامل تأخر حتى
+أخذ غيره المهمة لا يكتب فوق نتيجة الآخر.
+المهام المنتهية (done/failed) تُحذف بعد TASKS_DONE_RETENTION_DAYS / TASKS_FAILED_RETENTION_DAYS
+(purge_finished، يستدعيها run_workers دورياً).
+
+بدون run_workers (و TASKS_EAGER=False) لا يُنفذ شيء، ومنه إشعارات حجوزات الموقع: عمر أقدم
+مهمة جاهزة يظهر في /metrics وفي صفحة المهام بالأدمن (oldest_due_seconds).
+"""
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Task
+from .writes import serialized_write
+
+logger = logging.getLogger(__name__)
+
+# مدة حجز المهمة قبل أن تعتبر متروكة (ثوانٍ)
+LEASE_SECONDS = getattr(settings, 'TASKS_LEASE_SECONDS', 300)
+
+# إعادة المحاولة: 5ث، 10ث، 20ث ... بحد أقصى ساعة
+BACKOFF_BASE = 5
+BACKOFF_MAX = 3600
+
+_registry = {}
+
+
+def task(name=None, max_attempts=5):
+    """ يسجل الدالة كمهمة خلفية ويضيف لها .delay() """
+    def decorator(func):
+        key = name or f"{func.__module__}.{func.__name__}"
+        func.task_name = key
+        func.max_attempts = max_attempts
+        func.delay = lambda **payload: enqueue(key, **payload)
+        _registry[key] = func
+        return func
+    return decorator
+
+
+def enqueue(name, *, delay=0, unique=False, **payload):
+    """
+    يضيف مهمة إلى الطابور ويرجع سجل Task (الاسمان delay و unique محجوزان ولا يُمرران للمهمة).
+    delay: تأجيل التنفيذ بالثواني.
+    unique=True: لا نضيف مهمة جديدة إذا كانت نفس المهمة (بنفس البيانات) تنتظر بالفعل.
+    """
+    func = _registry.get(name)
+    if func is None:
+        raise KeyError(f"مهمة غير مسجلة: {name}")
+
+    # وضع التنفيذ الفوري (للتطوير والاختبارات)
+    if getattr(settings, 'TASKS_EAGER', False):
+        func(**payload)
+        return None
+
+    if unique:
+        existing = Task.objects.filter(name=name, payload=payload, status='queued').first()
+        if existing:
+            return existing
+
+    return Task.objects.create(
+        name=name,
+        payload=payload,
+        max_attempts=func.max_attempts,
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def backoff(attempts):
+    """ مدة الانتظار قبل المحاولة التالية (تضاعف مع عشوائية بسيطة) """
+    wait = min(BACKOFF_BASE * (2 ** max(attempts - 1, 0)), BACKOFF_MAX)
+    return wait + random.uniform(0, wait / 4)
+
+
+@serialized_write
+def claim(worker_id, lease=LEASE_SECONDS):
+    """ يحجز أقدم مهمة جاهزة (أو مهمة انتهت مدة حجزها) ويرجعها، أو None """
+    now = timezone.now()
+    available = Q(status='queued', run_after__lte=now) | Q(status='running', locked_until__lt=now)
+    candidates = Task.objects.filter(available).order_by('run_after', 'id').values_list('id', flat=True)[:10]
+
+    for task_id in candidates:
+        won = Task.objects.filter(available, id=task_id).update(
+            status='running',
+            locked_by=worker_id,
+            locked_until=now + timedelta(seconds=lease),
+            attempts=F('attempts') + 1,
+        )
+        if won:
+            return Task.objects.get(id=task_id)
+    return None
+
+
+def execute(task_obj):
+    """ ينفذ المهمة ويحدث حالتها (تمت / إعادة جدولة / فشل نهائي) """
+    func = _registry.get(task_obj.name)
+    try:
+        if func is None:
+            raise KeyError(f"مهمة غير مسجلة: {task_obj.name}")
+        func(**task_obj.payload)
+    except Exception:
+        error = traceback.format_exc(limit=5)
+        logger.warning("Task %s #%s failed (attempt %s)", task_obj.name, task_obj.pk, task_obj.attempts)
+        if task_obj.attempts >= task_obj.max_attempts:
+            _update(task_obj, status='failed', last_error=error, locked_until=None, finished_at=timezone.now())
+        else:
+            _update(
+                task_obj, status='queued', last_error=error, locked_until=None,
+                run_after=timezone.now() + timedelta(seconds=backoff(task_obj.attempts)),
+            )
+        return False
+
+    _update(task_obj, status='done', locked_until=None, last_error='', finished_at=timezone.now())
+    return True
+
+
+@serialized_write
+def _update(task_obj, **fields):
+    """ يسجل النتيجة إن كان الحجز ما زال لنا (locked_until هنا رمز الحجز، لا وقت يُقارن) """
+    won = Task.objects.filter(
+        pk=task_obj.pk, status='running', locked_by=task_obj.locked_by, locked_until=task_obj.locked_until,
+    ).update(**fields)
+    if not won:
+        logger.warning("Task %s #%s: lease lost to another worker, result dropped", task_obj.name, task_obj.pk)
+    return bool(won)
+
+
+@serialized_write
+def _delete_finished(condition, batch_size):
+    ids = list(Task.objects.filter(condition).order_by('id').values_list('id', flat=True)[:batch_size])
+    if ids:
+        Task.objects.filter(id__in=ids).delete()
+    return len(ids)
+
+
+def purge_finished(now=None, batch_size=500):
+    """ يحذف المهام المنتهية القديمة على دفعات قصيرة. يرجع عدد المحذوف """
+    now = now or timezone.now()
+    done_days = getattr(settings, 'TASKS_DONE_RETENTION_DAYS', 7)
+    failed_days = getattr(settings, 'TASKS_FAILED_RETENTION_DAYS', 30)
+    condition = (
+        Q(status='done', finished_at__lt=now - timedelta(days=done_days))
+        | Q(status='failed', finished_at__lt=now - timedelta(days=failed_days))
+    )
+    removed = 0
+    while True:
+        n = _delete_finished(condition, batch_size)
+        removed += n
+        if n < batch_size:
+            return removed
+
+
+def oldest_due_seconds(now=None):
+    """ منذ متى تنتظر أقدم مهمة جاهزة للتنفيذ (0 = الطابور يلحق) """
+    now = now or timezone.now()
+    oldest = (
+        Task.objects.filter(status='queued', run_after__lte=now)
+        .order_by('run_after').values_list('run_after', flat=True).first()
+    )
+    return (now - oldest).total_seconds() if oldest else 0.0
+
+
+def run_pending(worker_id='inline', limit=None):
+    """ ينفذ المهام الجاهزة في نفس العملية (مفيد للاختبارات والأوامر). يرجع عدد المهام المنفذة. """
+    done = 0
+    while limit is None or done < limit:
+        task_obj = claim(worker_id)
+        if task_obj is None:
+            break
+        execute(task_obj)
+        done += 1
+    return done
@@ -0,0 +1,123 @@
+"""
+⚙️ المهام الخلفية الخاصة بالمحطة (تُنفذ بواسطة run_workers خارج مسار الطلب).
+"""
+from datetime import date
+
+from django.contrib.auth.models import User
+
+from .models import Job, Notification, WorkerProfile
+from .taskqueue import task
+from .writes import serialized_write
+from . import caching, heatmap, media, outbox, projections, querylog, retention, slots, stations
+
+
+@task()
+@serialized_write
+def notify_new_booking(job_id):
+    """ 🔔 إنشاء (أو تحديث) إشعار الحجز الجديد القادم من الموقع """
+    job = Job.objects.filter(id=job_id).first()
+    if job is None:
+        return
+
+    # تحديد نوع الإشعار
+    if job.voice_audio:
+        notif_msg = f"🎙️ رسالة صوتية من {job.client_name}"
+        n_type = 'voice'
+    elif job.custom_desc:
+        notif_msg = f"📝 طلب خاص من {job.client_name}"
+        n_type = 'voice'
+    else:
+        notif_msg = f"🚗 حجز جديد: {job.client_name}"
+        n_type = 'standard'
+
+    # منع التكرار (إعادة تنفيذ المهمة لا تنشئ إشعاراً ثانياً)
+    existing_notif = Notification.objects.filter(job=job).first()
+    if existing_notif:
+        existing_notif.message = notif_msg
+        existing_notif.notif_type = n_type
+        existing_notif.is_read = False
+        existing_notif.save()
+    else:
+        Notification.objects.create(job=job, message=notif_msg, notif_type=n_type)
+
+
+@task()
+@serialized_write
+def ensure_worker_profiles():
+    """ 👤 إنشاء ملف الراتب للعمال الذين لا يملكون ملفاً بعد """
+    missing = User.objects.filter(is_staff=True, profile__isnull=True)
+    if WorkerProfile.objects.bulk_create([WorkerProfile(user=u) for u in missing], ignore_conflicts=True):
+        # bulk_create لا يرسل إشارات
+        caching.invalidate('workerprofile')
+
+
+@task()
+@serialized_write
+def record_job_in_heatmap(job_id):
+    """ 🔥 إضافة العملية إلى خريطة الضغط """
+    job = Job.objects.filter(id=job_id).first()
+    if job is not None:
+        heatmap.record_job(job)
+
+
+@task(max_attempts=2)
+def rebuild_heatmap(days=heatmap.WINDOW_DAYS, every=None):
+    """ 🔥 إعادة بناء خريطة الضغط بالكامل (every: تتكرر كل N ثانية فتنزلق النافذة) """
+    heatmap.rebuild(window_days=days)
+    if every:
+        rebuild_heatmap.delay(delay=every, unique=True, days=days, every=every)
+
+
+@task(max_attempts=3)
+def refresh_slot_capacity(day):
+    """ 📅 سعة مواعيد الحجز بعد تعديل الحضور (day: YYYY-MM-DD) """
+    slots.refresh_capacity(date.fromisoformat(day))
+
+
+@task(max_attempts=3)
+def update_projections():
+    """ 📊 تمرير الأحداث الجديدة على الإسقاطات (كل دفعة في معاملة مع مؤشرها) """
+    projections.catch_up()
+
+
+@task(max_attempts=2)
+def compact_notifications(every=None):
+    """ 🧹 تنظيف الإشعارات (every: إعادة الجدولة بعد N ثانية، للتشغيل الدوري بدون cron) """
+    retention.compact()
+    if every:
+        compact_notifications.delay(delay=every, unique=True, every=every)
+
+
+@task(max_attempts=3)
+def release_voice_note(path):
+    """ 🎙️ حذف تسجيل عملية محذوفة إن لم تعد تشير إليه عملية أخرى """
+    media.release(path)
+
+
+@task(max_attempts=2)
+def sweep_voice_notes(after='', every=None):
+    """ 🧹 دفعة من الكنس ثم متابعة من نفس النقطة (every: إعادة الدورة كاملة بعد N ثانية) """
+    last, _ = media.sweep(after=after, max_files=media.SWEEP_FILES_PER_TASK)
+    if last is not None:
+        sweep_voice_notes.delay(after=last, every=every)
+    elif every:
+        sweep_voice_notes.delay(delay=every, unique=True, every=every)
+
+
+@task(max_attempts=1)
+def record_slow_queries(entries, view):
+    """ 🐢 خطة التنفيذ وحفظ الاستعلامات البطيئة لطلب انتهى (خارج مسار الطلب) """
+    querylog.record(entries, view, stations.db_alias())
+
+
+@task(max_attempts=3)
+def dispatch_outbox():
+    """
+    📨 دفعة واحدة من رسائل الزبائن ثم موعد الدفعة التالية.
+    لا نوم داخل المهمة: حد الإرسال يصبح تأجيلاً للمهمة التالية، فلا تتجاوز مدة الحجز
+    (TASKS_LEASE_SECONDS) مهما كبر الطابور ولا يعمل مرسلان معاً.
+    """
+    stats = outbox.dispatch(max_batches=1, pace=False)
+    retry_in = outbox.next_retry_in()
+    if retry_in is not None:
+        dispatch_outbox.delay(delay=max(retry_in, outbox.pace_seconds(sum(stats.values()))), unique=True)
@@ -0,0 +1,124 @@
+// =========================================================
+// 📴 Service Worker الكاشير: إرسال الإدخالات المحفوظة محلياً على دفعات
+// الصفحة تحفظ الإدخال في IndexedDB فوراً، وهذا الملف يرسله عند توفر الاتصال.
+// الإدخال المرفوض (خدمة/عامل غير معروف) لا يُحذف: يُنقل إلى "rejected" وتعرضه صفحة الكاشير.
+// =========================================================
+const SYNC_URL = '{{ sync_url }}';
+const DB_NAME = 'turbowash-pos';
+const DB_VERSION = 2;
+const STORE = 'entries';
+const REJECTED = 'rejected';
+const BATCH_SIZE = 20;
+
+function openDb() {
+    return new Promise((resolve, reject) => {
+        const req = indexedDB.open(DB_NAME, DB_VERSION);
+        req.onupgradeneeded = () => {
+            [STORE, REJECTED].forEach(name => {
+                if (!req.result.objectStoreNames.contains(name)) req.result.createObjectStore(name, { keyPath: 'key' });
+            });
+        };
+        req.onsuccess = () => resolve(req.result);
+        req.onerror = () => reject(req.error);
+    });
+}
+
+function allEntries(db, store = STORE) {
+    return new Promise((resolve, reject) => {
+        const req = db.transaction(store).objectStore(store).getAll();
+        req.onsuccess = () => resolve(req.result || []);
+        req.onerror = () => reject(req.error);
+    });
+}
+
+function removeEntries(db, keys) {
+    return new Promise((resolve, reject) => {
+        const tx = db.transaction(STORE, 'readwrite');
+        keys.forEach(k => tx.objectStore(STORE).delete(k));
+        tx.oncomplete = resolve;
+        tx.onerror = () => reject(tx.error);
+    });
+}
+
+function rejectEntries(db, rejected) {
+    // نقل ذري: الإدخال يخرج من الطابور ويدخل قائمة المرفوضات في نفس المعاملة
+    return new Promise((resolve, reject) => {
+        const tx = db.transaction([STORE, REJECTED], 'readwrite');
+        rejected.forEach(({ entry, error }) => {
+            tx.objectStore(STORE).delete(entry.key);
+            tx.objectStore(REJECTED).put({ ...entry, error, rejected_at: new Date().toISOString() });
+        });
+        tx.oncomplete = resolve;
+        tx.onerror = () => reject(tx.error);
+    });
+}
+
+async function freshCsrfToken() {
+    // الرمز المحفوظ مع الإدخال قد يكون قديماً (تسجيل دخول جديد): نطلب الحالي قبل كل مزامنة
+    const response = await fetch(SYNC_URL, { credentials: 'same-origin', headers: { Accept: 'application/json' } });
+    if (!response.ok || !(response.headers.get('Content-Type') || '').includes('json')) {
+        throw new Error('csrf token unavailable: ' + response.status);
+    }
+    return (await response.json()).csrf;
+}
+
+async function notifyPages(message) {
+    const pages = await self.clients.matchAll({ includeUncontrolled: true });
+    pages.forEach(p => p.postMessage(message));
+}
+
+let flushing = null;
+
+async function flushQueue() {
+    // دفعة واحدة في نفس الوقت (الصفحة قد تطلب المزامنة أكثر من مرة)
+    if (flushing) return flushing;
+    flushing = (async () => {
+        const db = await openDb();
+        const entries = (await allEntries(db)).sort((a, b) => a.created_at.localeCompare(b.created_at));
+        const summary = { created: 0, duplicate: 0, error: 0 };
+        const csrf = entries.length ? await freshCsrfToken() : null;
+
+        for (let i = 0; i < entries.length; i += BATCH_SIZE) {
+            const batch = entries.slice(i, i + BATCH_SIZE);
+            const response = await fetch(SYNC_URL, {
+                method: 'POST',
+                credentials: 'same-origin',
+                headers: { 'Content-Type': 'application/json', 'X-CSRFToken': csrf },
+                body: JSON.stringify({ entries: batch.map(({ csrf, ...e }) => e) }),
+            });
+            // خطأ شبكة أو خادم: نترك الدفعة كما هي ونعيد المحاولة لاحقاً
+            if (!response.ok) throw new Error('sync failed: ' + response.status);
+
+            const data = await response.json();
+            // وصل (جديد أو مكرر): يُحذف من الطابور. مرفوض: يُنقل إلى قائمة المرفوضات
+            const byKey = new Map(batch.map(e => [e.key, e]));
+            const done = data.results.filter(r => r.key && r.status !== 'error').map(r => r.key);
+            const rejected = data.results
+                .filter(r => r.key && r.status === 'error' && byKey.has(r.key))
+                .map(r => ({ entry: byKey.get(r.key), error: r.error }));
+            data.results.forEach(r => { summary[r.status] = (summary[r.status] || 0) + 1; });
+            await removeEntries(db, done);
+            await rejectEntries(db, rejected);
+        }
+
+        const remaining = (await allEntries(db)).length;
+        const rejected = (await allEntries(db, REJECTED)).length;
+        await notifyPages({ type: 'pos-sync', summary, remaining, rejected });
+    })().finally(() => { flushing = null; });
+    return flushing;
+}
+
+self.addEventListener('install', () => self.skipWaiting());
+self.addEventListener('activate', event => event.waitUntil(self.clients.claim()));
+
+// Background Sync: المتصفح يستدعينا عند عودة الاتصال حتى لو أُغلقت الصفحة
+self.addEventListener('sync', event => {
+    if (event.tag === 'pos-sync') event.waitUntil(flushQueue());
+});
+
+// طلب مزامنة مباشر من الصفحة
+self.addEventListener('message', event => {
+    if (event.data && event.data.type === 'flush') {
+        event.waitUntil(flushQueue().catch(err => notifyPages({ type: 'pos-sync-error', error: String(err) })));
+    }
+});
@@ -1,3 +1,1951 @@
-from django.test import TestCase
+"""
+🧪 ميزانية الاستعلامات (Query Budget) لكل صفحة.
 
-# Create your tests here.
+كل اختبار يزرع بيانات تشبه المحطة (عمال، خدمات، عمليات، حضور، سلف، إشعارات)
+ثم يتحقق من:
+1. عدد الاستعلامات (بالضبط أو حد أقصى) في النظامين: العمولة والرواتب.
+2. أن العدد لا يكبر مع 10× عمال وعمليات (أي N+1 جديد يُفشل الاختبار).
+3. زمن تقريبي لكل صفحة (حد واسع، فقط لالتقاط التراجعات الكبيرة).
+"""
+import asyncio
+import hashlib
+import importlib
+import io
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connection, connections, transaction
+from django.db.migrations.loader import MigrationLoader
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Advance, Attendance, BookingSlot, Job, JobEvent, Notification, OutboundMessage, ProjectionRow, RequestProfile, Service, SlowQuery, StationSettings, Task, WorkerProfile, WorkerServiceStats
+from . import backup, caching, consolidated, dashboard, events, heatmap, importer, loadtest, media, metrics, outbox, performance, projections, queueboard, ratelimit, replica, retention, routers, slots, startup, stations, taskqueue, tasks, views, writes
+
+# زمن أقصى تقريبي لأي صفحة في الاختبارات (ثوانٍ)
+TIME_BUDGET = 2.0
+
+# الكاش المشترك (L2) والدلاء في ذاكرة الاختبار: لا نلمس .cache الذي يقرأ منه خادم التطوير
+TEST_CACHES = {
+    alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'tests-{alias}'}
+    for alias in ('default', 'shared', 'ratelimit')
+}
+
+
+@override_settings(SLOW_QUERY_SAMPLE_RATE=0, TASKS_EAGER=False, CACHES=TEST_CACHES)
+class QueryBudgetTestCase(TestCase):
+    workers = 5
+    jobs_per_worker = 10
+
+    @classmethod
+    def seed(cls, workers, jobs_per_worker):
+        """ بيانات ممثلة: كل عامل له ملف وحضور وسلفة وعمليات في النظامين """
+        now = timezone.now()
+        services = [
+            Service.objects.create(name=f"خدمة {i}", price=Decimal(500 + i * 100), worker_commission=Decimal(100 + i * 20))
+            for i in range(4)
+        ]
+        base = User.objects.count()
+        staff = User.objects.bulk_create([
+            User(username=f"worker{base + i}", first_name=f"عامل {base + i}", is_staff=True) for i in range(workers)
+        ])
+        WorkerProfile.objects.bulk_create([WorkerProfile(user=w, daily_salary=Decimal(1200)) for w in staff])
+        Attendance.objects.bulk_create([
+            Attendance(worker=w, date=now.date(), is_present=i % 2 == 0, day_salary_snapshot=Decimal(1200) if i % 2 == 0 else 0)
+            for i, w in enumerate(staff)
+        ])
+        Advance.objects.bulk_create([Advance(worker=w, amount=Decimal(200), date=now) for w in staff])
+
+        jobs = []
+        for i, w in enumerate(staff):
+            for j in range(jobs_per_worker):
+                service = services[j % len(services)]
+                status = ('completed', 'processing', 'pending', 'canceled')[j % 4]
+                mode = 'salary' if j % 3 == 0 else 'commission'
+                jobs.append(Job(
+                    car_plate=f"{i:03d}-{j:03d}", service=service, worker=w, status=status,
+                    source='website' if j % 5 == 0 else 'manual', system_mode=mode,
+                    created_at=now - timedelta(hours=j % 48), final_price=service.price,
+                    final_commission=service.worker_commission if status == 'completed' and mode == 'commission' else 0,
+                ))
+        jobs = Job.objects.bulk_create(jobs)
+        Notification.objects.bulk_create([
+            Notification(job=job, message=f"حجز جديد {job.car_plate}") for job in jobs if job.source == 'website'
+        ])
+        return staff, services, jobs
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('boss', 'boss@example.com', 'pass')
+        WorkerProfile.objects.create(user=cls.admin)
+        cls.staff, cls.services, cls.jobs = cls.seed(cls.workers, cls.jobs_per_worker)
+        StationSettings.objects.create(id=1, current_mode='commission')
+
+    def setUp(self):
+        caches['ratelimit'].clear()
+        caches['shared'].clear()
+        caching.clear_local()
+        self.client.force_login(self.admin)
+
+    # -------------------------------------------------------------
+    # أدوات القياس
+    # -------------------------------------------------------------
+    def set_mode(self, mode):
+        StationSettings.objects.filter(id=1).update(current_mode=mode)
+        caching.bump('stationsettings')  # update() لا يرسل إشارات
+
+    def next_slot(self, days=1, clock=None):
+        """ موعد حجز صالح للنموذج (غداً عند الافتتاح افتراضياً) """
+        day = timezone.localdate() + timedelta(days=days)
+        return f"{day.isoformat()}T{clock or settings.BOOKING_OPEN}"
+
+    def measure(self, method, url, data=None, **extra):
+        """ يرجع (الاستجابة، عدد الاستعلامات، الزمن) """
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = getattr(self.client, method)(url, data, **extra)
+            elapsed = time.perf_counter() - started
+        return response, len(queries), elapsed
+
+    def assertBudget(self, method, url, max_queries, data=None, exact=False, status=200, **extra):
+        response, queries, elapsed = self.measure(method, url, data, **extra)
+        self.assertEqual(response.status_code, status, f"{method.upper()} {url}")
+        if exact:
+            self.assertEqual(queries, max_queries, f"{method.upper()} {url}: {queries} queries")
+        else:
+            self.assertLessEqual(queries, max_queries, f"{method.upper()} {url}: {queries} queries")
+        self.assertLess(elapsed, TIME_BUDGET, f"{method.upper()} {url}: {elapsed:.2f}s")
+        return response, queries
+
+
+class PublicViewsTests(QueryBudgetTestCase):
+    def test_home_get(self):
+        self.client.logout()
+        self.assertBudget('get', reverse('home'), 1, exact=True)
+
+    def test_home_post(self):
+        self.client.logout()
+        data = {'name': 'زبون', 'phone': '0555', 'plate': '123-45', 'service': self.services[0].pk, 'slot': self.next_slot()}
+        # +1: سطر الإنشاء في سجل الأحداث (نفس معاملة الحفظ)
+        # +2: مدة الخدمة + حجز الفترة (تحديث ذري واحد؛ فترات اليوم موجودة مسبقاً)
+        slots.ensure_day(timezone.localdate() + timedelta(days=1))
+        self.assertBudget('post', reverse('home'), 10, data=data)
+        self.assertTrue(Job.objects.filter(car_plate='123-45', source='website').exists())
+
+
+class CashierViewsTests(QueryBudgetTestCase):
+    def test_pos_dashboard_post(self):
+        data = {'service': self.services[0].pk, 'worker': self.staff[0].pk, 'plate': 'POS-1', 'idempotency_key': 'k-1'}
+        self.assertBudget('post', reverse('pos_dashboard'), 10, data=data, status=302)
+        # نفس المفتاح مرة ثانية: لا عملية جديدة وعدد استعلامات أقل
+        self.assertBudget('post', reverse('pos_dashboard'), 3, data=data, status=302)
+        self.assertEqual(Job.objects.filter(idempotency_key='k-1').count(), 1)
+
+    def raced_create(self):
+        """ طلب آخر يحفظ نفس المفتاح بين الفحص المسبق وكتابتنا (ضغطتان في نفس اللحظة) """
+        original = views._create_job
+
+        def create(**fields):
+            original(**fields)
+            return original(**fields)
+        return mock.patch.object(views, '_create_job', side_effect=create)
+
+    def test_pos_dashboard_double_submit_race_is_a_duplicate(self):
+        data = {'service': self.services[0].pk, 'worker': self.staff[0].pk, 'plate': 'RACE-1', 'idempotency_key': 'race-1'}
+        with self.raced_create():
+            response = self.client.post(reverse('pos_dashboard'), data, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['duplicate'])
+        self.assertEqual(Job.objects.filter(idempotency_key='race-1').count(), 1)
+
+    def test_quick_add_double_submit_race_is_a_duplicate(self):
+        data = {'quick_add': '1', 'service': self.services[0].pk, 'worker': self.staff[0].pk, 'plate': 'RACE-2', 'idempotency_key': 'race-2'}
+        with self.raced_create():
+            response = self.client.post(reverse('admin:bookings_job_changelist'), data, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['duplicate'])
+        job = Job.objects.get(idempotency_key='race-2')
+        # نفس مسار الكاشير: حدث الإنشاء مع العملية
+        self.assertTrue(JobEvent.objects.filter(job_id=job.pk).exists())
+
+    def test_finish_wash(self):
+        job = Job.objects.filter(status='processing').first()
+        self.assertBudget('get', reverse('finish_wash', args=[job.pk]), 7, status=302)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+
+    def test_get_notifications(self):
+        self.assertBudget('get', reverse('get_notifications'), 4, exact=True)
+
+    def test_mark_read_and_redirect(self):
+        notif = Notification.objects.filter(is_read=False).first()
+        self.assertBudget('get', reverse('mark_notification_read', args=[notif.pk]), 7, status=302)
+        notif.refresh_from_db()
+        self.assertTrue(notif.is_read)
+
+    def test_toggle_mode(self):
+        self.assertBudget('post', reverse('toggle_mode'), 6, status=302)
+        self.assertEqual(StationSettings.objects.get(id=1).current_mode, 'salary')
+
+    def test_update_attendance_manual(self):
+        data = {'worker_id': self.staff[1].pk}
+        self.assertBudget('post', reverse('update_attendance_manual'), 10, data=data, status=302)
+        self.assertTrue(Attendance.objects.get(worker=self.staff[1], date=timezone.now().date()).is_present)
+
+
+class AdminChangelistTests(QueryBudgetTestCase):
+    JOB_BUDGET = {'commission': 20, 'salary': 19}
+    PAYROLL_BUDGET = 9
+
+    def test_job_changelist_commission(self):
+        self.set_mode('commission')
+        response, _ = self.assertBudget('get', reverse('admin:bookings_job_changelist'), self.JOB_BUDGET['commission'])
+        self.assertTemplateUsed(response, 'admin/bookings/job/change_list_jazzmin.html')
+
+    def test_job_changelist_salary(self):
+        self.set_mode('salary')
+        response, _ = self.assertBudget('get', reverse('admin:bookings_job_changelist'), self.JOB_BUDGET['salary'])
+        self.assertTemplateUsed(response, 'admin/bookings/job/salary_dashboard.html')
+
+    def test_payroll_changelist_both_modes(self):
+        for mode in ('commission', 'salary'):
+            with self.subTest(mode=mode):
+                self.set_mode(mode)
+                self.assertBudget('get', reverse('admin:bookings_payroll_changelist'), self.PAYROLL_BUDGET)
+
+    def test_payroll_values(self):
+        """ الأرقام المحسوبة في الاستعلام نفسه تطابق الحساب المباشر """
+        worker = self.staff[0]
+        start_month = timezone.now().replace(day=1)
+        self.set_mode('commission')
+        response = self.client.get(reverse('admin:bookings_payroll_changelist'))
+        row = next(obj for obj in response.context['cl'].result_list if obj.pk == worker.pk)
+        expected = sum(
+            j.final_commission for j in self.jobs
+            if j.worker_id == worker.pk and j.status == 'completed' and j.system_mode == 'commission' and j.created_at >= start_month
+        )
+        self.assertEqual(row.earned, expected)
+        self.assertEqual(row.taken, Decimal(200))
+
+        self.set_mode('salary')
+        response = self.client.get(reverse('admin:bookings_payroll_changelist'))
+        row = next(obj for obj in response.context['cl'].result_list if obj.pk == worker.pk)
+        self.assertEqual((row.earned, row.present_days), (Decimal(1200), 1))
+
+
+class ScalingTests(QueryBudgetTestCase):
+    """ نفس الصفحات مع 10× عمال وعمليات: عدد الاستعلامات يجب ألا يتغير """
+    URLS = (
+        ('admin:bookings_job_changelist', ('commission', 'salary')),
+        ('admin:bookings_payroll_changelist', ('commission', 'salary')),
+        ('get_notifications', ('commission',)),
+        ('home', ('commission',)),
+    )
+
+    def counts(self):
+        result = {}
+        for name, modes in self.URLS:
+            for mode in modes:
+                self.set_mode(mode)
+                response, queries, _ = self.measure('get', reverse(name))
+                self.assertEqual(response.status_code, 200, name)
+                result[(name, mode)] = queries
+        return result
+
+    def test_query_count_is_constant_with_10x_data(self):
+        before = self.counts()
+        self.seed(self.workers * 9, self.jobs_per_worker * 10)  # المجموع: 10× عمال، وأكثر من 10× عمليات
+        started = time.perf_counter()
+        after = self.counts()
+        self.assertEqual(before, after)
+        self.assertLess(time.perf_counter() - started, TIME_BUDGET * len(after))
+
+
+
+class PosSyncTests(QueryBudgetTestCase):
+    def entry(self, key, **fields):
+        return {'key': key, 'service': self.services[0].pk, 'worker': self.staff[0].pk, 'plate': f"SYNC-{key}", **fields}
+
+    def sync(self, client, *entries, token=None):
+        headers = {'HTTP_X_CSRFTOKEN': token} if token else {}
+        return client.post(reverse('pos_sync'), json.dumps({'entries': list(entries)}), content_type='application/json', **headers)
+
+    def test_replayed_batch_is_idempotent_and_rejects_are_reported(self):
+        batch = [self.entry('k1'), self.entry('k2', service=999999), self.entry('k3', worker='x')]
+        first = self.sync(self.client, *batch).json()['results']
+        self.assertEqual([r['status'] for r in first], ['created', 'error', 'error'])
+        self.assertEqual([r['key'] for r in first], ['k1', 'k2', 'k3'])
+
+        # الجهاز لم يستلم الرد فأعاد نفس الدفعة: لا عملية جديدة، ونفس الرقم
+        again = self.sync(self.client, *batch).json()['results']
+        self.assertEqual([r['status'] for r in again], ['duplicate', 'error', 'error'])
+        self.assertEqual(again[0]['job_id'], first[0]['job_id'])
+        self.assertEqual(Job.objects.filter(idempotency_key='k1').count(), 1)
+        self.assertFalse(Job.objects.filter(idempotency_key__in=['k2', 'k3']).exists())
+
+    def test_odd_field_types_are_coerced_or_rejected_per_entry(self):
+        batch = [
+            self.entry('t1', phone=213555123456789012, client_name='ز' * 300, car_type=42, plate=7, created_at='2024-13-45T10:00:00'),
+            self.entry('t2', phone={'nested': 1}),
+        ]
+        response = self.sync(self.client, *batch)
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([r['status'] for r in results], ['created', 'error'])
+        job = Job.objects.get(idempotency_key='t1')
+        self.assertEqual((job.phone, job.car_plate, job.car_type), ('213555123456789', '7', '42'))
+        self.assertEqual(len(job.client_name), 100)
+        self.assertFalse(Job.objects.filter(idempotency_key='t2').exists())
+
+    def test_fresh_csrf_token_for_the_service_worker(self):
+        client = self.client_class(enforce_csrf_checks=True)
+        client.force_login(self.admin)
+        self.assertEqual(self.sync(client, self.entry('c1'), token='stale-token-from-an-old-session').status_code, 403)
+        token = client.get(reverse('pos_sync')).json()['csrf']
+        self.assertEqual(self.sync(client, self.entry('c1'), token=token).json()['results'][0]['status'], 'created')
+
+
+class PartialUpdateTests(QueryBudgetTestCase):
+    """ الأزرار بـ Accept: application/json ترجع السطر المتغير + أرقام اليوم فقط """
+    JSON = {'HTTP_ACCEPT': 'application/json'}
+
+    def test_finish_wash_json(self):
+        job = Job.objects.filter(status='processing', system_mode='commission').first()
+        response, _ = self.assertBudget('post', reverse('finish_wash', args=[job.pk]), 9, **self.JSON)
+        data = response.json()
+        self.assertEqual(data['job']['status'], 'completed')
+        self.assertEqual(set(data['counters']), {'mode', 'total_revenue', 'total_commission', 'profit', 'pending_jobs'})
+
+    def test_attendance_json(self):
+        response, _ = self.assertBudget('post', reverse('update_attendance_manual'), 13, data={'worker_id': self.staff[1].pk}, **self.JSON)
+        data = response.json()
+        self.assertEqual(data['worker'], {'id': self.staff[1].pk, 'is_present': True})
+        self.assertEqual(data['counters']['present_workers'], Attendance.objects.filter(is_present=True).count())
+
+    def test_salary_json(self):
+        data = {'worker_id': self.staff[0].pk, 'salary': '1500'}
+        response, _ = self.assertBudget('post', reverse('update_worker_salary_manual'), 13, data=data, **self.JSON)
+        self.assertEqual(response.json()['worker']['salary'], 1500.0)
+
+    def test_pos_dashboard_json_returns_row(self):
+        self.set_mode('salary')
+        data = {'service': self.services[0].pk, 'worker': self.staff[0].pk, 'plate': 'JSON-1', 'idempotency_key': 'json-1'}
+        response, _ = self.assertBudget('post', reverse('pos_dashboard'), 13, data=data, **self.JSON)
+        payload = response.json()
+        self.assertIn('JSON-1', payload['row_html'])
+        self.assertEqual(payload['counters']['mode'], 'salary')
+
+    def test_toggle_mode_json_asks_for_reload(self):
+        response, _ = self.assertBudget('post', reverse('toggle_mode'), 9, **self.JSON)
+        self.assertTrue(response.json()['reload'])
+
+    def test_counters_are_built_after_the_write(self):
+        """ التجميعات ورسم السطر لا تحجز الكاتب الوحيد """
+        held = []
+        original = dashboard.today_counters
+
+        def spy(*args, **kwargs):
+            held.append(writes.in_write())
+            return original(*args, **kwargs)
+
+        job = Job.objects.filter(status='processing').first()
+        posts = (
+            (reverse('finish_wash', args=[job.pk]), {}),
+            (reverse('update_attendance_manual'), {'worker_id': self.staff[1].pk}),
+            (reverse('update_worker_salary_manual'), {'worker_id': self.staff[0].pk, 'salary': '1300'}),
+            (reverse('toggle_mode'), {}),
+            (reverse('pos_dashboard'), {'service': self.services[0].pk, 'worker': self.staff[0].pk, 'plate': 'AFTER-1'}),
+        )
+        with mock.patch.object(dashboard, 'today_counters', spy):
+            for url, data in posts:
+                self.assertEqual(self.client.post(url, data, **self.JSON).status_code, 200, url)
+        self.assertEqual(held, [False] * len(posts))
+
+    def test_counters_match_dashboard(self):
+        """ أرقام الرد الجزئي = أرقام رأس اللوحة """
+        for mode, key in (('commission', 'stats'), ('salary', 'salary_stats')):
+            with self.subTest(mode=mode):
+                self.set_mode(mode)
+                page = self.client.get(reverse('admin:bookings_job_changelist')).context[key]
+                counters = self.client.get(reverse('dashboard_counters')).json()['counters']
+                for name, value in counters.items():
+                    self.assertEqual(str(page[name]), str(value), name)
+
+
+class EventLogTests(QueryBudgetTestCase):
+    """ سجل الأحداث + الإسقاطات: التدريجي = إعادة البناء = أرقام اللوحة """
+
+    def setUp(self):
+        super().setUp()
+        # عمليات الزرع أُدخلت بـ bulk_create (بدون Job.save)
+        events.backfill()
+
+    def rows(self):
+        return {(r.projection, r.key): r.data for r in ProjectionRow.objects.all()}
+
+    def test_lifecycle_events(self):
+        job = Job.objects.create(service=self.services[0], car_plate='EV-1', phone='0666', status='pending')
+        job = Job.objects.get(pk=job.pk)
+        job.worker = self.staff[0]
+        job.status = 'processing'
+        job.save()
+        job.status = 'completed'
+        job.save()
+        job_id = job.pk
+        job.delete()
+
+        log = JobEvent.objects.filter(job_id=job_id)
+        self.assertEqual(list(log.values_list('kind', flat=True)), ['created', 'assigned', 'started', 'completed', 'deleted'])
+        completed = log.get(kind='completed')
+        self.assertEqual(completed.before['commission'], '0.00')
+        self.assertEqual(completed.after['commission'], str(self.services[0].worker_commission.quantize(Decimal('0.01'))))
+
+    def test_event_log_is_append_only(self):
+        event = JobEvent.objects.first()
+        with self.assertRaises(ValueError):
+            event.save()
+        with self.assertRaises(ValueError):
+            event.delete()
+
+    def test_incremental_matches_rebuild_and_dashboard(self):
+        projections.catch_up()
+        # تغييرات بعد أول تمرير: إكمال، إلغاء، تعيين، حذف، إنشاء
+        for job in Job.objects.filter(status='processing', system_mode='commission')[:3]:
+            job.status = 'completed'
+            job.save()
+        for job in Job.objects.filter(status='pending')[:2]:
+            job.status = 'canceled'
+            job.save()
+        moved = Job.objects.filter(status='completed').first()
+        moved.worker = self.staff[1]
+        moved.save()
+        Job.objects.filter(status='canceled').first().delete()
+        Job.objects.create(service=self.services[1], worker=self.staff[2], car_plate='EV-2', status='processing')
+
+        projections.catch_up(batch_size=2)
+        self.assertEqual(projections.lag(), {name: 0 for name in projections.REGISTRY})
+        incremental = self.rows()
+        projections.rebuild()
+        self.assertEqual(self.rows(), incremental)
+
+        counters = dashboard.today_counters('commission')
+        daily = projections.read('daily', f"{timezone.localdate().isoformat()}:commission")
+        self.assertEqual(daily['revenue'], counters['total_revenue'])
+        self.assertEqual(daily['commission'], counters['total_commission'])
+        self.assertEqual(daily['pending'], counters['pending_jobs'])
+
+
+@override_settings(CHANGES_SETTLE_SECONDS=0, CHANGES_TOKEN='sync-secret')
+class ChangeFeedTests(QueryBudgetTestCase):
+    """ /api/changes/: كل سطر مرة واحدة، ثم فقط ما تغير بعد المؤشر """
+
+    def pull(self, feed, cursor=None, limit=7):
+        seen = []
+        while True:
+            params = {'feed': feed, 'limit': limit}
+            if cursor:
+                params['since'] = cursor
+            response, _ = self.assertBudget('get', reverse('changes_feed'), 3, data=params, exact=True)
+            body = response.json()
+            seen += [row['id'] for row in body['results']]
+            cursor = body['next_cursor']
+            if not body['has_more']:
+                return seen, cursor
+
+    def test_incremental_sync(self):
+        ids, cursor = self.pull('jobs')
+        self.assertEqual(sorted(ids), sorted(Job.objects.values_list('id', flat=True)))
+
+        # لا تغيير = لا أسطر
+        self.assertEqual(self.pull('jobs', cursor)[0], [])
+
+        job = Job.objects.filter(status='processing').first()
+        job.status = 'completed'
+        job.save()
+        self.assertEqual(self.pull('jobs', cursor)[0], [job.pk])
+
+    def test_deletes_become_tombstones(self):
+        _, cursor = self.pull('tombstones')
+        advance = Advance.objects.first()
+        advance_id = advance.pk
+        advance.delete()
+        response = self.client.get(reverse('changes_feed'), {'feed': 'tombstones', 'since': cursor or ''})
+        self.assertEqual(
+            [(r['model'], r['object_id']) for r in response.json()['results']],
+            [('advances', advance_id)],
+        )
+
+    def test_access_and_bad_input(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('changes_feed')).status_code, 403)
+        ok = self.client.get(reverse('changes_feed'), HTTP_AUTHORIZATION='Bearer sync-secret')
+        self.assertEqual(ok.status_code, 200)
+        bad = self.client.get(reverse('changes_feed'), {'since': 'not-a-cursor'}, HTTP_AUTHORIZATION='Bearer sync-secret')
+        self.assertEqual(bad.status_code, 400)
+
+
+class NotificationRetentionTests(QueryBudgetTestCase):
+    def test_compact_removes_only_expired_and_orphans(self):
+        now = timezone.now()
+        job = self.jobs[1]  # مصدرها الكاشير: خارج اليتيمة أدناه
+        keep = [
+            Notification.objects.create(job=job, message="جديد مقروء", is_read=True),
+            Notification.objects.create(job=job, message="قديم غير مقروء"),
+        ]
+        Notification.objects.filter(pk=keep[1].pk).update(created_at=now - timedelta(days=40))
+        old_read = Notification.objects.bulk_create([Notification(job=job, message=f"قديم {i}", is_read=True) for i in range(5)])
+        Notification.objects.filter(pk__in=[n.pk for n in old_read]).update(created_at=now - timedelta(days=40))
+        expired = Notification.objects.create(job=job, message="منسي")
+        Notification.objects.filter(pk=expired.pk).update(created_at=now - timedelta(days=400))
+        orphans = Notification.objects.filter(job__source='website')[:3]
+        orphan_count = len(orphans)
+        Notification.objects.filter(pk__in=[n.pk for n in orphans]).update(job=None)
+
+        total = Notification.objects.count()
+        removed = retention.compact(batch_size=2)
+        # غير المقروءة تبقى ما لم يُفعل حذفها صراحة
+        self.assertEqual(removed, {'orphan': orphan_count, 'read_expired': 5})
+        self.assertEqual(Notification.objects.count(), total - orphan_count - 5)
+        self.assertTrue(Notification.objects.filter(pk=expired.pk).exists())
+        self.assertEqual(Notification.objects.filter(pk__in=[n.pk for n in keep]).count(), 2)
+
+        with override_settings(NOTIFICATION_UNREAD_TTL_DAYS=180):
+            removed = retention.compact(batch_size=2)
+        self.assertEqual(removed, {'orphan': 0, 'read_expired': 0, 'unread_expired': 1})
+        self.assertFalse(Notification.objects.filter(pk=expired.pk).exists())
+        self.assertEqual(Notification.objects.filter(pk__in=[n.pk for n in keep]).count(), 2)
+
+    def test_max_batches_bounds_one_run(self):
+        Notification.objects.filter(job__source='website').update(job=None)
+        orphans = Notification.objects.filter(job__isnull=True).count()
+        self.assertGreater(orphans, 2)
+        self.assertEqual(retention.compact(batch_size=1, max_batches=2)['orphan'], 2)
+
+
+class VoiceStorageTests(QueryBudgetTestCase):
+    """ الرسائل الصوتية: ملف واحد لكل محتوى + حذف ما لا تشير إليه أي عملية """
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(8000)
+            w.writeframes(b'\0\0' * 12000)
+        self.recording = buffer.getvalue()
+
+    def book(self, **extra):
+        voice = SimpleUploadedFile('voice_note.wav', self.recording, content_type='audio/wav')
+        data = {'name': 'زبون', 'phone': '0555', 'plate': 'VN-1', 'service': self.services[0].pk, 'voice_note': voice, 'slot': self.next_slot(), **extra}
+        self.client.post(reverse('home'), data)
+        return Job.objects.latest('id')
+
+    def voice_files(self):
+        root = os.path.join(settings.MEDIA_ROOT, media.VOICE_DIR)
+        return sorted(os.path.relpath(os.path.join(d, f), settings.MEDIA_ROOT) for d, _, files in os.walk(root) for f in files)
+
+    def age(self, name, seconds=2 * media.SWEEP_GRACE_SECONDS):
+        old = time.time() - seconds
+        os.utime(os.path.join(settings.MEDIA_ROOT, name), (old, old))
+
+    def test_identical_recordings_are_stored_once(self):
+        first, second = self.book(), self.book(voice_duration='4.2')
+        self.assertEqual(first.voice_audio.name, second.voice_audio.name)
+        self.assertEqual(self.voice_files(), [first.voice_audio.name])
+        self.assertIn(hashlib.sha256(self.recording).hexdigest(), first.voice_audio.name)
+        self.assertEqual(first.voice_size, len(self.recording))
+        self.assertEqual(first.voice_duration, 1.5)   # من رأس WAV
+        self.assertEqual(second.voice_duration, 4.2)  # كما قاسها المتصفح
+
+    def test_release_keeps_shared_files(self):
+        first, second = self.book(), self.book()
+        name = first.voice_audio.name
+        self.age(name)
+        first.delete()
+        self.assertFalse(media.release(name))
+        second.delete()
+        self.assertTrue(media.release(name))
+        self.assertEqual(self.voice_files(), [])
+
+    def test_sweep_removes_orphans_in_batches(self):
+        live = self.book().voice_audio.name
+        storage = media.voice_storage()
+        orphans = [storage.save(f"{media.VOICE_DIR}/2024/0{i}/old.mp3", ContentFile(b'x' * (i + 1))) for i in range(1, 4)]
+        fresh = storage.save(f"{media.VOICE_DIR}/ff/just-uploaded.mp3", ContentFile(b'new'))
+        for name in orphans + [live]:
+            self.age(name)
+
+        last, stats = media.sweep(batch_size=2, max_files=2)
+        self.assertEqual(stats['scanned'], 2)
+        while last is not None:
+            last, more = media.sweep(after=last, batch_size=2, max_files=2)
+            stats['removed'] += more['removed']
+        self.assertEqual(stats['removed'], 3)
+        self.assertEqual(self.voice_files(), sorted([live, fresh]))
+
+
+    def test_reuse_during_delete_keeps_the_file(self):
+        """ حفظ نفس التسجيل بين فحص الكنّاس والحذف: الملف يبقى """
+        storage = media.voice_storage()
+        name = storage.save(f"{media.VOICE_DIR}/ab/reused.wav", ContentFile(self.recording))
+        self.age(name)
+
+        # 1) الحفظ جدد الوقت بعد الفحص الأول وقبل النقل: فحص الشاهد يراه جديداً
+        with mock.patch.object(media, '_is_fresh', return_value=False):
+            os.utime(storage.path(name))
+            self.assertEqual(media.sweep()[1]['removed'], 0)
+        self.assertTrue(storage.exists(name))
+
+        # 2) الحفظ بعد النقل لا يجد الملف فيكتبه، وعملية تشير إليه قبل إعادة الفحص
+        self.age(name)
+        original = media._referenced
+
+        def save_during_check(names):
+            if name in names and not storage.exists(name):
+                storage.save(name, ContentFile(self.recording))
+                Job.objects.filter(pk=self.jobs[0].pk).update(voice_audio=name)
+            return original(names)
+
+        with mock.patch.object(media, '_referenced', save_during_check):
+            self.assertEqual(media.sweep()[1]['removed'], 0)
+        self.assertEqual(self.voice_files(), [name])
+        with open(storage.path(name), 'rb') as f:
+            self.assertEqual(f.read(), self.recording)
+
+    def test_save_rewrites_a_file_moved_after_exists(self):
+        storage = media.voice_storage()
+        name = storage.save(f"{media.VOICE_DIR}/ab/moved.wav", ContentFile(self.recording))
+        os.remove(storage.path(name))
+        with mock.patch.object(media.ContentAddressedStorage, 'exists', return_value=True):
+            self.assertEqual(storage.save(name, ContentFile(self.recording)), name)
+        self.assertTrue(os.path.exists(storage.path(name)))
+
+
+class FailingGateway(outbox.Gateway):
+    max_batch = 10
+
+    def send_batch(self, messages):
+        return [outbox.SendResult(ok=False, error='503 from provider') for _ in messages]
+
+
+
+_flaky_calls = []
+
+
+@taskqueue.task(name='tests.flaky', max_attempts=2)
+def flaky_task(fail=False):
+    _flaky_calls.append(fail)
+    if fail:
+        raise RuntimeError("boom")
+
+
+class TaskQueueTests(QueryBudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        _flaky_calls.clear()
+
+    def test_unique_enqueue_keeps_one_waiting_task(self):
+        first = flaky_task.delay(unique=True, fail=False)
+        self.assertEqual(flaky_task.delay(unique=True, fail=False).pk, first.pk)
+        self.assertNotEqual(flaky_task.delay(unique=True, fail=True).pk, first.pk)
+        self.assertNotEqual(flaky_task.delay(fail=False).pk, first.pk)
+
+    def test_claim_is_exclusive_until_the_lease_expires(self):
+        task_obj = flaky_task.delay()
+        claimed = taskqueue.claim('a')
+        self.assertEqual((claimed.pk, claimed.status, claimed.attempts), (task_obj.pk, 'running', 1))
+        self.assertIsNone(taskqueue.claim('b'))
+        # العامل a توقف: بعد انتهاء الحجز يأخذها عامل آخر
+        Task.objects.filter(pk=task_obj.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        reclaimed = taskqueue.claim('b')
+        self.assertEqual((reclaimed.pk, reclaimed.locked_by, reclaimed.attempts), (task_obj.pk, 'b', 2))
+
+    def test_late_worker_cannot_overwrite_the_new_lease(self):
+        flaky_task.delay()
+        late = taskqueue.claim('a')
+        # a تأخر حتى انتهى حجزه وأخذها b
+        Task.objects.filter(pk=late.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        current = taskqueue.claim('b')
+        with self.assertLogs('bookings.taskqueue', 'WARNING'):
+            self.assertTrue(taskqueue.execute(late))
+        current.refresh_from_db()
+        self.assertEqual((current.status, current.locked_by), ('running', 'b'))
+        self.assertTrue(taskqueue.execute(current))
+        current.refresh_from_db()
+        self.assertEqual(current.status, 'done')
+
+    def test_old_finished_tasks_are_purged(self):
+        now = timezone.now()
+        old_done, old_failed, recent_failed, queued = (flaky_task.delay() for _ in range(4))
+        Task.objects.filter(pk=old_done.pk).update(status='done', finished_at=now - timedelta(days=8))
+        Task.objects.filter(pk=old_failed.pk).update(status='failed', finished_at=now - timedelta(days=31))
+        Task.objects.filter(pk=recent_failed.pk).update(status='failed', finished_at=now - timedelta(days=8))
+        Task.objects.filter(pk=queued.pk).update(run_after=now - timedelta(days=60))
+        self.assertEqual(taskqueue.purge_finished(batch_size=1), 2)
+        self.assertEqual(set(Task.objects.values_list('pk', flat=True)), {recent_failed.pk, queued.pk})
+
+    def test_failure_backs_off_then_gives_up(self):
+        task_obj = flaky_task.delay(fail=True)
+        with self.assertLogs('bookings.taskqueue', 'WARNING'):
+            self.assertFalse(taskqueue.execute(taskqueue.claim('a')))
+        task_obj.refresh_from_db()
+        self.assertEqual(task_obj.status, 'queued')
+        self.assertGreater(task_obj.run_after, timezone.now() + timedelta(seconds=taskqueue.BACKOFF_BASE - 1))
+        self.assertIsNone(taskqueue.claim('a'))  # لم يحن موعدها بعد
+
+        Task.objects.filter(pk=task_obj.pk).update(run_after=timezone.now())
+        with self.assertLogs('bookings.taskqueue', 'WARNING'):
+            self.assertFalse(taskqueue.execute(taskqueue.claim('a')))
+        task_obj.refresh_from_db()
+        self.assertEqual((task_obj.status, task_obj.attempts), ('failed', 2))
+        self.assertIn('boom', task_obj.last_error)
+        self.assertEqual(_flaky_calls, [True, True])
+
+    def test_stalled_queue_is_visible(self):
+        self.assertEqual(taskqueue.oldest_due_seconds(), 0)
+        task_obj = flaky_task.delay()
+        Task.objects.filter(pk=task_obj.pk).update(run_after=timezone.now() - timedelta(minutes=10))
+        self.assertGreaterEqual(taskqueue.oldest_due_seconds(), 600)
+        self.assertIn('bookings_task_oldest_due_seconds 6', metrics.render())
+        response = self.client.get(reverse('admin:bookings_task_changelist'))
+        self.assertContains(response, 'run_workers')
+        self.assertEqual(taskqueue.run_pending(), 1)
+        self.assertEqual(taskqueue.oldest_due_seconds(), 0)
+
+
+@override_settings(OUTBOX_RATE_PER_MINUTE=0, OUTBOX_MAX_ATTEMPTS=2)
+class OutboxTests(QueryBudgetTestCase):
+    """ إكمال/تأكيد العملية يكتب رسالة في نفس المعاملة؛ الإرسال لاحقاً على دفعات """
+
+    def make_job(self, **fields):
+        defaults = {'service': self.services[0], 'worker': self.staff[0], 'phone': '0555 12 34 56', 'car_plate': 'OB-1'}
+        return Job.objects.get(pk=Job.objects.create(**{**defaults, **fields}).pk)
+
+    def test_finish_wash_writes_one_message(self):
+        job = self.make_job()
+        self.assertBudget('post', reverse('finish_wash', args=[job.pk]), 8, status=302)
+        message = OutboundMessage.objects.get(job=job)
+        self.assertEqual((message.kind, message.phone, message.status), ('job_completed', '0555123456', 'queued'))
+
+        # إعادة فتح ثم إكمال: لا رسالة ثانية
+        job.refresh_from_db()
+        job.status = 'processing'
+        job.save()
+        job.status = 'completed'
+        job.save()
+        self.assertEqual(OutboundMessage.objects.filter(job=job).count(), 1)
+
+    def test_no_phone_no_message(self):
+        job = self.make_job(phone='-')
+        job.status = 'completed'
+        job.save()
+        self.assertFalse(OutboundMessage.objects.exists())
+
+    def test_website_booking_confirmation(self):
+        job = self.make_job(source='website', status='pending')
+        job.status = 'processing'
+        job.save()
+        self.assertEqual(list(OutboundMessage.objects.values_list('kind', flat=True)), ['booking_confirmed'])
+
+    def test_dispatch_in_batches_through_file_gateway(self):
+        for i in range(5):
+            job = self.make_job(car_plate=f"OB-{i}")
+            job.status = 'completed'
+            job.save()
+        path = os.path.join(tempfile.mkdtemp(), 'outbox.jsonl')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path), ignore_errors=True)
+
+        stats = outbox.dispatch(batch_size=2, max_batches=2, gateway=outbox.FileGateway(path))
+        self.assertEqual(stats['sent'], 4)
+        self.assertEqual(outbox.dispatch(batch_size=2, gateway=outbox.FileGateway(path))['sent'], 1)
+        with open(path, encoding='utf-8') as f:
+            self.assertEqual(len(f.readlines()), 5)
+        self.assertFalse(OutboundMessage.objects.exclude(status='sent').exists())
+
+    def test_retry_then_fail(self):
+        job = self.make_job()
+        job.status = 'completed'
+        job.save()
+        self.assertEqual(outbox.dispatch(gateway=FailingGateway())['retry'], 1)
+        message = OutboundMessage.objects.get()
+        self.assertGreater(message.next_attempt_at, timezone.now())
+        self.assertEqual(outbox.dispatch(gateway=FailingGateway()), {'sent': 0, 'retry': 0, 'failed': 0})
+
+        OutboundMessage.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(outbox.dispatch(gateway=FailingGateway())['failed'], 1)
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts, message.last_error), ('failed', 2, '503 from provider'))
+
+    def test_late_dispatcher_does_not_overwrite_the_new_lease(self):
+        job = self.make_job()
+        job.status = 'completed'
+        job.save()
+        taken = []
+
+        class SlowGateway(outbox.Gateway):
+            max_batch = 10
+
+            def send_batch(self, messages):
+                # الإرسال أخذ أطول من الحجز فأخذ مرسل آخر نفس الرسائل
+                OutboundMessage.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+                taken.extend(outbox._claim(10))
+                return [outbox.SendResult(ok=False, error='timeout') for _ in messages]
+
+        with self.assertLogs('bookings.outbox', 'WARNING'):
+            self.assertEqual(outbox.dispatch(gateway=SlowGateway()), {'sent': 0, 'retry': 0, 'failed': 0})
+        message = OutboundMessage.objects.get()
+        self.assertEqual((message.status, message.attempts, message.locked_until), ('sending', 0, taken[0].locked_until))
+
+    @override_settings(OUTBOX_RATE_PER_MINUTE=60, OUTBOX_BATCH_SIZE=2)
+    def test_task_sends_one_batch_and_schedules_the_rest(self):
+        """ طابور كبير لا يطيل المهمة بعد مدة الحجز: دفعة ثم مهمة مؤجلة بدل النوم """
+        for i in range(5):
+            job = self.make_job(car_plate=f"OB-{i}")
+            job.status = 'completed'
+            job.save()
+        with mock.patch('bookings.outbox.time.sleep') as sleep:
+            tasks.dispatch_outbox()
+        sleep.assert_not_called()
+        self.assertEqual(OutboundMessage.objects.filter(status='sent').count(), 2)
+        follow_up = Task.objects.get(name=tasks.dispatch_outbox.task_name, status='queued')
+        self.assertAlmostEqual((follow_up.run_after - timezone.now()).total_seconds(), 2, delta=1)
+
+        # الدفعات التالية تعود للطابور حتى يفرغ الصندوق
+        while Task.objects.filter(status='queued').exists():
+            Task.objects.update(run_after=timezone.now())
+            taskqueue.run_pending()
+        self.assertFalse(OutboundMessage.objects.exclude(status='sent').exists())
+
+
+class QueueBoardTests(QueryBudgetTestCase):
+    """ شاشة الانتظار: نسخة واحدة في الذاكرة لكل الشاشات """
+
+    def setUp(self):
+        super().setUp()
+        self.client.logout()
+        queueboard.invalidate()
+
+    def test_mask_plate(self):
+        self.assertEqual(queueboard.mask_plate('12345-116-16'), '•••••-••6-16')
+        self.assertEqual(queueboard.mask_plate('AB1'), 'AB1')
+
+    def test_page_reads_memory_after_first_build(self):
+        # العمليات + جدول إحصاءات المدة (لتوقع الانتهاء، ثم من الكاش)
+        response, _ = self.assertBudget('get', reverse('queue_board'), 2, exact=True)
+        self.assertNotContains(response, self.jobs[1].car_plate)
+        self.assertBudget('get', reverse('queue_board'), 0, exact=True)
+        self.assertBudget('get', reverse('queue_stream'), 0, exact=True)
+
+        board = json.loads(queueboard.snapshot()[1])
+        waiting = [j for j in board['jobs'] if j['position']]
+        self.assertEqual([j['position'] for j in waiting], list(range(1, board['waiting'] + 1)))
+        self.assertTrue(all(j['status'] in ('pending', 'processing') for j in waiting))
+        self.assertTrue(all(j['eta'] for j in waiting))
+        self.assertLessEqual(len(board['jobs']) - len(waiting), settings.QUEUE_BOARD_COMPLETED)
+
+    def test_job_change_rebuilds_once(self):
+        version, _ = queueboard.snapshot()
+        with self.captureOnCommitCallbacks(execute=True):
+            Job.objects.create(service=self.services[0], worker=self.staff[0], car_plate='QB-777', status='pending')
+        new_version, data = queueboard.snapshot()
+        self.assertEqual(new_version, version + 1)
+        self.assertIn('••-777', data)
+        with self.assertNumQueries(0):
+            self.assertEqual(queueboard.snapshot()[0], new_version)
+
+    def test_stream_fans_out_without_extra_queries(self):
+        """ ثلاث شاشات متصلة + تغيير واحد = بناء واحد """
+        class Screen:
+            def __init__(self):
+                self.events, self.closed = [], asyncio.Event()
+
+            async def receive(self):
+                await self.closed.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(self, message):
+                if message.get('body', b'').startswith(b'id:'):
+                    self.events.append(message['body'])
+
+        async def until(predicate):
+            for _ in range(200):
+                if predicate():
+                    return
+                await asyncio.sleep(0.01)
+            self.fail("screens did not receive the board")
+
+        async def scenario():
+            screens = [Screen() for _ in range(3)]
+            scope = {'type': 'http', 'path': queueboard.STREAM_PATH}
+            running = [asyncio.ensure_future(queueboard.stream(scope, s.receive, s.send)) for s in screens]
+            await until(lambda: all(len(s.events) == 1 for s in screens) and queueboard.screens() == 3)
+            queueboard.invalidate()
+            await until(lambda: all(len(s.events) == 2 for s in screens))
+            for s in screens:
+                s.closed.set()
+            await asyncio.gather(*running)
+            return screens
+
+        queueboard.snapshot()
+        with mock.patch.object(queueboard, 'build', wraps=queueboard.build) as build:
+            Job.objects.filter(pk=self.jobs[1].pk).update(status='completed')
+            screens = async_to_sync(scenario)()
+        self.assertEqual(build.call_count, 1)
+        self.assertIn(queueboard.mask_plate(self.jobs[1].car_plate).encode(), screens[0].events[1])
+        self.assertEqual(queueboard.screens(), 0)
+
+    @override_settings(QUEUE_STREAM_MAX_PER_CLIENT=2)
+    def test_stream_caps_open_connections_per_address(self):
+        class Screen:
+            def __init__(self, address):
+                self.scope = {'type': 'http', 'path': queueboard.STREAM_PATH, 'client': (address, 5000)}
+                self.status, self.closed = None, asyncio.Event()
+
+            async def receive(self):
+                await self.closed.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(self, message):
+                if message['type'] == 'http.response.start':
+                    self.status = message['status']
+
+        async def scenario():
+            screens = [Screen('10.0.0.7') for _ in range(3)] + [Screen('10.0.0.8')]
+            running = [asyncio.ensure_future(queueboard.stream(s.scope, s.receive, s.send)) for s in screens]
+            for _ in range(200):
+                if all(s.status for s in screens):
+                    break
+                await asyncio.sleep(0.01)
+            statuses = sorted(s.status for s in screens)
+            # شاشة أغلقت: مكانها يعود لنفس العنوان
+            open_screen = next(s for s in screens if s.status == 200 and s.scope['client'][0] == '10.0.0.7')
+            open_screen.closed.set()
+            await running[screens.index(open_screen)]
+            again = Screen('10.0.0.7')
+            running.append(asyncio.ensure_future(queueboard.stream(again.scope, again.receive, again.send)))
+            screens.append(again)
+            for _ in range(200):
+                if again.status:
+                    break
+                await asyncio.sleep(0.01)
+            for s in screens:
+                s.closed.set()
+            await asyncio.gather(*running)
+            return statuses, again.status
+
+        queueboard.snapshot()
+        statuses, reopened = async_to_sync(scenario)()
+        self.assertEqual(statuses, [200, 200, 200, 429])
+        self.assertEqual(reopened, 200)
+        self.assertEqual(queueboard._streams, {})
+        self.assertIn('bookings_rate_limited_total{reason="connections",view="queue_stream"}', metrics.render())
+
+
+@override_settings(BOOKING_OPEN='08:00', BOOKING_CLOSE='10:00', BOOKING_SLOT_MINUTES=30)
+class BookingSlotTests(QueryBudgetTestCase):
+    """ السعة من الحضور، والحجز تحديث ذري واحد لا يتجاوزها """
+
+    def setUp(self):
+        super().setUp()
+        self.client.logout()
+        self.day = timezone.localdate() + timedelta(days=1)
+        self.long_service = Service.objects.create(name="تلميع", price=Decimal(2000), worker_commission=Decimal(400), duration_minutes=60)
+
+    def book(self, plate, clock='08:00', service=None, status=200):
+        data = {'name': 'زبون', 'phone': '0555', 'plate': plate, 'service': (service or self.services[0]).pk, 'slot': self.next_slot(clock=clock)}
+        # مسح الكاش بعد التثبيت (on_commit)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('home'), data)
+        self.assertEqual(response.status_code, status, plate)
+        return response
+
+    def availability(self, minutes=30):
+        response = self.client.get(reverse('slots_data'), {'date': self.day.isoformat(), 'minutes': minutes})
+        return {s['time']: s['available'] for s in response.json()['slots']}
+
+    def test_capacity_follows_attendance(self):
+        # زرع الاختبارات: 3 عمال من 5 حاضرون اليوم، والغد يأخذ آخر يوم مسجل
+        self.assertEqual(self.availability(), {'08:00': 3, '08:30': 3, '09:00': 3, '09:30': 3})
+        Attendance.objects.create(worker=self.staff[1], date=self.day, is_present=True)
+        slots.refresh_capacity(self.day)
+        self.assertEqual(BookingSlot.objects.filter(date=self.day).values_list('capacity', flat=True).distinct().get(), 1)
+
+    def test_reservations_never_exceed_capacity(self):
+        BookingSlot.objects.bulk_create([BookingSlot(date=self.day, start=s, capacity=2) for s in slots.day_starts(self.day)])
+        self.book('S-1')
+        self.book('S-2', service=self.long_service)  # 08:00 + 08:30
+        response = self.book('S-3', status=409)
+        self.assertContains(response, "امتلأ", status_code=409)
+        self.assertFalse(Job.objects.filter(car_plate='S-3').exists())
+        self.assertEqual(
+            list(BookingSlot.objects.filter(date=self.day).values_list('reserved', flat=True)), [2, 1, 0, 0],
+        )
+        # الخدمة الطويلة تحتاج فترتين متتاليتين حرتين، والأخيرة لا تتسع لها
+        self.assertEqual(self.availability(60), {'08:00': 0, '08:30': 1, '09:00': 2, '09:30': 0})
+
+    def test_availability_is_one_cached_read(self):
+        slots.ensure_day(self.day)
+        self.assertBudget('get', reverse('slots_data'), 1, exact=True, data={'date': self.day.isoformat()})
+        self.assertBudget('get', reverse('slots_data'), 0, exact=True, data={'date': self.day.isoformat()})
+        self.assertBudget('get', reverse('slots_data'), 0, status=400, data={'date': '1999-01-01'})
+
+    def test_cancel_and_delete_release_slots(self):
+        BookingSlot.objects.bulk_create([BookingSlot(date=self.day, start=s, capacity=1) for s in slots.day_starts(self.day)])
+        self.book('C-1', service=self.long_service)
+        self.book('C-2', clock='09:00')
+        first = Job.objects.get(car_plate='C-1')
+        self.assertEqual((first.slot_count, timezone.localtime(first.slot_at).strftime('%H:%M')), (2, '08:00'))
+
+        first.status = 'canceled'
+        first.save()
+        Job.objects.get(car_plate='C-2').delete()
+        self.assertFalse(BookingSlot.objects.filter(date=self.day, reserved__gt=0).exists())
+        # إعادة الحفظ بعد الإلغاء لا تحرر مرة ثانية
+        first.refresh_from_db()
+        self.assertEqual(first.slot_count, 0)
+
+    def test_invalid_slots_are_rejected(self):
+        self.book('X-1', clock='08:10', status=409)
+        self.book('X-2', clock='10:00', status=409)
+        self.client.post(reverse('home'), {'name': 'زبون', 'plate': 'X-3', 'service': self.services[0].pk})
+        self.assertFalse(Job.objects.filter(car_plate__startswith='X-').exists())
+
+
+@override_settings(RATE_LIMITS={'home': {'rate': 3, 'per': 60, 'methods': ('POST',)}, 'get_notifications': {'rate': 2, 'per': 60}})
+class RateLimitTests(QueryBudgetTestCase):
+    """ الطلب المرفوض يرجع 429 قبل أي استعلام """
+
+    def test_token_bucket_refills(self):
+        self.assertEqual(ratelimit.take('t', 2, 10, now=100), 0)
+        self.assertEqual(ratelimit.take('t', 2, 10, now=100), 0)
+        self.assertAlmostEqual(ratelimit.take('t', 2, 10, now=100), 5.0)
+        self.assertEqual(ratelimit.take('t', 2, 10, now=105), 0)
+
+    def test_process_local_bucket_store_fails_check(self):
+        # TEST_CACHES: الدلاء في LocMem = خطأ إقلاع؛ الملفات المشتركة مقبولة
+        self.assertEqual([e.id for e in ratelimit.check_shared_store()], ['bookings.E001'])
+        shared = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': tempfile.gettempdir()}
+        with self.settings(CACHES={**TEST_CACHES, 'ratelimit': shared}):
+            self.assertEqual(ratelimit.check_shared_store(), [])
+
+    def test_booking_flood_is_shed_without_queries(self):
+        self.client.logout()
+        data = {'name': 'روبوت', 'plate': 'BOT', 'service': self.services[0].pk, 'slot': 'x'}
+        for _ in range(3):
+            self.assertEqual(self.client.post(reverse('home'), data).status_code, 409)
+        response, _ = self.assertBudget('post', reverse('home'), 0, data=data, exact=True, status=429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+        # الصفحة نفسها (GET) ليست محدودة (أزرار الخدمات من الكاش: بدون استعلام)
+        self.assertBudget('get', reverse('home'), 0, exact=True)
+
+    def test_fresh_session_cookies_share_the_address_budget(self):
+        """ جلسة جديدة (أو كوكي مزور) لكل طلب لا تعطي دلواً جديداً للزائر """
+        store = importlib.import_module(settings.SESSION_ENGINE).SessionStore
+        self.client.logout()
+        data = {'name': 'روبوت', 'plate': 'BOT', 'service': self.services[0].pk, 'slot': 'x'}
+        statuses = []
+        for i in range(4):
+            session = store()
+            session['visit'] = i
+            session.create()
+            self.client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key if i % 2 else f"forged{i:026d}"
+            statuses.append(self.client.post(reverse('home'), data).status_code)
+        self.assertEqual(statuses, [409, 409, 409, 429])
+
+    def test_budget_is_per_user(self):
+        url = reverse('get_notifications')
+        self.assertEqual([self.client.get(url).status_code for _ in range(3)], [200, 200, 429])
+        self.assertEqual(self.client.get(url).json()['ok'], False)
+        self.client.force_login(User.objects.create_user('tablet', is_staff=True))
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertIn('bookings_rate_limited_total{reason="rate",view="get_notifications"}', metrics.render())
+
+    @override_settings(RATE_LIMIT_MAX_INFLIGHT=0)
+    def test_concurrency_cap_sheds_load(self):
+        response = self.client.get(reverse('dashboard_counters'))
+        self.assertEqual((response.status_code, response['Retry-After']), (429, '1'))
+        # المراقبة مستثناة
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+        self.assertEqual(ratelimit.inflight(), 0)
+
+
+class MetricsEndpointTests(QueryBudgetTestCase):
+    """ /metrics مغلقة افتراضياً حتى من 127.0.0.1 (بروكسي محلي) """
+
+    def test_denied_by_default_even_from_localhost(self):
+        self.client.logout()
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='127.0.0.1').status_code, 403)
+
+    @override_settings(METRICS_TOKEN='scrape-me', METRICS_ALLOWED_IPS=('10.0.0.5',))
+    def test_token_or_explicit_allowlist(self):
+        self.client.logout()
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-me').status_code, 200)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer guess').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.5').status_code, 200)
+
+    def test_foreign_files_in_metrics_dir_are_skipped(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        for name in ('prometheus.json', '.json', '4242.json.tmp'):
+            with open(os.path.join(directory, name), 'w') as f:
+                f.write('{}')
+        with override_settings(METRICS_DIR=directory):
+            response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('bookings_requests_total', response.content.decode())
+
+    def test_snapshots_of_exited_processes_are_removed(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+        exited.wait()
+
+        def snapshot(pid, value):
+            with open(os.path.join(directory, f'{pid}.json'), 'w') as f:
+                json.dump({'counters': [['bookings_jobs_total', [['source', f'p{pid}']], value]], 'histograms': [], 'max_gauges': []}, f)
+
+        snapshot(exited.pid, 5)
+        snapshot(os.getppid(), 7)
+        with override_settings(METRICS_DIR=directory):
+            text = metrics.render()
+            self.assertFalse(os.path.exists(os.path.join(directory, f'{exited.pid}.json')))
+            self.assertIn(f'source="p{os.getppid()}"}} 7', text)
+            self.assertNotIn(f'p{exited.pid}', text)
+            # أوامر الخلفية تكتب نسختها عند الخروج دون انتظار الثانية
+            own = os.path.join(directory, f'{os.getpid()}.json')
+            with mock.patch.object(metrics, '_last_flush', [time.monotonic()]):
+                metrics.maybe_flush()
+                self.assertFalse(os.path.exists(own))
+                metrics.maybe_flush(force=True)
+                self.assertTrue(os.path.exists(own))
+
+
+class ProfilerTests(QueryBudgetTestCase):
+    """ 🔬 ?profile=1: لمدير النظام فقط، والتخزين محدود بالعدد والحجم """
+
+    def profiled(self, **extra):
+        return self.client.get(reverse('get_notifications'), {'profile': '1'}, **extra)
+
+    def test_superuser_gets_a_stored_profile(self):
+        response = self.profiled()
+        self.assertEqual(response.status_code, 200)
+        profile = RequestProfile.objects.get()
+        self.assertEqual(response['X-Profile-Url'], reverse('admin:bookings_requestprofile_change', args=[profile.pk]))
+        self.assertEqual((profile.view, profile.user, profile.status_code), ('get_notifications', self.admin, 200))
+        self.assertGreater(profile.query_count, 0)
+        self.assertIn('get_notifications', profile.top_functions)
+
+    def test_staff_and_visitors_are_not_profiled(self):
+        self.client.force_login(self.staff[0])
+        response = self.profiled()
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-Url', response)
+        self.client.logout()
+        self.assertNotIn('X-Profile-Url', self.client.get(reverse('queue_board'), {'profile': '1'}))
+        self.assertFalse(RequestProfile.objects.exists())
+
+    @override_settings(PROFILE_MAX_STORED=2)
+    def test_only_the_latest_profiles_are_kept(self):
+        ids = [int(self.profiled()['X-Profile-Url'].rstrip('/').split('/')[-2]) for _ in range(3)]
+        self.assertEqual(sorted(RequestProfile.objects.values_list('id', flat=True)), ids[1:])
+
+    @override_settings(PROFILE_MAX_BYTES=300)
+    def test_large_outputs_are_capped(self):
+        self.profiled()
+        profile = RequestProfile.objects.get()
+        self.assertLessEqual(len(profile.collapsed_stacks.encode()), 300)
+        self.assertEqual(bytes(profile.pstats_data), b'')
+        self.assertTrue(profile.top_functions)
+
+
+@override_settings(SLOW_QUERY_SAMPLE_RATE=1.0, SLOW_QUERY_MS=0)
+class SlowQueryLogTests(QueryBudgetTestCase):
+    """ 🐢 الخطة والحفظ في مهمة بعد الطلب، وبدون قيم الزبائن """
+
+    def test_recorded_after_the_request_without_values(self):
+        self.client.logout()
+        data = {'name': 'زبون سري', 'phone': '0555998877', 'plate': 'SQ-1', 'service': self.services[0].pk, 'slot': self.next_slot()}
+        self.client.post(reverse('home'), data)
+        self.assertFalse(SlowQuery.objects.exists())
+
+        task_obj = Task.objects.get(name=tasks.record_slow_queries.task_name)
+        self.assertNotIn('0555998877', json.dumps(task_obj.payload, ensure_ascii=False))
+        taskqueue.run_pending()
+
+        self.assertTrue(SlowQuery.objects.exclude(plan='').exists())
+        self.assertFalse(SlowQuery.objects.filter(plan__startswith='(EXPLAIN failed').exists())
+        for sample in SlowQuery.objects.values_list('sample_sql', flat=True):
+            self.assertNotIn('0555998877', sample)
+            self.assertNotIn('زبون سري', sample)
+        self.assertTrue(SlowQuery.objects.filter(sample_sql__contains='%s').exists())
+
+
+class TwoTierCacheTests(QueryBudgetTestCase):
+    """ L1 في العملية + L2 مشترك، والإصدار يتغير بعد تثبيت أي حفظ """
+
+    def counters(self):
+        return dashboard.today_counters('commission')
+
+    def test_second_read_is_free_and_saves_invalidate(self):
+        before = self.counters()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.counters(), before)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Job.objects.create(service=self.services[3], worker=self.staff[0], status='completed', car_plate='C-1')
+        self.assertEqual(self.counters()['total_revenue'], before['total_revenue'] + self.services[3].price)
+
+    def test_other_process_sees_l2_and_new_versions(self):
+        before = self.counters()
+        # عملية أخرى: L1 فارغ، القيمة من L2 بدون قاعدة البيانات
+        caching.clear_local()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.counters(), before)
+
+        # حفظ في عملية أخرى = إصدار جديد في L2 فقط؛ يظهر هنا بعد CACHE_VERSION_TTL
+        Job.objects.filter(pk=self.jobs[1].pk).update(status='canceled')
+        caches['shared'].set('ns:job', 'elsewhere', None)
+        with override_settings(CACHE_VERSION_TTL=0):
+            caching.clear_local()
+            self.assertNotEqual(self.counters(), before)
+
+    def test_inside_write_transaction_reads_are_fresh(self):
+        before = self.counters()
+        job = Job.objects.get(pk=self.jobs[1].pk)
+        job.status = 'completed'
+        job.save()
+        # لم تُثبت بعد: الرد الجزئي يحسب مباشرة
+        self.assertNotEqual(self.counters(), before)
+
+    def test_home_form_fragment(self):
+        self.client.logout()
+        self.assertBudget('get', reverse('home'), 1, exact=True)
+        response, _ = self.assertBudget('get', reverse('home'), 0, exact=True)
+        self.assertContains(response, f'data-duration="{self.services[0].duration_minutes}"')
+        with self.captureOnCommitCallbacks(execute=True):
+            Service.objects.filter(pk=self.services[0].pk).get().save()
+        self.assertBudget('get', reverse('home'), 1, exact=True)
+        self.assertIn('bookings_cache_requests_total{result="l1_hit",value="service_choices"}', metrics.render())
+
+
+@override_settings(ROOT_URLCONF='core.urls_public', STAFF_LOGIN_URL='/admin/login/')
+class PublicEntrypointTests(QueryBudgetTestCase):
+    """ 🪶 العمال الخفيفة: الموقع والواجهات تعمل بنفس الروابط، والأدمن غير موجود """
+
+    def test_public_routes_without_admin(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('home')).status_code, 200)
+        self.assertEqual(self.client.get(reverse('queue_board')).status_code, 200)
+        self.assertEqual(self.client.get('/admin/').status_code, 404)
+        # لوحات الطاقم: تحويل لدخول الأدمن على العمال الكاملة
+        response = self.client.get(reverse('get_notifications'))
+        self.assertRedirects(response, f"/admin/login/?next={reverse('get_notifications')}", fetch_redirect_response=False)
+
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(reverse('get_notifications')).status_code, 200)
+
+    def test_public_settings_drop_admin_stack(self):
+        from core import settings_public
+        for app in ('jazzmin', 'django.contrib.admin'):
+            self.assertNotIn(app, settings_public.INSTALLED_APPS)
+        for app in ('django.contrib.sessions', 'modeltranslation'):
+            self.assertIn(app, settings_public.INSTALLED_APPS)
+
+    def test_service_names_are_translated_on_public_pages(self):
+        self.client.logout()
+        Service.objects.filter(pk=self.services[0].pk).update(name_fr="Lavage complet")
+        caching.bump('service')
+        response = self.client.get('/fr/')
+        self.assertContains(response, "Lavage complet")
+
+    def test_parse_importtime_groups_by_package(self):
+        stderr = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |   django.utils\n"
+            "import time:        80 |        200 | django\n"
+            "import time:      1500 |       1500 | numpy\n"
+        )
+        self.assertEqual(startup.parse_importtime(stderr), {'django': 200, 'numpy': 1500})
+
+    def test_public_settings_do_not_load_the_admin_site(self):
+        self.assertEqual(startup.measure('core.settings_public')['loaded'], [])
+        # نفس الأسماء تُحمّل فعلاً مع الإعدادات الكاملة (القائمة ليست أسماء خاطئة)
+        self.assertEqual(startup.measure('core.settings')['loaded'], list(startup.WATCHED))
+
+
+class ReportingReplicaTests(TestCase):
+    """ 📸 نسخة التقارير: القراءة منها فقط داخل reporting_reads وهي حديثة، والتحديث داخل الملف نفسه """
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        self.target = os.path.join(self.tmp, 'db_reporting.sqlite3')
+        reporting = connections[routers.REPORTING_ALIAS]
+        patcher = mock.patch.object(reporting, 'settings_dict', {**reporting.settings_dict, 'NAME': self.target})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(routers._last_check.update, at=0.0)
+
+    def route(self):
+        """ ((القراءة، الكتابة) داخل reporting_reads، القراءة خارجه) """
+        routers._last_check['at'] = 0.0
+        router = routers.ReportingRouter()
+        with routers.reporting_reads():
+            inside = (router.db_for_read(Job), router.db_for_write(Job))
+        return inside, router.db_for_read(Job)
+
+    def sql(self, path, *statements):
+        db = sqlite3.connect(path)
+        try:
+            with db:
+                for statement in statements:
+                    db.execute(statement)
+        finally:
+            db.close()
+
+    def test_missing_or_stale_replica_falls_back_to_default(self):
+        self.assertEqual(self.route(), ((None, 'default'), None))
+        self.sql(self.target, 'CREATE TABLE t (v)')
+        self.assertEqual(self.route(), (('reporting', 'default'), None))
+        old = time.time() - settings.REPORTING_MAX_LAG - 60
+        os.utime(self.target, (old, old))
+        self.assertEqual(self.route(), ((None, 'default'), None))
+
+    def test_reporting_reads_does_not_leak_to_other_threads(self):
+        self.sql(self.target, 'CREATE TABLE t (v)')
+        routers._last_check['at'] = 0.0
+        seen = []
+        with routers.reporting_reads():
+            worker = threading.Thread(target=lambda: seen.append(routers.ReportingRouter().db_for_read(Job)))
+            worker.start()
+            worker.join()
+            self.assertEqual(routers.ReportingRouter().db_for_read(Job), 'reporting')
+        self.assertEqual(seen, [None])
+
+    def test_refresh_updates_the_replica_under_open_readers(self):
+        source = os.path.join(self.tmp, 'live.sqlite3')
+        self.sql(source, 'CREATE TABLE t (v)', 'INSERT INTO t VALUES (1)')
+        replica.online_backup(self.target, source_path=source)
+        reader = sqlite3.connect(self.target)
+        self.addCleanup(reader.close)
+        self.assertEqual(reader.execute('SELECT COUNT(*) FROM t').fetchone(), (1,))
+
+        self.sql(source, 'INSERT INTO t VALUES (2)')
+        default = connections[DEFAULT_DB_ALIAS]
+        with mock.patch.object(default, 'settings_dict', {**default.settings_dict, 'NAME': source}):
+            replica.refresh_reporting_snapshot(pause=0)
+        # نفس الاتصال المفتوح يرى البيانات الجديدة: الملف لم يُستبدل تحته
+        self.assertEqual(reader.execute('SELECT COUNT(*) FROM t').fetchone(), (2,))
+        self.assertFalse(os.path.exists(f'{self.target}.tmp'))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class BackupTests(TestCase):
+    """ 💾 نسخ كاملة وتزايدية من ملف SQLite حي، واستعادتها والتحقق منها """
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        override = override_settings(BACKUP_DIR=os.path.join(self.tmp, 'backups'), BACKUP_KEEP_FULL=2)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.source = os.path.join(self.tmp, 'live.sqlite3')
+        self.execute('PRAGMA journal_mode = WAL', 'CREATE TABLE job (id INTEGER PRIMARY KEY, plate TEXT)',
+                     *[f"INSERT INTO job (plate) VALUES ('{i:05d}-116-16')" for i in range(2000)])
+
+    def execute(self, *statements):
+        db = sqlite3.connect(self.source)
+        for sql in statements:
+            db.execute(sql)
+        db.commit()
+        db.close()
+
+    def snapshot(self, **kwargs):
+        return backup.create(source_path=self.source, pause=0, **kwargs)
+
+    def restored_plates(self, name):
+        dest = os.path.join(self.tmp, f"{name}.sqlite3")
+        backup.restore(name, dest)
+        db = sqlite3.connect(dest)
+        try:
+            return [row[0] for row in db.execute('SELECT plate FROM job ORDER BY id')]
+        finally:
+            db.close()
+
+    def test_incremental_ships_only_changed_pages(self):
+        full = self.snapshot()
+        self.assertEqual(full['kind'], 'full')
+        self.assertIsNone(self.snapshot())  # لا تغيير = لا نسخة
+
+        self.execute("UPDATE job SET plate = 'CHANGED' WHERE id = 1")
+        delta = self.snapshot()
+        self.assertEqual((delta['kind'], delta['base']), ('incremental', full['name']))
+        self.assertLess(delta['changed_pages'], full['pages'] / 4)
+        self.assertLess(delta['bytes'], full['bytes'])
+
+        self.assertEqual(backup.verify()['chain'], 2)
+        self.assertEqual(self.restored_plates(delta['name'])[0], 'CHANGED')
+        self.assertEqual(self.restored_plates(full['name'])[0], '00000-116-16')
+
+    def test_incremental_reads_the_live_file_without_staging(self):
+        self.execute('PRAGMA journal_mode = DELETE')
+        full = self.snapshot()
+        self.execute("UPDATE job SET plate = 'LIVE' WHERE id = 2")
+        with mock.patch.object(replica, 'online_backup') as staged:
+            delta = self.snapshot()
+        staged.assert_not_called()
+        self.assertEqual((delta['kind'], delta['base']), ('incremental', full['name']))
+        self.assertEqual(self.restored_plates(delta['name'])[1], 'LIVE')
+        self.assertEqual(backup.verify()['chain'], 2)
+
+    def test_busy_source_does_not_restart_the_copy_forever(self):
+        writer = sqlite3.connect(self.source)
+        self.addCleanup(writer.close)
+        steps = []
+
+        def write_between_steps(remaining, total):
+            # كاشير يكتب بين كل خطوتين: بدون حد يعيد النسخ من البداية إلى الأبد
+            steps.append(remaining)
+            with writer:
+                writer.execute("UPDATE job SET plate = ? WHERE id = 1", (f'W{len(steps)}',))
+            if len(steps) > 1000:
+                raise AssertionError("backup never finished")
+
+        dest = os.path.join(self.tmp, 'copy.sqlite3')
+        replica.online_backup(dest, source_path=self.source, pages=1, pause=0, progress=write_between_steps, max_restarts=2)
+        db = sqlite3.connect(dest)
+        try:
+            self.assertEqual(db.execute('SELECT count(*) FROM job').fetchone(), (2000,))
+            self.assertEqual(db.execute('PRAGMA integrity_check').fetchone(), ('ok',))
+        finally:
+            db.close()
+
+    def test_corrupt_archive_fails_verification(self):
+        self.snapshot()
+        self.execute("DELETE FROM job WHERE id > 1000")
+        delta = self.snapshot()
+        with open(os.path.join(backup.backup_dir(), delta['file']), 'r+b') as fh:
+            fh.seek(20)
+            fh.write(b'broken')
+        with self.assertRaises(backup.BackupError):
+            backup.verify()
+
+    def test_rotation_keeps_whole_chains(self):
+        names = []
+        for i in range(3):
+            names.append(self.snapshot(full=True)['name'])
+            self.execute(f"UPDATE job SET plate = 'R{i}' WHERE id = 1")
+            names.append(self.snapshot()['name'])
+        kept = [s['name'] for s in backup.load_manifest()['snapshots']]
+        self.assertEqual(kept, names[2:])
+        self.assertEqual(sorted(f for f in os.listdir(backup.backup_dir()) if f.endswith('.gz')),
+                         sorted(s['file'] for s in backup.load_manifest()['snapshots']))
+
+
+class ImportJobsTests(QueryBudgetTestCase):
+    """ 📥 استيراد السجل القديم: نفس حسابات Job.save، بلا تكرار، وبعدد استعلامات ثابت """
+
+    def csv(self, rows):
+        lines = ['created_at,service,worker,car_plate,status,system_mode,price']
+        lines += [','.join(row) for row in rows]
+        return io.StringIO('\n'.join(lines) + '\n')
+
+    def history(self, n):
+        service, worker = self.services[1], self.staff[0]
+        return [
+            (f"2024-03-{1 + i % 28:02d} 10:{i % 60:02d}", service.name, worker.username, f"OLD-{i}", 'completed', '', '')
+            for i in range(n)
+        ]
+
+    def test_import_matches_job_save_rules(self):
+        service, worker = self.services[2], self.staff[1]
+        report = importer.run(self.csv([
+            ('2023-05-01 09:30', service.name, worker.username, 'A-1', 'completed', '', ''),
+            ('2023-05-01', str(service.pk), worker.first_name, 'A-2', 'completed', 'salary', ''),
+            ('2023-05-02 11:00', service.name, '', 'A-3', 'canceled', '', '450'),
+            ('2023-05-02 12:00', 'خدمة مجهولة', worker.username, 'A-4', 'completed', '', ''),
+            ('not a date', service.name, worker.username, 'A-5', 'completed', '', ''),
+        ]))
+        self.assertEqual((report.read, report.inserted, len(report.rejected)), (5, 3, 2))
+        self.assertEqual([line for line, _ in report.rejected], [5, 6])
+
+        jobs = {j.car_plate: j for j in Job.objects.filter(car_plate__startswith='A-')}
+        self.assertEqual((jobs['A-1'].final_price, jobs['A-1'].final_commission), (service.price, service.worker_commission))
+        self.assertEqual((jobs['A-2'].system_mode, jobs['A-2'].final_commission, jobs['A-2'].worker_id), ('salary', 0, worker.pk))
+        self.assertEqual((jobs['A-3'].final_price, jobs['A-3'].final_commission, jobs['A-3'].worker_id), (Decimal('450'), 0, None))
+        self.assertEqual(timezone.localtime(jobs['A-2'].created_at).hour, 12)
+
+        # الأحداث والإسقاطات تشمل العمليات المستوردة
+        self.assertEqual(JobEvent.objects.filter(job_id__in=[j.pk for j in jobs.values()], kind='created').count(), 3)
+        self.assertEqual(projections.read('daily', '2023-05-01:commission')['completed'], 1)
+        self.assertEqual(projections.read('daily', '2023-05-01:salary')['completed'], 1)
+
+    def test_reimport_skips_existing_rows(self):
+        rows = self.history(20) + self.history(1)  # السطر الأخير مكرر فعلاً في الدفتر
+        first = importer.run(self.csv(rows), chunk_size=7)
+        self.assertEqual((first.inserted, first.duplicates), (21, 0))
+        again = importer.run(self.csv(rows), chunk_size=7)
+        self.assertEqual((again.inserted, again.duplicates), (0, 21))
+        self.assertEqual(Job.objects.filter(car_plate__startswith='OLD-').count(), 21)
+
+    def test_queries_do_not_grow_with_rows(self):
+        def queries(n):
+            with mock.patch.object(importer, 'finalize'), CaptureQueriesContext(connection) as captured:
+                self.assertEqual(importer.run(self.csv(self.history(n)), chunk_size=1000, batch_size=1000).inserted, n)
+            Job.objects.filter(car_plate__startswith='OLD-').delete()
+            return len(captured)
+        # SQLite يحد عدد المتغيرات في INSERT الواحد (~50 عملية)، لكن لا استعلام لكل سطر
+        self.assertLess(queries(500) - queries(10), 500 / 40)
+
+    def test_missing_required_column(self):
+        with self.assertRaises(importer.RowError):
+            importer.run(io.StringIO('plate,price\nX,1\n'))
+
+
+class WorkerPerformanceTests(QueryBudgetTestCase):
+    """ ⏱️ مدة الغسيل: أختام الحالة، إحصاء جارٍ عند الاكتمال، ترتيب وتوقعات بدون مسح العمليات """
+
+    def wash(self, worker, service, minutes):
+        job = Job.objects.create(service=service, worker=worker, status='processing', car_plate='T-1')
+        Job.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(minutes=minutes))
+        job.refresh_from_db()
+        job.status = 'completed'
+        job.save()
+        return job
+
+    def test_summary_matches_exact_statistics(self):
+        import statistics
+        samples = [300 + (i * 37) % 900 for i in range(400)]
+        whole = performance.Summary()
+        for x in samples:
+            whole.add(x)
+        left, right = performance.Summary(), performance.Summary()
+        for i, x in enumerate(samples):
+            (left if i % 3 else right).add(x)
+        merged = left.merge(right)
+
+        for summary in (whole, merged):
+            self.assertAlmostEqual(summary.mean, statistics.mean(samples), places=6)
+            self.assertAlmostEqual(summary.stddev, statistics.stdev(samples), places=6)
+            for q in (0.5, 0.9):
+                exact = statistics.quantiles(samples, n=100, method='inclusive')[int(q * 100) - 1]
+                self.assertLess(abs(summary.quantile(q) - exact) / exact, 0.03)
+        self.assertLess(len(whole.sketch), 40)
+
+    def test_transitions_stamp_and_record_once(self):
+        worker, service = self.staff[0], self.services[1]
+        job = Job.objects.create(service=service, worker=worker, status='pending', car_plate='T-0')
+        self.assertIsNone(job.started_at)
+        job.status = 'processing'
+        job.save()
+        self.assertIsNotNone(job.started_at)
+
+        job = self.wash(worker, service, 20)
+        self.assertIsNotNone(job.completed_at)
+        row = WorkerServiceStats.objects.get(worker=worker, service=service)
+        self.assertEqual(row.count, 1)
+        self.assertAlmostEqual(row.mean, 1200, delta=5)
+
+        # إعادة فتح ثم إكمال، ومدة قصيرة شاذة: لا تدخل الإحصاء
+        job.status = 'processing'
+        job.save()
+        job.status = 'completed'
+        job.save()
+        short = Job.objects.create(service=service, worker=worker, status='processing', car_plate='T-2')
+        short.status = 'completed'
+        short.save()
+        self.assertEqual(WorkerServiceStats.objects.get(pk=row.pk).count, 1)
+
+    def test_leaderboard_and_eta_read_stats_only(self):
+        fast, slow, service = self.staff[0], self.staff[1], self.services[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(5):
+                self.wash(fast, service, 15)
+                self.wash(slow, service, 30)
+
+        response, _ = self.assertBudget('get', reverse('leaderboard_data'), 3, exact=True)
+        board = response.json()['leaderboard']
+        self.assertEqual([row['worker_id'] for row in board], [fast.pk, slow.pk])
+        self.assertGreater(board[0]['speed_index'], board[1]['speed_index'])
+        self.assertAlmostEqual(board[0]['median_minutes'], 15, delta=0.5)
+
+        now = timezone.now()
+        jobs = [
+            {'status': 'processing', 'worker_id': slow.pk, 'service_id': service.pk, 'started_at': now - timedelta(minutes=10)},
+            {'status': 'pending', 'worker_id': None, 'service_id': service.pk, 'started_at': None},
+            {'status': 'pending', 'worker_id': None, 'service_id': service.pk, 'started_at': None},
+        ]
+        with self.assertNumQueries(0):
+            finish = performance.estimate_finish(jobs, now=now, lanes=2)
+        minutes = [round((f - now).total_seconds() / 60) for f in finish]
+        # المشغول: وسيطه 30 - 10 = 20؛ المنتظرتان بوسيط الخدمة (15) على الخط الحر أولاً
+        self.assertEqual(minutes[0], 20)
+        self.assertAlmostEqual(minutes[1], 15, delta=1)
+        self.assertAlmostEqual(minutes[2], 30, delta=1)
+
+
+
+class HeatmapTests(QueryBudgetTestCase):
+    def test_bad_filter_is_rejected(self):
+        url = reverse('heatmap_data')
+        self.assertEqual(self.client.get(url, {'service': 'abc'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'worker': '1.5'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'service': self.services[0].pk}).status_code, 200)
+
+    def test_incremental_update_follows_the_rebuild_window(self):
+        heatmap.rebuild()
+        total = lambda: sum(map(sum, heatmap.get_matrix('all')['counts']))
+        counted = total()
+        recent = Job.objects.create(service=self.services[0], car_plate='HM-1')
+        old = Job.objects.create(service=self.services[0], car_plate='HM-2')
+        Job.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=heatmap.WINDOW_DAYS + 5))
+        old.refresh_from_db()
+        heatmap.record_job(recent)
+        heatmap.record_job(old)
+        self.assertEqual(total(), counted + 1)
+        heatmap.rebuild()
+        self.assertEqual(total(), counted + 1)
+
+    def test_rebuild_races_with_incremental_updates(self):
+        total = lambda: sum(map(sum, heatmap.get_matrix('all')['counts']))
+        counted_before = Job.objects.filter(created_at__gte=timezone.now() - timedelta(days=heatmap.WINDOW_DAYS)).count()
+        original = heatmap._replace_all
+        during = []
+
+        def job_created_during_the_read(*args):
+            # عملية جديدة بعد قراءة إعادة البناء وقبل الاستبدال، ومهمتها نُفذت قبل الاستبدال
+            job = Job.objects.create(service=self.services[0], car_plate='HM-RACE')
+            heatmap.record_job(job)
+            during.append(job)
+            return original(*args)
+
+        with mock.patch.object(heatmap, '_replace_all', side_effect=job_created_during_the_read):
+            self.assertEqual(heatmap.rebuild(), counted_before + 1)
+        self.assertEqual(total(), counted_before + 1)
+
+        # مهمة متأخرة لعملية حسبتها إعادة البناء: لا تُحسب مرتين
+        heatmap.record_job(during[0])
+        heatmap.record_job(self.jobs[0])
+        self.assertEqual(total(), counted_before + 1)
+        later = Job.objects.create(service=self.services[0], car_plate='HM-LATER')
+        heatmap.record_job(later)
+        self.assertEqual(total(), counted_before + 2)
+
+
+@override_settings(DB_WRITE_RETRIES=2, DB_WRITE_BACKOFF=0, CACHES=TEST_CACHES)
+class WriteCoordinatorTests(TransactionTestCase):
+    """ الكاتب الوحيد خارج معاملة الاختبار: القفل، إعادة المحاولة، والفشل النهائي """
+
+    def flaky_write(self, failures, message='database is locked'):
+        calls = []
+
+        @writes.serialized_write
+        def write():
+            calls.append(connection.in_atomic_block)
+            if len(calls) <= failures:
+                raise OperationalError(message)
+            return StationSettings.objects.create(id=1, current_mode='salary').pk
+
+        return write, calls
+
+    def test_locked_database_is_retried_then_succeeds(self):
+        write, calls = self.flaky_write(failures=2)
+        before = writes.stats_snapshot()
+        self.assertEqual(write(), 1)
+        after = writes.stats_snapshot()
+        self.assertEqual(len(calls), 3)
+        self.assertTrue(all(calls))  # كل محاولة داخل معاملة
+        self.assertEqual(after['retries'] - before['retries'], 2)
+        self.assertEqual(after['writes'] - before['writes'], 1)
+        self.assertEqual(after['failures'], before['failures'])
+
+    def test_exhausted_retries_raise_and_count_failure(self):
+        write, calls = self.flaky_write(failures=10)
+        before = writes.stats_snapshot()
+        with self.assertRaises(OperationalError):
+            write()
+        self.assertEqual(len(calls), 3)  # المحاولة الأولى + DB_WRITE_RETRIES
+        self.assertEqual(writes.stats_snapshot()['failures'] - before['failures'], 1)
+        self.assertFalse(StationSettings.objects.exists())
+
+    def test_only_serialized_writes_begin_immediate(self):
+        write, _ = self.flaky_write(failures=0)
+        with CaptureQueriesContext(connection) as ctx:
+            write()
+            with transaction.atomic():
+                StationSettings.objects.update(current_mode='commission')
+        begins = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('BEGIN')]
+        self.assertEqual(begins, ['BEGIN IMMEDIATE', 'BEGIN'])
+
+    def test_other_errors_are_not_retried(self):
+        write, calls = self.flaky_write(failures=10, message='no such table: nowhere')
+        before = writes.stats_snapshot()
+        with self.assertRaises(OperationalError):
+            write()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(writes.stats_snapshot()['retries'], before['retries'])
+
+    def test_nested_write_reuses_the_held_lock(self):
+        @writes.serialized_write
+        def inner():
+            return writes.in_write()
+
+        @writes.serialized_write
+        def outer():
+            # القفل غير قابل لإعادة الدخول: لو حاولت inner أخذه لتوقف الاختبار هنا
+            return inner()
+
+        self.assertTrue(outer())
+        self.assertFalse(writes.in_write())
+        self.assertFalse(writes._thread_lock(DEFAULT_DB_ALIAS).locked())
+
+    def test_writers_wait_for_each_other(self):
+        inside, overlaps = [], []
+
+        @writes.serialized_write
+        def write():
+            if inside:
+                overlaps.append(True)
+            inside.append(True)
+            time.sleep(0.05)
+            inside.pop()
+
+        def worker():
+            write()
+            connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(overlaps, [])
+
+    def test_each_database_has_its_own_lock(self):
+        self.assertIs(writes._thread_lock('default'), writes._thread_lock('default'))
+        self.assertIsNot(writes._thread_lock('default'), writes._thread_lock('station_other'))
+
+
+@override_settings(SLOW_QUERY_SAMPLE_RATE=0, TASKS_EAGER=False, CACHES=TEST_CACHES, RATE_LIMITS={})
+class LoadTestTests(TransactionTestCase):
+    """ 🏋️ اختبار الضغط: يعمل بدون أخطاء، و--in-place لا يترك أثراً في القاعدة """
+
+    def setUp(self):
+        caching.clear_local()
+        self.service = Service.objects.create(name="غسيل", price=Decimal(500), worker_commission=Decimal(100))
+        self.worker = User.objects.create(username='washer', is_staff=True)
+        self.job = Job.objects.create(service=self.service, worker=self.worker, car_plate='REAL-1')
+        StationSettings.objects.create(id=1, current_mode='commission')
+
+    def test_in_place_run_cleans_up_after_itself(self):
+        users, services = User.objects.count(), Service.objects.count()
+        # مستخدم واحد في كل تشغيل: قاعدة الاختبار في الذاكرة تقفل الجداول بين الخيوط فوراً
+        for role in ('cashiers', 'visitors'):
+            with self.subTest(role=role):
+                counts = dict.fromkeys(('tablets', 'cashiers', 'visitors', 'admins'), 0)
+                counts[role] = 1
+                summary = loadtest.run(duration=1, think=0.05, voice_ratio=0, task_workers=0, in_place=True,
+                                       log=lambda message: None, **counts)
+                self.assertEqual(summary['errors'], {})
+                self.assertGreater(summary['jobs_created'], 0)
+
+                self.assertEqual(list(Job.objects.values_list('car_plate', flat=True)), ['REAL-1'])
+                self.assertFalse(User.objects.filter(username=loadtest.LOADTEST_USER).exists())
+                self.assertEqual((User.objects.count(), Service.objects.count()), (users, services))
+
+    def test_in_place_needs_confirmation(self):
+        with mock.patch.object(loadtest, 'run') as run, mock.patch('builtins.input', return_value='no'):
+            with self.assertRaises(CommandError):
+                call_command('loadtest', '--in-place', stdout=io.StringIO())
+        run.assert_not_called()
+
+    def test_percentiles_are_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual([loadtest.Results.percentile(values, p) for p in (50, 95, 99)], [50, 95, 99])
+        self.assertEqual(loadtest.Results.percentile([7], 99), 7)
+
+
+STATION_SLUGS = ('north', 'south')
+
+
+@override_settings(SLOW_QUERY_SAMPLE_RATE=0, TASKS_EAGER=False, CACHES=TEST_CACHES)
+class StationTests(TransactionTestCase):
+    """ 🏪 قاعدة لكل محطة: العزل، التوجيه بالنطاق، والتقرير الموحد بالتوازي """
+
+    @classmethod
+    def setUpClass(cls):
+        # قواعد المحطات تُضاف وقت التشغيل (ملفات مؤقتة)، فلا يعرفها منشئ قواعد الاختبار
+        cls.databases = {DEFAULT_DB_ALIAS, *(f'station_{slug}' for slug in STATION_SLUGS)}
+        cls.tmp = tempfile.mkdtemp()
+        conf = {'main': {'database': DEFAULT_DB_ALIAS, 'hosts': ['main.test']}}
+        for slug in STATION_SLUGS:
+            alias = f'station_{slug}'
+            db = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': os.path.join(cls.tmp, f'db_{slug}.sqlite3'), 'OPTIONS': dict(settings.DATABASES[DEFAULT_DB_ALIAS]['OPTIONS'])}
+            connections.settings[alias] = connections.configure_settings({DEFAULT_DB_ALIAS: connections.settings[DEFAULT_DB_ALIAS], alias: db})[alias]
+            conf[slug] = {'database': alias, 'hosts': [f'{slug}.test']}
+        cls.enterClassContext(override_settings(STATIONS=conf, ALLOWED_HOSTS=['*']))
+        for slug in STATION_SLUGS:
+            with stations.use(slug):
+                call_command('migrate', database=f'station_{slug}', verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        for slug in STATION_SLUGS:
+            alias = f'station_{slug}'
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+
+    def setUp(self):
+        caches['shared'].clear()
+        caches['ratelimit'].clear()
+        caching.clear_local()
+        self.prices = {}
+        for slug, price in (('main', 500), ('north', 700), ('south', 900)):
+            with stations.use(slug):
+                service = Service.objects.create(name=f"غسيل {slug}", price=Decimal(price), worker_commission=Decimal(100))
+                worker = User.objects.create(username=f"worker-{slug}", is_staff=True)
+                Job.objects.create(service=service, worker=worker, status='completed', car_plate=f"{slug}-1")
+                Job.objects.create(service=service, worker=worker, status='canceled', car_plate=f"{slug}-2")
+            self.prices[slug] = Decimal(price)
+
+    def test_each_station_reads_and_writes_its_own_database(self):
+        self.assertEqual(Job.objects.count(), 2)
+        with stations.use('north'):
+            self.assertEqual(stations.db_alias(), 'station_north')
+            self.assertEqual(list(Service.objects.values_list('name', flat=True)), ["غسيل north"])
+            self.assertEqual(list(User.objects.values_list('username', flat=True)), ['worker-north'])
+            # مهام الخلفية (الإسقاطات...) في طابور المحطة نفسها
+            job = Job.objects.get(car_plate='north-1')
+            self.assertEqual(job._state.db, 'station_north')
+            self.assertTrue(JobEvent.objects.filter(job_id=job.pk).exists())
+        self.assertFalse(Job.objects.filter(car_plate__startswith='north').exists())
+        self.assertEqual(Job.objects.using('station_south').get(car_plate='south-1').final_price, self.prices['south'])
+
+        with self.assertRaises(stations.UnknownStation):
+            with stations.use('nowhere'):
+                pass
+        # لكل قاعدة كاتبها الوحيد (قفل وملف قفل مستقلان)
+        self.assertIsNot(writes._thread_lock('station_north'), writes._thread_lock(DEFAULT_DB_ALIAS))
+        self.assertTrue(writes._lock_file_path('station_north').endswith('db_north.sqlite3.write-lock'))
+
+    def test_host_selects_station_and_cache_is_scoped(self):
+        self.assertEqual(stations.for_host('North.test:8000'), 'north')
+        self.assertIsNone(stations.for_host('unknown.test'))
+        for host, slug in (('main.test', 'main'), ('north.test', 'north'), ('unknown.test', 'main')):
+            response = self.client.get(reverse('home'), HTTP_HOST=host)
+            self.assertContains(response, f"غسيل {slug}")
+            for other in {'main', 'north', 'south'} - {slug}:
+                self.assertNotContains(response, f"غسيل {other}")
+
+        version = caching.version('job')
+        with stations.use('north'):
+            caching.bump('job')
+            self.assertNotEqual(caching.version('job'), version)
+        self.assertEqual(caching.version('job'), version)
+
+    def test_voice_files_referenced_by_another_station_are_kept(self):
+        """ مجلد الرسائل مشترك: ملف تشير إليه عملية في الشمال لا يحذفه كنس الرئيسية """
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        name = media.voice_storage().save(f"{media.VOICE_DIR}/ab/shared.wav", ContentFile(b'RIFF'))
+        old = time.time() - 2 * media.SWEEP_GRACE_SECONDS
+        os.utime(media.voice_storage().path(name), (old, old))
+        with stations.use('north'):
+            Job.objects.filter(car_plate='north-1').update(voice_audio=name)
+
+        self.assertFalse(media.release(name))
+        self.assertEqual(media.sweep()[1]['removed'], 0)
+        with stations.use('south'):
+            self.assertFalse(media.release(name))
+        self.assertTrue(media.voice_storage().exists(name))
+
+        Job.objects.using('station_north').update(voice_audio='')
+        self.assertTrue(media.release(name))
+        self.assertFalse(media.voice_storage().exists(name))
+
+    def test_event_backfill_migration_writes_to_the_migrated_database(self):
+        """ migrate --database station_north يملأ سجل أحداث الشمال وليس القاعدة الرئيسية """
+        migration = importlib.import_module('bookings.migrations.0008_jobevent_projections')
+        JobEvent.objects.using('station_north').all().delete()
+        main_events = JobEvent.objects.count()
+        connection = connections['station_north']
+        state = MigrationLoader(connection).project_state(('bookings', '0008_jobevent_projections'))
+        with connection.schema_editor() as editor:
+            migration.backfill_created_events(state.apps, editor)
+        self.assertEqual(JobEvent.objects.using('station_north').filter(kind='created').count(), 2)
+        self.assertEqual(JobEvent.objects.count(), main_events)
+
+    def test_loadtest_sandbox_copies_the_current_station(self):
+        live = settings.DATABASES['station_north']['NAME']
+        with override_settings(DEFAULT_STATION='north'):
+            with loadtest.sandbox() as db_path:
+                self.assertEqual(settings.DATABASES['station_north']['NAME'], db_path)
+                self.assertNotEqual(db_path, live)
+                with stations.use('north'):
+                    self.assertTrue(Job.objects.filter(car_plate='north-1').exists())
+                    Job.objects.filter(car_plate='north-1').update(car_plate='sandboxed')
+        self.assertEqual(settings.DATABASES['station_north']['NAME'], live)
+        self.assertTrue(Job.objects.using('station_north').filter(car_plate='north-1').exists())
+
+    def test_report_fans_out_and_merges(self):
+        today = timezone.localdate()
+        result = consolidated.report(today, today)
+        self.assertEqual([row['station'] for row in result['stations']], ['main', 'north', 'south'])
+        self.assertEqual(result['failed'], [])
+        for row in result['stations']:
+            # الملغاة لا تُحسب
+            self.assertEqual((row['jobs'], row['completed']), (1, 1))
+            self.assertEqual(row['revenue'], self.prices[row['station']])
+        self.assertEqual(result['totals']['jobs'], 3)
+        self.assertEqual(result['totals']['revenue'], sum(self.prices.values()))
+        self.assertEqual(result['totals']['commission'], Decimal(300))
+        self.assertEqual(result['totals']['profit'], sum(self.prices.values()) - 300)
+
+        out = io.StringIO()
+        call_command('station_report', '--json', '--station', 'north', stdout=out)
+        self.assertEqual(json.loads(out.getvalue())['totals']['revenue'], str(self.prices['north']))
+
+    def test_slow_station_does_not_delay_the_others(self):
+        def work():
+            if stations.current() == 'south':
+                time.sleep(1.0)
+            return Job.objects.count()
+
+        started = time.perf_counter()
+        results = stations.fan_out(work, timeout=0.3)
+        self.assertLess(time.perf_counter() - started, 0.9)
+        self.assertEqual([r.station for r in results], ['main', 'north', 'south'])
+        self.assertEqual([r.value for r in results[:2]], [2, 2])
+        self.assertEqual(results[2].error, 'timeout')
+        time.sleep(0.8)  # خيط المحطة البطيئة ينتهي قبل تفريغ القواعد
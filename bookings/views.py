@@ -1,65 +1,124 @@
+import datetime
+import json
+
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse
+from django.db import IntegrityError
+from django.utils.dateparse import parse_datetime
 from django.urls import reverse
+from django.template.loader import render_to_string
 from django.contrib import messages
 from django.utils import timezone
-from django.views.decorators.http import require_POST 
+from django.views.decorators.http import require_http_methods, require_POST 
+from django.middleware.csrf import get_token
+from django.conf import settings
 # 👇 الاستيرادات (لم نغير شيئاً)
 from .models import Service, Job, Notification, StationSettings, Attendance, WorkerProfile
-from django.contrib.admin.views.decorators import staff_member_required
+from .decorators import staff_member_required
 from django.contrib.auth.models import User
+from . import caching, changes, dashboard, heatmap, metrics, performance, queueboard, slots
+from .writes import serialized_write
+
+# ✍️ إنشاء العمليات يمر عبر الكاتب الوحيد (لا أخطاء "database is locked" وقت الذروة)
+@serialized_write
+def _create_job(slot_at=None, **fields):
+    # 📅 حجز الموقع: الفترات تُحجز في نفس المعاملة (امتلاؤها يلغي إنشاء العملية)
+    if slot_at is not None:
+        fields.update(slot_at=slot_at, slot_count=slots.reserve(slot_at, fields.get('service_id')))
+    return Job.objects.create(**fields)
+
+def _create_job_once(**fields):
+    """ _create_job مع منع التكرار: None إن سبقه حفظ بنفس idempotency_key (ضغطتان في نفس اللحظة) """
+    key = fields.get('idempotency_key')
+    try:
+        return _create_job(**fields)
+    except IntegrityError:
+        if key and Job.objects.filter(idempotency_key=key).exists():
+            return None
+        raise
+
+# ✍️ أزرار اللوحة: الكتابة وحدها داخل الكاتب الوحيد، والرد (رسائل، توجيه، HTML) بعد التثبيت
+@serialized_write
+def _complete_job(job_id):
+    """ (العملية، هل تغيرت) أو Job.DoesNotExist """
+    job = Job.objects.select_related('service').get(id=job_id)
+    if job.status == 'completed':
+        return job, False
+    job.status = 'completed'
+    job.save()
+    return job, True
+
+@serialized_write
+def _read_notification(notif):
+    """ يعلم الإشعار مقروءاً ويرجع رقم عمليته، أو يحذفه ويرجع None إن حُذفت العملية """
+    notif.is_read = True
+    notif.save()
+    if notif.job_id and Job.objects.filter(id=notif.job_id).exists():
+        return notif.job_id
+    notif.delete()
+    return None
+
+@serialized_write
+def _toggle_mode():
+    settings_obj, _ = StationSettings.objects.get_or_create(id=1)
+    settings_obj.current_mode = 'salary' if settings_obj.current_mode == 'commission' else 'commission'
+    settings_obj.save()
+    return settings_obj.current_mode
+
+@serialized_write
+def _toggle_attendance(worker):
+    att, _ = Attendance.objects.get_or_create(worker=worker, date=timezone.now().date())
+    att.is_present = not att.is_present
+    if hasattr(worker, 'profile'):
+        att.day_salary_snapshot = worker.profile.daily_salary
+    att.save()
+    return att
+
+@serialized_write
+def _set_daily_salary(worker, salary):
+    profile, _ = WorkerProfile.objects.get_or_create(user=worker)
+    profile.daily_salary = salary
+    profile.save()
+    return profile
 
 # ========================================================
 # 👇👇👇 الكود القديم (الأصلي) 👇👇👇
 # ========================================================
 
+@caching.cached_fragment('service')
+def service_choices():
+    """ 🗃️ أزرار الخدمات في نموذج الموقع (تتغير فقط مع جدول الخدمات) """
+    return render_to_string('service_choices.html', {'services': Service.objects.all()})
+
 def home(request):
     """ 
     واجهة الزبون (الموقع) - لم نلمسها
     """
     if request.method == 'POST':
         # 1. حفظ بيانات الحجز
-        new_job = Job.objects.create( 
-            client_name=request.POST.get('name'),
-            phone=request.POST.get('phone'),
-            car_plate=request.POST.get('plate'),
-            service_id=request.POST.get('service'),
-            source='website',
-            status='pending', 
-            car_type="غير محدد",
-            custom_desc=request.POST.get('description'), 
-            voice_audio=request.FILES.get('voice_note') 
-        )
-
-        # 2. تحديد نوع الإشعار
-        if request.FILES.get('voice_note'):
-            notif_msg = f"🎙️ رسالة صوتية من {new_job.client_name}"
-            n_type = 'voice'
-        elif request.POST.get('description'):
-            notif_msg = f"📝 طلب خاص من {new_job.client_name}"
-            n_type = 'voice'
-        else:
-            notif_msg = f"🚗 حجز جديد: {new_job.client_name}"
-            n_type = 'standard'
-
-        # 3. منع التكرار
-        existing_notif = Notification.objects.filter(job=new_job).first()
-        if existing_notif:
-            existing_notif.message = notif_msg
-            existing_notif.notif_type = n_type
-            existing_notif.is_read = False
-            existing_notif.save()
-        else:
-            Notification.objects.create(
-                job=new_job,
-                message=notif_msg,
-                notif_type=n_type
+        # ⚙️ الإشعار (نوعه ومنع تكراره) يُنشأ في مهمة خلفية عبر signals.py
+        # 📅 الموعد إجباري: الفترة تُحجز ذرياً مع العملية (slots.py)
+        try:
+            _create_job( 
+                slot_at=slots.parse(request.POST.get('slot')),
+                client_name=request.POST.get('name'),
+                phone=request.POST.get('phone'),
+                car_plate=request.POST.get('plate'),
+                service_id=request.POST.get('service'),
+                source='website',
+                status='pending', 
+                car_type="غير محدد",
+                custom_desc=request.POST.get('description'), 
+                voice_audio=request.FILES.get('voice_note'),
+                # المدة كما قاسها المتصفح (تُتحقق وتُقدر من الملف إن غابت - media.py)
+                voice_duration=request.POST.get('voice_duration') if request.FILES.get('voice_note') else None,
             )
+        except slots.SlotUnavailable as exc:
+            return render(request, 'home.html', {'service_choices': service_choices(), 'booking_days': slots.bookable_days(), 'slot_error': str(exc)}, status=409)
 
         return render(request, 'home.html', {'success': True})
 
-    services = Service.objects.all()
-    return render(request, 'home.html', {'services': services})
+    return render(request, 'home.html', {'service_choices': service_choices(), 'booking_days': slots.bookable_days()})
 
 # ========================================================
 # 🚀 تحديث هام هنا: دالة الكاشير لتستقبل البيانات الجديدة
@@ -83,8 +142,21 @@ def pos_dashboard(request):
             c_type = request.POST.get('car_type') or "سيارة سياحية"
             notes = request.POST.get('notes') or ""
 
-            # الحفظ في قاعدة البيانات
-            Job.objects.create(
+            # 📴 نفس الإدخال أُرسل مرتين (ضغط مزدوج أو إعادة إرسال) -> لا ننشئ عملية ثانية
+            key = request.POST.get('idempotency_key') or None
+
+            def duplicate():
+                if dashboard.wants_json(request):
+                    return dashboard.partial_response(f"ℹ️ العملية ({plate}) مسجلة مسبقاً.", level='info', duplicate=True)
+                messages.info(request, f"ℹ️ العملية ({plate}) مسجلة مسبقاً.")
+                return redirect('/admin/bookings/job/')
+
+            if key and Job.objects.filter(idempotency_key=key).exists():
+                return duplicate()
+
+            # الحفظ في قاعدة البيانات (الإرسالان في نفس اللحظة: الثاني يصطدم بالمفتاح الفريد)
+            job = _create_job_once(
+                idempotency_key=key,
                 client_name=c_name,   # جديد
                 phone=c_phone,        # جديد
                 car_plate=plate,
@@ -95,23 +167,150 @@ def pos_dashboard(request):
                 source='manual',
                 status='processing'
             )
+            if job is None:
+                return duplicate()
+            if dashboard.wants_json(request):
+                # ⚡ السطر الجديد فقط (HTML جاهز لجدول عمليات اليوم) + أرقام اليوم
+                return dashboard.partial_response(
+                    f"✅ تم تسجيل {c_type} ({plate}) بنجاح!",
+                    mode=job.system_mode,
+                    job=dashboard.job_row(job),
+                    row_html=render_to_string('admin/bookings/job/latest_job_row.html', {'job': job}),
+                )
             messages.success(request, f"✅ تم تسجيل {c_type} ({plate}) بنجاح!")
         except Exception as e:
+            if dashboard.wants_json(request):
+                return dashboard.partial_response("❌ حدث خطأ أثناء التسجيل، تأكد من اختيار الخدمة والعامل.", level='error', status=400)
             messages.error(request, "❌ حدث خطأ أثناء التسجيل، تأكد من اختيار الخدمة والعامل.")
             print(f"Error: {e}")
             
     return redirect('/admin/bookings/job/')
 
+# ========================================================
+# 📴 الكاشير بدون اتصال: مزامنة دفعات من الإدخالات المحفوظة محلياً
+# ========================================================
+SYNC_MAX_BATCH = 100
+
+def _client_time(value):
+    """ وقت الإدخال كما سجله الجهاز (لا نقبل وقتاً في المستقبل) """
+    try:
+        dt = parse_datetime(value) if isinstance(value, str) else None
+    except ValueError:  # شكل صحيح وتاريخ مستحيل (شهر 13)
+        dt = None
+    now = timezone.now()
+    if dt is None:
+        return now
+    if timezone.is_naive(dt):
+        dt = timezone.make_aware(dt)
+    return min(dt, now)
+
+def _sync_text(entry, name, default, field=None):
+    """ نص حقل من إدخال الجهاز: أي قيمة بسيطة تُحول لنص وتُقص على طول الحقل في Job """
+    value = entry.get(name)
+    if isinstance(value, (dict, list)):
+        raise ValueError(name)
+    text = str(value).strip() if value is not None else ''
+    if not text:
+        return default
+    max_length = Job._meta.get_field(field or name).max_length
+    return text[:max_length] if max_length else text
+
+@staff_member_required
+@require_http_methods(['GET', 'POST'])
+def pos_sync(request):
+    """
+    يستقبل {"entries": [...]} من جهاز الكاشير.
+    كل إدخال يحمل مفتاحاً (key) يولده الجهاز؛ المفتاح المكرر يرجع نفس العملية بدل إنشاء جديدة.
+    GET: رمز CSRF الحالي (الـ Service Worker يطلبه قبل كل مزامنة، فالرمز المحفوظ مع
+    الإدخال قد يكون تغير بعد تسجيل الدخول من جديد).
+    """
+    if request.method == 'GET':
+        return JsonResponse({'csrf': get_token(request)})
+    try:
+        entries = json.loads(request.body or b'{}').get('entries') or []
+    except (ValueError, AttributeError):
+        return JsonResponse({'error': 'invalid json'}, status=400)
+    if len(entries) > SYNC_MAX_BATCH:
+        return JsonResponse({'error': f'max {SYNC_MAX_BATCH} entries per batch'}, status=400)
+
+    keys = [str(e.get('key'))[:64] for e in entries if isinstance(e, dict) and e.get('key')]
+    known = dict(Job.objects.filter(idempotency_key__in=keys).values_list('idempotency_key', 'id'))
+    service_ids = set(Service.objects.values_list('id', flat=True))
+    worker_ids = set(User.objects.filter(is_staff=True).values_list('id', flat=True))
+
+    results = []
+    for entry in entries:
+        if not isinstance(entry, dict) or not entry.get('key'):
+            results.append({'key': None, 'status': 'error', 'error': 'missing key'})
+            continue
+        key = str(entry['key'])[:64]
+
+        if key in known:
+            results.append({'key': key, 'status': 'duplicate', 'job_id': known[key]})
+            continue
+
+        try:
+            service_id, worker_id = int(entry.get('service')), int(entry.get('worker'))
+        except (TypeError, ValueError):
+            service_id = worker_id = None
+        if service_id not in service_ids or worker_id not in worker_ids:
+            results.append({'key': key, 'status': 'error', 'error': 'service/worker'})
+            continue
+
+        try:
+            fields = {
+                'client_name': _sync_text(entry, 'client_name', "زبون ورشة"),
+                'phone': _sync_text(entry, 'phone', ""),
+                'car_plate': _sync_text(entry, 'plate', "بدون لوحة", field='car_plate'),
+                'car_type': _sync_text(entry, 'car_type', "سيارة سياحية"),
+                'custom_desc': _sync_text(entry, 'notes', "", field='custom_desc'),
+            }
+        except ValueError as exc:
+            results.append({'key': key, 'status': 'error', 'error': f'invalid {exc}'})
+            continue
+
+        try:
+            job = _create_job(
+                idempotency_key=key,
+                service_id=service_id,
+                worker_id=worker_id,
+                created_at=_client_time(entry.get('created_at')),
+                source='manual',
+                status='processing',
+                **fields,
+            )
+        except IntegrityError:
+            # دفعة أخرى سبقتنا بنفس المفتاح
+            job_id = Job.objects.filter(idempotency_key=key).values_list('id', flat=True).first()
+            results.append({'key': key, 'status': 'duplicate', 'job_id': job_id})
+            continue
+
+        known[key] = job.id
+        results.append({'key': key, 'status': 'created', 'job_id': job.id})
+
+    return JsonResponse({'results': results})
+
+def pos_service_worker(request):
+    """ Service Worker الخاص بالكاشير (يُقدم من الجذر ليغطي صفحات الإدارة) """
+    response = render(request, 'pos_sw.js', {'sync_url': reverse('pos_sync')}, content_type='application/javascript')
+    response['Service-Worker-Allowed'] = '/'
+    response['Cache-Control'] = 'no-cache'
+    return response
+
 @staff_member_required
 def finish_wash(request, job_id):
     """ زر إنهاء الغسيل - لم نلمسها """
     try:
-        job = Job.objects.get(id=job_id)
-        if job.status != 'completed':
-            job.status = 'completed' 
-            job.save()
+        job, changed = _complete_job(job_id)
+        if changed:
+            if dashboard.wants_json(request):
+                return dashboard.partial_response(f"🏁 تم إنهاء غسيل السيارة {job.car_plate} بنجاح!", mode=job.system_mode, job=dashboard.job_row(job))
             messages.success(request, f"🏁 تم إنهاء غسيل السيارة {job.car_plate} بنجاح!")
+        elif dashboard.wants_json(request):
+            return dashboard.partial_response(f"ℹ️ السيارة {job.car_plate} منتهية مسبقاً.", level='info', mode=job.system_mode, job=dashboard.job_row(job))
     except Job.DoesNotExist:
+        if dashboard.wants_json(request):
+            return dashboard.partial_response("⚠️ هذه العملية غير موجودة.", level='error', status=404)
         messages.error(request, "⚠️ هذه العملية غير موجودة.")
         pass 
     
@@ -124,7 +323,9 @@ def finish_wash(request, job_id):
 @staff_member_required
 def job_detail(request, job_id):
     job = get_object_or_404(Job, id=job_id)
-    Notification.objects.filter(job=job, is_read=False).update(is_read=True)
+    unread = Notification.objects.filter(job=job, is_read=False)
+    if unread.exists():
+        serialized_write(unread.update)(is_read=True)
     return render(request, 'job_detail.html', {'job': job})
 
 @staff_member_required
@@ -136,15 +337,79 @@ def get_notifications(request):
 @staff_member_required
 def mark_read_and_redirect(request, notif_id):
     notif = get_object_or_404(Notification, id=notif_id)
-    notif.is_read = True
-    notif.save()
-    
-    if notif.job_id and Job.objects.filter(id=notif.job_id).exists():
-        return redirect('job_detail', job_id=notif.job_id)
-    else:
-        notif.delete()
-        messages.warning(request, "⚠️ عذراً، هذا الحجز تم حذفه مسبقاً.")
-        return redirect('/admin/bookings/job/')
+    job_id = _read_notification(notif)
+    if job_id:
+        return redirect('job_detail', job_id=job_id)
+    messages.warning(request, "⚠️ عذراً، هذا الحجز تم حذفه مسبقاً.")
+    return redirect('/admin/bookings/job/')
+
+@staff_member_required
+def heatmap_data(request):
+    """ 🔥 خريطة الضغط (7×24) - تُقرأ من الذاكرة ولا تمر على جدول العمليات """
+    try:
+        scope = heatmap.scope_for(
+            service_id=request.GET.get('service') or None,
+            worker_id=request.GET.get('worker') or None,
+        )
+    except ValueError:
+        return JsonResponse({'error': 'expected ?service=<id> or ?worker=<id>'}, status=400)
+    return JsonResponse(heatmap.get_matrix(scope))
+
+@staff_member_required
+def dashboard_counters(request):
+    """ 📊 أرقام اليوم فقط (بعد مزامنة الكاشير بدون اتصال مثلاً) """
+    return JsonResponse({'counters': dashboard.today_counters()})
+
+@staff_member_required
+def leaderboard_data(request):
+    """ ⏱️ ترتيب العمال بمدة الغسيل (من جدول الإحصاءات الصغير، لا من العمليات) """
+    return JsonResponse({'leaderboard': performance.leaderboard()})
+
+def changes_feed(request):
+    """ 🔄 ما تغير بعد المؤشر فقط (?feed=jobs&since=<cursor>&limit=500) """
+    if not changes.authorized(request):
+        return HttpResponse(status=403)
+    feed = request.GET.get('feed', 'jobs')
+    if feed not in changes.FEEDS:
+        return JsonResponse({'error': f"unknown feed, expected one of: {', '.join(changes.FEEDS)}"}, status=400)
+    try:
+        limit = int(request.GET.get('limit', changes.DEFAULT_LIMIT))
+        rows, cursor, has_more = changes.fetch(feed, request.GET.get('since'), limit)
+    except (ValueError, changes.InvalidCursor):
+        return JsonResponse({'error': 'invalid cursor or limit'}, status=400)
+    return JsonResponse({'feed': feed, 'results': rows, 'next_cursor': cursor, 'has_more': has_more})
+
+def slots_data(request):
+    """ 📅 توفر مواعيد يوم (?date=YYYY-MM-DD&minutes=<مدة الخدمة>) - من الكاش غالباً """
+    try:
+        day = datetime.date.fromisoformat(request.GET.get('date', ''))
+        minutes = int(request.GET.get('minutes') or slots.slot_minutes())
+    except ValueError:
+        return JsonResponse({'error': 'expected ?date=YYYY-MM-DD&minutes=<int>'}, status=400)
+    if day not in slots.bookable_days():
+        return JsonResponse({'error': 'date outside the booking window'}, status=400)
+    response = JsonResponse({'date': day.isoformat(), 'slots': slots.availability(day, minutes)})
+    response['Cache-Control'] = f"public, max-age={getattr(settings, 'BOOKING_SLOTS_CACHE_SECONDS', 15)}"
+    return response
+
+def queue_board(request):
+    """ 📺 شاشة الانتظار العامة (تلفاز صالة الانتظار) """
+    version, data = queueboard.snapshot()
+    return render(request, 'queue_board.html', {'board': json.loads(data), 'stream_url': queueboard.STREAM_PATH})
+
+def queue_stream(request):
+    """ 📺 بديل البث تحت WSGI: حدث واحد ثم يعيد المتصفح الاتصال (core/asgi.py يبث مباشرة) """
+    version, data = queueboard.snapshot()
+    retry = int(getattr(settings, 'QUEUE_BOARD_MAX_AGE', 10) * 1000)
+    response = HttpResponse(f"retry: {retry}\n".encode() + queueboard.event(version, data), content_type='text/event-stream; charset=utf-8')
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+def metrics_endpoint(request):
+    """ 📈 عدادات المراقبة بصيغة Prometheus """
+    if not metrics.authorized(request):
+        return HttpResponse(status=403)
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 # =========================================================
 # 👇👇👇 الدوال الإدارية (تبديل الوضع + الحضور + الرواتب) 👇👇👇
@@ -154,12 +419,10 @@ def mark_read_and_redirect(request, notif_id):
 def toggle_mode(request):
     """ زر التبديل بين الرواتب والعمولة """
     if request.method == "POST":
-        s, _ = StationSettings.objects.get_or_create(id=1)
-        if s.current_mode == 'commission':
-            s.current_mode = 'salary'
-        else:
-            s.current_mode = 'commission'
-        s.save()
+        mode = _toggle_mode()
+        if dashboard.wants_json(request):
+            # اللوحتان مختلفتان تماماً: الجافاسكريبت يعيد تحميل الصفحة
+            return dashboard.partial_response("🔄 تم تبديل النظام", mode=mode, reload=True)
     return redirect('/admin/bookings/job/')
 
 @staff_member_required
@@ -168,15 +431,14 @@ def update_attendance_manual(request):
     if request.method == "POST":
         w_id = request.POST.get('worker_id')
         worker = get_object_or_404(User, id=w_id)
-        today = timezone.now().date()
-        
-        att, created = Attendance.objects.get_or_create(worker=worker, date=today)
-        att.is_present = not att.is_present
-        
-        if hasattr(worker, 'profile'):
-            att.day_salary_snapshot = worker.profile.daily_salary
-            
-        att.save()
+        att = _toggle_attendance(worker)
+
+        if dashboard.wants_json(request):
+            return dashboard.partial_response(
+                f"{'✅ حاضر' if att.is_present else '❌ غائب'}: {worker.first_name or worker.username}",
+                mode='salary',
+                worker={'id': worker.id, 'is_present': att.is_present},
+            )
         
     return redirect('/admin/bookings/job/')
 
@@ -194,13 +456,18 @@ def update_worker_salary_manual(request):
         try:
             worker_user = get_object_or_404(User, id=worker_id)
             # تحديث أو إنشاء البروفايل
-            profile, created = WorkerProfile.objects.get_or_create(user=worker_user)
-            
-            profile.daily_salary = float(new_salary)
-            profile.save()
+            profile = _set_daily_salary(worker_user, float(new_salary))
             
+            if dashboard.wants_json(request):
+                return dashboard.partial_response(
+                    f"💰 تم تحديث راتب {worker_user.first_name} إلى {new_salary} د.ج",
+                    mode='salary',
+                    worker={'id': worker_user.id, 'salary': profile.daily_salary},
+                )
             messages.success(request, f"💰 تم تحديث راتب {worker_user.first_name} إلى {new_salary} د.ج")
         except Exception as e:
+            if dashboard.wants_json(request):
+                return dashboard.partial_response("❌ حدث خطأ أثناء تحديث الراتب.", level='error', status=400)
             messages.error(request, "❌ حدث خطأ أثناء تحديث الراتب.")
             print(f"Salary Update Error: {e}")
             
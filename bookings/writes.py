@@ -0,0 +1,167 @@
+"""
+✍️ منسق الكتابة لقاعدة SQLite.
+
+SQLite يقبل كاتباً واحداً فقط في نفس اللحظة. بدل أن تتصادم الطلبات وتفشل بـ
+"database is locked"، كل كتابة قصيرة تمر عبر @serialized_write:
+
+1. قفل داخل العملية (threading) + قفل ملف بين العمليات (fcntl، إن وُجد)، لكل
+   قاعدة على حدة: كل محطة (stations.py) لها كاتبها الوحيد.
+2. معاملة BEGIN IMMEDIATE (هنا فقط، لا لكل atomic()) تحجز الكتابة من البداية.
+3. عند "database is locked": إعادة المحاولة بعدد محدود مع انتظار عشوائي (jitter).
+
+الإحصائيات (مدة انتظار القفل، المحاولات، الفشل) متاحة عبر stats_snapshot().
+"""
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+
+from . import stations
+
+try:
+    import fcntl
+except ImportError:  # ويندوز: نكتفي بالقفل داخل العملية
+    fcntl = None
+
+_thread_locks = {}  # القاعدة -> threading.Lock
+_thread_locks_guard = threading.Lock()
+_local = threading.local()
+
+_stats_lock = threading.Lock()
+_stats = {
+    'writes': 0,                # عدد الكتابات المنفذة
+    'lock_waits': 0,            # كتابات انتظرت القفل أكثر من 1ms
+    'lock_wait_seconds': 0.0,   # مجموع زمن الانتظار
+    'max_lock_wait_seconds': 0.0,
+    'retries': 0,               # إعادة محاولة بعد "database is locked"
+    'failures': 0,              # فشل نهائي بعد استنفاد المحاولات
+}
+
+
+def _record(**values):
+    with _stats_lock:
+        for key, value in values.items():
+            if key == 'max_lock_wait_seconds':
+                _stats[key] = max(_stats[key], value)
+            else:
+                _stats[key] += value
+
+
+def stats_snapshot():
+    """ نسخة من إحصائيات الكتابة (للوحة المراقبة) """
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _lock_file_path(alias=DEFAULT_DB_ALIAS):
+    path = getattr(settings, 'DB_WRITE_LOCK_FILE', None) if alias == DEFAULT_DB_ALIAS else None
+    if path is None:
+        path = f"{connections[alias].settings_dict['NAME']}.write-lock"
+    return str(path)
+
+
+def _thread_lock(alias):
+    with _thread_locks_guard:
+        return _thread_locks.setdefault(alias, threading.Lock())
+
+
+def _depth():
+    if not hasattr(_local, 'depth'):
+        _local.depth = {}
+    return _local.depth
+
+
+def in_write(alias=None):
+    """ هل هذا الخيط داخل @serialized_write على هذه القاعدة الآن؟ """
+    return bool(_depth().get(alias or stations.db_alias()))
+
+
+@contextmanager
+def _writer_lock(alias=DEFAULT_DB_ALIAS):
+    """ قفل الكاتب الوحيد لهذه القاعدة: داخل العملية ثم بين العمليات """
+    started = time.perf_counter()
+    lock = _thread_lock(alias)
+    lock.acquire()
+    fd = None
+    try:
+        # قاعدة في الذاكرة (الاختبارات) لا تشاركها عملية أخرى: لا ملف قفل
+        if fcntl is not None and not connections[alias].is_in_memory_db():
+            fd = os.open(_lock_file_path(alias), os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        waited = time.perf_counter() - started
+        _record(lock_waits=int(waited > 0.001), lock_wait_seconds=waited, max_lock_wait_seconds=waited)
+        yield
+    finally:
+        if fd is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+        lock.release()
+
+
+@contextmanager
+def _immediate(connection):
+    """ atomic() التالي على هذا الاتصال يبدأ بـ BEGIN IMMEDIATE بدل BEGIN """
+    connection.ensure_connection()
+    previous = connection.transaction_mode
+    connection.transaction_mode = 'IMMEDIATE'
+    try:
+        yield
+    finally:
+        connection.transaction_mode = previous
+
+
+def _is_locked_error(exc):
+    message = str(exc).lower()
+    return 'locked' in message or 'busy' in message
+
+
+def serialized_write(func):
+    """
+    يمرر الدالة عبر الكاتب الوحيد داخل transaction.atomic مع إعادة المحاولة.
+    يجب أن تكون الدالة قصيرة وكتابة فقط (لا رسم صفحات ولا اتصالات خارجية بداخلها).
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        alias = stations.db_alias()
+        connection = connections[alias]
+        # غير SQLite: قاعدة البيانات تدير التزامن بنفسها
+        if connection.vendor != 'sqlite':
+            with transaction.atomic(using=alias):
+                return func(*args, **kwargs)
+
+        # داخل كتابة أخرى (نفس الخيط) أو داخل معاملة خارجية: لا قفل ولا إعادة محاولة هنا
+        depth = _depth()
+        if depth.get(alias) or connection.in_atomic_block:
+            depth[alias] = depth.get(alias, 0) + 1
+            try:
+                with transaction.atomic(using=alias):
+                    return func(*args, **kwargs)
+            finally:
+                depth[alias] -= 1
+
+        retries = getattr(settings, 'DB_WRITE_RETRIES', 5)
+        backoff = getattr(settings, 'DB_WRITE_BACKOFF', 0.05)
+        for attempt in range(retries + 1):
+            try:
+                with _writer_lock(alias):
+                    depth[alias] = 1
+                    try:
+                        with _immediate(connection), transaction.atomic(using=alias):
+                            result = func(*args, **kwargs)
+                    finally:
+                        depth[alias] = 0
+                _record(writes=1)
+                return result
+            except OperationalError as exc:
+                if not _is_locked_error(exc) or attempt == retries:
+                    _record(failures=1)
+                    raise
+                _record(retries=1)
+                # انتظار متزايد مع عشوائية حتى لا تعود كل الطلبات في نفس اللحظة
+                time.sleep(backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+    return wrapper
@@ -13,4 +13,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# 📺 بث شاشة الانتظار (SSE): كل الشاشات المتصلة تشترك في نسخة واحدة في الذاكرة
+# لا يمر على middleware Django: حد الاتصالات لكل عنوان داخل queueboard.stream
+from bookings import queueboard  # noqa: E402 (بعد تهيئة Django)
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == queueboard.STREAM_PATH:
+        return await queueboard.stream(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -0,0 +1,9 @@
+"""
+🪶 مدخل ASGI الخفيف: مثل core/asgi.py (بما فيه بث شاشة الانتظار) لكن بالإعدادات العامة.
+"""
+
+import os
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings_public')
+
+from core.asgi import application  # noqa: E402,F401
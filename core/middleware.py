@@ -1,6 +1,17 @@
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import render
 from django.utils import timezone
+from django.db import connections
+from django.urls import reverse
 import datetime
+import logging
+import time
+from contextlib import ExitStack
+
+from bookings import dashboard, metrics, profiler, querylog, ratelimit, stations, tasks
+
+logger = logging.getLogger(__name__)
 
 class TrialPeriodMiddleware:
     def __init__(self, get_response):
@@ -16,4 +27,146 @@ class TrialPeriodMiddleware:
             return render(request, 'trial_expired.html')
 
         response = self.get_response(request)
-        return response
\ No newline at end of file
+        return response
+
+
+class StationMiddleware:
+    """ 🏪 المحطة حسب اسم النطاق (bookings/stations.py): أول طبقة، فكل ما بعدها يقرأ ويكتب في قاعدتها """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.station = stations.for_host(request.get_host()) or stations.current()
+        with stations.use(request.station):
+            return self.get_response(request)
+
+
+class MetricsMiddleware:
+    """ 📈 قياس زمن كل طلب وعدد ومدة استعلامات قاعدة البيانات (لـ /metrics) """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        db = [0, 0.0]  # عدد الاستعلامات، زمنها
+
+        def count_queries(execute, sql, params, many, context):
+            t = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                db[0] += 1
+                db[1] += time.perf_counter() - t
+
+        with connections[stations.db_alias()].execute_wrapper(count_queries):
+            response = self.get_response(request)
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.url_name or match.view_name) if match else 'unmatched'
+        elapsed = time.perf_counter() - started
+
+        metrics.observe('bookings_request_duration_seconds', elapsed, view=view)
+        metrics.inc('bookings_requests_total', view=view, method=request.method, status=response.status_code)
+        if db[0]:
+            metrics.inc('bookings_db_queries_total', db[0], view=view)
+            metrics.inc('bookings_db_query_seconds_total', db[1], view=view)
+        metrics.maybe_flush()
+        return response
+
+
+class RateLimitMiddleware:
+    """ 🚦 رفض سريع (429 + Retry-After) عند الزحام أو تجاوز ميزانية الرابط (bookings/ratelimit.py) """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.path in getattr(settings, 'RATE_LIMIT_EXEMPT_PATHS', ()):
+            return self.get_response(request)
+        with ratelimit.admit() as admitted:
+            if not admitted:
+                metrics.inc('bookings_rate_limited_total', view='all', reason='concurrency')
+                return self.reject(request, 1)
+            return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        retry_after = ratelimit.check(request, match.url_name or match.view_name)
+        if retry_after:
+            return self.reject(request, retry_after)
+        return None
+
+    @staticmethod
+    def reject(request, retry_after):
+        message = "⏳ طلبات كثيرة، حاول بعد قليل."
+        if dashboard.wants_json(request) or '/api/' in request.path:
+            response = JsonResponse({'ok': False, 'message': message, 'retry_after': retry_after}, status=429)
+        else:
+            response = HttpResponse(message, status=429, content_type='text/plain; charset=utf-8')
+        response['Retry-After'] = str(retry_after)
+        return response
+
+
+class SlowQueryMiddleware:
+    """ 🐢 يلتقط الاستعلامات البطيئة أثناء الطلب، والخطة والحفظ في مهمة خلفية (bookings/querylog.py) """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not querylog.sampled():
+            return self.get_response(request)
+
+        capture = querylog.QueryCapture()
+        with connections[stations.db_alias()].execute_wrapper(capture):
+            response = self.get_response(request)
+
+        if capture.entries:
+            match = getattr(request, 'resolver_match', None)
+            view = (match.url_name or match.view_name) if match else request.path
+            try:
+                # سطر واحد في الطابور؛ EXPLAIN والتجميع عند عامل المهام
+                tasks.record_slow_queries.delay(entries=capture.entries, view=view)
+            except Exception:
+                # السجل لا يجب أن يُفشل الطلب نفسه
+                logger.exception("Slow query log failed for %s", view)
+        return response
+
+
+class ProfileMiddleware:
+    """ 🔬 ?profile=1: يقيس الطلب بـ cProfile + عينات المكدس ويحفظه (bookings/profiler.py) """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not profiler.requested(request):
+            return self.get_response(request)
+
+        # نحذف المعامل حتى لا تعتبره صفحات الإدارة فلتراً
+        request.GET = request.GET.copy()
+        request.GET.pop('profile')
+
+        queries = [0]
+
+        def count_queries(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        capture = profiler.Capture()
+        try:
+            capture.start()
+        except ValueError:
+            # بروفايلر آخر يعمل بالفعل في هذه العملية
+            return self.get_response(request)
+        try:
+            # كل الاتصالات (التقارير تقرأ من نسخة reporting)
+            with ExitStack() as stack:
+                for conn in connections.all():
+                    stack.enter_context(conn.execute_wrapper(count_queries))
+                response = self.get_response(request)
+        finally:
+            capture.stop()
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.url_name or match.view_name) if match else request.path
+        profile = profiler.save(capture, request, response, view, queries[0])
+        response['X-Profile-Url'] = reverse('admin:bookings_requestprofile_change', args=[profile.pk])
+        return response
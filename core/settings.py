@@ -51,6 +51,15 @@ INSTALLED_APPS = [
 # ⚙️ Middleware
 # =========================================================
 MIDDLEWARE = [
+    # 🏪 المحطة حسب النطاق (قاعدة بياناتها) قبل أي استعلام
+    'core.middleware.StationMiddleware',
+    # 📈 تقيس زمن الطلب كاملاً
+    'core.middleware.MetricsMiddleware',
+    # 🚦 رفض سريع (429) قبل أي عمل: حد التزامن + ميزانية كل رابط
+    'core.middleware.RateLimitMiddleware',
+    # 🐢 سجل الاستعلامات البطيئة (الخطة والحفظ في مهمة خلفية بعد انتهاء الطلب)
+    'core.middleware.SlowQueryMiddleware',
+
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     
@@ -62,6 +71,9 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+
+    # 🔬 ?profile=1 (بعد المصادقة: مدير النظام فقط)
+    'core.middleware.ProfileMiddleware',
 ]
 
 ROOT_URLCONF = 'core.urls'
@@ -89,13 +101,254 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # =========================================================
 # 🗄️ Database
 # =========================================================
+# WAL (القراءة لا تنتظر الكاتب) يُكتب في ملف القاعدة نفسه، لذلك يُفعل على الخادم فقط:
+#   SQLITE_JOURNAL_MODE=WAL  (مرة واحدة تكفي، ويبقى بعدها)
+# محلياً نتركه، فلا يتحول db.sqlite3 المحفوظ في git مع أول أمر manage.py.
+SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', '')
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # ✍️ BEGIN IMMEDIATE يُطلب داخل @serialized_write فقط (writes.py)، لا لكل atomic()
+            # انتظار القفل (ثوانٍ) قبل "database is locked"
+            'timeout': 5,
+            # synchronous=NORMAL آمن مع WAL فقط؛ مع journal العادي قد يفسد الملف عند انقطاع الكهرباء
+            'init_command': (
+                f'PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}; '
+                + ('PRAGMA synchronous = NORMAL;' if SQLITE_JOURNAL_MODE.upper() == 'WAL' else '')
+            ) if SQLITE_JOURNAL_MODE else '',
+        },
+    },
+
+    # 📸 نسخة التقارير (قراءة فقط): تُحدث بالأمر refresh_reporting_replica
+    # يمكن استبدالها بـ PostgreSQL standby بتغيير ENGINE/NAME فقط
+    'reporting': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_reporting.sqlite3',
+        'OPTIONS': {'init_command': 'PRAGMA query_only = ON;'},
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+# =========================================================
+# 🏪 المحطات (bookings/stations.py)
+# =========================================================
+# الرئيسية (main) = القاعدة default. كل محطة إضافية لها ملف SQLite خاص ونطاقاتها:
+#   BOOKINGS_STATIONS="north=north.example.com|north.local,south=south.example.com"
+# ثم مرة لكل محطة (بياناتها الأولية تُكتب في قاعدتها):
+#   BOOKINGS_STATION=north python manage.py migrate --database station_north
+STATIONS = {'main': {'database': 'default', 'hosts': []}}
+for _entry in filter(None, (e.strip() for e in os.environ.get('BOOKINGS_STATIONS', '').split(','))):
+    _slug, _sep, _hosts = _entry.partition('=')
+    DATABASES[f'station_{_slug}'] = {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / f'db_{_slug}.sqlite3',
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
     }
+    STATIONS[_slug] = {'database': f'station_{_slug}', 'hosts': [h for h in _hosts.split('|') if h]}
+
+# محطة الأوامر والعمال الخلفيين (والطلبات من نطاق غير معروف)
+DEFAULT_STATION = os.environ.get('BOOKINGS_STATION', 'main')
+# مهلة كل محطة في التقرير الموحد (ثوانٍ): المتأخرة تُعلَّم ولا تؤخر الباقي
+STATION_REPORT_TIMEOUT = 30
+
+# المحطة أولاً (كل الجداول ← قاعدتها)، ثم التقارير الثقيلة (الرواتب، الأرباح الشهرية
+# والسنوية) للمحطة الرئيسية تُقرأ من النسخة
+DATABASE_ROUTERS = ['bookings.routers.StationRouter', 'bookings.routers.ReportingRouter']
+
+# أقصى عمر مسموح لنسخة التقارير (ثوانٍ)، بعده نرجع للقاعدة الرئيسية
+REPORTING_MAX_LAG = 15 * 60
+
+# ✍️ منسق الكتابة (bookings/writes.py): عدد المحاولات والانتظار الأولي (ثوانٍ)
+DB_WRITE_RETRIES = 5
+DB_WRITE_BACKOFF = 0.05
+
+# =========================================================
+# 📈 Metrics (/metrics بصيغة Prometheus)
+# =========================================================
+# مع عدة عمال: مجلد مشترك تكتب فيه كل عملية عداداتها (None = ذاكرة العملية فقط)
+METRICS_DIR = os.environ.get('METRICS_DIR')
+
+# الوصول: Authorization: Bearer <METRICS_TOKEN> أو من هذه العناوين أو مستخدم إداري.
+# لا عناوين افتراضياً: خلف بروكسي محلي كل الطلبات تأتي من 127.0.0.1 فتصبح الصفحة عامة.
+# مثال: METRICS_ALLOWED_IPS=10.0.0.5 (جامع Prometheus يصل مباشرة بدون بروكسي)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+METRICS_ALLOWED_IPS = tuple(filter(None, (ip.strip() for ip in os.environ.get('METRICS_ALLOWED_IPS', '').split(','))))
+
+# =========================================================
+# 🔄 Change Feed (/api/changes/ + export_changes)
+# =========================================================
+# المستهلكون الخارجيون: Authorization: Bearer <CHANGES_TOKEN> (أو مستخدم إداري)
+CHANGES_TOKEN = os.environ.get('CHANGES_TOKEN')
+# التغييرات الأحدث من هذا (ثوانٍ) تنتظر الطلب التالي حتى تُثبت كل المعاملات قبلها
+CHANGES_SETTLE_SECONDS = 2
+
+# =========================================================
+# 🚦 Rate Limiting (bookings/ratelimit.py)
+# =========================================================
+# أقصى عدد طلبات قيد التنفيذ في العملية الواحدة (الزائد = 429 فوري). None = بدون حد
+RATE_LIMIT_MAX_INFLIGHT = 32
+# الكاش الذي يحفظ الدلاء (انظر CACHES)
+RATE_LIMIT_CACHE = 'ratelimit'
+# X-Forwarded-For يُصدق فقط خلف وكيل موثوق (nginx)
+RATE_LIMIT_TRUST_FORWARDED = False
+# مسارات لا يشملها حد التزامن (المراقبة يجب أن تعمل وقت الزحام)
+RATE_LIMIT_EXEMPT_PATHS = ('/metrics',)
+# ميزانية كل رابط لكل زائر: rate طلب كل per ثانية (methods: الطرق المحسوبة فقط)
+RATE_LIMITS = {
+    'home': {'rate': 5, 'per': 60, 'methods': ('POST',)},
+    'slots_data': {'rate': 60, 'per': 60},
+    'get_notifications': {'rate': 30, 'per': 60},
+    'dashboard_counters': {'rate': 60, 'per': 60},
+    'pos_sync': {'rate': 60, 'per': 60},
+    # بديل WSGI فقط (views.queue_stream)؛ البث تحت ASGI محدود بـ QUEUE_STREAM_MAX_PER_CLIENT
+    'queue_stream': {'rate': 20, 'per': 60},
 }
 
+# =========================================================
+# 🗃️ Caches (bookings/caching.py: L1 ذاكرة العملية + L2 'shared')
+# =========================================================
+# REDIS_URL (مثلاً redis://127.0.0.1:6379/1): L2 ودلاء تحديد المعدل في Redis يشترك فيها كل العمال.
+# بدونه: L2 والدلاء ملفات محلية مشتركة بين عمال نفس الجهاز (لا ذاكرة كل عملية:
+# مع N عمال كانت الميزانية تتضاعف N مرة). عدة أجهزة = REDIS_URL إلزامي.
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'shared': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL, 'KEY_PREFIX': 'bookings'},
+        'ratelimit': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL, 'KEY_PREFIX': 'rl'},
+    }
+else:
+    CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'shared': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(BASE_DIR, '.cache'),
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        },
+        'ratelimit': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(BASE_DIR, '.cache', 'ratelimit'),
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        },
+    }
+CACHE_SHARED_ALIAS = 'shared'
+# L1: أقصى عدد قيم في ذاكرة كل عملية، وأقصى عمر لها (ثوانٍ)
+CACHE_L1_MAX_ENTRIES = 1000
+CACHE_L1_TTL = 30
+# كم ثانية تثق العملية بإصدار المساحة قبل أن تسأل L2 (= أقصى تأخر بين العمال)
+CACHE_VERSION_TTL = 1
+CACHE_DEFAULT_TIMEOUT = 300
+
+# =========================================================
+# 🐢 Slow Query Log (لوحة التحكم > الاستعلامات البطيئة)
+# =========================================================
+# أي استعلام يتجاوز هذا الزمن (ms) يُسجل مع خطة تنفيذه
+SLOW_QUERY_MS = 100
+# نسبة الطلبات المراقبة (1.0 = كلها، 0 = إيقاف)
+SLOW_QUERY_SAMPLE_RATE = 1.0
+# الحد الأقصى لأشكال الاستعلامات المحفوظة (الأقدم يُحذف)
+SLOW_QUERY_MAX_FINGERPRINTS = 500
+
+# =========================================================
+# 🔬 Request Profiler (?profile=1 لمدير النظام)
+# =========================================================
+# الفاصل بين عينات المكدس (ثوانٍ)
+PROFILE_SAMPLE_INTERVAL = 0.002
+# عدد القياسات المحفوظة (الأقدم يُحذف) والحد الأقصى لحجم كل ملف
+PROFILE_MAX_STORED = 50
+PROFILE_MAX_BYTES = 512 * 1024
+
+# =========================================================
+# ⚙️ Background Tasks (python manage.py run_workers)
+# =========================================================
+# True = تنفيذ المهام فوراً داخل الطلب (بدون عمال) - للتطوير فقط
+TASKS_EAGER = False
+
+# مدة حجز المهمة قبل أن يأخذها عامل آخر (ثوانٍ)
+TASKS_LEASE_SECONDS = 300
+
+# تحذير في صفحة المهام إن انتظرت مهمة جاهزة أكثر من هذا (ثوانٍ): العمال متوقفون
+TASKS_STALL_WARNING_SECONDS = 120
+
+# حذف المهام المنتهية بعد هذه المدة (أيام): الناجحة سريعاً، والفاشلة تبقى أطول للتحقيق
+TASKS_DONE_RETENTION_DAYS = 7
+TASKS_FAILED_RETENTION_DAYS = 30
+# كل كم ثانية يحذفها run_workers
+TASKS_PURGE_INTERVAL = 3600
+
+# =========================================================
+# 📨 Customer Messages Outbox (python manage.py dispatch_outbox)
+# =========================================================
+# البوابة (SMS/WhatsApp): أي صنف يطبق bookings.outbox.Gateway
+OUTBOX_GATEWAY = os.environ.get('OUTBOX_GATEWAY', 'bookings.outbox.ConsoleGateway')
+# ملف البوابة المحلية FileGateway
+OUTBOX_FILE = os.path.join(BASE_DIR, 'outbox.jsonl')
+# حجم الدفعة، أقصى عدد رسائل في الدقيقة، وعدد المحاولات قبل الفشل النهائي
+OUTBOX_BATCH_SIZE = 50
+OUTBOX_RATE_PER_MINUTE = 60
+OUTBOX_MAX_ATTEMPTS = 6
+
+# =========================================================
+# 💾 Backups (python manage.py backup_db)
+# =========================================================
+# مجلد النسخ (يُفضل قرص آخر أو مجلد متزامن خارج الجهاز)
+BACKUP_DIR = os.environ.get('BACKUP_DIR', os.path.join(BASE_DIR, 'backups'))
+# عدد السلاسل الكاملة المحفوظة (كل سلسلة = نسخة كاملة + تزايدياتها)
+BACKUP_KEEP_FULL = 7
+# بعد هذا العدد من التزايديات تكون النسخة التالية كاملة
+BACKUP_MAX_INCREMENTALS = 24
+# النسخ من القاعدة الحية على دفعات: صفحات في كل خطوة + استراحة (ثوانٍ)
+BACKUP_PAGES = 256
+BACKUP_PAUSE = 0.005
+# كتابات الكاشير تعيد النسخ من البداية: بعد هذا العدد ننسخ الباقي بخطوة واحدة
+BACKUP_MAX_RESTARTS = 3
+
+# =========================================================
+# 🧹 Notification Retention (python manage.py compact_notifications)
+# =========================================================
+# الإشعارات المقروءة أقدم من هذا تُحذف
+NOTIFICATION_READ_RETENTION_DAYS = 30
+# غير المقروءة لا تُحذف (قد يكون حجزاً لم يره أحد بعد)؛ ضع عدد أيام لتفعيل حذفها
+NOTIFICATION_UNREAD_TTL_DAYS = None
+# الحذف على دفعات قصيرة حتى لا يُحجز الكاتب الوحيد طويلاً
+NOTIFICATION_COMPACT_BATCH = 500
+
+# =========================================================
+# 📅 Booking Slots (مواعيد حجز الموقع /api/slots/)
+# =========================================================
+# ساعات العمل وطول الفترة (دقائق)
+BOOKING_OPEN = '08:00'
+BOOKING_CLOSE = '18:00'
+BOOKING_SLOT_MINUTES = 30
+# كم يوماً للأمام يمكن الحجز
+BOOKING_DAYS_AHEAD = 7
+# السعة إن لم يُسجل أي حضور بعد
+BOOKING_DEFAULT_CAPACITY = 2
+# مدة حفظ توفر اليوم في الكاش (ثوانٍ)
+BOOKING_SLOTS_CACHE_SECONDS = 15
+
+# =========================================================
+# 📺 Queue Board (شاشة الانتظار /queue/ + البث /queue/stream/ عبر ASGI)
+# =========================================================
+# أقصى عمر للنسخة في الذاكرة (ثوانٍ): تغييرات العمليات الأخرى تظهر خلال هذه المدة
+QUEUE_BOARD_MAX_AGE = 10
+# عدد السيارات الجاهزة المعروضة (الأحدث أولاً)
+QUEUE_BOARD_COMPLETED = 8
+# البث لا يمر على حد المعدل (ASGI): أقصى عدد بثوث مفتوحة لكل عنوان (None = بدون حد)
+QUEUE_STREAM_MAX_PER_CLIENT = 4
+
+# =========================================================
+# ⏱️ Worker Performance (مدة الغسيل - /api/leaderboard/)
+# =========================================================
+# مدد خارج هذا المجال لا تدخل الإحصاء (ضغطة خاطئة أو زر نُسي) - ثوانٍ
+WASH_DURATION_MIN_SECONDS = 60
+WASH_DURATION_MAX_SECONDS = 4 * 3600
+# أقل عدد غسلات قبل الاعتماد على إحصاء العامل (التوقعات وترتيب اللوحة)
+PERFORMANCE_MIN_SAMPLES = 5
+
 # =========================================================
 # 🔑 Password Validation
 # =========================================================
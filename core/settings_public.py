@@ -0,0 +1,30 @@
+"""
+🪶 إعدادات العمال الخفيفة: الموقع العام + واجهات JSON فقط (core/urls_public.py).
+
+نفس الإعدادات الكاملة (نفس القاعدة والمفتاح والجلسات) لكن بدون jazzmin وتطبيق الأدمن:
+لا روابط /admin/ على هذه العمال، ولا تسجيلات الأدمن (bookings.admin وما يستورده).
+الأدمن يبقى على core.wsgi.
+modeltranslation يبقى: أسماء الخدمات في /fr/ و /en/ تُقرأ من name_fr و name_en.
+⚠️ modeltranslation.manager يستورد django.contrib.admin.utils، فكود حزمة الأدمن يُحمّل
+هنا أيضاً: التوفير الفعلي صغير (نحو 30 وحدة، بضع ميلي ثوانٍ وقليل من الذاكرة)، والفائدة
+الأساسية إغلاق مسارات الأدمن على العمال العامة. الأرقام: bench_startup.
+
+التشغيل:
+    gunicorn core.wsgi_public:application          # أو
+    uvicorn core.asgi_public:application
+القياس: python manage.py bench_startup
+"""
+from .settings import *  # noqa: F401,F403
+
+# الأدمن وملحقاته فقط تُحذف؛ المصادقة والجلسات تبقى (لوحات الطاقم تسأل عن الإشعارات)
+PUBLIC_EXCLUDED_APPS = ('jazzmin', 'django.contrib.admin', 'django.contrib.humanize')
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in PUBLIC_EXCLUDED_APPS]  # noqa: F405
+
+ROOT_URLCONF = 'core.urls_public'
+WSGI_APPLICATION = 'core.wsgi_public.application'
+
+# 🔬 ?profile=1 يفتح نتائجه في الأدمن: غير متاح هنا
+MIDDLEWARE = [m for m in MIDDLEWARE if m != 'core.middleware.ProfileMiddleware']  # noqa: F405
+
+# صفحة الدخول على عمال الأدمن (نفس النطاق خلف الوكيل)
+STAFF_LOGIN_URL = '/admin/login/'
@@ -14,11 +14,30 @@ from bookings.views import (
     job_detail,
     toggle_mode,              
     update_attendance_manual,
-    update_worker_salary_manual  # 🆕 هام جداً: أضفنا استيراد دالة الراتب
+    update_worker_salary_manual,  # 🆕 هام جداً: أضفنا استيراد دالة الراتب
+    heatmap_data,
+    dashboard_counters,
+    leaderboard_data,
+    changes_feed,
+    pos_sync,
+    pos_service_worker,
+    metrics_endpoint,
+    queue_board,
+    queue_stream,
+    slots_data,
 )
 
 urlpatterns = [
     path('i18n/', include('django.conf.urls.i18n')),
+
+    # 📴 Service Worker للكاشير (بدون بادئة لغة حتى يغطي كل الصفحات)
+    path('pos-sw.js', pos_service_worker, name='pos_service_worker'),
+
+    # 📈 عدادات المراقبة (Prometheus)
+    path('metrics', metrics_endpoint, name='metrics'),
+
+    # 📺 بث شاشة الانتظار (تحت ASGI يلتقطه core/asgi.py قبل الوصول إلى هنا)
+    path('queue/stream/', queue_stream, name='queue_stream'),
 ]
 
 urlpatterns += i18n_patterns(
@@ -28,9 +47,16 @@ urlpatterns += i18n_patterns(
     # الصفحة الرئيسية
     path('', home, name='home'),
     
+    # 📅 توفر مواعيد الحجز (نموذج الموقع)
+    path('api/slots/', slots_data, name='slots_data'),
+
     # الكاشير
     path('pos/', pos_dashboard, name='pos_dashboard'),
+    path('api/pos/sync/', pos_sync, name='pos_sync'),
     
+    # 📺 شاشة الانتظار العامة
+    path('queue/', queue_board, name='queue_board'),
+
     # إنهاء الغسيل
     path('finish/<int:job_id>/', finish_wash, name='finish_wash'),
     
@@ -40,6 +66,16 @@ urlpatterns += i18n_patterns(
     # الإشعارات
     path('api/notifications/', get_notifications, name='get_notifications'),
     path('notifications/read/<int:notif_id>/', mark_read_and_redirect, name='mark_notification_read'),
+
+    # 🔥 خريطة الضغط (ساعة × يوم)
+    path('api/heatmap/', heatmap_data, name='heatmap_data'),
+
+    # 📊 أرقام اليوم (تحديث اللوحة دون إعادة تحميلها)
+    path('api/dashboard/counters/', dashboard_counters, name='dashboard_counters'),
+    path('api/leaderboard/', leaderboard_data, name='leaderboard_data'),
+
+    # 🔄 تغذية التغييرات للمزامنة التدريجية
+    path('api/changes/', changes_feed, name='changes_feed'),
     
     # =========================================================
     # 👇👇👇 الروابط الإدارية (تم إضافة رابط الراتب المفقود) 👇👇👇
@@ -0,0 +1,43 @@
+"""
+🪶 روابط العمال الخفيفة (core/settings_public.py): الموقع العام وواجهات JSON فقط.
+
+نفس الأسماء والمسارات الموجودة في core/urls.py، فالوكيل (nginx) يوجه هذه المسارات
+إلى العمال الخفيفة والباقي (/admin/، /pos/، ...) إلى العمال الكاملة دون تغيير أي رابط.
+"""
+from django.conf.urls.i18n import i18n_patterns
+from django.urls import include, path
+
+from bookings.views import (
+    home,
+    get_notifications,
+    heatmap_data,
+    dashboard_counters,
+    leaderboard_data,
+    changes_feed,
+    pos_sync,
+    pos_service_worker,
+    metrics_endpoint,
+    queue_board,
+    queue_stream,
+    slots_data,
+)
+
+urlpatterns = [
+    path('i18n/', include('django.conf.urls.i18n')),
+    path('pos-sw.js', pos_service_worker, name='pos_service_worker'),
+    path('metrics', metrics_endpoint, name='metrics'),
+    path('queue/stream/', queue_stream, name='queue_stream'),
+]
+
+urlpatterns += i18n_patterns(
+    path('', home, name='home'),
+    path('queue/', queue_board, name='queue_board'),
+    path('api/slots/', slots_data, name='slots_data'),
+    path('api/pos/sync/', pos_sync, name='pos_sync'),
+    path('api/notifications/', get_notifications, name='get_notifications'),
+    path('api/heatmap/', heatmap_data, name='heatmap_data'),
+    path('api/dashboard/counters/', dashboard_counters, name='dashboard_counters'),
+    path('api/leaderboard/', leaderboard_data, name='leaderboard_data'),
+    path('api/changes/', changes_feed, name='changes_feed'),
+    prefix_default_language=False,
+)
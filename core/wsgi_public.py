@@ -0,0 +1,11 @@
+"""
+🪶 مدخل WSGI الخفيف: الموقع العام وواجهات JSON بدون الأدمن (core/settings_public.py).
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings_public')
+
+application = get_wsgi_application()